@@ -0,0 +1,295 @@
+"""
+Backtesting
+===========
+
+Backtest walk-forward dos sinais de compra/venda do MLPredictor.
+
+O histórico é reproduzido em ordem de tempo, em passos (ex.: um dia). Em
+cada passo:
+
+1. os trades do passo são pontuados contra o estado do modelo *antes*
+   deles (sem olhar o futuro):
+   - 'zscore': o sinal de detect_anomalies (MLPredictor.score_anomalies,
+     com os mesmos padrões: últimos trades de cada item, |z| mínimo),
+     contra a média/desvio do item no estado;
+   - 'rolling': z robusto contra a mediana/MAD móvel (rolling_anomaly);
+2. o lote entra no estado incremental (ModelState.ingest);
+3. 'trend': itens em ALTA/BAIXA na previsão de Holt ao fim do passo.
+
+Preço abaixo do esperado (ou tendência de alta) é COMPRAR; acima (ou
+tendência de baixa) é VENDER. Depois da reprodução, cada sinal é comparado
+com o preço médio realizado do item no horizonte seguinte ao sinal (somas
+prefixadas por item, vetorizado): acerto quando o preço anda na direção do
+sinal. O relatório traz qualidade por tipo de sinal e a latência de cada
+passo (atualização do estado + geração dos sinais).
+
+Exemplo:
+    report = WalkForwardBacktest(step='1D', horizon='3D').run(engine.df)
+    report.quality()
+    report.latency()
+"""
+
+import logging
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from ml_predictor import MLPredictor
+from model_state import ModelState
+from rolling_anomaly import RollingAnomalyDetector
+
+logger = logging.getLogger(__name__)
+
+SIGNAL_KINDS = ('zscore', 'rolling', 'trend')
+
+SIGNAL_COLUMNS = ['kind', 'main_item', 'when', 'price_s', 'expected_price', 'score', 'direction']
+
+STEP_COLUMNS = ['start', 'rows', 'signals', 'seconds']
+
+
+class BacktestReport:
+    """
+    Resultado de um backtest: sinais avaliados e latência por passo.
+
+    Attributes:
+        signals: Um sinal por linha (SIGNAL_COLUMNS + realized_price, trades_after,
+            forward_return, hit)
+        steps: Um passo por linha (STEP_COLUMNS)
+        horizon: Horizonte de avaliação dos sinais
+    """
+
+    def __init__(self, signals: pd.DataFrame, steps: pd.DataFrame, horizon: pd.Timedelta) -> None:
+        self.signals = signals
+        self.steps = steps
+        self.horizon = horizon
+
+    def quality(self) -> pd.DataFrame:
+        """
+        Qualidade por tipo de sinal.
+
+        Returns:
+            DataFrame indexado por 'kind' com signals, evaluated (com trades no
+            horizonte), hit_rate, mean_return e median_return (retorno no
+            sentido do sinal, em %).
+        """
+        columns = ['signals', 'evaluated', 'hit_rate', 'mean_return', 'median_return']
+        if self.signals.empty:
+            return pd.DataFrame(columns=columns, index=pd.Index([], name='kind'))
+        signed = self.signals.assign(signed_return=self.signals['forward_return'] * self.signals['direction'] * 100)
+        grouped = signed.groupby('kind', sort=True)
+        table = pd.DataFrame({
+            'signals': grouped.size(),
+            'evaluated': grouped['forward_return'].count(),
+            'hit_rate': grouped['hit'].mean(),
+            'mean_return': grouped['signed_return'].mean(),
+            'median_return': grouped['signed_return'].median(),
+        })
+        return table[columns]
+
+    def latency(self) -> Dict[str, float]:
+        """Latência por passo (segundos) e vazão total (linhas/s)."""
+        seconds = self.steps['seconds'].to_numpy(dtype=float)
+        if not len(seconds):
+            return {'steps': 0, 'total': 0.0, 'mean': np.nan, 'p50': np.nan, 'p95': np.nan, 'max': np.nan,
+                    'rows_per_second': np.nan}
+        total = float(seconds.sum())
+        return {
+            'steps': int(len(seconds)),
+            'total': total,
+            'mean': float(seconds.mean()),
+            'p50': float(np.percentile(seconds, 50)),
+            'p95': float(np.percentile(seconds, 95)),
+            'max': float(seconds.max()),
+            'rows_per_second': float(self.steps['rows'].sum() / total) if total > 0 else np.nan,
+        }
+
+
+class WalkForwardBacktest:
+    """
+    Reprodução walk-forward do histórico com o estado incremental do preditor.
+
+    Args:
+        step: Tamanho do passo (ex.: '1D', '6h')
+        horizon: Janela após o sinal usada para o preço realizado
+        warmup: Histórico inicial incorporado sem gerar sinais
+        kinds: Tipos de sinal gerados (subconjunto de SIGNAL_KINDS)
+        recent: Trades mais recentes por item avaliados no sinal 'zscore'
+            (None = padrão de score_anomalies)
+        threshold: |z| mínimo do sinal 'zscore' (None = padrão de score_anomalies)
+        min_trades: Trades mínimos do item para o sinal 'zscore' (None = padrão de score_anomalies)
+        trend_horizon: Dias da previsão usada no sinal 'trend'
+        rolling: Detector móvel do estado (padrão: RollingAnomalyDetector())
+    """
+
+    def __init__(self, step: str = '1D', horizon: str = '3D', warmup: str = '7D',
+                 kinds: Sequence[str] = SIGNAL_KINDS, recent: Optional[int] = None,
+                 threshold: Optional[float] = None, min_trades: Optional[int] = None,
+                 trend_horizon: int = 7, rolling: Optional[RollingAnomalyDetector] = None) -> None:
+        unknown = set(kinds) - set(SIGNAL_KINDS)
+        if unknown:
+            raise ValueError(f"Tipos de sinal desconhecidos: {sorted(unknown)}. Use {SIGNAL_KINDS}.")
+        self.step = pd.Timedelta(step)
+        self.horizon = pd.Timedelta(horizon)
+        self.warmup = pd.Timedelta(warmup)
+        self.kinds = tuple(kinds)
+        # Só os parâmetros informados: o resto segue os padrões do sinal publicado
+        self.anomaly_kwargs = {name: value for name, value in
+                               (('recent', recent), ('threshold', threshold), ('min_trades', min_trades))
+                               if value is not None}
+        self.trend_horizon = trend_horizon
+        self.rolling = rolling
+
+    def run(self, df: pd.DataFrame, progress=None) -> BacktestReport:
+        """
+        Reproduz ``df`` e avalia os sinais.
+
+        Args:
+            df: DataFrame de trades (main_item, price_s) com DatetimeIndex ordenado
+            progress: Callback opcional (passos concluídos, total de passos)
+
+        Returns:
+            BacktestReport com os sinais avaliados e a latência por passo.
+        """
+        if df is None or df.empty or not isinstance(df.index, pd.DatetimeIndex) \
+                or not {'main_item', 'price_s'}.issubset(df.columns):
+            raise ValueError("Backtest requer trades (main_item, price_s) com DatetimeIndex.")
+        if not df.index.is_monotonic_increasing:
+            df = df.sort_index(kind='stable')
+        valid = df['price_s'].to_numpy(dtype=float) > 0
+        if not valid.all():
+            df = df[valid]
+
+        state = ModelState(rolling=RollingAnomalyDetector(**self._rolling_kwargs()))
+        timestamps = df.index.to_numpy().astype('datetime64[ns]')
+        origin = df.index[0].floor('D')
+        warm_end = int(np.searchsorted(timestamps, np.datetime64(origin + self.warmup), side='left'))
+        edges = pd.date_range(origin + self.warmup, df.index[-1] + self.step, freq=self.step).to_numpy()
+        bounds = np.unique(np.r_[warm_end, np.searchsorted(timestamps, edges, side='left'), len(df)])
+        bounds = bounds[bounds >= warm_end]
+
+        if warm_end:
+            state.ingest(df.iloc[:warm_end])
+
+        signals: List[pd.DataFrame] = []
+        steps = []
+        total_steps = len(bounds) - 1
+        for k, (lo, hi) in enumerate(zip(bounds[:-1], bounds[1:])):
+            batch = df.iloc[lo:hi]
+            started = time.perf_counter()
+            produced = []
+            if 'zscore' in self.kinds:
+                produced.append(self._zscore_signals(state, batch))
+            flags = state.ingest(batch)
+            if 'rolling' in self.kinds:
+                produced.append(self._rolling_signals(flags))
+            if 'trend' in self.kinds:
+                produced.append(self._trend_signals(state, batch.index[-1]))
+            produced = [p for p in produced if not p.empty]
+            elapsed = time.perf_counter() - started
+
+            n_signals = sum(len(p) for p in produced)
+            signals.extend(produced)
+            steps.append((batch.index[0], hi - lo, n_signals, elapsed))
+            if progress:
+                progress(k + 1, total_steps)
+
+        steps = pd.DataFrame(steps, columns=STEP_COLUMNS)
+        signals = pd.concat(signals, ignore_index=True) if signals else pd.DataFrame(columns=SIGNAL_COLUMNS)
+        signals = self._evaluate(df, signals)
+        logger.info(f"Backtest: {len(steps)} passos, {len(signals):,} sinais, "
+                    f"{steps['seconds'].sum():.1f}s de processamento")
+        return BacktestReport(signals, steps, self.horizon)
+
+    def _rolling_kwargs(self) -> dict:
+        if self.rolling is None:
+            return {}
+        return {'window_days': self.rolling.window_days, 'threshold': self.rolling.threshold,
+                'min_days': self.rolling.min_days, 'keep_flags': self.rolling.keep_flags}
+
+    # ------------------------------------------------------------------
+    # Sinais (só com o estado anterior ao lote)
+    # ------------------------------------------------------------------
+
+    def _zscore_signals(self, state: ModelState, batch: pd.DataFrame) -> pd.DataFrame:
+        scores = MLPredictor.score_anomalies(batch, moments=state.moments.table(), **self.anomaly_kwargs)
+        if scores.empty:
+            return pd.DataFrame(columns=SIGNAL_COLUMNS)
+        return self._frame('zscore', scores['main_item'].to_numpy(dtype=object), scores['when'].to_numpy(),
+                           scores['price_s'].to_numpy(dtype=float), scores['mean_price'].to_numpy(dtype=float),
+                           scores['z_score'].to_numpy(dtype=float))
+
+    def _rolling_signals(self, flags: pd.DataFrame) -> pd.DataFrame:
+        if flags.empty:
+            return pd.DataFrame(columns=SIGNAL_COLUMNS)
+        return self._frame('rolling', flags['main_item'].to_numpy(dtype=object), flags['when'].to_numpy(),
+                           flags['price_s'].to_numpy(dtype=float), flags['median_price'].to_numpy(dtype=float),
+                           flags['robust_z'].to_numpy(dtype=float))
+
+    def _trend_signals(self, state: ModelState, when: pd.Timestamp) -> pd.DataFrame:
+        summary = state.forecast.summary(horizon=self.trend_horizon)
+        summary = summary[summary['label'] != 'ESTÁVEL']
+        if summary.empty:
+            return pd.DataFrame(columns=SIGNAL_COLUMNS)
+        # Score negativo = preço deve subir (COMPRAR), como z < 0 nos sinais de anomalia
+        return self._frame('trend', summary['main_item'].to_numpy(dtype=object),
+                           np.full(len(summary), np.datetime64(when, 'ns')),
+                           summary['last_price'].to_numpy(dtype=float), summary['forecast'].to_numpy(dtype=float),
+                           -summary['change_pct'].to_numpy(dtype=float))
+
+    @staticmethod
+    def _frame(kind, items, when, prices, expected, score) -> pd.DataFrame:
+        return pd.DataFrame({
+            'kind': kind,
+            'main_item': items,
+            'when': np.asarray(when, dtype='datetime64[ns]'),
+            'price_s': prices,
+            'expected_price': expected,
+            'score': score,
+            # COMPRAR (+1) quando o preço está abaixo do esperado, VENDER (-1) acima
+            'direction': np.where(np.asarray(score) < 0, 1, -1).astype(np.int8),
+        }, columns=SIGNAL_COLUMNS)
+
+    # ------------------------------------------------------------------
+    # Avaliação
+    # ------------------------------------------------------------------
+
+    def _evaluate(self, df: pd.DataFrame, signals: pd.DataFrame) -> pd.DataFrame:
+        """Preço médio realizado no horizonte após cada sinal (somas prefixadas por item)."""
+        signals = signals.copy()
+        if signals.empty:
+            for column in ('realized_price', 'trades_after', 'forward_return', 'hit'):
+                signals[column] = pd.Series(dtype=float)
+            return signals
+
+        # df está em ordem de tempo: a posição da linha é o tempo. Ordenando
+        # por (item, posição), os trades de um item num intervalo de tempo
+        # são uma fatia contígua, achada por busca binária para todos os sinais
+        codes, uniques = pd.factorize(df['main_item'])
+        n = len(df)
+        order = np.argsort(codes, kind='stable')
+        key = codes[order].astype(np.int64) * n + order
+        cumulative = np.r_[0.0, np.cumsum(df['price_s'].to_numpy(dtype=float)[order])]
+
+        timestamps = df.index.to_numpy().astype('datetime64[ns]')
+        signal_when = signals['when'].to_numpy().astype('datetime64[ns]')
+        first = np.searchsorted(timestamps, signal_when, side='right')
+        last = np.searchsorted(timestamps, signal_when + self.horizon.to_timedelta64(), side='right')
+        signal_codes = pd.Index(uniques).get_indexer(signals['main_item'])
+        known = signal_codes >= 0
+        base = np.where(known, signal_codes, 0).astype(np.int64) * n
+        lo = np.searchsorted(key, base + first, side='left')
+        hi = np.searchsorted(key, base + last, side='left')
+        n_after = np.where(known, hi - lo, 0)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            realized = np.where(n_after > 0, (cumulative[hi] - cumulative[lo]) / n_after, np.nan)
+            forward = realized / signals['price_s'].to_numpy(dtype=float) - 1
+        hit = np.where(np.isfinite(forward), (forward * signals['direction'].to_numpy()) > 0, np.nan)
+
+        signals['realized_price'] = realized
+        signals['trades_after'] = n_after
+        signals['forward_return'] = forward
+        signals['hit'] = hit
+        return signals
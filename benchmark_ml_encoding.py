@@ -0,0 +1,78 @@
+"""
+Benchmark: get_dummies denso vs codificação compacta do item
+=============================================================
+
+Compara a memória e o tempo do pré-processamento antigo de
+MLPredictor.preprocess_for_ml (pd.get_dummies em 'main_item') com o atual
+(categoria + frequência + média por item) e com o one-hot esparso CSR.
+
+O caminho denso é medido numa amostra e extrapolado linearmente: no
+tamanho cheio ele pode não caber na memória.
+
+Uso:
+    python benchmark_ml_encoding.py [linhas] [itens]   (padrão: 2.000.000 e 5.000)
+"""
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from ml_predictor import MLPredictor
+
+DENSE_SAMPLE = 100_000
+
+
+def make_frame(n: int, n_items: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    # Popularidade de itens com cauda longa (Zipf), como no chat de trade
+    codes = np.minimum(rng.zipf(1.3, n), n_items) - 1
+    items = pd.Categorical.from_codes(codes, [f'item {i}' for i in range(n_items)])
+    prices = np.round(rng.lognormal(3, 0.6, n), 2)
+    return pd.DataFrame({
+        'main_item': items,
+        'price_s': prices,
+        'price_iron': prices * 100,
+        'Timestamp': pd.date_range('2025-01-01', periods=n, freq='min'),
+    })
+
+
+def frame_mb(df: pd.DataFrame) -> float:
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+
+def main(n: int, n_items: int) -> None:
+    print(f"Gerando {n:,} linhas com até {n_items:,} itens...")
+    df = make_frame(n, n_items)
+    predictor = MLPredictor()
+
+    sample = df.iloc[:min(DENSE_SAMPLE, n)]
+    t0 = time.perf_counter()
+    dense = pd.get_dummies(sample, columns=['main_item'], prefix='item', drop_first=False)
+    dense_s = (time.perf_counter() - t0) * n / len(sample)
+    dense_mb = frame_mb(dense) * n / len(sample)
+    del dense
+
+    t0 = time.perf_counter()
+    compact = predictor.preprocess_for_ml(df)
+    compact_s = time.perf_counter() - t0
+    compact_mb = frame_mb(compact)
+
+    print(f"\n  {'caminho':<34} {'memória':>12} {'tempo':>9}")
+    print(f"  {'get_dummies denso (extrapolado)':<34} {dense_mb:9.1f} MB {dense_s:8.2f}s")
+    print(f"  {'categoria + freq + média':<34} {compact_mb:9.1f} MB {compact_s:8.2f}s")
+    try:
+        t0 = time.perf_counter()
+        matrix, _ = predictor.item_onehot(compact)
+        sparse_s = time.perf_counter() - t0
+        sparse_mb = (matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes) / 1024 ** 2
+        print(f"  {'one-hot CSR (só a matriz)':<34} {sparse_mb:9.1f} MB {sparse_s:8.2f}s")
+    except ImportError as e:
+        print(f"  one-hot CSR: {e}")
+    print(f"\n  Redução: {dense_mb / compact_mb:,.0f}x")
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*(args + [2_000_000, 5_000][len(args):]))
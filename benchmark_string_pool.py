@@ -0,0 +1,77 @@
+"""
+Benchmark: raw_text como coluna object vs StringPool
+=====================================================
+
+Gera linhas de chat sintéticas e compara memória e latência da busca por
+substring (como a Busca Avançada da GUI).
+
+Uso:
+    python benchmark_string_pool.py [linhas]   (padrão: 5.000.000)
+"""
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from string_pool import StringPool
+
+ITEMS = ['iron lump', 'stone brick', 'log', 'plank', 'rare bone', 'sleep powder',
+         'silver lump', 'gold lump', 'mortar', 'rope', 'nails', 'small anvil']
+PLAYERS = [f'player{i}' for i in range(3000)]
+
+
+def make_lines(n: int, seed: int = 0) -> pd.Series:
+    rng = np.random.default_rng(seed)
+    ops = np.where(rng.random(n) < 0.6, 'WTS', 'WTB')
+    items = np.array(ITEMS)[rng.integers(0, len(ITEMS), n)]
+    players = np.array(PLAYERS)[rng.integers(0, len(PLAYERS), n)]
+    ql = rng.integers(1, 100, n)
+    price = rng.integers(1, 500, n)
+    lines = [f"<{p}> {o} {i} ql{q} {c}c pm me" for p, o, i, q, c in zip(players, ops, items, ql, price)]
+    return pd.Series(lines, dtype=object, name='raw_text')
+
+
+def timed(label: str, func, repeat: int = 3):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - t0)
+    print(f"  {label:<38} {best * 1000:9.1f} ms")
+    return result
+
+
+def main(n: int) -> None:
+    print(f"Gerando {n:,} linhas...")
+    raw = make_lines(n)
+
+    print("\nMemória:")
+    object_mb = raw.memory_usage(deep=True) / 1024 ** 2
+    t0 = time.perf_counter()
+    pool = StringPool(raw)
+    build_s = time.perf_counter() - t0
+    pool_mb = pool.nbytes / 1024 ** 2
+    print(f"  coluna object                          {object_mb:9.1f} MB")
+    print(f"  StringPool ({pool.n_unique:,} distintos)     {pool_mb:9.1f} MB  (construção {build_s:.1f}s)")
+
+    print("\nBusca 'rare bone' (case-insensitive):")
+    expected = timed('pandas str.contains', lambda: raw.str.contains('rare bone', case=False, regex=False).to_numpy())
+    result = timed('StringPool.contains', lambda: pool.contains('rare bone'))
+    assert (expected == result).all()
+
+    print("\nBusca avançada 'wts rare' sem 'ql9':")
+    def pandas_advanced():
+        lower = raw.str.lower()
+        return (lower.str.contains('wts', regex=False) & lower.str.contains('rare', regex=False)
+                & ~lower.str.contains('ql9', regex=False)).to_numpy()
+    expected = timed('pandas (3 x str.contains)', pandas_advanced, repeat=1)
+    result = timed('StringPool.search', lambda: pool.search(['wts', 'rare'], ['ql9']))
+    assert (expected == result).all()
+    print(f"\n  {int(result.sum()):,} linhas encontradas")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000)
@@ -9,8 +9,13 @@ from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
 import logging
 
+from wurm_stats_engine import slice_time_range
+
 logger = logging.getLogger(__name__)
 
+# Rótulos das frequências de reamostragem
+FREQ_LABELS = {'h': 'Horário', 'D': 'Diário', 'W': 'Semanal', 'M': 'Mensal'}
+
 
 class ChartsEngine:
     """Motor de geração de gráficos para análise de dados de trade."""
@@ -21,7 +26,7 @@ class ChartsEngine:
         self.current_canvas = None
         
     def create_price_trend_chart(self, df: pd.DataFrame, item_name: str, 
-                                  parent_frame=None) -> Figure:
+                                  parent_frame=None, start=None, end=None) -> Figure:
         """
         Cria um gráfico de tendência de preço para um item específico.
         
@@ -29,11 +34,16 @@ class ChartsEngine:
             df: DataFrame com os dados de trade
             item_name: Nome do item para filtrar
             parent_frame: Frame Tkinter para embedding (opcional)
+            start: Data inicial (inclusiva), opcional
+            end: Data final (inclusiva), opcional
             
         Returns:
             Figure do Matplotlib
         """
         try:
+            # Fatia o período antes de qualquer outro processamento
+            df = slice_time_range(df, start, end)
+
             # Reset index to avoid ambiguity with date
             df = df.reset_index(drop=True)
             
@@ -41,7 +51,7 @@ class ChartsEngine:
             if 'main_item' not in df.columns:
                 raise ValueError("Coluna 'main_item' não encontrada")
                 
-            item_df = df[df['main_item'].str.contains(item_name, case=False, na=False)].copy()
+            item_df = df[df['main_item'].str.contains(item_name, case=False, regex=False, na=False)].copy()
             
             if item_df.empty:
                 raise ValueError(f"Nenhum dado encontrado para '{item_name}'")
@@ -60,51 +70,8 @@ class ChartsEngine:
             daily_avg = item_df.groupby('date')['price_s'].agg(['mean', 'count']).reset_index()
             daily_avg = daily_avg.sort_values('date')
             
-            # Calcula média geral para linha de base
-            overall_mean = daily_avg['mean'].mean()
-            
-            # Calcula limites do eixo Y com margem de 5%
-            price_min = daily_avg['mean'].min()
-            price_max = daily_avg['mean'].max()
-            price_range = price_max - price_min
-            margin = price_range * 0.05 if price_range > 0 else price_max * 0.1
-            y_min = max(0, price_min - margin)  # Não deixa negativo
-            y_max = price_max + margin
-            
-            # Cria figura
-            fig = Figure(figsize=(10, 6), dpi=100)
-            ax = fig.add_subplot(111)
-            
-            # Plot linha de tendência com marcadores mais evidentes
-            ax.plot(daily_avg['date'], daily_avg['mean'], 
-                   marker='o', linestyle='-', linewidth=2.5, markersize=8,
-                   color='#2E86AB', label='Preço Médio Diário', 
-                   markerfacecolor='#2E86AB', markeredgecolor='white', markeredgewidth=1.5)
-            
-            # Linha de base (média geral)
-            ax.axhline(y=overall_mean, color='#E63946', linestyle='--', 
-                      linewidth=2, alpha=0.7, label=f'Média Geral ({overall_mean:.2f}s)')
-            
-            # Configurações visuais
-            ax.set_xlabel('Data', fontsize=11, fontweight='bold')
-            ax.set_ylabel('Preço (silver)', fontsize=11, fontweight='bold')
-            ax.set_title(f'Tendência de Preço: {item_name}', 
-                        fontsize=13, fontweight='bold', pad=15)
-            
-            # Define limites do eixo Y (zoom focado)
-            ax.set_ylim(y_min, y_max)
-            
-            # Grid mais sutil
-            ax.grid(True, alpha=0.3, linestyle='--', linewidth=0.8)
-            ax.legend(loc='best', framealpha=0.95, fontsize=9)
-            
-            # Rotaciona labels do eixo X
-            fig.autofmt_xdate()
-            
-            # Ajusta layout
-            fig.tight_layout()
-            
-            self.current_figure = fig
+            fig = self._plot_price_series(daily_avg['date'], daily_avg['mean'], item_name,
+                                          'Preço Médio Diário')
             
             logger.info(f"Gráfico criado para '{item_name}' com {len(daily_avg)} pontos")
             
@@ -114,23 +81,78 @@ class ChartsEngine:
             logger.error(f"Erro ao criar gráfico: {e}")
             raise
     
-    def create_volume_chart(self, df: pd.DataFrame, item_name: str) -> Figure:
+    def _plot_price_series(self, dates, means, item_name: str, series_label: str) -> Figure:
+        """Desenha uma série de preço médio com a linha de média geral."""
+        # Calcula média geral para linha de base
+        overall_mean = means.mean()
+
+        # Calcula limites do eixo Y com margem de 5%
+        price_min = means.min()
+        price_max = means.max()
+        price_range = price_max - price_min
+        margin = price_range * 0.05 if price_range > 0 else price_max * 0.1
+        y_min = max(0, price_min - margin)  # Não deixa negativo
+        y_max = price_max + margin
+
+        # Cria figura
+        fig = Figure(figsize=(10, 6), dpi=100)
+        ax = fig.add_subplot(111)
+
+        # Plot linha de tendência com marcadores mais evidentes
+        ax.plot(dates, means, 
+               marker='o', linestyle='-', linewidth=2.5, markersize=8,
+               color='#2E86AB', label=series_label, 
+               markerfacecolor='#2E86AB', markeredgecolor='white', markeredgewidth=1.5)
+
+        # Linha de base (média geral)
+        ax.axhline(y=overall_mean, color='#E63946', linestyle='--', 
+                  linewidth=2, alpha=0.7, label=f'Média Geral ({overall_mean:.2f}s)')
+
+        # Configurações visuais
+        ax.set_xlabel('Data', fontsize=11, fontweight='bold')
+        ax.set_ylabel('Preço (silver)', fontsize=11, fontweight='bold')
+        ax.set_title(f'Tendência de Preço: {item_name}', 
+                    fontsize=13, fontweight='bold', pad=15)
+
+        # Define limites do eixo Y (zoom focado)
+        ax.set_ylim(y_min, y_max)
+
+        # Grid mais sutil
+        ax.grid(True, alpha=0.3, linestyle='--', linewidth=0.8)
+        ax.legend(loc='best', framealpha=0.95, fontsize=9)
+
+        # Rotaciona labels do eixo X
+        fig.autofmt_xdate()
+
+        # Ajusta layout
+        fig.tight_layout()
+
+        self.current_figure = fig
+        return fig
+
+    def create_volume_chart(self, df: pd.DataFrame, item_name: str,
+                            start=None, end=None) -> Figure:
         """
         Cria um gráfico de volume de transações.
         
         Args:
             df: DataFrame com os dados de trade
             item_name: Nome do item para filtrar
+            start: Data inicial (inclusiva), opcional
+            end: Data final (inclusiva), opcional
             
         Returns:
             Figure do Matplotlib
         """
         try:
+            # Fatia o período antes de qualquer outro processamento
+            df = slice_time_range(df, start, end)
+
             # Reset index to avoid ambiguity
             df = df.reset_index(drop=True)
             
             # Filtra dados do item
-            item_df = df[df['main_item'].str.contains(item_name, case=False, na=False)].copy()
+            item_df = df[df['main_item'].str.contains(item_name, case=False, regex=False, na=False)].copy()
             
             if item_df.empty:
                 raise ValueError(f"Nenhum dado encontrado para '{item_name}'")
@@ -139,36 +161,109 @@ class ChartsEngine:
             daily_volume = item_df.groupby('date').size().reset_index(name='volume')
             daily_volume = daily_volume.sort_values('date')
             
-            # Cria figura
-            fig = Figure(figsize=(10, 6), dpi=100)
-            ax = fig.add_subplot(111)
-            
-            # Plot barras
-            ax.bar(daily_volume['date'], daily_volume['volume'], 
-                  color='#A23B72', alpha=0.7, label='Volume de Transações')
-            
-            # Configurações visuais
-            ax.set_xlabel('Data', fontsize=11, fontweight='bold')
-            ax.set_ylabel('Número de Transações', fontsize=11, fontweight='bold')
-            ax.set_title(f'Volume de Atividade: {item_name}', 
-                        fontsize=13, fontweight='bold', pad=15)
-            ax.grid(True, alpha=0.3, linestyle='--', axis='y')
-            ax.legend(loc='best', framealpha=0.9)
-            
-            # Rotaciona labels
-            fig.autofmt_xdate()
-            
-            # Ajusta layout
-            fig.tight_layout()
-            
-            self.current_figure = fig
-            
-            return fig
+            return self._plot_volume_series(daily_volume['date'], daily_volume['volume'],
+                                            item_name, 'Volume de Transações')
             
         except Exception as e:
             logger.error(f"Erro ao criar gráfico de volume: {e}")
             raise
     
+    def _plot_volume_series(self, dates, volumes, item_name: str, series_label: str,
+                            bar_width=None) -> Figure:
+        """Desenha uma série de volume em barras."""
+        fig = Figure(figsize=(10, 6), dpi=100)
+        ax = fig.add_subplot(111)
+
+        # Plot barras
+        bar_kwargs = {'width': bar_width} if bar_width is not None else {}
+        ax.bar(dates, volumes, color='#A23B72', alpha=0.7, label=series_label, **bar_kwargs)
+
+        # Configurações visuais
+        ax.set_xlabel('Data', fontsize=11, fontweight='bold')
+        ax.set_ylabel('Número de Transações', fontsize=11, fontweight='bold')
+        ax.set_title(f'Volume de Atividade: {item_name}', 
+                    fontsize=13, fontweight='bold', pad=15)
+        ax.grid(True, alpha=0.3, linestyle='--', axis='y')
+        ax.legend(loc='best', framealpha=0.9)
+
+        # Rotaciona labels
+        fig.autofmt_xdate()
+
+        # Ajusta layout
+        fig.tight_layout()
+
+        self.current_figure = fig
+        return fig
+
+    def create_resampled_chart(self, series: pd.DataFrame, item_name: str,
+                               kind: str = 'price', freq: str = 'D') -> Figure:
+        """
+        Cria um gráfico a partir de uma série já reamostrada.
+
+        Args:
+            series: Saída de WurmStatsEngine.get_resampled_series
+            item_name: Nome do item (título)
+            kind: 'price' (preço médio) ou 'volume' (número de transações)
+            freq: Frequência da série ('h', 'D', 'W' ou 'M')
+
+        Returns:
+            Figure do Matplotlib
+        """
+        label = FREQ_LABELS.get(freq, freq)
+        if series is None or series.empty:
+            raise ValueError(f"Nenhum dado encontrado para '{item_name}'")
+
+        if kind == 'volume':
+            widths = {'h': 1 / 24, 'D': 0.8, 'W': 5, 'M': 20}
+            return self._plot_volume_series(series.index, series['trades'], item_name,
+                                            f'Transações ({label})', widths.get(freq))
+
+        prices = series['mean_price'].dropna()
+        if prices.empty:
+            raise ValueError(f"Dados insuficientes para '{item_name}'")
+        fig = self._plot_price_series(prices.index, prices, item_name, f'Preço Médio ({label})')
+        logger.info(f"Gráfico {label.lower()} criado para '{item_name}' com {len(prices)} pontos")
+        return fig
+
+    def create_ql_surface_chart(self, surface: pd.DataFrame, item_name: str) -> Figure:
+        """
+        Mapa de calor da mediana de preço por faixa de QL e mês.
+
+        Args:
+            surface: Saída de WurmStatsEngine.get_ql_surface (faixas x períodos)
+            item_name: Nome do item (título)
+
+        Returns:
+            Figure do Matplotlib
+        """
+        if surface is None or surface.empty:
+            raise ValueError(f"Nenhum dado de QL encontrado para '{item_name}'")
+
+        fig = Figure(figsize=(10, 6), dpi=100)
+        ax = fig.add_subplot(111)
+
+        values = surface.to_numpy(dtype=float)
+        image = ax.imshow(values, aspect='auto', origin='lower', cmap='viridis',
+                          interpolation='nearest')
+        cbar = fig.colorbar(image, ax=ax)
+        cbar.set_label('Mediana (silver)', fontsize=10)
+
+        ax.set_yticks(range(len(surface.index)))
+        ax.set_yticklabels(surface.index)
+        step = max(1, len(surface.columns) // 12)
+        ax.set_xticks(range(0, len(surface.columns), step))
+        ax.set_xticklabels([pd.Timestamp(c).strftime('%Y-%m') for c in surface.columns[::step]],
+                           rotation=45, ha='right')
+
+        ax.set_xlabel('Mês', fontsize=11, fontweight='bold')
+        ax.set_ylabel('Faixa de QL', fontsize=11, fontweight='bold')
+        ax.set_title(f'Preço por QL: {item_name}', fontsize=13, fontweight='bold', pad=15)
+        fig.tight_layout()
+
+        self.current_figure = fig
+        logger.info(f"Superfície de QL criada para '{item_name}' ({values.shape[0]}x{values.shape[1]})")
+        return fig
+
     def save_chart(self, filepath: str, dpi: int = 150):
         """
         Salva o gráfico atual em arquivo.
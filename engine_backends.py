@@ -0,0 +1,311 @@
+"""
+Engine Backends
+===============
+
+Backends colunares para as consultas pesadas do WurmStatsEngine.
+
+O engine continua dono do DataFrame pandas; o backend responde três
+perguntas sobre ele: quais linhas pertencem a um conjunto de itens, qual o
+preço médio diário dessas linhas e qual o menor WTS / maior WTB por dia.
+
+- ``pandas``: NumPy/pandas puro (padrão, sem dependências extras).
+- ``polars``: LazyFrame multi-thread; as colunas usadas são copiadas uma vez
+  por versão do DataFrame.
+- ``duckdb``: SQL embutido; as colunas viram uma tabela nativa uma vez por
+  versão do DataFrame.
+
+Nomes de item são resolvidos antes, sobre as categorias: os backends só
+filtram códigos inteiros. As respostas voltam como NumPy/pandas para a GUI.
+"""
+
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Linhas a considerar: fatia posicional (índice temporal) ou máscara booleana
+Rows = Optional[Union[slice, np.ndarray]]
+
+
+def item_codes(df: pd.DataFrame) -> Tuple[np.ndarray, pd.Index]:
+    """Códigos inteiros de 'main_item' (-1 = nulo) e os nomes correspondentes."""
+    col = df['main_item']
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        return col.cat.codes.to_numpy(), col.cat.categories
+    codes, uniques = pd.factorize(col)
+    return codes, pd.Index(uniques)
+
+
+def trade_timestamps(df: pd.DataFrame) -> np.ndarray:
+    """
+    Momento de cada trade como datetime64[ns]: o índice temporal ou a coluna 'date'.
+
+    Sem nenhum dos dois (ou com datas ilegíveis) os valores viram NaT; quem
+    consome descarta linhas NaT, então um DataFrame sem tempo não gera
+    resultados em vez de levantar KeyError.
+    """
+    if isinstance(df.index, pd.DatetimeIndex):
+        return df.index.to_numpy(dtype='datetime64[ns]')
+    if 'date' in df.columns:
+        return pd.to_datetime(df['date'], errors='coerce').to_numpy(dtype='datetime64[ns]')
+    return np.full(len(df), np.datetime64('NaT'), dtype='datetime64[ns]')
+
+
+def match_item_names(names: Sequence, item_name: str, exact: bool = False) -> np.ndarray:
+    """
+    Máscara dos nomes que casam com item_name (regra única de busca por item).
+
+    Texto literal e case-insensitive (nomes como 'rope (thick)' não são
+    regex): com ``exact`` o nome inteiro precisa ser igual, senão basta
+    aparecer em qualquer parte do nome.
+    """
+    names = pd.Series(np.asarray(names, dtype=object), dtype=object).astype(str).str.lower()
+    item_name = str(item_name).lower()
+    if exact:
+        return (names == item_name).to_numpy(dtype=bool)
+    return names.str.contains(item_name, regex=False, na=False).to_numpy(dtype=bool)
+
+
+def _row_positions(n: int, rows: Rows) -> np.ndarray:
+    if rows is None:
+        return np.arange(n)
+    if isinstance(rows, slice):
+        return np.arange(n)[rows]
+    return np.flatnonzero(rows)
+
+
+class EngineBackend:
+    """Interface comum (implementação de referência em pandas)."""
+
+    name = 'pandas'
+
+    def prepare(self, df: pd.DataFrame) -> None:
+        """Pré-converte/registra o DataFrame (opcional)."""
+
+    def invalidate(self) -> None:
+        """Descarta conversões em cache (o DataFrame mudou de lugar ou de tipo)."""
+
+    def filter_positions(self, df: pd.DataFrame, codes: np.ndarray, rows: Rows = None) -> np.ndarray:
+        """Posições (ordenadas) das linhas cujo item está em ``codes``."""
+        all_codes, _ = item_codes(df)
+        positions = _row_positions(len(df), rows)
+        return positions[np.isin(all_codes[positions], codes)]
+
+    def daily_mean_price(self, df: pd.DataFrame, codes: np.ndarray, rows: Rows = None) -> pd.Series:
+        """Preço médio por 'date' das linhas selecionadas."""
+        rows_df = df.iloc[self.filter_positions(df, codes, rows)]
+        return rows_df.groupby('date')['price_s'].mean()
+
+    def daily_spread(self, df: pd.DataFrame, codes: np.ndarray, rows: Rows = None) -> pd.DataFrame:
+        """Menor WTS e maior WTB por 'date' (apenas dias com os dois lados)."""
+        rows_df = df.iloc[self.filter_positions(df, codes, rows)]
+        wts = rows_df[rows_df['operation'] == 'WTS'].groupby('date')['price_s'].min()
+        wtb = rows_df[rows_df['operation'] == 'WTB'].groupby('date')['price_s'].max()
+        return pd.DataFrame({'min_wts': wts, 'max_wtb': wtb}).dropna()
+
+
+PandasBackend = EngineBackend
+
+
+class _ColumnarBackend(EngineBackend):
+    """Base dos backends que trabalham sobre uma cópia colunar enxuta do DataFrame."""
+
+    def __init__(self) -> None:
+        self._source: Optional[pd.DataFrame] = None
+        self._shape: Tuple[int, int] = (0, 0)
+
+    def invalidate(self) -> None:
+        self._source = None
+
+    @staticmethod
+    def _columns(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """Apenas as colunas usadas pelas consultas, como arrays NumPy."""
+        codes, _ = item_codes(df)
+        columns = {
+            'pos': np.arange(len(df), dtype=np.int64),
+            'item_code': codes.astype(np.int32),
+        }
+        if 'date' in df.columns:
+            columns['date'] = pd.to_datetime(df['date'], errors='coerce').to_numpy(dtype='datetime64[ns]')
+        if 'price_s' in df.columns:
+            columns['price_s'] = df['price_s'].to_numpy(dtype=float)
+        if 'operation' in df.columns:
+            columns['is_wts'] = (df['operation'] == 'WTS').to_numpy()
+            columns['is_wtb'] = (df['operation'] == 'WTB').to_numpy()
+        return columns
+
+    def _ensure(self, df: pd.DataFrame) -> None:
+        # O engine troca o objeto a cada append; downcasts mudam as colunas
+        shape = (len(df), len(df.columns))
+        if self._source is not df or self._shape != shape:
+            self._load(self._columns(df))
+            self._source, self._shape = df, shape
+
+    def prepare(self, df: pd.DataFrame) -> None:
+        self.invalidate()
+        self._ensure(df)
+
+    @staticmethod
+    def _date_index(values, df: pd.DataFrame) -> pd.DatetimeIndex:
+        """Índice 'date' na mesma resolução da coluna original (como no groupby do pandas)."""
+        index = pd.DatetimeIndex(values, name='date')
+        dtype = df['date'].dtype
+        return index.astype(dtype) if isinstance(dtype, np.dtype) and dtype.kind == 'M' else index
+
+    def _load(self, columns: Dict[str, np.ndarray]) -> None:
+        raise NotImplementedError
+
+
+class PolarsBackend(_ColumnarBackend):
+    """Consultas em Polars (lazy, multi-thread)."""
+
+    name = 'polars'
+
+    def __init__(self) -> None:
+        try:
+            import polars as pl
+        except ImportError as e:
+            raise ImportError("Backend 'polars' requer o pacote polars: pip install polars") from e
+        super().__init__()
+        self._pl = pl
+        self._frame = None
+
+    def _load(self, columns: Dict[str, np.ndarray]) -> None:
+        pl = self._pl
+        series = [pl.Series(name, values, nan_to_null=(name == 'price_s'))
+                  for name, values in columns.items()]
+        self._frame = pl.DataFrame(series)
+
+    def _selected(self, df: pd.DataFrame, codes: np.ndarray, rows: Rows):
+        pl = self._pl
+        self._ensure(df)
+        lf = self._frame.lazy()
+        if isinstance(rows, slice):
+            start, stop, _ = rows.indices(len(df))
+            lf = lf.slice(start, max(stop - start, 0))
+        elif rows is not None:
+            lf = lf.filter(pl.Series(np.asarray(rows, dtype=bool)))
+        return lf.filter(pl.col('item_code').is_in(np.asarray(codes, dtype=np.int32).tolist()))
+
+    def filter_positions(self, df, codes, rows=None):
+        out = self._selected(df, codes, rows).select('pos').collect()
+        return out['pos'].to_numpy()
+
+    def daily_mean_price(self, df, codes, rows=None):
+        pl = self._pl
+        out = (self._selected(df, codes, rows)
+               .filter(pl.col('date').is_not_null())
+               .group_by('date').agg(pl.col('price_s').mean())
+               .sort('date').collect())
+        return pd.Series(out['price_s'].to_numpy(), index=self._date_index(out['date'].to_numpy(), df),
+                         name='price_s', dtype=float)
+
+    def daily_spread(self, df, codes, rows=None):
+        pl = self._pl
+        out = (self._selected(df, codes, rows)
+               .filter(pl.col('date').is_not_null())
+               .group_by('date')
+               .agg(pl.col('price_s').filter(pl.col('is_wts')).min().alias('min_wts'),
+                    pl.col('price_s').filter(pl.col('is_wtb')).max().alias('max_wtb'))
+               .drop_nulls().sort('date').collect())
+        return pd.DataFrame({'min_wts': out['min_wts'].to_numpy(), 'max_wtb': out['max_wtb'].to_numpy()},
+                            index=self._date_index(out['date'].to_numpy(), df), dtype=float)
+
+
+class DuckDBBackend(_ColumnarBackend):
+    """Consultas SQL no DuckDB embutido (paralelo, sobre uma tabela nativa)."""
+
+    name = 'duckdb'
+
+    def __init__(self) -> None:
+        try:
+            import duckdb
+        except ImportError as e:
+            raise ImportError("Backend 'duckdb' requer o pacote duckdb: pip install duckdb") from e
+        super().__init__()
+        self._con = duckdb.connect()
+
+    def _load(self, columns: Dict[str, np.ndarray]) -> None:
+        # Tabela nativa: varrer o DataFrame registrado a cada consulta é bem mais lento
+        self._con.register('trades_frame', pd.DataFrame(columns, copy=False))
+        self._con.execute("CREATE OR REPLACE TABLE trades AS SELECT * FROM trades_frame")
+        self._con.unregister('trades_frame')
+
+    def _where(self, df: pd.DataFrame, codes: np.ndarray, rows: Rows) -> Tuple[str, List]:
+        self._ensure(df)
+        clauses = ['item_code = ANY(?)']
+        params: List = [np.asarray(codes, dtype=np.int64).tolist()]
+        if isinstance(rows, slice):
+            start, stop, _ = rows.indices(len(df))
+            clauses.append('pos >= ? AND pos < ?')
+            params += [start, stop]
+        elif rows is not None:
+            self._con.register('selected_rows', pd.DataFrame({'pos': np.flatnonzero(rows)}))
+            clauses.append('pos IN (SELECT pos FROM selected_rows)')
+        return ' AND '.join(clauses), params
+
+    def filter_positions(self, df, codes, rows=None):
+        where, params = self._where(df, codes, rows)
+        out = self._con.execute(f"SELECT pos FROM trades WHERE {where} ORDER BY pos", params).fetchnumpy()
+        return np.asarray(out['pos'], dtype=np.int64)
+
+    def daily_mean_price(self, df, codes, rows=None):
+        where, params = self._where(df, codes, rows)
+        out = self._con.execute(
+            f"SELECT date, avg(price_s) AS price_s FROM trades "
+            f"WHERE {where} AND date IS NOT NULL GROUP BY date ORDER BY date", params).df()
+        return pd.Series(out['price_s'].to_numpy(dtype=float),
+                         index=self._date_index(out['date'], df), name='price_s')
+
+    def daily_spread(self, df, codes, rows=None):
+        where, params = self._where(df, codes, rows)
+        out = self._con.execute(
+            f"SELECT date, min(price_s) FILTER (WHERE is_wts) AS min_wts, "
+            f"max(price_s) FILTER (WHERE is_wtb) AS max_wtb FROM trades "
+            f"WHERE {where} AND date IS NOT NULL GROUP BY date "
+            f"HAVING min_wts IS NOT NULL AND max_wtb IS NOT NULL ORDER BY date", params).df()
+        return pd.DataFrame({'min_wts': out['min_wts'].to_numpy(dtype=float),
+                             'max_wtb': out['max_wtb'].to_numpy(dtype=float)},
+                            index=self._date_index(out['date'], df))
+
+
+BACKENDS = {'pandas': PandasBackend, 'polars': PolarsBackend, 'duckdb': DuckDBBackend}
+
+
+def available_backends() -> List[str]:
+    """Backends cujas dependências estão instaladas."""
+    available = []
+    for name, cls in BACKENDS.items():
+        try:
+            cls()
+        except ImportError:
+            continue
+        available.append(name)
+    return available
+
+
+def get_backend(name: Union[str, EngineBackend] = 'pandas') -> EngineBackend:
+    """
+    Instancia um backend pelo nome ('pandas', 'polars', 'duckdb' ou 'auto').
+
+    'auto' escolhe o primeiro disponível entre polars, duckdb e pandas.
+
+    Raises:
+        ValueError: Nome desconhecido
+        ImportError: Dependência do backend não instalada
+    """
+    if isinstance(name, EngineBackend):
+        return name
+    if name == 'auto':
+        for candidate in ('polars', 'duckdb'):
+            try:
+                return BACKENDS[candidate]()
+            except ImportError:
+                continue
+        return PandasBackend()
+    if name not in BACKENDS:
+        raise ValueError(f"Backend inválido: {name}. Use {list(BACKENDS)} ou 'auto'.")
+    return BACKENDS[name]()
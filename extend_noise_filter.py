@@ -9,6 +9,11 @@ def apply_extended_noise_filter():
     with open(file_path, 'r', encoding='utf-8') as f:
         content = f.read()
     
+    # O filtro agora é nativo do engine (noise_filter.NoiseFilter)
+    if 'NoiseFilter' in content:
+        print("✓ Noise filter já integrado ao WurmStatsEngine (Aho-Corasick). Nada a fazer.")
+        return
+
     # 1. Add COLUMNS_TO_CHECK constant
     if 'COLUMNS_TO_CHECK =' not in content:
         columns_const = """
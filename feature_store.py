@@ -0,0 +1,224 @@
+"""
+Feature Store
+=============
+
+Tabelas de features calculadas uma vez e reaproveitadas por todas as
+análises de ML.
+
+Cada conjunto de features (ex.: 'ml' = saída do preprocess_for_ml,
+'market_summary', 'item_baselines') é registrado com a função que o
+constrói a partir do DataFrame de trades. As tabelas ficam em memória num
+LRU chaveado por (dados, conjunto); trocar o tipo de análise ou repetir os
+insights sobre os mesmos dados reaproveita as tabelas em vez de refazê-las.
+
+A chave dos dados é o data_version do engine (com tamanho e pontas do
+índice), quando informado, ou uma impressão digital do DataFrame (linhas,
+primeiro/último timestamp, soma dos preços e hash dos itens). Com
+``cache_dir``, as tabelas também são gravadas em disco como Parquet
+(Pickle se não houver engine Parquet, como no cache do wurm_parser), pela
+impressão digital (e o data_version, quando informado), e sobrevivem ao
+reinício do app.
+
+Exemplo:
+    store = FeatureStore(max_entries=8, cache_dir='data/features')
+    store.register('market_summary', market_summary)
+    store.get('market_summary', engine.df, engine.data_version)
+"""
+
+import hashlib
+import logging
+import os
+import pickle
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+FeatureBuilder = Callable[[pd.DataFrame], pd.DataFrame]
+
+
+def dataset_fingerprint(df: pd.DataFrame) -> str:
+    """
+    Impressão digital barata de um DataFrame de trades (estável entre execuções).
+
+    Usa número de linhas, primeiro e último timestamp (ou 'date'), a soma
+    dos preços e um hash dos itens (categorias e códigos de 'main_item');
+    appends, trocas de dataset, edições de preço e renomeações de item
+    (canonicalize_items) a mudam.
+    """
+    if df is None or df.empty:
+        return 'empty'
+    if isinstance(df.index, pd.DatetimeIndex):
+        first, last = df.index[0], df.index[-1]
+    elif 'date' in df.columns:
+        first, last = df['date'].iloc[0], df['date'].iloc[-1]
+    else:
+        first = last = None
+    price_sum = float(np.nansum(df['price_s'].to_numpy(dtype=float))) if 'price_s' in df.columns else 0.0
+    raw = f"{len(df)}|{first}|{last}|{price_sum!r}|{','.join(map(str, df.columns))}|{_items_digest(df)}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def _items_digest(df: pd.DataFrame) -> str:
+    """Hash dos nomes de item por linha (categorias + códigos, sem hashear strings por linha)."""
+    if 'main_item' not in df.columns:
+        return ''
+    col = df['main_item']
+    digest = hashlib.sha1()
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        digest.update('\x1f'.join(map(str, col.cat.categories)).encode('utf-8'))
+        digest.update(np.ascontiguousarray(col.cat.codes.to_numpy()).tobytes())
+    else:
+        digest.update(pd.util.hash_pandas_object(col, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class FeatureStore:
+    """
+    Cache LRU de tabelas de features por (dados, conjunto de features).
+
+    Args:
+        max_entries: Tabelas mantidas em memória
+        cache_dir: Diretório para gravar as tabelas em disco (None = só memória)
+    """
+
+    def __init__(self, max_entries: int = 8, cache_dir: Optional[str] = None) -> None:
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self._builders: Dict[str, FeatureBuilder] = {}
+        self._entries: "OrderedDict[Tuple[Hashable, str], pd.DataFrame]" = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0, 'disk_hits': 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Tuple[Hashable, str]) -> bool:
+        return key in self._entries
+
+    def register(self, name: str, builder: FeatureBuilder) -> None:
+        """Registra (ou substitui) o construtor de um conjunto de features."""
+        self._builders[name] = builder
+        self.invalidate(feature_set=name)
+
+    @property
+    def feature_sets(self) -> list:
+        return list(self._builders)
+
+    @staticmethod
+    def data_key(df: pd.DataFrame, data_version: Optional[int] = None) -> Hashable:
+        """
+        Chave dos dados: data_version quando informado, senão a impressão digital.
+
+        O data_version recomeça a cada engine novo (recarga de dados), então a
+        chave leva junto o tamanho e as pontas do índice (custo O(1)).
+        """
+        if data_version is not None:
+            ends = (df.index[0], df.index[-1]) if df is not None and len(df) else (None, None)
+            return ('version', data_version, 0 if df is None else len(df)) + ends
+        return ('fingerprint', dataset_fingerprint(df))
+
+    def get(self, name: str, df: pd.DataFrame, data_version: Optional[int] = None) -> pd.DataFrame:
+        """
+        Tabela de features ``name`` para ``df`` (memória -> disco -> construção).
+
+        Args:
+            name: Conjunto de features registrado
+            df: DataFrame de trades
+            data_version: data_version do engine (evita calcular a impressão digital)
+
+        Returns:
+            A tabela (compartilhada entre chamadas: não altere no lugar).
+        """
+        if name not in self._builders:
+            raise KeyError(f"Conjunto de features desconhecido: '{name}'. Registrados: {self.feature_sets}")
+        key = (self.data_key(df, data_version), name)
+        table = self._entries.get(key)
+        if table is not None:
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return table
+
+        fingerprint = self._disk_key(df, data_version) if self.cache_dir else None
+        table = self._load(name, fingerprint) if fingerprint else None
+        if table is not None:
+            self.stats['disk_hits'] += 1
+        else:
+            self.stats['misses'] += 1
+            table = self._builders[name](df)
+            if fingerprint:
+                self._save(name, fingerprint, table)
+        self._put(key, table)
+        return table
+
+    def _put(self, key: Tuple[Hashable, str], table: pd.DataFrame) -> None:
+        self._entries[key] = table
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            logger.debug(f"Feature store: descartado {evicted}")
+
+    def invalidate(self, data_version: Optional[int] = None, feature_set: Optional[str] = None) -> int:
+        """
+        Remove tabelas da memória (todas, de um data_version e/ou de um conjunto).
+
+        Returns:
+            Número de tabelas removidas.
+        """
+        doomed = [key for key in self._entries
+                  if (data_version is None or key[0][:2] == ('version', data_version))
+                  and (feature_set is None or key[1] == feature_set)]
+        for key in doomed:
+            del self._entries[key]
+        return len(doomed)
+
+    def clear(self) -> None:
+        """Esvazia a memória (os arquivos em disco ficam)."""
+        self._entries.clear()
+
+    # ------------------------------------------------------------------
+    # Disco
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _disk_key(df: pd.DataFrame, data_version: Optional[int]) -> str:
+        """Impressão digital dos dados, mais o data_version quando informado."""
+        fingerprint = dataset_fingerprint(df)
+        return fingerprint if data_version is None else f"{fingerprint}v{data_version}"
+
+    def _path(self, name: str, fingerprint: str, ext: str) -> str:
+        return os.path.join(self.cache_dir, f"{name}_{fingerprint}.{ext}")
+
+    def _load(self, name: str, fingerprint: str) -> Optional[pd.DataFrame]:
+        parquet, pkl = self._path(name, fingerprint, 'parquet'), self._path(name, fingerprint, 'pkl')
+        try:
+            if os.path.exists(parquet):
+                return pd.read_parquet(parquet)
+            if os.path.exists(pkl):
+                with open(pkl, 'rb') as fh:
+                    return pickle.load(fh)
+        except Exception as e:
+            logger.warning(f"Falha ao ler features '{name}' do disco ({e}). Recalculando...")
+        return None
+
+    def _save(self, name: str, fingerprint: str, table: pd.DataFrame) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Conjuntos antigos do mesmo nome (outros dados) são substituídos
+        for entry in os.listdir(self.cache_dir):
+            stem = entry.rsplit('.', 1)[0]
+            if stem.rsplit('_', 1)[0] == name and stem != f"{name}_{fingerprint}":
+                try:
+                    os.remove(os.path.join(self.cache_dir, entry))
+                except OSError:
+                    pass
+        try:
+            table.to_parquet(self._path(name, fingerprint, 'parquet'))
+        except Exception as e:
+            logger.debug(f"Features '{name}' sem Parquet ({e}). Salvando em Pickle...")
+            try:
+                with open(self._path(name, fingerprint, 'pkl'), 'wb') as fh:
+                    pickle.dump(table, fh, protocol=pickle.HIGHEST_PROTOCOL)
+            except Exception as pkl_e:
+                logger.error(f"Falha ao salvar features '{name}': {pkl_e}")
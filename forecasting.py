@@ -0,0 +1,383 @@
+"""
+Forecasting
+===========
+
+Previsão de preço de todos os itens de uma vez (Holt amortecido).
+
+Os preços diários formam uma matriz itens x dias (log da média geométrica
+do dia). O modelo de Holt com tendência amortecida roda como uma única
+recursão sobre os dias, com operações NumPy sobre todos os itens (e todas
+as combinações de parâmetros da grade) ao mesmo tempo:
+
+    nível_t     = α·y_t + (1-α)·(nível_{t-1} + φ·tend_{t-1})
+    tendência_t = β·(nível_t - nível_{t-1}) + (1-β)·φ·tend_{t-1}
+
+Dias sem trade do item só avançam a previsão (nível += φ·tend, tend *= φ). Cada
+item fica com o par (α, β) de menor erro quadrático um passo à frente; o
+desvio desses erros dá os intervalos de previsão. Em log, a tendência vira
+variação percentual e os intervalos ficam sempre positivos.
+
+O rótulo da tendência compara a previsão no horizonte com o nível atual:
+ALTA / BAIXA acima de ``TREND_THRESHOLD`` de variação, ESTÁVEL caso
+contrário.
+
+O estado (nível, tendência, erros, parâmetros por item) pode continuar a
+partir de trades novos (update_trades), sem refazer o ajuste: é assim que
+ele vive no ModelState do MLPredictor. O último dia visto fica "aberto" até
+chegar um trade de um dia posterior.
+
+Exemplo:
+    forecaster = HoltForecaster()
+    forecaster.fit_frame(engine.cleaned_df)
+    forecaster.summary(horizon=7)
+"""
+
+import logging
+from statistics import NormalDist
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from engine_backends import trade_timestamps
+
+logger = logging.getLogger(__name__)
+
+# Variação prevista (no horizonte) para rotular ALTA/BAIXA
+TREND_THRESHOLD = 0.05
+
+# Grade de parâmetros avaliada para cada item
+ALPHAS = (0.1, 0.2, 0.4, 0.6, 0.8)
+BETAS = (0.02, 0.1, 0.3)
+
+# Amortecimento da tendência (evita extrapolar tendências em lacunas longas)
+PHI = 0.98
+
+# Dias observados mínimos para um item entrar nas previsões
+MIN_OBSERVATIONS = 5
+
+SUMMARY_COLUMNS = ['main_item', 'last_price', 'forecast', 'lower', 'upper', 'change_pct',
+                   'trend', 'alpha', 'beta', 'observations', 'last_day']
+
+
+def daily_log_prices(items: pd.Series, timestamps: np.ndarray, prices: np.ndarray
+                     ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Soma e contagem de log(preço) por (dia, item), vetorizado.
+
+    Returns:
+        (dias, códigos dos itens, soma de log-preços, contagem) por par
+        (dia, item), ordenados por dia, e os nomes dos itens (uniques).
+    """
+    items = pd.Series(items, copy=False)
+    timestamps = np.asarray(timestamps, dtype='datetime64[ns]')
+    prices = np.asarray(prices, dtype=float)
+    valid = np.isfinite(prices) & (prices > 0) & ~np.isnat(timestamps) & items.notna().to_numpy()
+    codes, uniques = pd.factorize(items[valid])
+    days = timestamps[valid].astype('datetime64[D]').astype(np.int64)
+    if not len(days):
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, np.zeros(0), empty, np.asarray(uniques, dtype=object)
+
+    n_items = max(len(uniques), 1)
+    keys = (days - days.min()) * n_items + codes
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    sums = np.bincount(inverse, weights=np.log(prices[valid]))
+    counts = np.bincount(inverse)
+    return (unique_keys // n_items + days.min(), unique_keys % n_items, sums, counts,
+            np.asarray(uniques, dtype=object))
+
+
+class HoltForecaster:
+    """
+    Holt amortecido vetorizado para todos os itens, com estado contínuo.
+
+    Args:
+        alphas: Valores de α avaliados na grade
+        betas: Valores de β avaliados na grade
+        phi: Amortecimento da tendência
+        level: Nível de confiança dos intervalos (ex.: 0.95)
+    """
+
+    def __init__(self, alphas: Sequence[float] = ALPHAS, betas: Sequence[float] = BETAS,
+                 phi: float = PHI, level: float = 0.95) -> None:
+        self.alphas = tuple(alphas)
+        self.betas = tuple(betas)
+        self.phi = phi
+        self.level = level
+        self.reset()
+
+    def reset(self) -> None:
+        self.index: Dict[str, int] = {}
+        self.level_ = np.zeros(0)      # nível (log-preço) após o último dia fechado
+        self.trend_ = np.zeros(0)
+        self.sse_ = np.zeros(0)
+        self.n_obs_ = np.zeros(0, dtype=np.int64)
+        self.alpha_ = np.zeros(0)
+        self.beta_ = np.zeros(0)
+        self.last_obs_ = np.zeros(0, dtype=np.int64)
+        self.last_day: Optional[int] = None  # último dia fechado (já na recursão)
+        self.open_day: Optional[int] = None
+        self._open_sum = np.zeros(0)
+        self._open_count = np.zeros(0)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    # ------------------------------------------------------------------
+    # Ajuste
+    # ------------------------------------------------------------------
+
+    def _slots(self, names: np.ndarray) -> np.ndarray:
+        """Posição de cada item nos arrays de estado (cria os novos)."""
+        slots = np.empty(len(names), dtype=np.int64)
+        for i, name in enumerate(names):
+            slot = self.index.get(str(name))
+            if slot is None:
+                slot = self.index[str(name)] = len(self.index)
+            slots[i] = slot
+        grow = len(self.index) - len(self.level_)
+        if grow > 0:
+            self.level_ = np.append(self.level_, np.full(grow, np.nan))
+            self.trend_ = np.append(self.trend_, np.zeros(grow))
+            self.sse_ = np.append(self.sse_, np.zeros(grow))
+            self.n_obs_ = np.append(self.n_obs_, np.zeros(grow, dtype=np.int64))
+            self.alpha_ = np.append(self.alpha_, np.full(grow, self.alphas[len(self.alphas) // 2]))
+            self.beta_ = np.append(self.beta_, np.full(grow, self.betas[0]))
+            self.last_obs_ = np.append(self.last_obs_, np.zeros(grow, dtype=np.int64))
+            self._open_sum = np.append(self._open_sum, np.zeros(grow))
+            self._open_count = np.append(self._open_count, np.zeros(grow))
+        return slots
+
+    def _run(self, matrix: np.ndarray, level: np.ndarray, trend: np.ndarray,
+             alpha: np.ndarray, beta: np.ndarray) -> Tuple[np.ndarray, ...]:
+        """
+        Recursão de Holt sobre as colunas (dias) de ``matrix``.
+
+        Os arrays de estado podem ter uma dimensão extra na frente (grade de
+        parâmetros); ``matrix`` tem forma (itens, dias) e é difundida.
+
+        Returns:
+            (nível, tendência, soma dos erros², observações, último dia observado)
+        """
+        phi = self.phi
+        level, trend = level.copy(), trend.copy()
+        sse = np.zeros(level.shape)
+        n_obs = np.zeros(level.shape, dtype=np.int64)
+        last_obs = np.full(level.shape, -1, dtype=np.int64)
+        for t in range(matrix.shape[1]):
+            y = matrix[:, t]
+            observed = np.isfinite(y)
+            if not observed.any():
+                # Dia sem trades no mercado: mesma regra do item sem observação
+                level = level + phi * trend
+                trend = phi * trend
+                continue
+            predicted = level + phi * trend
+            started = np.isfinite(level)
+            update = observed & started
+            error = np.where(update, y - predicted, 0.0)
+            sse += error ** 2
+            n_obs += observed
+            last_obs = np.where(observed, t, last_obs)
+
+            new_level = np.where(update, predicted + alpha * error, predicted)
+            new_trend = np.where(update, beta * (new_level - level) + (1 - beta) * phi * trend, phi * trend)
+            # Primeira observação do item: inicia o nível, tendência zero
+            first = observed & ~started
+            level = np.where(first, y, new_level)
+            trend = np.where(first, 0.0, new_trend)
+        return level, trend, sse, n_obs, last_obs
+
+    def fit_matrix(self, matrix: np.ndarray, items: Sequence[str], first_day: int) -> "HoltForecaster":
+        """
+        Ajusta do zero a partir da matriz itens x dias de log-preços (NaN = sem trade).
+
+        Cada item fica com o par (α, β) de menor erro um passo à frente.
+        """
+        self.reset()
+        slots = self._slots(np.asarray(items, dtype=object))
+        n_items = len(slots)
+        grid = [(a, b) for a in self.alphas for b in self.betas]
+        alpha = np.array([a for a, _ in grid])[:, None] * np.ones((1, n_items))
+        beta = np.array([b for _, b in grid])[:, None] * np.ones((1, n_items))
+        start = np.full((len(grid), n_items), np.nan)
+
+        level, trend, sse, n_obs, last_obs = self._run(matrix, start, np.zeros_like(start), alpha, beta)
+        best = np.argmin(sse, axis=0)
+        cols = np.arange(n_items)
+        self.level_[slots] = level[best, cols]
+        self.trend_[slots] = trend[best, cols]
+        self.sse_[slots] = sse[best, cols]
+        self.n_obs_[slots] = n_obs[best, cols]
+        self.alpha_[slots] = alpha[best, cols]
+        self.beta_[slots] = beta[best, cols]
+        self.last_obs_[slots] = np.where(last_obs[best, cols] >= 0, last_obs[best, cols] + first_day, 0)
+        self.last_day = first_day + matrix.shape[1] - 1 if matrix.shape[1] else None
+        return self
+
+    def _advance(self, matrix: np.ndarray, first_day: int) -> None:
+        """Continua a recursão (parâmetros fixos) pelos dias da matriz."""
+        level, trend, sse, n_obs, last_obs = self._run(matrix, self.level_, self.trend_,
+                                                       self.alpha_, self.beta_)
+        self.sse_ += sse
+        self.n_obs_ += n_obs
+        self.last_obs_ = np.where(last_obs >= 0, last_obs + first_day, self.last_obs_)
+        self.level_, self.trend_ = level, trend
+        self.last_day = first_day + matrix.shape[1] - 1
+
+    def fit_trades(self, items: pd.Series, timestamps: np.ndarray, prices: np.ndarray) -> "HoltForecaster":
+        """Ajusta do zero a partir de trades; o último dia fica aberto."""
+        days, codes, sums, counts, names = daily_log_prices(items, timestamps, prices)
+        self.reset()
+        if not len(days):
+            return self
+        open_day = int(days.max())
+        closed = days < open_day
+        first_day = int(days.min())
+        n_days = open_day - first_day
+        matrix = np.full((len(names), n_days), np.nan)
+        matrix[codes[closed], days[closed] - first_day] = sums[closed] / counts[closed]
+        self.fit_matrix(matrix, names, first_day)
+        if self.last_day is None:
+            self.last_day = first_day - 1
+        self._set_open(open_day, self._slots(names[codes[~closed]]), sums[~closed], counts[~closed])
+        return self
+
+    def update_trades(self, items: pd.Series, timestamps: np.ndarray, prices: np.ndarray) -> int:
+        """
+        Continua o estado com trades novos (sem reajustar os parâmetros).
+
+        Trades de dias já fechados são ignorados.
+
+        Returns:
+            Dias fechados nesta chamada.
+        """
+        if self.last_day is None:
+            self.fit_trades(items, timestamps, prices)
+            return 0
+        days, codes, sums, counts, names = daily_log_prices(items, timestamps, prices)
+        keep = days > self.last_day
+        days, codes, sums, counts = days[keep], codes[keep], sums[keep], counts[keep]
+        if not len(days):
+            return 0
+        slots = self._slots(names)[codes]
+
+        new_open = int(days.max())
+        if self.open_day is not None and new_open <= self.open_day:
+            # Tudo no dia aberto
+            np.add.at(self._open_sum, slots, sums)
+            np.add.at(self._open_count, slots, counts)
+            return 0
+
+        # Fecha o dia aberto e os dias intermediários
+        first_day = self.last_day + 1
+        n_days = new_open - first_day
+        closed = days < new_open
+        col = days[closed] - first_day
+        # Dia aberto anterior pode receber trades novos: mescla soma e contagem
+        total_sum = np.zeros((len(self.index), n_days))
+        total_count = np.zeros((len(self.index), n_days))
+        if self.open_day is not None:
+            total_sum[:, self.open_day - first_day] = self._open_sum
+            total_count[:, self.open_day - first_day] = self._open_count
+        np.add.at(total_sum, (slots[closed], col), sums[closed])
+        np.add.at(total_count, (slots[closed], col), counts[closed])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            matrix = np.where(total_count > 0, total_sum / total_count, np.nan)
+        self._advance(matrix, first_day)
+        self._set_open(new_open, slots[~closed], sums[~closed], counts[~closed])
+        return n_days
+
+    def _set_open(self, day: int, slots: np.ndarray, sums: np.ndarray, counts: np.ndarray) -> None:
+        self.open_day = day
+        self._open_sum = np.zeros(len(self.index))
+        self._open_count = np.zeros(len(self.index))
+        np.add.at(self._open_sum, slots, sums)
+        np.add.at(self._open_count, slots, counts)
+
+    def fit_frame(self, df: pd.DataFrame) -> "HoltForecaster":
+        """Ajusta a partir de um DataFrame de trades (main_item, price_s, índice temporal ou 'date')."""
+        if df is None or df.empty or not {'main_item', 'price_s'}.issubset(df.columns):
+            self.reset()
+            return self
+        return self.fit_trades(df['main_item'], trade_timestamps(df), df['price_s'].to_numpy(dtype=float))
+
+    # ------------------------------------------------------------------
+    # Previsão
+    # ------------------------------------------------------------------
+
+    def _state_at(self, day: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Nível e tendência projetados até ``day`` (dias sem trade só avançam)."""
+        steps = max(day - self.last_day, 0) if self.last_day is not None else 0
+        damp = np.sum(self.phi ** np.arange(1, steps + 1)) if steps else 0.0
+        return self.level_ + damp * self.trend_, self.trend_ * self.phi ** steps
+
+    def forecast(self, horizon: int = 7, min_observations: int = MIN_OBSERVATIONS) -> pd.DataFrame:
+        """
+        Previsões diárias dos próximos ``horizon`` dias, com intervalos.
+
+        Returns:
+            DataFrame com main_item, date, forecast, lower e upper (preços).
+        """
+        names, level, trend, sigma, alpha, beta, start = self._eligible(min_observations)
+        steps = np.arange(1, horizon + 1)
+        damp = np.cumsum(self.phi ** steps)                       # φ + φ² + ... + φ^h
+        mean = level[:, None] + damp[None, :] * trend[:, None]
+        # Variância do erro h passos à frente (aproximação do Holt amortecido)
+        c = alpha[:, None] * (1 + beta[:, None] * np.concatenate([[0.0], damp[:-1]])[None, :])
+        c[:, 0] = 0.0
+        var = sigma[:, None] ** 2 * (1 + np.cumsum(c ** 2, axis=1))
+        z = NormalDist().inv_cdf(0.5 + self.level / 2)
+        half = z * np.sqrt(var)
+        dates = (np.datetime64(start, 'D') + steps.astype('timedelta64[D]')).astype('datetime64[ns]')
+        return pd.DataFrame({
+            'main_item': np.repeat(names, horizon),
+            'date': np.tile(dates, len(names)),
+            'forecast': np.exp(mean).ravel(),
+            'lower': np.exp(mean - half).ravel(),
+            'upper': np.exp(mean + half).ravel(),
+        })
+
+    def summary(self, horizon: int = 7, threshold: float = TREND_THRESHOLD,
+                min_observations: int = MIN_OBSERVATIONS) -> pd.DataFrame:
+        """
+        Uma linha por item: preço atual, previsão no horizonte, intervalo e rótulo.
+
+        Returns:
+            DataFrame com SUMMARY_COLUMNS + 'label' (ALTA/BAIXA/ESTÁVEL),
+            ordenado pela variação absoluta.
+        """
+        if not self.index:
+            return pd.DataFrame(columns=SUMMARY_COLUMNS + ['label'])
+        names, level, trend, sigma, alpha, beta, start = self._eligible(min_observations)
+        table = self.forecast(horizon, min_observations)
+        last = table.groupby('main_item', sort=False).tail(1).set_index('main_item').reindex(names)
+        change = last['forecast'].to_numpy() / np.exp(level) - 1
+        result = pd.DataFrame({
+            'main_item': names,
+            'last_price': np.exp(level),
+            'forecast': last['forecast'].to_numpy(),
+            'lower': last['lower'].to_numpy(),
+            'upper': last['upper'].to_numpy(),
+            'change_pct': change * 100,
+            'trend': (np.exp(trend) - 1) * 100,
+            'alpha': alpha,
+            'beta': beta,
+            'observations': self.n_obs_[[self.index[n] for n in names]] if len(names) else [],
+            'last_day': self.last_obs_[[self.index[n] for n in names]].astype('datetime64[D]')
+                        .astype('datetime64[ns]') if len(names) else [],
+        }, columns=SUMMARY_COLUMNS)
+        result['label'] = np.select([change > threshold, change < -threshold], ['ALTA', 'BAIXA'], 'ESTÁVEL')
+        order = np.argsort(-np.abs(change), kind='stable')
+        return result.iloc[order].reset_index(drop=True)
+
+    def _eligible(self, min_observations: int):
+        """Itens com observações suficientes e o estado projetado até o dia aberto."""
+        start = self.open_day if self.open_day is not None else self.last_day
+        level, trend = self._state_at(start if start is not None else 0)
+        keep = (self.n_obs_ >= min_observations) & np.isfinite(level)
+        names = np.array(list(self.index), dtype=object)[keep]
+        sigma = np.sqrt(self.sse_ / np.maximum(self.n_obs_ - 2, 1))
+        return (names, level[keep], trend[keep], sigma[keep], self.alpha_[keep], self.beta_[keep],
+                start if start is not None else 0)
@@ -0,0 +1,192 @@
+"""
+Heavy Hitters - Space-Saving
+============================
+
+Contadores aproximados dos itens mais negociados, atualizados por lote.
+
+Cada dia mantém um resumo Space-Saving (contagem de trades e quantidade
+total). Resumos Space-Saving são mescláveis, então uma janela de datas é
+respondida combinando resumos mensais completos e os dias das pontas, sem
+depender do DataFrame completo estar em memória.
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+class SpaceSaving:
+    """
+    Resumo Space-Saving ponderado com no máximo ``capacity`` contadores.
+
+    As contagens são superestimadas em no máximo ``error`` por chave; itens
+    com frequência acima de total/capacity nunca são perdidos.
+    """
+
+    def __init__(self, capacity: int = 1000) -> None:
+        self.capacity = capacity
+        self.counts: Dict[str, float] = {}
+        self.errors: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    @property
+    def floor(self) -> float:
+        """Menor contador quando cheio (limite para chaves ausentes)."""
+        if len(self.counts) < self.capacity:
+            return 0.0
+        return min(self.counts.values())
+
+    def update(self, keys: Iterable[str], weights: Optional[Iterable[float]] = None) -> None:
+        """Incorpora chaves (já agregadas ou não) com pesos opcionais."""
+        batch = SpaceSaving(self.capacity)
+        series = pd.Series(1.0 if weights is None else list(weights), index=list(keys))
+        for key, weight in series.groupby(level=0, sort=False).sum().items():
+            batch.counts[key] = float(weight)
+            batch.errors[key] = 0.0
+        self.merge(batch, exact_other=True)
+
+    def merge(self, other: "SpaceSaving", exact_other: bool = False) -> None:
+        """
+        Mescla outro resumo (Agarwal et al., resumos mescláveis).
+
+        Chaves ausentes de um lado recebem o menor contador daquele resumo
+        como estimativa (e erro), preservando a garantia de superestimação.
+        """
+        if not self.counts and len(other.counts) <= self.capacity:
+            self.counts, self.errors = dict(other.counts), dict(other.errors)
+            return
+
+        floor_self = self.floor
+        floor_other = 0.0 if exact_other else other.floor
+
+        counts: Dict[str, float] = {}
+        errors: Dict[str, float] = {}
+        for key in self.counts.keys() | other.counts.keys():
+            c1 = self.counts.get(key)
+            c2 = other.counts.get(key)
+            counts[key] = (c1 if c1 is not None else floor_self) + (c2 if c2 is not None else floor_other)
+            errors[key] = (self.errors[key] if c1 is not None else floor_self) + \
+                          (other.errors[key] if c2 is not None else floor_other)
+
+        if len(counts) > self.capacity:
+            keep = sorted(counts, key=counts.__getitem__, reverse=True)[:self.capacity]
+            counts = {k: counts[k] for k in keep}
+            errors = {k: errors[k] for k in keep}
+        self.counts, self.errors = counts, errors
+
+    def top(self, n: int = 10) -> List[Tuple[str, float, float]]:
+        """Retorna as n chaves mais frequentes como (chave, contagem, erro)."""
+        keys = sorted(self.counts, key=self.counts.__getitem__, reverse=True)[:n]
+        return [(k, self.counts[k], self.errors[k]) for k in keys]
+
+
+class HeavyHitterTracker:
+    """
+    Top itens por contagem de trades e por quantidade, consultável por janela.
+
+    Mantém resumos por dia, por mês e o total. Uma janela usa os meses
+    inteiros contidos nela e os dias avulsos das pontas.
+    """
+
+    METRICS = ('count', 'quantity')
+
+    def __init__(self, capacity: int = 1000) -> None:
+        self.capacity = capacity
+        self._daily: Dict[int, Dict[str, SpaceSaving]] = {}
+        self._monthly: Dict[int, Dict[str, SpaceSaving]] = {}
+        self._total = self._new_summaries()
+
+    def _new_summaries(self) -> Dict[str, SpaceSaving]:
+        return {m: SpaceSaving(self.capacity) for m in self.METRICS}
+
+    @staticmethod
+    def _month_of(day: int) -> int:
+        month = np.datetime64(int(day), 'D').astype('datetime64[M]')
+        return int(month.astype(np.int64))
+
+    def update(self, items: pd.Series, days: np.ndarray,
+               quantities: Optional[np.ndarray] = None) -> None:
+        """
+        Incorpora um lote de trades.
+
+        Args:
+            items: Nome do item de cada trade
+            days: Dia de cada trade em epoch-days
+            quantities: Quantidade de cada trade (NaN conta como 1)
+        """
+        qty = np.ones(len(items)) if quantities is None else \
+            np.nan_to_num(np.asarray(quantities, dtype=float), nan=1.0)
+        frame = pd.DataFrame({'item': pd.Series(items, copy=False).to_numpy(),
+                              'day': np.asarray(days, dtype=np.int64), 'qty': qty})
+        frame = frame[frame['item'].notna() & (frame['day'] != np.iinfo(np.int64).min)]
+        if frame.empty:
+            return
+
+        frame['item'] = frame['item'].astype(str)
+        frame['month'] = frame['day'].to_numpy().astype('datetime64[D]') \
+            .astype('datetime64[M]').astype(np.int64)
+
+        # Agrega o lote em cada nível antes de tocar nos resumos
+        for key_col, store in (('day', self._daily), ('month', self._monthly)):
+            grouped = frame.groupby([key_col, 'item'], sort=False)['qty'].agg(['size', 'sum'])
+            for key, part in grouped.groupby(level=0, sort=False):
+                target = store.setdefault(int(key), self._new_summaries())
+                self._merge_batch(target, part.index.get_level_values('item'), part)
+
+        totals = frame.groupby('item', sort=False)['qty'].agg(['size', 'sum'])
+        self._merge_batch(self._total, totals.index, totals)
+
+    def _merge_batch(self, target: Dict[str, SpaceSaving], names, agg: pd.DataFrame) -> None:
+        for metric, column in (('count', 'size'), ('quantity', 'sum')):
+            target[metric].merge(self._exact(names, agg[column].to_numpy(dtype=float),
+                                             self.capacity), exact_other=True)
+
+    @staticmethod
+    def _exact(names, values: np.ndarray, capacity: int) -> SpaceSaving:
+        """Resumo exato de um lote já agregado, truncado aos maiores contadores."""
+        names = np.asarray(names, dtype=object)
+        if len(values) > capacity:
+            keep = np.argpartition(-values, capacity - 1)[:capacity]
+            names, values = names[keep], values[keep]
+        exact = SpaceSaving(capacity)
+        exact.counts = dict(zip(names, values))
+        exact.errors = dict.fromkeys(names, 0.0)
+        return exact
+
+    def top(self, n: int = 10, by: str = 'count', start_day: Optional[int] = None,
+            end_day: Optional[int] = None) -> List[Tuple[str, float, float]]:
+        """
+        Top-n itens na janela [start_day, end_day] (epoch-days, inclusivos).
+
+        Returns:
+            Lista de (item, estimativa, erro máximo), em ordem decrescente.
+        """
+        if by not in self.METRICS:
+            raise ValueError(f"Métrica inválida: {by}. Use {self.METRICS}")
+        if start_day is None and end_day is None:
+            return self._total[by].top(n)
+        if not self._daily:
+            return []
+
+        days = sorted(self._daily)
+        lo = days[0] if start_day is None else max(start_day, days[0])
+        hi = days[-1] if end_day is None else min(end_day, days[-1])
+
+        result = SpaceSaving(self.capacity)
+        day = lo
+        while day <= hi:
+            month = self._month_of(day)
+            month_start = int(np.datetime64(month, 'M').astype('datetime64[D]').astype(np.int64))
+            month_end = int((np.datetime64(month + 1, 'M').astype('datetime64[D]')
+                             - np.timedelta64(1, 'D')).astype(np.int64))
+            if day == month_start and month_end <= hi and month in self._monthly:
+                result.merge(self._monthly[month][by])
+                day = month_end + 1
+                continue
+            if day in self._daily:
+                result.merge(self._daily[day][by])
+            day += 1
+        return result.top(n)
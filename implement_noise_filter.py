@@ -9,6 +9,11 @@ def apply_noise_filter_patch():
     with open(file_path, 'r', encoding='utf-8') as f:
         content = f.read()
     
+    # O filtro agora é nativo do engine (noise_filter.NoiseFilter)
+    if 'NoiseFilter' in content:
+        print("✓ Noise filter já integrado ao WurmStatsEngine (Aho-Corasick). Nada a fazer.")
+        return
+
     # 1. Add 'import re'
     if 'import re' not in content:
         content = content.replace('import pandas as pd', 'import pandas as pd\nimport re')
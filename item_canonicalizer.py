@@ -0,0 +1,213 @@
+"""
+Item Canonicalizer
+==================
+
+Mapeia nomes brutos de item ("Iron Lumps", "lump, iron", "iron lupm") para
+um nome canônico ("iron lump").
+
+Etapas, aplicadas uma vez por categoria distinta:
+1. minúsculas, espaços e pontuação normalizados;
+2. ordem invertida com vírgula ("lump, iron" -> "iron lump");
+3. plural -> singular, palavra a palavra;
+4. erros de digitação: distância de edição limitada contra a lista de
+   preços de ``external/`` (só aceita um candidato único e próximo).
+
+O mapeamento fica salvo em JSON. Entradas já salvas têm prioridade, então o
+arquivo também serve para correções manuais.
+"""
+
+import json
+import logging
+import os
+import re
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+ALIASES_VERSION = 1
+
+_PUNCT = re.compile(r"[^\w\s,'-]+")
+_SPACES = re.compile(r"\s+")
+
+# Palavras que terminam em 's' mas não são plurais
+_KEEP_S = {'glass', 'moss', 'brass', 'cross', 'grass', 'dross', 'lens',
+           'pants', 'tongs', 'shears', 'series', 'species'}
+
+
+def singularize(word: str) -> str:
+    """Singular de uma palavra em inglês (regras simples, sem dicionário)."""
+    if len(word) <= 3 or word in _KEEP_S or not word.endswith('s'):
+        return word
+    if word.endswith('ies') and len(word) > 4:
+        return word[:-3] + 'y'
+    if word.endswith(('sses', 'shes', 'ches', 'xes', 'zes')):
+        return word[:-2]
+    if word.endswith(('ss', 'us', 'is')):
+        return word
+    return word[:-1]
+
+
+def canonical_key(name: str) -> str:
+    """Forma normalizada de um nome, antes da correção de digitação."""
+    text = _PUNCT.sub(' ', str(name).lower())
+    if ',' in text:
+        # "lump, iron" -> "iron lump"
+        parts = [p.strip() for p in text.split(',') if p.strip()]
+        text = ' '.join(reversed(parts))
+    words = _SPACES.sub(' ', text).strip().split(' ')
+    return ' '.join(singularize(w) for w in words if w)
+
+
+def bounded_edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Distância de Levenshtein, interrompida quando passa de ``limit``.
+
+    Só calcula a faixa diagonal de largura 2*limit+1; retorna limit + 1
+    quando a distância excede o limite.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    if len(a) > len(b):
+        a, b = b, a
+    big = limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        lo, hi = max(1, i - limit), min(len(b), i + limit)
+        current = [big] * (len(b) + 1)
+        current[0] = i if i <= limit else big
+        for j in range(lo, hi + 1):
+            cost = 0 if ca == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+        if min(current[lo - 1:hi + 1]) > limit:
+            return big
+        previous = current
+    return min(previous[len(b)], big)
+
+
+def load_reference_names(csv_path: str) -> List[str]:
+    """
+    Nomes de item da lista de preços (primeira coluna, separador ';').
+
+    Aceita tanto linhas normais quanto linhas inteiras entre aspas, como no
+    arquivo exportado em ``external/``.
+    """
+    names = []
+    with open(csv_path, encoding='utf-8-sig') as fh:
+        for i, line in enumerate(fh):
+            line = line.strip().strip('"')
+            if not line or i == 0:
+                continue
+            name = line.split(';', 1)[0].strip()
+            if name:
+                names.append(name)
+    return names
+
+
+class ItemCanonicalizer:
+    """
+    Mapeamento nome bruto -> nome canônico, calculado por valor distinto e em cache.
+
+    Args:
+        reference_names: Nomes da lista de preços (alvos da correção de digitação)
+        aliases_path: JSON onde o mapeamento é persistido (opcional)
+        max_distance: Distância de edição máxima aceita para nomes longos
+    """
+
+    def __init__(self, reference_names: Optional[Iterable[str]] = None,
+                 aliases_path: Optional[str] = None, max_distance: int = 2) -> None:
+        self.aliases_path = aliases_path
+        self.max_distance = max_distance
+        self._reference = sorted({canonical_key(n) for n in reference_names or []})
+        self._reference_set = set(self._reference)
+        self._aliases: Dict[str, str] = {}
+        self._dirty = False
+        if aliases_path and os.path.exists(aliases_path):
+            self.load()
+
+    @classmethod
+    def from_price_list(cls, csv_path: str, aliases_path: Optional[str] = None,
+                        **kwargs) -> "ItemCanonicalizer":
+        names = load_reference_names(csv_path) if csv_path and os.path.exists(csv_path) else []
+        return cls(names, aliases_path, **kwargs)
+
+    @property
+    def aliases(self) -> Dict[str, str]:
+        return dict(self._aliases)
+
+    def _limit_for(self, key: str) -> int:
+        # Nomes curtos toleram menos erros ("ash" vs "ask")
+        if len(key) < 5:
+            return 0
+        return 1 if len(key) < 9 else self.max_distance
+
+    def _match_reference(self, key: str) -> str:
+        if key in self._reference_set or not self._reference:
+            return key
+        limit = self._limit_for(key)
+        if limit == 0:
+            return key
+        best, best_dist, tie = key, limit + 1, False
+        for ref in self._reference:
+            dist = bounded_edit_distance(key, ref, limit)
+            if dist < best_dist:
+                best, best_dist, tie = ref, dist, False
+            elif dist == best_dist and dist <= limit:
+                tie = True
+        return key if tie or best_dist > limit else best
+
+    def canonicalize(self, name: str) -> str:
+        """Nome canônico de um valor (usa e alimenta o cache)."""
+        cached = self._aliases.get(name)
+        if cached is not None:
+            return cached
+        canonical = self._match_reference(canonical_key(name))
+        self._aliases[name] = canonical
+        self._dirty = True
+        return canonical
+
+    def remap(self, values: pd.Series, keep: Optional[Callable[[str], bool]] = None) -> pd.Series:
+        """
+        Aplica o mapeamento a uma coluna por remapeamento de categorias.
+
+        Cada categoria distinta é resolvida uma vez; as linhas só recebem
+        novos códigos inteiros.
+
+        Args:
+            values: Coluna de nomes de item
+            keep: Categorias para as quais retorna True ficam como estão
+                (ex.: ruído de chat, que precisa continuar casando com NOISE_TERMS)
+        """
+        values = values if isinstance(values.dtype, pd.CategoricalDtype) else values.astype('category')
+        old = values.cat.categories
+        if len(old) == 0:
+            return values
+        canonical = [str(c) if keep is not None and keep(str(c)) else self.canonicalize(str(c)) for c in old]
+        new_categories, mapping = np.unique(np.array(canonical, dtype=object), return_inverse=True)
+        codes = values.cat.codes.to_numpy()
+        new_codes = np.where(codes >= 0, mapping[codes], -1)
+        return pd.Series(pd.Categorical.from_codes(new_codes, new_categories),
+                         index=values.index, name=values.name)
+
+    def load(self) -> None:
+        """Carrega aliases salvos (entradas salvas vencem as calculadas)."""
+        try:
+            with open(self.aliases_path, encoding='utf-8') as fh:
+                payload = json.load(fh)
+            self._aliases.update(payload.get('aliases', {}))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Falha ao ler aliases de item ({self.aliases_path}): {e}")
+
+    def save(self) -> bool:
+        """Persiste o mapeamento se houve novas entradas."""
+        if not self.aliases_path or not self._dirty:
+            return False
+        os.makedirs(os.path.dirname(self.aliases_path) or '.', exist_ok=True)
+        with open(self.aliases_path, 'w', encoding='utf-8') as fh:
+            json.dump({'version': ALIASES_VERSION, 'aliases': self._aliases}, fh,
+                      ensure_ascii=False, indent=1, sort_keys=True)
+        self._dirty = False
+        logger.info(f"{len(self._aliases)} aliases de item salvos em {self.aliases_path}")
+        return True
@@ -0,0 +1,263 @@
+"""
+Item Clustering
+===============
+
+Agrupamento de itens pela dinâmica de preço (k-means em mini-lotes).
+
+Cada item vira um vetor compacto de features:
+
+- curva de preço normalizada: log do preço médio semanal nas últimas
+  ``curve_weeks`` semanas, menos a média do próprio item (só a forma);
+- volatilidade: desvio do log-preço dos trades;
+- volume: log(1 + trades);
+- spread: log(mediana WTS / mediana WTB), 0 sem as duas operações.
+
+As features escalares são padronizadas entre itens. O k-means roda em
+mini-lotes (Sculley, 2010) em NumPy: cada passo atribui um lote ao centro
+mais próximo (distâncias por produto de matrizes) e move os centros com
+taxa 1/contagem, então o custo por passo não depende do número de itens.
+
+O resultado fica em cache até o data_version mudar (ou, sem data_version,
+até mudarem tamanho e extremos do DataFrame). similar_items devolve os
+itens mais próximos no espaço de features, do mesmo cluster primeiro.
+
+Exemplo:
+    clustering = ItemClustering(n_clusters=12)
+    clustering.fit(engine.cleaned_df, engine.data_version)
+    clustering.similar_items('iron lump', n=5)
+"""
+
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from engine_backends import trade_timestamps
+
+logger = logging.getLogger(__name__)
+
+# Peso de cada grupo de features na distância (a curva tem várias colunas)
+FEATURE_WEIGHTS = {'curve': 2.0, 'volatility': 1.0, 'volume': 1.0, 'spread': 0.5}
+
+SIMILAR_COLUMNS = ['main_item', 'cluster', 'distance', 'same_cluster']
+
+
+def _sq_distances(x: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    """Distâncias quadráticas (linhas de x contra centros) por produto de matrizes."""
+    d = (x ** 2).sum(axis=1)[:, None] - 2 * x @ centers.T + (centers ** 2).sum(axis=1)[None, :]
+    return np.maximum(d, 0.0)
+
+
+def _kmeans_pp(x: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    """Centros iniciais k-means++ (amostragem proporcional à distância²)."""
+    centers = [x[rng.integers(len(x))]]
+    closest = _sq_distances(x, centers[0][None, :])[:, 0]
+    for _ in range(1, k):
+        total = closest.sum()
+        pick = rng.choice(len(x), p=closest / total) if total > 0 else rng.integers(len(x))
+        centers.append(x[pick])
+        closest = np.minimum(closest, _sq_distances(x, x[pick][None, :])[:, 0])
+    return np.array(centers)
+
+
+def minibatch_kmeans(x: np.ndarray, k: int, batch_size: int = 1024, max_iter: int = 100,
+                     seed: int = 0, tol: float = 1e-4) -> Tuple[np.ndarray, np.ndarray, float]:
+    """
+    K-means em mini-lotes.
+
+    Args:
+        x: Matriz (amostras, features)
+        k: Número de clusters (limitado ao número de amostras)
+        batch_size: Amostras por passo
+        max_iter: Passos máximos
+        seed: Semente (resultado determinístico)
+        tol: Para quando o maior deslocamento de centro fica abaixo disto
+
+    Returns:
+        (centros, rótulo de cada amostra, inércia)
+    """
+    rng = np.random.default_rng(seed)
+    k = max(1, min(k, len(x)))
+    init_sample = x if len(x) <= 20 * k else x[rng.choice(len(x), 20 * k, replace=False)]
+    centers = _kmeans_pp(init_sample, k, rng)
+    counts = np.zeros(k)
+
+    for _ in range(max_iter):
+        batch = x if len(x) <= batch_size else x[rng.choice(len(x), batch_size, replace=False)]
+        nearest = np.argmin(_sq_distances(batch, centers), axis=1)
+        before = centers.copy()
+        # Média acumulada de cada centro: equivale a taxa 1/contagem por amostra
+        batch_counts = np.bincount(nearest, minlength=k)
+        sums = np.zeros_like(centers)
+        np.add.at(sums, nearest, batch)
+        hit = batch_counts > 0
+        counts[hit] += batch_counts[hit]
+        centers[hit] += (sums[hit] - batch_counts[hit, None] * centers[hit]) / counts[hit, None]
+        if np.abs(centers - before).max() < tol:
+            break
+
+    distances = _sq_distances(x, centers)
+    labels = np.argmin(distances, axis=1)
+    return centers, labels, float(distances[np.arange(len(x)), labels].sum())
+
+
+def item_features(df: pd.DataFrame, curve_weeks: int = 12, min_trades: int = 20) -> pd.DataFrame:
+    """
+    Features de dinâmica de preço por item (sem padronização).
+
+    Args:
+        df: DataFrame de trades (main_item, price_s, índice temporal ou 'date';
+            'operation' opcional para o spread)
+        curve_weeks: Semanas da curva de preço (até o último trade)
+        min_trades: Trades mínimos para um item entrar
+
+    Returns:
+        DataFrame indexado por item: curve_0..curve_{n-1}, volatility, volume, spread.
+    """
+    if df is None or df.empty or not {'main_item', 'price_s'}.issubset(df.columns):
+        return pd.DataFrame()
+    timestamps = trade_timestamps(df)
+    prices = df['price_s'].to_numpy(dtype=float)
+    valid = np.isfinite(prices) & (prices > 0) & ~np.isnat(timestamps) & df['main_item'].notna().to_numpy()
+    codes, uniques = pd.factorize(df['main_item'][valid])
+    n_items = len(uniques)
+    if not n_items:
+        return pd.DataFrame()
+    log_price = np.log(prices[valid])
+    weeks = timestamps[valid].astype('datetime64[W]').astype(np.int64)
+
+    count = np.bincount(codes, minlength=n_items)
+    mean = np.bincount(codes, weights=log_price, minlength=n_items) / count
+    var = np.bincount(codes, weights=(log_price - mean[codes]) ** 2, minlength=n_items) / np.maximum(count - 1, 1)
+
+    # Curva semanal: média do log-preço por (item, semana), lacunas preenchidas
+    col = weeks - (weeks.max() - curve_weeks + 1)
+    recent = col >= 0
+    flat = codes[recent] * curve_weeks + col[recent]
+    week_sum = np.bincount(flat, weights=log_price[recent], minlength=n_items * curve_weeks)
+    week_count = np.bincount(flat, minlength=n_items * curve_weeks)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        curve = (week_sum / week_count).reshape(n_items, curve_weeks)
+    curve = pd.DataFrame(curve).ffill(axis=1).bfill(axis=1).to_numpy()
+    # Só a forma: cada linha menos a sua média (itens sem trades recentes ficam em 0)
+    curve = np.nan_to_num(curve - curve.mean(axis=1, keepdims=True))
+
+    features = pd.DataFrame(curve, index=pd.Index(np.asarray(uniques, dtype=object), name='main_item'),
+                            columns=[f'curve_{w}' for w in range(curve_weeks)])
+    features['volatility'] = np.sqrt(var)
+    features['volume'] = np.log1p(count)
+    features['spread'] = 0.0
+    if 'operation' in df.columns:
+        medians = (pd.DataFrame({'main_item': codes, 'operation': df['operation'].to_numpy()[valid],
+                                 'log_price': log_price})
+                   .groupby(['main_item', 'operation'])['log_price'].median().unstack())
+        if {'WTS', 'WTB'}.issubset(medians.columns):
+            spread = (medians['WTS'] - medians['WTB']).reindex(range(n_items)).fillna(0.0)
+            features['spread'] = spread.to_numpy()
+    return features[count >= min_trades]
+
+
+class ItemClustering:
+    """
+    Clusters de itens por dinâmica de preço, em cache por data_version.
+
+    Args:
+        n_clusters: Número de clusters
+        curve_weeks: Semanas da curva de preço normalizada
+        min_trades: Trades mínimos para um item ser agrupado
+        seed: Semente do k-means
+    """
+
+    def __init__(self, n_clusters: int = 12, curve_weeks: int = 12,
+                 min_trades: int = 20, seed: int = 0) -> None:
+        self.n_clusters = n_clusters
+        self.curve_weeks = curve_weeks
+        self.min_trades = min_trades
+        self.seed = seed
+        self.features = pd.DataFrame()
+        self.labels = pd.Series(dtype=np.int64)
+        self.inertia = np.nan
+        self._vectors = np.zeros((0, 0))
+        self._lookup: Dict[str, int] = {}
+        self._key: Optional[Any] = None
+
+    @staticmethod
+    def _cache_key(df: pd.DataFrame, data_version: Optional[int]) -> Any:
+        if data_version is not None:
+            return ('version', data_version)
+        return ('shape', len(df), df.index[0] if len(df) else None, df.index[-1] if len(df) else None)
+
+    @property
+    def is_fitted(self) -> bool:
+        return self._key is not None
+
+    def fit(self, df: pd.DataFrame, data_version: Optional[int] = None) -> "ItemClustering":
+        """Calcula features e clusters (nada a fazer se os dados não mudaram)."""
+        key = self._cache_key(df, data_version)
+        if key == self._key:
+            return self
+        self.features = item_features(df, self.curve_weeks, self.min_trades)
+        self._key = key
+        if self.features.empty:
+            self.labels = pd.Series(dtype=np.int64)
+            self._vectors = np.zeros((0, 0))
+            self._lookup = {}
+            return self
+
+        self._vectors = self._scaled(self.features)
+        _, labels, self.inertia = minibatch_kmeans(self._vectors, self.n_clusters, seed=self.seed)
+        self.labels = pd.Series(labels, index=self.features.index, name='cluster')
+        self._lookup = {str(name).lower(): i for i, name in enumerate(self.features.index)}
+        logger.info(f"Itens agrupados: {len(self.features)} itens em {self.labels.nunique()} clusters")
+        return self
+
+    @staticmethod
+    def _scaled(features: pd.DataFrame) -> np.ndarray:
+        """Padroniza as features e aplica FEATURE_WEIGHTS."""
+        curve_cols = [c for c in features.columns if c.startswith('curve_')]
+        curve = features[curve_cols].to_numpy(dtype=float)
+        curve_std = curve.std() or 1.0
+        # A curva inteira pesa como uma feature só (não como curve_weeks features)
+        parts = [FEATURE_WEIGHTS['curve'] * curve / curve_std / np.sqrt(max(len(curve_cols), 1))]
+        for name in ('volatility', 'volume', 'spread'):
+            values = features[name].to_numpy(dtype=float)
+            std = values.std()
+            parts.append((FEATURE_WEIGHTS[name] * (values - values.mean()) / (std if std > 0 else 1.0))[:, None])
+        return np.hstack(parts)
+
+    def assignments(self) -> pd.DataFrame:
+        """Cluster de cada item, com volatilidade, volume e spread."""
+        if self.labels.empty:
+            return pd.DataFrame(columns=['cluster', 'volatility', 'volume', 'spread'])
+        return self.features[['volatility', 'volume', 'spread']].assign(cluster=self.labels)[
+            ['cluster', 'volatility', 'volume', 'spread']]
+
+    def similar_items(self, item: str, n: int = 10) -> pd.DataFrame:
+        """
+        Itens mais próximos de ``item`` no espaço de features (busca sem
+        diferenciar maiúsculas), do mesmo cluster primeiro.
+
+        Returns:
+            DataFrame com SIMILAR_COLUMNS (vazio se o item não foi agrupado).
+        """
+        row = self._lookup.get(str(item).strip().lower())
+        if row is None:
+            return pd.DataFrame(columns=SIMILAR_COLUMNS)
+        distances = np.sqrt(_sq_distances(self._vectors, self._vectors[row][None, :])[:, 0])
+        labels = self.labels.to_numpy()
+        same = labels == labels[row]
+        others = np.flatnonzero(np.arange(len(distances)) != row)
+        n = min(n, len(others))
+        if not n:
+            return pd.DataFrame(columns=SIMILAR_COLUMNS)
+        # Mesmo cluster antes, depois pela distância (argpartition + ordenação do top-n)
+        key = distances[others] + np.where(same[others], 0.0, distances.max() + 1)
+        top = others[np.argpartition(key, n - 1)[:n]] if n < len(others) else others
+        top = top[np.argsort(key[np.searchsorted(others, top)], kind='stable')]
+        return pd.DataFrame({
+            'main_item': self.features.index[top].astype(str),
+            'cluster': labels[top],
+            'distance': distances[top],
+            'same_cluster': same[top],
+        }, columns=SIMILAR_COLUMNS)
@@ -0,0 +1,172 @@
+"""
+Market Series - Resampling Cache
+================================
+
+Séries de preço e volume por item em qualquer frequência (hora, dia,
+semana, mês).
+
+Os trades são agregados uma única vez por (item, hora). As frequências mais
+grossas são derivadas da imediatamente mais fina (hora -> dia -> semana/mês)
+e ficam em cache, de modo que trocar o período de um gráfico não volta a
+varrer os trades brutos.
+"""
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Frequências suportadas e apelidos aceitos
+FREQ_ALIASES = {
+    'h': 'h', 'H': 'h', 'hour': 'h', 'hourly': 'h',
+    'D': 'D', 'd': 'D', 'day': 'D', 'daily': 'D',
+    'W': 'W', 'w': 'W', 'week': 'W', 'weekly': 'W',
+    'M': 'M', 'm': 'M', 'MS': 'M', 'month': 'M', 'monthly': 'M',
+}
+
+# Cada frequência é construída a partir da frequência "pai" já em cache
+ROLLUP_PARENT = {'D': 'h', 'W': 'D', 'M': 'D'}
+
+# Agregações que podem ser recombinadas (somas, mínimos e máximos)
+ROLLUP_AGG = {
+    'trades': 'sum',
+    'price_count': 'sum',
+    'price_sum': 'sum',
+    'price_min': 'min',
+    'price_max': 'max',
+    'quantity': 'sum',
+}
+
+
+def normalize_freq(freq: str) -> str:
+    """Converte apelidos ('daily', 'MS', ...) na frequência canônica."""
+    try:
+        return FREQ_ALIASES[freq]
+    except KeyError:
+        raise ValueError(f"Frequência inválida: {freq}. Use hora, dia, semana ou mês.")
+
+
+def floor_periods(values: np.ndarray, freq: str) -> np.ndarray:
+    """Início do período (datetime64[ns]) de cada timestamp."""
+    values = np.asarray(values, dtype='datetime64[ns]')
+    if freq == 'h':
+        return values.astype('datetime64[h]').astype('datetime64[ns]')
+    days = values.astype('datetime64[D]')
+    if freq == 'D':
+        return days.astype('datetime64[ns]')
+    if freq == 'W':
+        # Semana começando na segunda-feira (1970-01-01 foi uma quinta)
+        offset = (days.astype(np.int64) + 3) % 7
+        return (days - offset.astype('timedelta64[D]')).astype('datetime64[ns]')
+    if freq == 'M':
+        return days.astype('datetime64[M]').astype('datetime64[ns]')
+    raise ValueError(f"Frequência inválida: {freq}")
+
+
+class MarketSeriesCache:
+    """
+    Agregados (item, período) em cache para todas as frequências.
+
+    A tabela base é horária; as demais são derivadas sob demanda e
+    descartadas quando a base recebe um novo lote.
+    """
+
+    def __init__(self) -> None:
+        self._tables: Dict[str, pd.DataFrame] = {}
+
+    @property
+    def is_built(self) -> bool:
+        return 'h' in self._tables
+
+    def clear(self) -> None:
+        self._tables.clear()
+
+    @staticmethod
+    def _aggregate(items: pd.Series, timestamps: np.ndarray, prices: np.ndarray,
+                   quantities: Optional[np.ndarray]) -> pd.DataFrame:
+        prices = np.asarray(prices, dtype=float)
+        has_price = np.isfinite(prices)
+        frame = pd.DataFrame({
+            'item': pd.Series(items, copy=False).astype(str).to_numpy(),
+            'period': floor_periods(timestamps, 'h'),
+            'trades': 1,
+            'price_count': has_price.astype(np.int64),
+            'price_sum': np.where(has_price, prices, 0.0),
+            'price_min': prices,
+            'price_max': prices,
+            'quantity': np.ones(len(prices)) if quantities is None else
+                        np.nan_to_num(np.asarray(quantities, dtype=float), nan=1.0),
+        })
+        frame = frame[pd.Series(items, copy=False).notna().to_numpy() & ~np.isnat(frame['period'].to_numpy())]
+        return frame.groupby(['item', 'period'], sort=True).agg(ROLLUP_AGG)
+
+    def build(self, items: pd.Series, timestamps: np.ndarray, prices: np.ndarray,
+              quantities: Optional[np.ndarray] = None) -> None:
+        """Constrói a tabela horária a partir dos trades."""
+        self._tables = {'h': self._aggregate(items, timestamps, prices, quantities)}
+
+    def update(self, items: pd.Series, timestamps: np.ndarray, prices: np.ndarray,
+               quantities: Optional[np.ndarray] = None) -> None:
+        """Mescla um lote na tabela horária e invalida as frequências derivadas."""
+        if not self.is_built:
+            return
+        batch = self._aggregate(items, timestamps, prices, quantities)
+        if batch.empty:
+            return
+        base = self._tables['h']
+        touched = base.index.isin(batch.index)
+        merged = pd.concat([base[touched], batch]).groupby(level=['item', 'period']).agg(ROLLUP_AGG)
+        self._tables = {'h': pd.concat([base[~touched], merged]).sort_index()}
+
+    def table(self, freq: str) -> pd.DataFrame:
+        """Tabela (item, período) na frequência pedida, derivando se necessário."""
+        freq = normalize_freq(freq)
+        if freq not in self._tables:
+            parent = self.table(ROLLUP_PARENT[freq])
+            periods = floor_periods(parent.index.get_level_values('period').to_numpy(), freq)
+            items = parent.index.get_level_values('item')
+            rolled = parent.groupby([items, periods], sort=True).agg(ROLLUP_AGG)
+            rolled.index = rolled.index.set_names(['item', 'period'])
+            self._tables[freq] = rolled
+        return self._tables[freq]
+
+    def series(self, items: List[str], freq: str = 'D', start: Optional[Any] = None,
+               end: Optional[Any] = None) -> pd.DataFrame:
+        """
+        Série de preço e volume para um item ou conjunto de itens.
+
+        O intervalo [start, end] seleciona os períodos cujo início cai nele.
+
+        Returns:
+            DataFrame indexado por 'period' com mean_price, min_price,
+            max_price, trades e volume.
+        """
+        columns = ['mean_price', 'min_price', 'max_price', 'trades', 'volume']
+        table = self.table(freq)
+        known = table.index.levels[0]
+        present = [i for i in items if i in known]
+        if not present:
+            return pd.DataFrame(columns=columns)
+
+        part = table.loc[present]
+        if len(present) > 1:
+            part = part.groupby(level='period', sort=True).agg(ROLLUP_AGG)
+        else:
+            part = part.droplevel('item')
+
+        if start is not None or end is not None:
+            lo = pd.Timestamp(start) if start is not None else None
+            hi = pd.Timestamp(end) if end is not None else None
+            part = part.loc[lo:hi]
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = part['price_sum'] / part['price_count'].where(part['price_count'] > 0)
+        result = pd.DataFrame({
+            'mean_price': mean,
+            'min_price': part['price_min'],
+            'max_price': part['price_max'],
+            'trades': part['trades'].astype(np.int64),
+            'volume': part['quantity'],
+        })
+        result.index.name = 'period'
+        return result
@@ -2,62 +2,210 @@
 # Módulo de Preparação e Previsão de Machine Learning
 # Responsável por:
 # 1. Receber o DataFrame limpo do StatisticsEngine.
-# 2. Realizar a Engenharia de Features necessária (e.g., One-Hot Encoding).
+# 2. Realizar a Engenharia de Features necessária (códigos de item, frequência e média por item).
 # 3. Carregar um modelo de ML pré-treinado (ou iniciar o processo de treinamento).
 # 4. Gerar insights preditivos para a GUI.
 
+from functools import partial
+
 import pandas as pd
 # Importações futuras: from sklearn.cluster import KMeans
 # from statsmodels.tsa.arima.model import ARIMA
 import numpy as np
 
+from wurm_parser import format_wurm_price
+from engine_backends import trade_timestamps
+from wurm_stats_engine import scan_arbitrage, market_summary, unit_prices
+from model_state import ModelState
+from rolling_anomaly import RollingAnomalyDetector
+from forecasting import HoltForecaster, TREND_THRESHOLD
+from parallel_fitting import fit_ar_daily, fit_items_parallel
+from item_clustering import ItemClustering
+from relevance import RELEVANCE_WEIGHTS, item_relevance, top_k, trade_relevance
+from feature_store import FeatureStore
+
 class MLPredictor:
     """
     Classe responsável por preparar os dados para ML e gerar previsões.
     """
-    def __init__(self):
-        # Aqui, no futuro, carregaremos o modelo treinado.
-        self.model = None 
-        # Ex: self.model = load_model('kmeans_trade_clusters.pkl')
-        print("MLPredictor inicializado. Modelo de ML não carregado (stub).")
+    def __init__(self, state_path: str = None, price_manager=None, feature_dir: str = None):
+        """
+        :param state_path: Arquivo do estado incremental (model_state). Se existir,
+                           é recarregado: os insights saem sem reprocessar o histórico.
+        :param price_manager: PriceManager com os preços base (referência do score de relevância).
+        :param feature_dir: Diretório do cache em disco das tabelas de features (None = só memória).
+        """
+        self.state_path = state_path
+        self.price_manager = price_manager
+        # Tabelas de features compartilhadas pelas análises (LRU por dados e conjunto)
+        self.features = FeatureStore(cache_dir=feature_dir)
+        self.features.register('ml', self.preprocess_for_ml)
+        # Preço por unidade: a referência de relevância são os preços base (por unidade) do PriceManager
+        self.features.register('unit_summary', partial(market_summary, per_unit=True))
+        self.features.register('item_baselines', self.item_baselines)
+        self.model = ModelState.load(state_path) or ModelState()
+        self.clustering = ItemClustering()
+        if self.model.is_empty:
+            print("MLPredictor inicializado. Estado do modelo vazio (será construído na 1ª análise).")
+        else:
+            print(f"MLPredictor inicializado. Estado do modelo carregado: {len(self.model.moments)} itens, "
+                  f"{self.model.stamp['rows']:,} linhas.")
+
+    @property
+    def rolling_detector(self):
+        """Detector de mediana/MAD móveis (parte do estado do modelo)."""
+        return self.model.rolling
+
+    def update_model(self, df: pd.DataFrame, data_version: int = None) -> int:
+        """
+        Atualiza o estado do modelo só com as linhas novas de ``df`` e o salva.
+
+        :param df: DataFrame de trades com DatetimeIndex ordenado.
+        :param data_version: data_version do engine (carimbo do estado).
+        :return: Número de linhas processadas.
+        """
+        processed = self.model.sync(df, data_version)
+        if processed and self.state_path:
+            self.model.save(self.state_path)
+        return processed
+
+    def _state_covers(self, df: pd.DataFrame, data_version: int = None) -> bool:
+        """
+        Diz se o estado do modelo cobre exatamente ``df`` (só compara o carimbo).
+
+        Consultas não alteram nem salvam o estado: só update_model faz isso.
+        Com ``data_version``, ele também precisa bater com o do carimbo.
+        """
+        if df is None or df.empty or not isinstance(df.index, pd.DatetimeIndex) or self.model.is_empty:
+            return False
+        stamp = self.model.stamp
+        if data_version is not None and stamp['data_version'] != data_version:
+            return False
+        return stamp['rows'] == len(df) and stamp['first'] == df.index[0] and stamp['last'] == df.index[-1]
+
+    def _synced_moments(self, df: pd.DataFrame, data_version: int = None):
+        """Momentos por item do estado, se o estado cobre exatamente ``df``; senão None."""
+        return self.model.moments.table() if self._state_covers(df, data_version) else None
+
+    @staticmethod
+    def item_baselines(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        count, mean e std (amostral) do preço por item (preços <= 0 ignorados).
+
+        :return: DataFrame indexado por item, no formato de ItemMoments.table().
+        """
+        if df.empty or not {'main_item', 'price_s'}.issubset(df.columns):
+            return pd.DataFrame(columns=['count', 'mean', 'std'], index=pd.Index([], name='main_item'))
+        prices = df['price_s'].to_numpy(dtype=float)
+        valid = prices > 0
+        items = df['main_item'].to_numpy(dtype=object)[valid]
+        table = pd.Series(prices[valid]).groupby(items, sort=False).agg(['count', 'mean', 'std'])
+        table.index = table.index.astype(str).rename('main_item')
+        return table
+
+    # Suavização da codificação por alvo: itens com poucos trades puxam para a média global
+    TARGET_SMOOTHING = 10.0
 
     def preprocess_for_ml(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Ação A4: Projeta a sanitização e conversão de features categóricas para numéricas.
         Esta etapa é crucial para alimentar algoritmos como K-Means ou Regressão.
 
+        O item não vira uma coluna por valor (get_dummies gera uma matriz densa
+        linhas x itens, gigabytes com milhares de itens): fica como categoria
+        ('main_item', com os códigos em 'item_code'), mais a frequência do item
+        ('item_freq') e a média suavizada do preço do item ('item_target').
+        Para modelos que precisam de one-hot, use item_onehot (CSR esparsa).
+
         :param df: DataFrame limpo do StatisticsEngine.
         :return: DataFrame pronto para o consumo do modelo de ML.
         """
         if df.empty:
             return pd.DataFrame()
 
-        # 1. Feature Engineering: Conversão de Item Name (variável categórica)
-        # O One-Hot Encoding cria colunas binárias para cada item.
-        # Isto é essencial para que o modelo de ML possa processar o nome do item.
-        # [MODIFIED] Changed 'Item Name' to 'main_item'
-        df_ml = pd.get_dummies(df, columns=['main_item'], prefix='item', drop_first=False)
-        
+        df_ml = pd.DataFrame(index=df.index)
+        features = [col for col in df.columns if col.startswith(('Price', 'Volume')) or col in ('price_iron', 'main_qty')]
+        for col in features:
+            df_ml[col] = df[col]
+
+        # 1. Feature Engineering: item como categoria + codificações compactas
+        if 'main_item' in df.columns:
+            items = df['main_item'] if isinstance(df['main_item'].dtype, pd.CategoricalDtype) \
+                else df['main_item'].astype('category')
+            codes = items.cat.codes.to_numpy()
+            df_ml['main_item'] = items
+            df_ml['item_code'] = codes.astype(np.int32)
+
+            known = codes >= 0
+            counts = np.bincount(codes[known], minlength=len(items.cat.categories))
+            lookup = np.append(counts / max(known.sum(), 1), 0.0)  # código -1 -> 0
+            df_ml['item_freq'] = lookup[codes].astype(np.float32)
+
+            target = self._target_column(df)
+            if target is not None:
+                df_ml['item_target'] = self._target_encoding(codes, df[target].to_numpy(dtype=float),
+                                                             len(counts))
+
         # 2. Extração de Features Temporais (útil para Séries Temporais ou Previsão)
+        timestamps = None
         if 'Timestamp' in df.columns:
-            df_ml['hour'] = df['Timestamp'].dt.hour
-            df_ml['dayofweek'] = df['Timestamp'].dt.dayofweek
-        
-        # 3. Seleção de Features Numéricas para o Modelo
-        # As features de preço e volume são geralmente usadas.
-        features = [col for col in df_ml.columns if col.startswith(('Price', 'Volume', 'item_')) or col in ['hour', 'dayofweek', 'price_iron']]
-        
+            timestamps = pd.DatetimeIndex(df['Timestamp'])
+        elif isinstance(df.index, pd.DatetimeIndex):
+            timestamps = df.index
+        if timestamps is not None:
+            df_ml['hour'] = timestamps.hour.to_numpy(dtype=np.int8)
+            df_ml['dayofweek'] = timestamps.dayofweek.to_numpy(dtype=np.int8)
+
         # Remover colunas que possam causar vazamento de dados (e.g., Margem de Lucro calculada posteriormente)
-        features_clean = [f for f in features if f not in ['Profit Margin', 'Risk Trend']] 
-        
-        return df_ml[features_clean]
+        return df_ml.drop(columns=[c for c in ['Profit Margin', 'Risk Trend'] if c in df_ml.columns])
+
+    @staticmethod
+    def _target_column(df: pd.DataFrame):
+        for col in ('price_s', 'price_iron'):
+            if col in df.columns:
+                return col
+        return None
+
+    def _target_encoding(self, codes: np.ndarray, target: np.ndarray, n_items: int) -> np.ndarray:
+        """Média do alvo por item, suavizada para a média global (float32 por linha)."""
+        valid = (codes >= 0) & np.isfinite(target) & (target > 0)
+        if not valid.any():
+            return np.full(len(codes), np.nan, dtype=np.float32)
+        global_mean = target[valid].mean()
+        sums = np.bincount(codes[valid], weights=target[valid], minlength=n_items)
+        counts = np.bincount(codes[valid], minlength=n_items)
+        m = self.TARGET_SMOOTHING
+        encoded = np.append((sums + m * global_mean) / (counts + m), global_mean)  # -1 -> global
+        return encoded[codes].astype(np.float32)
+
+    @staticmethod
+    def item_onehot(df_ml: pd.DataFrame):
+        """
+        One-hot do item como matriz esparsa CSR (uma entrada por linha).
+
+        :param df_ml: Saída de preprocess_for_ml (ou DataFrame com 'main_item' categórico).
+        :return: (scipy.sparse.csr_matrix linhas x itens, categorias dos itens).
+        :raises ImportError: Se o SciPy não estiver instalado.
+        """
+        try:
+            from scipy import sparse
+        except ImportError as e:
+            raise ImportError("One-hot esparso requer o pacote scipy: pip install scipy") from e
+        items = df_ml['main_item'] if isinstance(df_ml['main_item'].dtype, pd.CategoricalDtype) \
+            else df_ml['main_item'].astype('category')
+        codes = items.cat.codes.to_numpy()
+        rows = np.flatnonzero(codes >= 0)
+        matrix = sparse.csr_matrix((np.ones(len(rows), dtype=np.uint8), (rows, codes[rows])),
+                                   shape=(len(codes), len(items.cat.categories)))
+        return matrix, items.cat.categories
 
-    def predict_opportunities(self, df_ml_ready: pd.DataFrame) -> list:
+    def predict_opportunities(self, df_ml_ready: pd.DataFrame, relevance: pd.DataFrame = None) -> list:
         """
         Simula a execução de um modelo de ML para identificar oportunidades.
         Na FASE 5, este método será a espinha dorsal da aba "Insights Preditivos".
         
         :param df_ml_ready: DataFrame após o pré-processamento.
+        :param relevance: Tabela de relevância por item (item_relevance); calculada se omitida.
         :return: Lista de dicionários com insights (Item, Preço Anômalo, Sugestão).
         """
         if df_ml_ready.empty:
@@ -68,34 +216,397 @@ class MLPredictor:
         
         # Para fins de stub, calculamos o Z-Score para o preço de venda
         if 'price_iron' in df_ml_ready.columns:
-            mean_price = df_ml_ready['price_iron'].mean()
-            std_price = df_ml_ready['price_iron'].std()
+            prices = df_ml_ready['price_iron'].to_numpy(dtype=float)
+            mean_price = np.nanmean(prices)
+            std_price = np.nanstd(prices, ddof=1) if len(prices) > 1 else np.nan
             
             # Identifica trades onde o preço está 2 desvios padrão acima da média
-            df_anomalies = df_ml_ready[df_ml_ready['price_iron'] > (mean_price + 2 * std_price)].head(3)
+            candidates = np.flatnonzero(prices > (mean_price + 2 * std_price))
+            if not len(candidates):
+                return [{"insight": "Nenhuma anomalia de preço detectada neste conjunto de dados."}]
+
+            # Os 3 mais relevantes (score determinístico, top-K por argpartition)
+            if relevance is None:
+                relevance = self.relevance_table(df_ml_ready.assign(price_s=prices / 100))
+            items = df_ml_ready['main_item'].to_numpy(dtype=object)[candidates] if 'main_item' in df_ml_ready.columns \
+                else np.full(len(candidates), 'UNKNOWN ITEM', dtype=object)
+            # Desvio contra a referência por unidade: preço do lote / quantidade
+            unit = unit_prices(df_ml_ready.iloc[candidates].assign(price_s=prices[candidates] / 100))
+            scores = trade_relevance(pd.Series(items), unit, relevance)
+            order = top_k(np.nan_to_num(scores, nan=0.0), 3)
             
             insights = []
-            for index, row in df_anomalies.iterrows():
-                # Reverte o One-Hot Encoding para obter o nome do item original (simplificado)
-                item_name_cols = [col for col in row.index if col.startswith('item_') and row[col] == 1]
-                item_name = item_name_cols[0].replace('item_', '') if item_name_cols else 'UNKNOWN ITEM'
-
+            for k in order:
                 insights.append({
-                    "Item": item_name,
-                    "Preço Anômalo (WTS)": f"R${row['price_iron'] / 100:.2f} (Copper)",
+                    "Item": str(items[k]),
+                    "Preço Anômalo (WTS)": f"R${prices[candidates[k]] / 100:.2f} (Copper)",
                     "Sugestão": "Venda Rápida (Preço acima da tendência).",
-                    "Score de Risco": f"{np.random.rand():.2f}"
+                    "Score de Risco": f"{scores[k] / 100:.2f}" if np.isfinite(scores[k]) else "-",
                 })
-            
-            if not insights:
-                return [{"insight": "Nenhuma anomalia de preço detectada neste conjunto de dados."}]
-            
             return insights
 
         return [{"insight": "Coluna de preço não encontrada após pré-processamento."}]
 
-    def run_prediction(self, df_clean: pd.DataFrame, analysis_type: str = 'all') -> list:
-        """ Executa o pipeline completo: pré-processamento e previsão. """
-        df_ml_ready = self.preprocess_for_ml(df_clean)
+    def relevance_table(self, df: pd.DataFrame, summary: pd.DataFrame = None,
+                        data_version: int = None) -> pd.DataFrame:
+        """
+        Relevância por item (relevance): recência, volume, desvio do preço base e spread.
+
+        :param df: DataFrame de trades (main_item, price_s, operation, índice temporal ou 'date').
+        :param summary: Resumo de mercado por unidade já calculado (market_summary(df, per_unit=True));
+                        se omitido, vem do feature store.
+        :param data_version: data_version do engine (chave do feature store).
+        :return: DataFrame indexado por item com os componentes e o score (0-100).
+        """
+        if summary is None:
+            summary = self.features.get('unit_summary', df, data_version)
+        references = self.price_manager.prices if self.price_manager is not None else None
+        return item_relevance(summary, references)
+
+    # Rótulo do componente que mais pesa no score de cada item
+    RELEVANCE_LABELS = {'recency': 'RECENTE', 'volume': 'VOLUME', 'deviation': 'DESVIO DE PREÇO', 'spread': 'SPREAD'}
+
+    def detect_relevance(self, df: pd.DataFrame, top_n: int = 50, summary: pd.DataFrame = None,
+                         data_version: int = None) -> list:
+        """
+        Itens mais relevantes agora (score de relevância, top-K por argpartition).
+
+        :return: Lista de insights, do maior score ao menor.
+        """
+        table = self.relevance_table(df, summary, data_version)
+        if table.empty:
+            return [{"insight": "Dados insuficientes para o score de relevância."}]
+
+        components = list(self.RELEVANCE_LABELS)
+        weighted = table[components].to_numpy(dtype=float) * np.array([RELEVANCE_WEIGHTS[c] for c in components])
+        dominant = np.argmax(weighted, axis=1)
+        now = table['last_seen'].max()
+
+        insights = []
+        for k in top_k(table['score'].to_numpy(), top_n):
+            row = table.iloc[k]
+            change = (row['price'] / row['reference'] - 1) * 100 if row['reference'] else 0.0
+            age = (now - row['last_seen']).total_seconds() / 86400 if pd.notna(row['last_seen']) else np.nan
+            source = 'base' if row['reference_source'] == 'base' else 'mercado'
+            insights.append({
+                "Item": str(table.index[k]),
+                "Preço": format_wurm_price(row['price'] * 100),
+                "Tipo": self.RELEVANCE_LABELS[components[dominant[k]]],
+                "Detalhe": (f"Ref. {source}: {format_wurm_price(row['reference'] * 100)} ({change:+.0f}%); "
+                            f"{int(row['count'])} trades; último há {age:.1f}d; spread {row['spread'] * 100:.0f}%"),
+                "Score": f"{row['score']:.0f}",
+                "relevance": float(row['score']),
+            })
+        return insights
+
+    def detect_arbitrage(self, df: pd.DataFrame, top_n: int = 50, ql_bins: list = None) -> list:
+        """
+        Oportunidades de arbitragem WTS x WTB no mercado inteiro (scanner vetorizado).
+
+        :param df: DataFrame de trades (main_item, operation, price_s, date).
+        :param top_n: Número máximo de oportunidades retornadas.
+        :param ql_bins: Limites opcionais de faixa de QL (ex.: [0, 50, 70, 90, 100]).
+        :return: Lista de insights (Item, Preço, Tipo, Detalhe, Score), do maior lucro % ao menor.
+        """
+        opportunities = scan_arbitrage(df, ql_bins=ql_bins, top_n=top_n)
+        if opportunities.empty:
+            return [{"insight": "Nenhuma oportunidade de arbitragem WTS/WTB encontrada."}]
+
+        insights = []
+        for row in opportunities.itertuples(index=False):
+            band = f" (QL {row.ql_band})" if ql_bins else ""
+            insights.append({
+                "Item": f"{row.main_item}{band}",
+                "Preço": format_wurm_price(row.min_wts * 100),
+                "Tipo": "ARBITRAGEM",
+                "Detalhe": (f"Comprar WTS a {format_wurm_price(row.min_wts * 100)} e vender WTB a "
+                            f"{format_wurm_price(row.max_wtb * 100)} em {row.date:%Y-%m-%d} "
+                            f"(lucro {format_wurm_price(row.profit * 100)})"),
+                "Score": f"{row.profit_pct:.1f}%",
+            })
+        return insights
+
+    @staticmethod
+    def score_anomalies(df: pd.DataFrame, recent: int = 3, min_trades: int = 5,
+                        threshold: float = 1.5, moments: pd.DataFrame = None) -> pd.DataFrame:
+        """
+        Z-Score dos trades recentes de cada item contra a média/desvio do item (vetorizado).
+
+        Média, desvio e contagem vêm de ``groupby().transform`` e os trades
+        recentes de ``groupby().tail``; o score é calculado em NumPy para
+        todos os itens de uma vez.
+
+        :param df: DataFrame de trades (main_item, price_s), em ordem de tempo.
+        :param recent: Trades mais recentes avaliados por item.
+        :param min_trades: Mínimo de trades do item para uma média confiável.
+        :param threshold: |Z| mínimo para considerar anomalia.
+        :param moments: count/mean/std por item já calculados (estado do modelo); se
+                        omitido, vêm de ``groupby().transform`` sobre ``df``.
+        :return: DataFrame ordenado por |Z| decrescente com main_item, when,
+                 price_s, mean_price, std_price e z_score.
+        """
+        columns = ['main_item', 'when', 'price_s', 'mean_price', 'std_price', 'z_score']
+        if df.empty or not {'main_item', 'price_s'}.issubset(df.columns):
+            return pd.DataFrame(columns=columns)
+
+        prices = df['price_s'].to_numpy(dtype=float)
+        valid = prices > 0
+        if not valid.any():
+            return pd.DataFrame(columns=columns)
+        when = trade_timestamps(df)
+
+        # Posicional: as linhas válidas, na ordem original, agrupadas por código inteiro
+        series = pd.Series(prices[valid])
+        codes, uniques = pd.factorize(df['main_item'].to_numpy()[valid]
+                                      if not isinstance(df['main_item'].dtype, pd.CategoricalDtype)
+                                      else df['main_item'][valid])
+        grouped = series.groupby(codes, sort=False)
+        if moments is not None:
+            stats = moments.reindex(pd.Index(uniques).astype(str))
+            mean = stats['mean'].to_numpy(dtype=float)[codes]
+            std = stats['std'].to_numpy(dtype=float)[codes]
+            count = stats['count'].fillna(0).to_numpy()[codes]
+        else:
+            mean = grouped.transform('mean').to_numpy()
+            std = grouped.transform('std').to_numpy()
+            count = grouped.transform('count').to_numpy()
+
+        rows = grouped.tail(recent).index.to_numpy()
+        rows = rows[(count[rows] >= min_trades) & (std[rows] > 0)]
+        z_score = (series.to_numpy()[rows] - mean[rows]) / std[rows]
+        hit = np.abs(z_score) > threshold
+        rows, z_score = rows[hit], z_score[hit]
+
+        # Mais anômalo primeiro (estável entre empates)
+        order = np.argsort(-np.abs(z_score), kind='stable')
+        rows, z_score = rows[order], z_score[order]
+        return pd.DataFrame({
+            'main_item': np.asarray(uniques, dtype=object)[codes[rows]],
+            'when': when[valid][rows],
+            'price_s': series.to_numpy()[rows],
+            'mean_price': mean[rows],
+            'std_price': std[rows],
+            'z_score': z_score,
+        }, columns=columns)
+
+    def detect_anomalies(self, df: pd.DataFrame, top_n: int = 50, recent: int = 3,
+                         min_trades: int = 5, threshold: float = 1.5, data_version: int = None) -> list:
+        """
+        Anomalias de preço por item (Z-Score), como insights para a GUI.
+
+        :param df: DataFrame de trades (main_item, price_s), em ordem de tempo.
+        :param top_n: Número máximo de anomalias retornadas.
+        :param data_version: data_version do engine (chave do feature store).
+        :return: Lista de insights (Item, Preço, Tipo, Detalhe, Score), do maior |Z| ao menor;
+                 cada insight traz também o 'z_score' numérico.
+        """
+        moments = self._synced_moments(df, data_version)
+        if moments is None:
+            moments = self.features.get('item_baselines', df, data_version)
+        scores = self.score_anomalies(df, recent, min_trades, threshold, moments).head(top_n)
+        if scores.empty:
+            return [{"insight": "Nenhuma anomalia de preço detectada neste conjunto de dados."}]
+
+        return self._anomaly_insights(scores['main_item'], scores['price_s'], scores['mean_price'],
+                                      scores['z_score'], 'média')
+
+    def detect_rolling_anomalies(self, df: pd.DataFrame, top_n: int = 50, data_version: int = None) -> list:
+        """
+        Anomalias contra a mediana/MAD móvel de cada item (rolling_anomaly).
+
+        Usa o detector do estado do modelo quando ele cobre ``df``; senão
+        alimenta um detector novo (mesma configuração) só com ``df``.
+
+        :param df: DataFrame de trades (main_item, price_s, índice temporal ou 'date').
+        :param top_n: Número máximo de anomalias retornadas.
+        :param data_version: data_version do engine (conferido contra o carimbo do estado).
+        :return: Lista de insights dos trades marcados mais recentes, do maior |Z| ao menor.
+        """
+        detector = self.rolling_detector
+        if not self._state_covers(df, data_version):
+            detector = RollingAnomalyDetector(window_days=detector.window_days, threshold=detector.threshold,
+                                              min_days=detector.min_days, keep_flags=detector.keep_flags)
+            detector.update_frame(df)
+        flags = detector.recent_flags()
+        if flags.empty:
+            return [{"insight": "Nenhuma anomalia de preço detectada neste conjunto de dados."}]
+        flags = flags.iloc[np.argsort(-flags['robust_z'].abs().to_numpy(), kind='stable')].head(top_n)
+        return self._anomaly_insights(flags['main_item'], flags['price_s'], flags['median_price'],
+                                      flags['robust_z'], 'mediana móvel')
+
+    def detect_trends(self, df: pd.DataFrame, top_n: int = 50, horizon: int = 7, data_version: int = None) -> list:
+        """
+        Tendências de preço por item (Holt amortecido, forecasting).
+
+        Usa o previsor do estado do modelo quando ele cobre ``df``; senão
+        ajusta um previsor só para ``df``.
+
+        :param df: DataFrame de trades (main_item, price_s, índice temporal ou 'date').
+        :param top_n: Número máximo de itens retornados.
+        :param horizon: Dias à frente da previsão.
+        :param data_version: data_version do engine (conferido contra o carimbo do estado).
+        :return: Lista de insights, itens em ALTA/BAIXA primeiro, pela variação prevista.
+        """
+        if self._state_covers(df, data_version):
+            forecaster = self.model.forecast
+        else:
+            forecaster = HoltForecaster().fit_frame(df)
+        summary = forecaster.summary(horizon=horizon)
+        if summary.empty:
+            return [{"insight": "Histórico insuficiente para prever tendências de preço."}]
+        summary = summary.iloc[np.argsort(summary['label'].to_numpy() == 'ESTÁVEL', kind='stable')].head(top_n)
+
+        insights = []
+        for row in summary.itertuples(index=False):
+            insights.append({
+                "Item": str(row.main_item),
+                "Preço": format_wurm_price(row.last_price * 100),
+                "Tipo": row.label,
+                "Detalhe": (f"Previsão em {horizon}d: {format_wurm_price(row.forecast * 100)} "
+                            f"(IC 95%: {format_wurm_price(row.lower * 100)} - {format_wurm_price(row.upper * 100)})"),
+                "Score": f"{row.change_pct:+.1f}%",
+                "change_pct": float(row.change_pct),
+            })
+        return insights
+
+    def fit_item_models(self, df: pd.DataFrame, fit_func=fit_ar_daily, items: list = None,
+                        max_workers: int = None, progress=None, cancel=None, **fit_kwargs) -> dict:
+        """
+        Ajusta um modelo por item (AR, ARIMA, ...) num pool de processos (parallel_fitting).
+
+        :param df: DataFrame de trades (main_item, price_s, índice temporal ou 'date').
+        :param fit_func: Função de ajuste de nível de módulo (item, timestamps, preços).
+        :param items: Itens a ajustar (None = todos).
+        :param max_workers: Processos do pool (None = número de CPUs).
+        :param progress: Callback (itens concluídos, total).
+        :param cancel: threading.Event para cancelar o ajuste.
+        :return: Resultado do ajuste por item.
+        """
+        return fit_items_parallel(df, fit_func, items=items, max_workers=max_workers,
+                                  progress=progress, cancel=cancel, **fit_kwargs)
+
+    def predict_item_models(self, df: pd.DataFrame, top_n: int = 50, progress=None, cancel=None) -> list:
+        """
+        Previsão do próximo dia com um AR(2) por item, ajustado em paralelo.
+
+        :return: Lista de insights, da maior variação prevista (absoluta) à menor.
+        """
+        models = self.fit_item_models(df, progress=progress, cancel=cancel)
+        if cancel is not None and cancel.is_set():
+            return [{"insight": f"Ajuste cancelado ({len(models)} itens ajustados)."}]
+        if not models:
+            return [{"insight": "Histórico insuficiente para ajustar modelos por item."}]
+
+        items = list(models)
+        last = np.array([models[i]['last_price'] for i in items])
+        nxt = np.array([models[i]['next_price'] for i in items])
+        change = nxt / last - 1
+        insights = []
+        for k in np.argsort(-np.abs(change), kind='stable')[:top_n]:
+            model = models[items[k]]
+            label = 'ALTA' if change[k] > TREND_THRESHOLD else 'BAIXA' if change[k] < -TREND_THRESHOLD else 'ESTÁVEL'
+            insights.append({
+                "Item": items[k],
+                "Preço": format_wurm_price(last[k] * 100),
+                "Tipo": f"AR ({label})",
+                "Detalhe": (f"Próximo dia: {format_wurm_price(nxt[k] * 100)} "
+                            f"(±{model['sigma'] * 100:.1f}%, {model['days']} dias)"),
+                "Score": f"{change[k] * 100:+.1f}%",
+                "change_pct": float(change[k] * 100),
+            })
+        return insights
+
+    def cluster_items(self, df: pd.DataFrame, data_version: int = None) -> pd.DataFrame:
+        """
+        Cluster de cada item por dinâmica de preço (item_clustering), em cache por data_version.
+
+        :param df: DataFrame de trades (main_item, price_s, índice temporal ou 'date').
+        :param data_version: data_version do engine (None = detecta mudança pelo DataFrame).
+        :return: DataFrame indexado por item com cluster, volatility, volume e spread.
+        """
+        return self.clustering.fit(df, data_version).assignments()
+
+    def similar_items(self, df: pd.DataFrame, item: str, n: int = 10, data_version: int = None) -> pd.DataFrame:
+        """
+        Itens com dinâmica de preço parecida com a de ``item``.
+
+        :return: DataFrame com main_item, cluster, distance e same_cluster (vazio se o item não foi agrupado).
+        """
+        return self.clustering.fit(df, data_version).similar_items(item, n)
+
+    def describe_clusters(self, df: pd.DataFrame, examples: int = 5, data_version: int = None) -> list:
+        """
+        Um insight por cluster: tamanho, perfil médio e itens de exemplo (os de maior volume).
+
+        :param data_version: data_version do engine (mesma chave de cache de similar_items).
+        :return: Lista de insights, do maior cluster ao menor.
+        """
+        table = self.cluster_items(df, data_version)
+        if table.empty:
+            return [{"insight": "Itens insuficientes para agrupar por dinâmica de preço."}]
+        insights = []
+        for cluster, group in sorted(table.groupby('cluster'), key=lambda kv: -len(kv[1])):
+            top = group.sort_values('volume', ascending=False).index[:examples]
+            insights.append({
+                "Item": ", ".join(map(str, top)),
+                "Preço": "-",
+                "Tipo": f"CLUSTER {cluster}",
+                "Detalhe": (f"{len(group)} itens; volatilidade {group['volatility'].mean() * 100:.0f}%, "
+                            f"~{np.expm1(group['volume'].mean()):.0f} trades/item"),
+                "Score": str(len(group)),
+            })
+        return insights
+
+    @staticmethod
+    def _anomaly_insights(items, prices, centers, z_scores, reference: str) -> list:
+        """Insights (Item, Preço, Tipo, Detalhe, Score + 'z_score' numérico) de trades pontuados."""
+        insights = []
+        for item, price, center, z in zip(items, prices, centers, z_scores):
+            cheap = z < 0
+            insights.append({
+                "Item": str(item),
+                "Preço": format_wurm_price(price * 100),
+                "Tipo": "OPORTUNIDADE (BARATO)" if cheap else "ALERTA (CARO)",
+                "Detalhe": (f"{'COMPRAR' if cheap else 'VENDER'}! Preço {abs(z):.1f}x sigma "
+                            f"longe da {reference} ({format_wurm_price(center * 100)})"),
+                "Score": f"Z={z:.1f}",
+                "z_score": float(z),
+            })
+        return insights
+
+    def run_prediction(self, df_clean: pd.DataFrame, analysis_type: str = 'all',
+                       progress=None, cancel=None, data_version: int = None) -> list:
+        """
+        Executa o pipeline completo: pré-processamento e previsão.
+
+        As tabelas de features vêm do feature store: trocar o tipo de análise
+        ou repetir a análise sobre os mesmos dados não refaz o pré-processamento.
+
+        :param progress: Callback (concluídos, total) das análises longas ('models').
+        :param cancel: threading.Event para cancelar as análises longas.
+        :param data_version: data_version do engine (chave do feature store).
+        """
+        if analysis_type == 'arbitrage':
+            return self.detect_arbitrage(df_clean)
+        if analysis_type == 'anomalies':
+            return self.detect_anomalies(df_clean, data_version=data_version)
+        if analysis_type == 'rolling':
+            return self.detect_rolling_anomalies(df_clean, data_version=data_version)
+        if analysis_type == 'trends':
+            return self.detect_trends(df_clean, data_version=data_version)
+        if analysis_type == 'relevance':
+            return self.detect_relevance(df_clean, data_version=data_version)
+        if analysis_type == 'clusters':
+            return self.describe_clusters(df_clean, data_version=data_version)
+        if analysis_type == 'models':
+            return self.predict_item_models(df_clean, progress=progress, cancel=cancel)
+
+        df_ml_ready = self.features.get('ml', df_clean, data_version)
         # For now we just pass it through or ignore it as the logic is stubbed
-        return self.predict_opportunities(df_ml_ready)
+        insights = self.predict_opportunities(df_ml_ready, self.relevance_table(df_clean, data_version=data_version))
+        if analysis_type == 'all':
+            insights += [i for i in self.detect_anomalies(df_clean, top_n=10, data_version=data_version)
+                         if 'insight' not in i]
+        if analysis_type == 'all' and 'operation' in df_clean.columns:
+            insights += [i for i in self.detect_arbitrage(df_clean, top_n=10) if 'insight' not in i]
+        return insights
@@ -0,0 +1,224 @@
+"""
+Model State
+===========
+
+Estado incremental do MLPredictor, persistido em disco.
+
+Em vez de recalcular as estatísticas sobre o histórico inteiro a cada
+análise, o preditor mantém:
+
+- momentos por item (contagem, média e M2 de Welford), mesclados lote a
+  lote pela fórmula de Chan, sem revisitar trades antigos;
+- as janelas de mediana/MAD do RollingAnomalyDetector;
+- o estado do HoltForecaster (nível, tendência e parâmetros por item),
+  ajustado com a grade de parâmetros na primeira carga e depois só
+  continuado com os dias novos;
+- um carimbo dos dados já incorporados (data_version, linhas, primeiro e
+  último timestamp).
+
+O estado é salvo com pickle (como o cache do wurm_parser). Na próxima
+execução é recarregado e só as linhas posteriores ao carimbo são
+processadas; se o dataset mudou (começa em outra data ou encolheu), o
+estado é descartado e reconstruído.
+
+Exemplo:
+    state = ModelState.load('data/ml_state.pkl') or ModelState()
+    state.sync(engine.df, engine.data_version)
+    state.save('data/ml_state.pkl')
+"""
+
+import logging
+import os
+import pickle
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from forecasting import HoltForecaster
+from rolling_anomaly import RollingAnomalyDetector
+
+logger = logging.getLogger(__name__)
+
+# Incrementar quando o formato do estado mudar (estados antigos são descartados)
+STATE_VERSION = 2
+
+
+class ItemMoments:
+    """Contagem, média e M2 (Welford) do preço por item, mescláveis por lote."""
+
+    def __init__(self) -> None:
+        self.index: Dict[str, int] = {}
+        self.count = np.zeros(0, dtype=np.int64)
+        self.mean = np.zeros(0, dtype=float)
+        self.m2 = np.zeros(0, dtype=float)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def update(self, items: pd.Series, prices: np.ndarray) -> None:
+        """Incorpora um lote (preços <= 0 ou NaN são ignorados)."""
+        prices = np.asarray(prices, dtype=float)
+        items = pd.Series(items, copy=False)
+        valid = np.isfinite(prices) & (prices > 0) & items.notna().to_numpy()
+        if not valid.any():
+            return
+        codes, uniques = pd.factorize(items[valid])
+        prices = prices[valid]
+
+        # Momentos do lote por item (duas passadas em NumPy)
+        n_b = np.bincount(codes, minlength=len(uniques))
+        mean_b = np.bincount(codes, weights=prices, minlength=len(uniques)) / n_b
+        m2_b = np.bincount(codes, weights=(prices - mean_b[codes]) ** 2, minlength=len(uniques))
+
+        slots = np.array([self._slot(str(u)) for u in uniques], dtype=np.int64)
+        n_a, mean_a, m2_a = self.count[slots], self.mean[slots], self.m2[slots]
+
+        # Fórmula de Chan para mesclar (n, média, M2)
+        n = n_a + n_b
+        delta = mean_b - mean_a
+        self.mean[slots] = mean_a + delta * n_b / n
+        self.m2[slots] = m2_a + m2_b + delta ** 2 * n_a * n_b / n
+        self.count[slots] = n
+
+    def _slot(self, item: str) -> int:
+        slot = self.index.get(item)
+        if slot is None:
+            slot = self.index[item] = len(self.index)
+            if slot >= len(self.count):
+                grow = max(64, len(self.count))
+                self.count = np.concatenate([self.count, np.zeros(grow, dtype=np.int64)])
+                self.mean = np.concatenate([self.mean, np.zeros(grow)])
+                self.m2 = np.concatenate([self.m2, np.zeros(grow)])
+        return slot
+
+    def table(self) -> pd.DataFrame:
+        """DataFrame indexado por item com count, mean e std (amostral)."""
+        n = len(self.index)
+        count = self.count[:n]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            std = np.sqrt(self.m2[:n] / (count - 1))
+        std[count < 2] = np.nan
+        return pd.DataFrame({'count': count, 'mean': self.mean[:n], 'std': std},
+                            index=pd.Index(list(self.index), name='main_item'))
+
+    def get(self, item: str) -> Optional[Dict[str, float]]:
+        slot = self.index.get(item)
+        if slot is None:
+            return None
+        count = int(self.count[slot])
+        std = float(np.sqrt(self.m2[slot] / (count - 1))) if count > 1 else np.nan
+        return {'count': count, 'mean': float(self.mean[slot]), 'std': std}
+
+
+class ModelState:
+    """
+    Estado incremental do preditor: momentos por item, detector móvel, previsões e carimbo dos dados.
+
+    Args:
+        rolling: Detector de mediana/MAD móveis (padrão: RollingAnomalyDetector())
+        forecast: Previsor de Holt (padrão: HoltForecaster())
+    """
+
+    def __init__(self, rolling: Optional[RollingAnomalyDetector] = None,
+                 forecast: Optional[HoltForecaster] = None) -> None:
+        self.version = STATE_VERSION
+        self.moments = ItemMoments()
+        self.rolling = rolling or RollingAnomalyDetector()
+        self.forecast = forecast or HoltForecaster()
+        self.stamp: Dict[str, Any] = {'data_version': None, 'rows': 0, 'first': None, 'last': None}
+
+    @property
+    def is_empty(self) -> bool:
+        return self.stamp['rows'] == 0
+
+    def reset(self) -> None:
+        """Esquece tudo (mantém a configuração do detector e do previsor)."""
+        self.moments = ItemMoments()
+        self.rolling.reset()
+        self.forecast.reset()
+        self.stamp = {'data_version': None, 'rows': 0, 'first': None, 'last': None}
+
+    def sync(self, df: pd.DataFrame, data_version: Optional[int] = None) -> int:
+        """
+        Incorpora as linhas de ``df`` ainda não vistas.
+
+        Args:
+            df: DataFrame de trades com DatetimeIndex ordenado (main_item, price_s)
+            data_version: data_version do engine (gravado no carimbo)
+
+        Returns:
+            Número de linhas processadas (0 se o estado já estava em dia).
+        """
+        if df is None or df.empty or not isinstance(df.index, pd.DatetimeIndex) \
+                or not {'main_item', 'price_s'}.issubset(df.columns):
+            return 0
+        first, last = df.index[0], df.index[-1]
+        if len(df) == self.stamp['rows'] and first == self.stamp['first'] and last == self.stamp['last']:
+            self.stamp['data_version'] = data_version
+            return 0
+
+        start = 0
+        if self.stamp['last'] is not None:
+            start = int(df.index.searchsorted(self.stamp['last'], side='right'))
+            # Outro dataset, ou lote fora de ordem inserido antes do carimbo
+            if first != self.stamp['first'] or start != self.stamp['rows']:
+                logger.info("Dados mudaram desde o estado salvo: reconstruindo o estado do modelo.")
+                self.reset()
+                start = 0
+
+        new = df.iloc[start:]
+        if not new.empty:
+            self.ingest(new)
+            self.stamp['last'] = last
+
+        self.stamp.update(data_version=data_version, rows=len(df), first=first)
+        return len(new)
+
+    def ingest(self, batch: pd.DataFrame) -> pd.DataFrame:
+        """
+        Incorpora um lote de trades novos (em ordem de tempo) sem mexer no carimbo.
+
+        Usado pelo sync e pelo backtesting, que alimenta o estado passo a passo.
+
+        Args:
+            batch: DataFrame de trades com DatetimeIndex (main_item, price_s)
+
+        Returns:
+            Trades do lote marcados pelo detector móvel (colunas FLAG_COLUMNS).
+        """
+        prices = batch['price_s'].to_numpy(dtype=float)
+        timestamps = batch.index.to_numpy()
+        self.moments.update(batch['main_item'], prices)
+        flags = self.rolling.update(batch['main_item'], timestamps, prices)
+        if self.forecast.last_day is None:
+            self.forecast.fit_trades(batch['main_item'], timestamps, prices)
+        else:
+            self.forecast.update_trades(batch['main_item'], timestamps, prices)
+        return flags
+
+    def save(self, path: str) -> None:
+        """Grava o estado (pickle) de forma atômica."""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, 'wb') as fh:
+            pickle.dump(self, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        logger.info(f"Estado do modelo salvo em {path} ({len(self.moments)} itens, "
+                    f"{self.stamp['rows']:,} linhas)")
+
+    @classmethod
+    def load(cls, path: str) -> Optional["ModelState"]:
+        """Carrega um estado salvo (None se não existe, é inválido ou de outra versão)."""
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as fh:
+                state = pickle.load(fh)
+        except Exception as e:
+            logger.warning(f"Falha ao ler o estado do modelo ({path}): {e}")
+            return None
+        if not isinstance(state, cls) or getattr(state, 'version', None) != STATE_VERSION:
+            logger.info(f"Estado do modelo em {path} é de outra versão: ignorado.")
+            return None
+        return state
@@ -0,0 +1,192 @@
+"""
+Noise Filter - Aho-Corasick
+===========================
+
+Filtro de ruído multi-padrão para as categorias de item do WurmStatsEngine.
+
+Em vez de montar uma regex gigante com todos os termos e rodá-la em cada
+linha do DataFrame, o filtro compila os termos num autômato Aho-Corasick e
+avalia apenas os valores únicos (categorias) da coluna. O resultado é uma
+máscara booleana alinhada às linhas, sem copiar o DataFrame.
+"""
+
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+class AhoCorasick:
+    """
+    Autômato Aho-Corasick para busca simultânea de vários padrões.
+
+    A busca percorre o texto uma única vez, independente do número de padrões.
+    """
+
+    def __init__(self, patterns: Optional[Iterable[str]] = None) -> None:
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[str]] = [[]]
+        self._built = False
+        for pattern in patterns or []:
+            self.add_pattern(pattern)
+
+    def add_pattern(self, pattern: str) -> None:
+        """Adiciona um padrão à trie. Invalida os links de falha."""
+        if not pattern:
+            return
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        if pattern not in self._out[node]:
+            self._out[node].append(pattern)
+        self._built = False
+
+    def build(self) -> None:
+        """Calcula os links de falha (BFS) e propaga as saídas."""
+        queue = deque()
+        for child in self._goto[0].values():
+            self._fail[child] = 0
+            queue.append(child)
+
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+        self._built = True
+
+    def _step(self, node: int, ch: str) -> int:
+        while node and ch not in self._goto[node]:
+            node = self._fail[node]
+        return self._goto[node].get(ch, 0)
+
+    def contains_any(self, text: str) -> bool:
+        """Retorna True se algum padrão ocorrer no texto."""
+        if not self._built:
+            self.build()
+        node = 0
+        for ch in text:
+            node = self._step(node, ch)
+            if self._out[node]:
+                return True
+        return False
+
+    def find_all(self, text: str) -> List[Tuple[int, str]]:
+        """Retorna todas as ocorrências como (posição inicial, padrão)."""
+        if not self._built:
+            self.build()
+        matches = []
+        node = 0
+        for i, ch in enumerate(text):
+            node = self._step(node, ch)
+            for pattern in self._out[node]:
+                matches.append((i - len(pattern) + 1, pattern))
+        return matches
+
+
+class NoiseFilter:
+    """
+    Classificador de ruído por categoria, extensível em tempo de execução.
+
+    Cada valor distinto é avaliado uma única vez e o resultado fica em cache,
+    de modo que novos lotes de dados só pagam pelas categorias inéditas.
+    """
+
+    def __init__(self, terms: Optional[Iterable[str]] = None) -> None:
+        self._terms: List[str] = []
+        self._automaton: Optional[AhoCorasick] = None
+        self._cache: Dict[str, bool] = {}
+        if terms:
+            self.add_terms(terms)
+
+    @property
+    def terms(self) -> List[str]:
+        """Termos de ruído ativos (normalizados em minúsculas)."""
+        return list(self._terms)
+
+    def add_terms(self, terms: Iterable[str]) -> int:
+        """
+        Adiciona termos de ruído.
+
+        Categorias já marcadas como ruído continuam marcadas; apenas as
+        categorias limpas em cache são reavaliadas contra os novos termos.
+
+        Returns:
+            Quantidade de termos efetivamente adicionados.
+        """
+        new_terms = []
+        for term in terms:
+            term = str(term).strip().lower()
+            if term and term not in self._terms and term not in new_terms:
+                new_terms.append(term)
+        if not new_terms:
+            return 0
+
+        self._terms.extend(new_terms)
+        self._automaton = None
+
+        delta = AhoCorasick(new_terms)
+        for value, is_noise in self._cache.items():
+            if not is_noise and delta.contains_any(value.lower()):
+                self._cache[value] = True
+        return len(new_terms)
+
+    def remove_terms(self, terms: Iterable[str]) -> int:
+        """Remove termos de ruído. Limpa o cache de categorias."""
+        to_remove = {str(t).strip().lower() for t in terms}
+        before = len(self._terms)
+        self._terms = [t for t in self._terms if t not in to_remove]
+        removed = before - len(self._terms)
+        if removed:
+            self._automaton = None
+            self._cache.clear()
+        return removed
+
+    def is_noise(self, text: str) -> bool:
+        """Retorna True se o texto contém algum termo de ruído."""
+        cached = self._cache.get(text)
+        if cached is not None:
+            return cached
+        if self._automaton is None:
+            self._automaton = AhoCorasick(self._terms)
+        result = self._automaton.contains_any(str(text).lower())
+        self._cache[text] = result
+        return result
+
+    def mask(self, values: pd.Series) -> np.ndarray:
+        """
+        Calcula a máscara de ruído de uma coluna.
+
+        Colunas categóricas são avaliadas pelas categorias; as demais são
+        fatoradas antes, para que cada valor distinto seja testado uma vez.
+
+        Returns:
+            Array booleano alinhado às linhas (True = ruído). Valores nulos
+            nunca são considerados ruído.
+        """
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes = values.cat.codes.to_numpy()
+            uniques = values.cat.categories
+        else:
+            codes, uniques = pd.factorize(values)
+
+        if len(uniques) == 0:
+            return np.zeros(len(values), dtype=bool)
+
+        flags = np.fromiter((self.is_noise(str(u)) for u in uniques),
+                            dtype=bool, count=len(uniques))
+        return np.where(codes >= 0, flags[codes], False)
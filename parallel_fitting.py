@@ -0,0 +1,242 @@
+"""
+Parallel Fitting
+================
+
+Ajuste de modelos por item em paralelo, num pool de processos.
+
+Modelos que não vetorizam (ARIMA e afins, um ajuste por item) são limitados
+pelo GIL numa thread só. Aqui os itens são divididos em lotes e cada lote
+roda num processo do pool:
+
+- os trades são ordenados por item e os arrays (timestamps em ns e preços)
+  são copiados uma única vez para um bloco de memória compartilhada
+  (multiprocessing.shared_memory);
+- cada tarefa recebe só o nome do bloco e as fatias (início, fim) dos seus
+  itens; o processo anexa o bloco e lê só essas fatias, sem pickle do
+  DataFrame;
+- os lotes são balanceados pelo número de trades e há mais lotes que
+  processos, então o progresso é reportado por lote e o cancelamento para
+  o que ainda não começou.
+
+A função de ajuste precisa ser importável (nível de módulo) e recebe
+(item, timestamps, preços) do item; o resultado volta por pickle e deve ser
+pequeno (coeficientes, previsões).
+
+Exemplo:
+    cancel = threading.Event()
+    results = fit_items_parallel(engine.cleaned_df, fit_ar_daily,
+                                 progress=lambda done, total: print(done, total),
+                                 cancel=cancel)
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from engine_backends import trade_timestamps
+
+logger = logging.getLogger(__name__)
+
+# Lotes por processo (mais lotes = progresso e cancelamento mais finos)
+SHARDS_PER_WORKER = 4
+
+# Trades mínimos para um item ser ajustado
+MIN_ITEM_TRADES = 10
+
+ProgressCallback = Callable[[int, int], None]
+
+
+# ----------------------------------------------------------------------
+# Funções de ajuste por item
+# ----------------------------------------------------------------------
+
+def fit_ar_daily(item: str, timestamps: np.ndarray, prices: np.ndarray, order: int = 2) -> Optional[Dict[str, Any]]:
+    """
+    AR(p) por mínimos quadrados sobre o log do preço médio diário do item.
+
+    Args:
+        item: Nome do item
+        timestamps: datetime64[ns] (como int64) dos trades do item, em ordem
+        prices: Preços dos trades
+
+    Returns:
+        Dicionário com coeficientes, desvio dos resíduos, dias usados e a
+        previsão do próximo dia (preço); None com histórico insuficiente.
+    """
+    days = np.asarray(timestamps, dtype=np.int64) // (86_400 * 10 ** 9)
+    valid = np.isfinite(prices) & (prices > 0)
+    if valid.sum() < order + 3:
+        return None
+    unique_days, inverse = np.unique(days[valid], return_inverse=True)
+    y = np.bincount(inverse, weights=np.log(prices[valid])) / np.bincount(inverse)
+    if len(y) < 2 * order + 2:
+        return None
+
+    # Matriz de defasagens [1, y_{t-1}, ..., y_{t-p}]
+    lags = np.column_stack([np.ones(len(y) - order)] + [y[order - k:len(y) - k] for k in range(1, order + 1)])
+    coef, _, _, _ = np.linalg.lstsq(lags, y[order:], rcond=None)
+    residuals = y[order:] - lags @ coef
+    next_log = coef[0] + coef[1:] @ y[::-1][:order]
+    return {
+        'coef': coef,
+        'sigma': float(np.std(residuals, ddof=min(order + 1, len(residuals) - 1))),
+        'days': int(len(y)),
+        'last_price': float(np.exp(y[-1])),
+        'next_price': float(np.exp(next_log)),
+    }
+
+
+def fit_arima(item: str, timestamps: np.ndarray, prices: np.ndarray,
+              order: Tuple[int, int, int] = (1, 1, 1)) -> Optional[Dict[str, Any]]:
+    """
+    ARIMA (statsmodels) sobre o log do preço médio diário do item.
+
+    Returns:
+        Dicionário com parâmetros, AIC, último preço e previsão do próximo dia;
+        None com histórico insuficiente.
+    """
+    try:
+        from statsmodels.tsa.arima.model import ARIMA
+    except ImportError as e:
+        raise ImportError("Ajuste ARIMA requer o pacote statsmodels: pip install statsmodels") from e
+
+    series = pd.Series(np.asarray(prices, dtype=float), index=pd.to_datetime(np.asarray(timestamps, dtype=np.int64)))
+    series = np.log(series[series > 0]).resample('D').mean().dropna()
+    if len(series) < 3 * sum(order) + 5:
+        return None
+    fitted = ARIMA(series.to_numpy(), order=order).fit()
+    return {
+        'params': np.asarray(fitted.params),
+        'aic': float(fitted.aic),
+        'days': int(len(series)),
+        'last_price': float(np.exp(series.iloc[-1])),
+        'next_price': float(np.exp(fitted.forecast(1)[0])),
+    }
+
+
+# ----------------------------------------------------------------------
+# Execução no pool
+# ----------------------------------------------------------------------
+
+def _fit_shard(shm_name: str, n_rows: int, fit_func: Callable, shard: List[Tuple[str, int, int]],
+               kwargs: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """Roda no processo do pool: anexa o bloco compartilhado e ajusta os itens do lote."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        timestamps = np.ndarray((n_rows,), dtype=np.int64, buffer=shm.buf)
+        prices = np.ndarray((n_rows,), dtype=np.float64, buffer=shm.buf, offset=n_rows * 8)
+        results, errors = {}, {}
+        for item, start, end in shard:
+            try:
+                # Cópia da fatia: o resultado não pode apontar para o bloco
+                result = fit_func(item, timestamps[start:end].copy(), prices[start:end].copy(), **kwargs)
+            except Exception as e:
+                errors[item] = f"{type(e).__name__}: {e}"
+                continue
+            if result is not None:
+                results[item] = result
+        del timestamps, prices
+        return results, errors
+    finally:
+        shm.close()
+
+
+def _item_slices(df: pd.DataFrame, items: Optional[Sequence[str]], min_trades: int
+                 ) -> Tuple[np.ndarray, np.ndarray, List[Tuple[str, int, int]]]:
+    """Arrays ordenados por item (e tempo) e a fatia (início, fim) de cada item."""
+    timestamps = trade_timestamps(df).astype(np.int64)
+    prices = df['price_s'].to_numpy(dtype=np.float64)
+    names = df['main_item']
+    keep = names.notna().to_numpy() & np.isfinite(prices) & (timestamps != np.iinfo(np.int64).min)
+    if items is not None:
+        keep &= names.isin(list(items)).to_numpy()
+
+    codes, uniques = pd.factorize(names[keep])
+    order = np.lexsort((timestamps[keep], codes))
+    codes = codes[order]
+    counts = np.bincount(codes, minlength=len(uniques))
+    ends = np.cumsum(counts)
+    slices = [(str(uniques[c]), int(ends[c] - counts[c]), int(ends[c]))
+              for c in range(len(uniques)) if counts[c] >= min_trades]
+    return timestamps[keep][order], prices[keep][order], slices
+
+
+def _shards(slices: List[Tuple[str, int, int]], n_shards: int) -> List[List[Tuple[str, int, int]]]:
+    """Divide os itens em lotes contíguos com número de trades parecido."""
+    if not slices:
+        return []
+    sizes = np.array([end - start for _, start, end in slices], dtype=np.int64)
+    bounds = np.searchsorted(np.cumsum(sizes), np.linspace(0, sizes.sum(), n_shards + 1)[1:-1], side='right')
+    edges = np.unique(np.r_[0, bounds, len(slices)])
+    return [slices[lo:hi] for lo, hi in zip(edges[:-1], edges[1:]) if hi > lo]
+
+
+def fit_items_parallel(df: pd.DataFrame, fit_func: Callable = fit_ar_daily,
+                       items: Optional[Sequence[str]] = None, max_workers: Optional[int] = None,
+                       progress: Optional[ProgressCallback] = None,
+                       cancel: Optional[threading.Event] = None,
+                       min_trades: int = MIN_ITEM_TRADES, **fit_kwargs) -> Dict[str, Any]:
+    """
+    Ajusta ``fit_func`` para cada item num pool de processos.
+
+    Args:
+        df: DataFrame de trades (main_item, price_s, índice temporal ou 'date')
+        fit_func: Função de nível de módulo (item, timestamps, preços, **fit_kwargs)
+        items: Itens a ajustar (None = todos)
+        max_workers: Processos do pool (None = número de CPUs)
+        progress: Chamado com (itens concluídos, total de itens) a cada lote,
+            na thread que chamou esta função
+        cancel: Evento que, quando setado, para o envio de lotes novos
+        min_trades: Trades mínimos para ajustar um item
+
+    Returns:
+        Resultado por item (itens sem resultado ou com erro ficam de fora;
+        se cancelado, só os lotes concluídos).
+    """
+    if df is None or df.empty or not {'main_item', 'price_s'}.issubset(df.columns):
+        return {}
+    timestamps, prices, slices = _item_slices(df, items, min_trades)
+    total = len(slices)
+    if not total:
+        return {}
+    workers = max_workers or os.cpu_count() or 1
+    shards = _shards(slices, workers * SHARDS_PER_WORKER)
+
+    n_rows = len(prices)
+    shm = shared_memory.SharedMemory(create=True, size=max(n_rows * 16, 1))
+    results: Dict[str, Any] = {}
+    done = 0
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        np.ndarray((n_rows,), dtype=np.int64, buffer=shm.buf)[:] = timestamps
+        np.ndarray((n_rows,), dtype=np.float64, buffer=shm.buf, offset=n_rows * 8)[:] = prices
+        pending = {pool.submit(_fit_shard, shm.name, n_rows, fit_func, shard, fit_kwargs): len(shard)
+                   for shard in shards}
+        if progress:
+            progress(0, total)
+        while pending:
+            if cancel is not None and cancel.is_set():
+                logger.info(f"Ajuste por item cancelado ({done}/{total} itens concluídos).")
+                break
+            finished, _ = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+            for future in finished:
+                done += pending.pop(future)
+                shard_results, errors = future.result()
+                results.update(shard_results)
+                for item, error in errors.items():
+                    logger.warning(f"Falha ao ajustar o modelo de '{item}': {error}")
+                if progress:
+                    progress(done, total)
+    finally:
+        # Cancelado: lotes não iniciados são descartados; espera os que já
+        # estão nos workers antes do unlink (senão não acham o bloco)
+        pool.shutdown(wait=True, cancel_futures=True)
+        shm.close()
+        shm.unlink()
+    return results
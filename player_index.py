@@ -0,0 +1,167 @@
+"""
+Player Index
+============
+
+Índice jogador -> posições das linhas no DataFrame do engine, com
+agregados por jogador (trades, itens ofertados, preço relativo ao mercado e
+horários de atividade).
+
+As posições são montadas com ``groupby().indices`` na carga e estendidas a
+cada lote anexado em ordem; buscar "tudo que este jogador postou" vira um
+``iloc`` sobre as posições, sem varrer a coluna. Os agregados ficam num
+dicionário por jogador e são recalculados apenas para os jogadores tocados.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+STAT_COLUMNS = ['trades', 'wts', 'wtb', 'items', 'price_ratio',
+                'first_seen', 'last_seen', 'peak_hour', 'active_hours']
+
+
+class PlayerIndex:
+    """
+    Posições e agregados por jogador (nomes case-insensitive).
+
+    ``price_ratio`` é a mediana de preço / mediana de mercado do item, por
+    trade: 1.0 significa que o jogador negocia no preço de mercado.
+    """
+
+    def __init__(self) -> None:
+        self._positions: Dict[str, np.ndarray] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._hours: Dict[str, np.ndarray] = {}
+        self._table: Optional[pd.DataFrame] = None
+
+    @staticmethod
+    def normalize_name(name: str) -> str:
+        return str(name).strip().lower()
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __contains__(self, player: str) -> bool:
+        return self.normalize_name(player) in self._positions
+
+    @property
+    def players(self) -> List[str]:
+        return list(self._positions)
+
+    def _codes(self, players: pd.Series):
+        """Códigos por linha e nomes normalizados (normaliza só os distintos)."""
+        codes, uniques = pd.factorize(pd.Series(players, copy=False))
+        names, inverse = np.unique(np.array([self.normalize_name(u) for u in uniques],
+                                            dtype=object), return_inverse=True)
+        mapped = np.full(len(codes), -1, dtype=np.int64)
+        mapped[codes >= 0] = inverse[codes[codes >= 0]]
+        return mapped, names
+
+    def add_rows(self, players: pd.Series, offset: int = 0) -> List[str]:
+        """
+        Indexa um bloco de linhas que começa na posição ``offset`` do DataFrame.
+
+        Os blocos devem chegar em ordem de posição (carga inicial e depois
+        lotes anexados ao final).
+
+        Returns:
+            Jogadores presentes no bloco.
+        """
+        codes, names = self._codes(players)
+        valid = codes >= 0
+        if not valid.any():
+            return []
+        positions = np.flatnonzero(valid) + offset
+        touched = []
+        for code, idx in pd.Series(positions).groupby(codes[valid]).indices.items():
+            name = names[code]
+            new = positions[idx]
+            old = self._positions.get(name)
+            self._positions[name] = new if old is None else np.concatenate([old, new])
+            touched.append(name)
+        self._table = None
+        return touched
+
+    def positions(self, player: str) -> np.ndarray:
+        """Posições (ordenadas) das linhas do jogador."""
+        return self._positions.get(self.normalize_name(player), np.empty(0, dtype=np.int64))
+
+    def positions_of(self, players: Iterable[str]) -> np.ndarray:
+        """Posições de vários jogadores, em ordem."""
+        parts = [self._positions[p] for p in players if p in self._positions]
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate(parts))
+
+    def update_stats(self, players: pd.Series, items: pd.Series, operations: pd.Series,
+                     ratios: np.ndarray, timestamps: np.ndarray) -> None:
+        """
+        Recalcula os agregados dos jogadores presentes.
+
+        As colunas devem conter TODAS as linhas (válidas) desses jogadores,
+        já que contagem de itens distintos e medianas não são mescláveis.
+        """
+        codes, names = self._codes(players)
+        valid = codes >= 0
+        if not valid.any():
+            return
+        timestamps = np.asarray(timestamps, dtype='datetime64[ns]')
+        item_codes = pd.factorize(pd.Series(items, copy=False))[0].astype(float)
+        item_codes[item_codes < 0] = np.nan
+        frame = pd.DataFrame({
+            'player': codes[valid],
+            'item': item_codes[valid],
+            'wts': (pd.Series(operations, copy=False) == 'WTS').to_numpy()[valid],
+            'wtb': (pd.Series(operations, copy=False) == 'WTB').to_numpy()[valid],
+            'ratio': np.asarray(ratios, dtype=float)[valid],
+            'ts': timestamps[valid],
+        })
+        grouped = frame.groupby('player', sort=True)
+        agg = pd.DataFrame({
+            'trades': grouped.size(),
+            'wts': grouped['wts'].sum(),
+            'wtb': grouped['wtb'].sum(),
+            'items': grouped['item'].nunique(),
+            'price_ratio': grouped['ratio'].median(),
+            'first_seen': grouped['ts'].min(),
+            'last_seen': grouped['ts'].max(),
+        })
+
+        # Histograma de horas (jogador x 24) com um único bincount
+        ts = frame['ts'].to_numpy()
+        dated = ~np.isnat(ts)
+        hours = (ts[dated].astype('datetime64[h]').astype(np.int64) % 24)
+        histogram = np.bincount(frame['player'].to_numpy()[dated] * 24 + hours,
+                                minlength=len(names) * 24).reshape(len(names), 24)
+
+        for code, row in zip(agg.index, agg.itertuples(index=False)):
+            hist = histogram[code]
+            name = names[code]
+            self._hours[name] = hist
+            self._stats[name] = {
+                'trades': int(row.trades), 'wts': int(row.wts), 'wtb': int(row.wtb),
+                'items': int(row.items),
+                'price_ratio': None if pd.isna(row.price_ratio) else float(row.price_ratio),
+                'first_seen': row.first_seen, 'last_seen': row.last_seen,
+                'peak_hour': int(hist.argmax()) if hist.any() else None,
+                'active_hours': int((hist > 0).sum()),
+            }
+        self._table = None
+
+    def stats(self, player: str) -> Optional[Dict[str, Any]]:
+        """Agregados do jogador (None se desconhecido)."""
+        stats = self._stats.get(self.normalize_name(player))
+        return dict(stats) if stats is not None else None
+
+    def hours(self, player: str) -> np.ndarray:
+        """Trades por hora do dia (array de 24 posições)."""
+        return self._hours.get(self.normalize_name(player), np.zeros(24, dtype=np.int64))
+
+    def table(self) -> pd.DataFrame:
+        """Agregados de todos os jogadores como DataFrame (em cache até a próxima mudança)."""
+        if self._table is None:
+            self._table = pd.DataFrame.from_dict(self._stats, orient='index',
+                                                 columns=STAT_COLUMNS)
+            self._table.index.name = 'player'
+        return self._table
@@ -6,10 +6,29 @@
 
 import statistics
 
+# ---------------------------
+# Resumo de mercado do engine
+# ---------------------------
+def _summary_rows(data, item=None):
+    """Linhas do resumo de mercado em cache (None se data não for um engine)."""
+    if not hasattr(data, "get_market_summary"):
+        return None
+    summary = data.get_market_summary()
+    if item:
+        names = summary.index.get_level_values("main_item").astype(str).str.lower()
+        summary = summary[names.str.contains(item.lower(), regex=False)]
+    return summary
+
 # ---------------------------
 # 1) Média de preço por item
 # ---------------------------
 def average_price(data, item=None):
+    rows = _summary_rows(data, item)
+    if rows is not None:
+        if rows.empty:
+            return "Nenhum preço encontrado."
+        total = (rows["mean_price"] * rows["count"]).sum()
+        return f"Média: {total / rows['count'].sum():.4f}"
     entries = data.get("entries", [])
     if item:
         entries = [e for e in entries if item.lower() in e.get("item", "").lower()]
@@ -22,6 +41,11 @@ def average_price(data, item=None):
 # 2) Preço mínimo por item
 # ---------------------------
 def min_price(data, item=None):
+    rows = _summary_rows(data, item)
+    if rows is not None:
+        if rows.empty:
+            return "Nenhum preço encontrado."
+        return f"Mínimo: {rows['min_price'].min():.4f}"
     entries = data.get("entries", [])
     if item:
         entries = [e for e in entries if item.lower() in e.get("item", "").lower()]
@@ -34,6 +58,11 @@ def min_price(data, item=None):
 # 3) Preço máximo por item
 # ---------------------------
 def max_price(data, item=None):
+    rows = _summary_rows(data, item)
+    if rows is not None:
+        if rows.empty:
+            return "Nenhum preço encontrado."
+        return f"Máximo: {rows['max_price'].max():.4f}"
     entries = data.get("entries", [])
     if item:
         entries = [e for e in entries if item.lower() in e.get("item", "").lower()]
@@ -46,6 +75,12 @@ def max_price(data, item=None):
 # 4) Mediana de preços
 # ---------------------------
 def median_price(data, item=None):
+    # Engine com sketches de quantis: responde sem ordenar os preços
+    if item and hasattr(data, "get_price_quantiles"):
+        median = data.get_price_quantiles(item, quantiles=(0.5,))[0.5]
+        if median is None:
+            return "Nenhum preço encontrado."
+        return f"Mediana: {median:.4f}"
     entries = data.get("entries", [])
     if item:
         entries = [e for e in entries if item.lower() in e.get("item", "").lower()]
@@ -75,6 +110,9 @@ def mode_price(data, item=None):
 # 6) Contagem de vendas
 # ---------------------------
 def count_sales(data, item=None):
+    rows = _summary_rows(data, item)
+    if rows is not None:
+        return f"Total de vendas: {int(rows['count'].sum())}"
     entries = data.get("entries", [])
     if item:
         entries = [e for e in entries if item.lower() in e.get("item", "").lower()]
@@ -84,6 +122,9 @@ def count_sales(data, item=None):
 # 7) Soma total de moedas
 # ---------------------------
 def total_volume(data, item=None):
+    rows = _summary_rows(data, item)
+    if rows is not None:
+        return f"Volume total: {(rows['mean_price'] * rows['count']).sum():.4f}"
     entries = data.get("entries", [])
     if item:
         entries = [e for e in entries if item.lower() in e.get("item", "").lower()]
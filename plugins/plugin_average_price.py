@@ -1,11 +1,18 @@
 import json
 
-def run(data):
+def run(data, params=None):
     """
     Calcula o preço médio dos itens no arquivo carregado.
     Espera um dicionário com a chave "entries" contendo objetos
-    que possuem "item" e "price".
+    que possuem "item" e "price", ou o engine (usa o resumo de mercado em cache).
     """
+    if hasattr(data, "get_market_summary"):
+        summary = data.get_market_summary()
+        if summary.empty:
+            return "Nenhum preço válido encontrado."
+        media = (summary["mean_price"] * summary["count"]).sum() / summary["count"].sum()
+        return f"Preço médio geral: {media:.4f}"
+
     entries = data.get("entries", [])
     if not entries:
         return "Nenhum dado carregado."
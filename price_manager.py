@@ -8,6 +8,8 @@ class PriceManager:
     def __init__(self, csv_path=None):
         self.prices = {}
         self.csv_path = csv_path
+        # Superfície de preço por QL (QLPriceSurface), anexada após o carregamento
+        self.ql_surface = None
         if csv_path and os.path.exists(csv_path):
             self.load_from_csv(csv_path)
 
@@ -35,8 +37,26 @@ class PriceManager:
         if not item_name: return None
         return self.prices.get(item_name.lower().strip())
 
-    def evaluate_trade(self, item_name, price_copper, quantity=1):
+    def attach_ql_surface(self, surface):
+        self.ql_surface = surface
+
+    def get_ql_reference(self, item_name, ql, min_count=3):
+        """Mediana de mercado do item na faixa de QL, se houver trades suficientes."""
+        if self.ql_surface is None or not item_name or ql is None:
+            return None
+        cell = self.ql_surface.lookup(item_name, ql)
+        if cell is None or cell['count'] < min_count:
+            return None
+        return cell
+
+    def evaluate_trade(self, item_name, price_copper, quantity=1, ql=None):
         ref_price = self.get_reference_price(item_name)
+        source = 'base'
+        cell = self.get_ql_reference(item_name, ql)
+        if cell is not None:
+            # Com QL informado, a mediana da faixa vence o preço base do CSV
+            ref_price = cell['median']
+            source = 'ql_surface'
         if ref_price is None or quantity <= 0 or price_copper is None:
             return {'rating': 'UNKNOWN', 'delta_percent': 0.0}
         
@@ -48,9 +68,14 @@ class PriceManager:
         if delta <= -10: rating = 'GOOD'
         elif delta >= 10: rating = 'BAD'
         
-        return {
+        result = {
             'reference_unit_price': ref_price,
             'trade_unit_price': trade_unit_price,
             'delta_percent': delta,
-            'rating': rating
+            'rating': rating,
+            'reference_source': source
         }
+        if cell is not None:
+            result['ql_band'] = cell['ql_band']
+            result['ql_spread'] = cell['spread']
+        return result
@@ -0,0 +1,224 @@
+"""
+QL Price Surface
+================
+
+Superfície de preço por item: faixas de QL x períodos de tempo.
+
+No Wurm o preço depende muito da qualidade (main_ql), mas as estatísticas
+gerais misturam todas as qualidades. Os preços são por unidade (o engine
+passa price_s / main_qty), como as referências do PriceManager. Aqui os trades são classificados por
+faixa de QL com um único ``pd.cut`` e agregados após uma única ordenação
+por (item, faixa, período, preço): contagem, mediana e spread interquartil
+saem por posição, sem groupby de quantis. O resultado fica indexado por (item, faixa), de modo que
+consultar "preço típico do item X com QL 72" é O(1).
+"""
+
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from market_series import floor_periods, normalize_freq
+
+# Faixas de QL padrão: (0, 10], (10, 20], ..., (90, 100]
+DEFAULT_QL_BINS = (0, 10, 20, 30, 40, 50, 60, 70, 80, 90, 100)
+
+# NaT como int64: a célula "todas as datas" ordena antes de qualquer período
+_ALL_PERIODS = np.iinfo(np.int64).min
+
+
+class QLPriceSurface:
+    """
+    Contagem, mediana e spread (p75 - p25) de preço por (item, faixa de QL, período).
+
+    Também guarda a célula sem período (todas as datas) de cada faixa. Nomes de
+    item são normalizados em minúsculas, como no PriceManager.
+    """
+
+    def __init__(self, ql_bins: Sequence[float] = DEFAULT_QL_BINS, freq: str = 'M') -> None:
+        if len(ql_bins) < 2:
+            raise ValueError("ql_bins precisa de pelo menos dois limites")
+        self.ql_bins = np.asarray(ql_bins, dtype=float)
+        self.freq = normalize_freq(freq)
+        self.labels = [f"{ql_bins[i]:g}-{ql_bins[i + 1]:g}" for i in range(len(ql_bins) - 1)]
+        self._cells: Dict[Tuple[str, int], Tuple[int, int]] = {}
+        self._period = np.empty(0, dtype=np.int64)
+        self._values = np.empty((0, 3))
+        self._table = self._empty_table()
+
+    def clear(self) -> None:
+        """Esvazia a superfície no lugar (quem guarda referência a ela, como o PriceManager, continua válido)."""
+        self._table = self._empty_table()
+        self._reindex()
+
+    @staticmethod
+    def normalize_name(name: str) -> str:
+        return str(name).strip().lower()
+
+    @staticmethod
+    def _empty_table() -> pd.DataFrame:
+        index = pd.MultiIndex.from_arrays([[], [], []], names=['item', 'band', 'period'])
+        return pd.DataFrame({'count': [], 'median': [], 'spread': []}, index=index)
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def band_of(self, ql: float) -> Optional[int]:
+        """Índice da faixa de um QL (None se fora dos limites)."""
+        if ql is None or not np.isfinite(ql) or ql < self.ql_bins[0] or ql > self.ql_bins[-1]:
+            return None
+        return int(min(max(np.searchsorted(self.ql_bins, ql, side='left') - 1, 0),
+                       len(self.labels) - 1))
+
+    def _aggregate(self, items: pd.Series, ql: np.ndarray, timestamps: np.ndarray,
+                   prices: np.ndarray) -> pd.DataFrame:
+        prices = np.asarray(prices, dtype=float)
+        timestamps = np.asarray(timestamps, dtype='datetime64[ns]')
+        bands = pd.cut(np.asarray(ql, dtype=float), self.ql_bins, labels=False,
+                       include_lowest=True)
+        codes, uniques = pd.factorize(pd.Series(items, copy=False))
+        periods = floor_periods(timestamps, self.freq)
+
+        valid = (codes >= 0) & np.isfinite(bands) & np.isfinite(prices) & (prices > 0)
+        valid &= ~np.isnat(periods)
+        if not valid.any():
+            return self._empty_table()
+
+        # Normaliza só os nomes distintos; nomes que colidem viram um só código
+        names, name_codes = np.unique(np.array([self.normalize_name(u) for u in uniques],
+                                               dtype=object), return_inverse=True)
+        item = name_codes[codes[valid]].astype(np.int64)
+        band = bands[valid].astype(np.int64)
+        period_values, period = np.unique(periods[valid], return_inverse=True)
+        prices = prices[valid]
+
+        n_bands, n_periods = len(self.labels), len(period_values)
+        cell = item * n_bands + band
+        by_price = np.argsort(prices, kind='stable')
+        parts = [self._summarize(cell * n_periods + period, prices, by_price, n_periods, period_values),
+                 self._summarize(cell, prices, by_price, 1, None)]
+        table = pd.concat(parts)
+        table.index = pd.MultiIndex.from_arrays(
+            [names[table.index.get_level_values(0) // n_bands],
+             table.index.get_level_values(0) % n_bands,
+             table.index.get_level_values(1)], names=['item', 'band', 'period'])
+        return table
+
+    @staticmethod
+    def _summarize(keys: np.ndarray, prices: np.ndarray, by_price: np.ndarray,
+                   n_periods: int, period_values: Optional[np.ndarray]) -> pd.DataFrame:
+        """Contagem, mediana e p75 - p25 por chave (preços já ordenados em by_price)."""
+        # Ordenação estável por chave sobre a ordem de preço = (chave, preço)
+        order = by_price[np.argsort(keys[by_price], kind='stable')]
+        keys, prices = keys[order], prices[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        counts = np.diff(np.r_[starts, len(keys)])
+
+        def quantile(q: float) -> np.ndarray:
+            # Interpolação linear, como pandas/NumPy
+            pos = starts + q * (counts - 1)
+            lo = np.floor(pos).astype(np.int64)
+            hi = np.minimum(lo + 1, starts + counts - 1)
+            return prices[lo] + (pos - lo) * (prices[hi] - prices[lo])
+
+        group = keys[starts]
+        if period_values is None:
+            period = np.full(len(group), np.datetime64('NaT'), dtype='datetime64[ns]')
+        else:
+            period = period_values[group % n_periods]
+        index = pd.MultiIndex.from_arrays([group // n_periods, period])
+        return pd.DataFrame({'count': counts, 'median': quantile(0.5),
+                             'spread': quantile(0.75) - quantile(0.25)}, index=index)
+
+    def _reindex(self) -> None:
+        """
+        Arrays de consulta: linhas ordenadas por (item, faixa, período), com a
+        célula sem período primeiro, e um dicionário (item, faixa) -> linhas.
+        """
+        table = self._table
+        item_codes, item_names = pd.factorize(table.index.get_level_values('item'))
+        band = table.index.get_level_values('band').to_numpy(dtype=np.int64)
+        period = table.index.get_level_values('period').to_numpy(dtype='datetime64[ns]').view(np.int64)
+        order = np.lexsort((period, band, item_codes))
+
+        self._period = period[order]
+        self._values = table[['count', 'median', 'spread']].to_numpy(dtype=float)[order]
+        cell = item_codes[order].astype(np.int64) * len(self.labels) + band[order]
+        starts = np.flatnonzero(np.r_[True, cell[1:] != cell[:-1]]) if len(cell) \
+            else np.empty(0, dtype=np.int64)
+        stops = np.r_[starts[1:], len(cell)]
+        names = np.asarray(item_names, dtype=object)[item_codes[order][starts]]
+        self._cells = dict(zip(zip(names, band[order][starts].tolist()),
+                               zip(starts.tolist(), stops.tolist())))
+
+    def build(self, items: pd.Series, ql: np.ndarray, timestamps: np.ndarray,
+              prices: np.ndarray) -> None:
+        """Constrói a superfície a partir de todos os trades."""
+        self._table = self._aggregate(items, ql, timestamps, prices)
+        self._reindex()
+
+    def update(self, items: pd.Series, ql: np.ndarray, timestamps: np.ndarray,
+               prices: np.ndarray) -> None:
+        """
+        Recalcula os itens presentes no lote.
+
+        Medianas não são mescláveis, então o lote deve conter TODOS os trades
+        dos itens afetados (não só os novos); os demais itens ficam intactos.
+        """
+        fresh = self._aggregate(items, ql, timestamps, prices)
+        touched = {self.normalize_name(i) for i in pd.Series(items, copy=False).dropna().unique()}
+        if not touched:
+            return
+        keep = ~self._table.index.get_level_values('item').isin(list(touched))
+        self._table = pd.concat([self._table[keep], fresh])
+        self._reindex()
+
+    def lookup(self, item_name: str, ql: float, when: Optional[Any] = None) -> Optional[Dict[str, Any]]:
+        """
+        Célula da superfície para um item e QL (O(1)).
+
+        Args:
+            item_name: Nome exato do item (case-insensitive)
+            ql: Qualidade do item
+            when: Data de referência; None usa todas as datas
+
+        Returns:
+            Dicionário com count, median, spread e ql_band, ou None sem dados.
+        """
+        band = self.band_of(ql)
+        if band is None:
+            return None
+        rows = self._cells.get((self.normalize_name(item_name), band))
+        if rows is None:
+            return None
+        lo, hi = rows
+        period = _ALL_PERIODS
+        if when is not None:
+            period = floor_periods(np.array([pd.Timestamp(when).to_datetime64()]),
+                                   self.freq)[0].astype(np.int64)
+        # Poucos períodos por célula: busca binária no trecho da célula
+        pos = lo + int(np.searchsorted(self._period[lo:hi], period))
+        if pos >= hi or self._period[pos] != period:
+            return None
+        count, median, spread = self._values[pos]
+        return {'count': int(count), 'median': float(median), 'spread': float(spread),
+                'ql_band': self.labels[band]}
+
+    def table(self) -> pd.DataFrame:
+        """Todas as células, indexadas por (item, band, period)."""
+        return self._table
+
+    def surface(self, item_name: str, value: str = 'median') -> pd.DataFrame:
+        """Matriz faixa de QL x período de um item (coluna 'value' da tabela)."""
+        name = self.normalize_name(item_name)
+        if value not in self._table.columns:
+            raise ValueError(f"Valor inválido: {value}. Use count, median ou spread.")
+        items = self._table.index.get_level_values('item')
+        if name not in items:
+            return pd.DataFrame()
+        part = self._table.xs(name, level='item').sort_index()
+        part = part[part.index.get_level_values('period').notna()]
+        matrix = part[value].unstack('period')
+        matrix.index = [self.labels[int(b)] for b in matrix.index]
+        matrix.index.name = 'ql_band'
+        return matrix
@@ -0,0 +1,212 @@
+"""
+Quantile Sketches
+=================
+
+Sketches de quantis mescláveis para consultas rápidas de mediana e percentis.
+
+Usa o DDSketch (erro relativo garantido): cada preço cai num bucket
+logarítmico ``ceil(log_gamma(x))``. Mesclar dois sketches é somar contagens
+por bucket, então sketches por item-dia podem ser combinados para qualquer
+intervalo de datas sem tocar nas linhas originais.
+"""
+
+import math
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+class DDSketch:
+    """
+    Sketch de quantis com erro relativo limitado.
+
+    Para ``relative_accuracy=0.01`` qualquer quantil retornado está a no
+    máximo 1% do valor exato. Apenas valores positivos são registrados.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01) -> None:
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy deve estar entre 0 e 1")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.keys = np.empty(0, dtype=np.int64)
+        self.counts = np.empty(0, dtype=np.int64)
+
+    @property
+    def count(self) -> int:
+        return int(self.counts.sum())
+
+    def key_for(self, values: np.ndarray) -> np.ndarray:
+        """Bucket logarítmico de cada valor (valores devem ser > 0)."""
+        return np.ceil(np.log(values) / self._log_gamma).astype(np.int64)
+
+    def value_for(self, keys: np.ndarray) -> np.ndarray:
+        """Valor representativo de cada bucket (ponto médio relativo)."""
+        return 2.0 * np.power(self.gamma, keys) / (self.gamma + 1.0)
+
+    def add(self, values: Iterable[float]) -> None:
+        """Adiciona valores ao sketch (não positivos e NaN são ignorados)."""
+        values = np.asarray(values, dtype=float)
+        values = values[np.isfinite(values) & (values > 0)]
+        if values.size == 0:
+            return
+        keys, counts = np.unique(self.key_for(values), return_counts=True)
+        self._merge_counts(keys, counts)
+
+    def merge(self, other: "DDSketch") -> None:
+        """Mescla outro sketch com a mesma precisão."""
+        if other.gamma != self.gamma:
+            raise ValueError("Sketches com precisões diferentes não podem ser mesclados")
+        self._merge_counts(other.keys, other.counts)
+
+    def _merge_counts(self, keys: np.ndarray, counts: np.ndarray) -> None:
+        all_keys = np.concatenate([self.keys, keys])
+        all_counts = np.concatenate([self.counts, counts])
+        self.keys, inverse = np.unique(all_keys, return_inverse=True)
+        self.counts = np.bincount(inverse, weights=all_counts).astype(np.int64)
+
+    @classmethod
+    def from_counts(cls, keys: np.ndarray, counts: np.ndarray,
+                    relative_accuracy: float = 0.01) -> "DDSketch":
+        """Cria um sketch a partir de buckets já agregados."""
+        sketch = cls(relative_accuracy)
+        if len(keys):
+            sketch._merge_counts(np.asarray(keys, dtype=np.int64),
+                                 np.asarray(counts, dtype=np.int64))
+        return sketch
+
+    def quantiles(self, qs: Sequence[float]) -> List[Optional[float]]:
+        """Retorna os quantis pedidos (None se o sketch estiver vazio)."""
+        total = self.count
+        if total == 0:
+            return [None for _ in qs]
+        cumulative = np.cumsum(self.counts)
+        ranks = np.clip(np.asarray(qs, dtype=float), 0.0, 1.0) * (total - 1)
+        idx = np.searchsorted(cumulative, ranks, side='right')
+        idx = np.minimum(idx, len(self.keys) - 1)
+        return [float(v) for v in self.value_for(self.keys[idx])]
+
+    def quantile(self, q: float) -> Optional[float]:
+        return self.quantiles([q])[0]
+
+
+class ItemQuantileIndex:
+    """
+    Sketches de preço por item e por item-dia.
+
+    Os buckets ficam em arrays ordenados por (item, dia, bucket). Consultar um
+    intervalo de datas é localizar o item (O(1)), fatiar os dias com
+    ``searchsorted`` e somar as contagens por bucket: o custo depende do número
+    de células não vazias no intervalo, não do número de trades. Consultas sem
+    intervalo usam o sketch total do item, pré-mesclado.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01) -> None:
+        self.relative_accuracy = relative_accuracy
+        self._proto = DDSketch(relative_accuracy)
+        self._codes: Dict[str, int] = {}
+        self._item = np.empty(0, dtype=np.int64)
+        self._day = np.empty(0, dtype=np.int64)
+        self._key = np.empty(0, dtype=np.int64)
+        self._count = np.empty(0, dtype=np.int64)
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._totals: Dict[int, DDSketch] = {}
+
+    @staticmethod
+    def normalize_name(name: str) -> str:
+        return str(name).strip().lower()
+
+    @property
+    def items(self) -> List[str]:
+        return list(self._codes)
+
+    def update(self, items: Sequence, days: np.ndarray, prices: np.ndarray) -> None:
+        """
+        Incorpora um lote de trades (nome do item, dia em epoch-days, preço).
+
+        Preços não positivos, itens nulos e dias inválidos são ignorados.
+        """
+        items = pd.Series(items, copy=False)
+        prices = np.asarray(prices, dtype=float)
+        days = np.asarray(days, dtype=np.int64)
+        valid = items.notna().to_numpy() & np.isfinite(prices) & (prices > 0)
+        valid &= days != np.iinfo(np.int64).min
+        if not valid.any():
+            return
+
+        # Normaliza apenas os nomes distintos, não cada linha
+        local_codes, uniques = pd.factorize(items[valid])
+        mapping = np.empty(len(uniques), dtype=np.int64)
+        for i, name in enumerate(uniques):
+            mapping[i] = self._codes.setdefault(self.normalize_name(name), len(self._codes))
+
+        cells = pd.DataFrame({
+            'item': mapping[local_codes],
+            'day': days[valid],
+            'key': self._proto.key_for(prices[valid]),
+        }).groupby(['item', 'day', 'key'], sort=False).size()
+
+        new_item = cells.index.get_level_values('item').to_numpy(dtype=np.int64)
+        new_key = cells.index.get_level_values('key').to_numpy(dtype=np.int64)
+        new_count = cells.to_numpy(dtype=np.int64)
+
+        # Sketch total por item: agrega (item, bucket) e fatia por item
+        per_key = cells.groupby(level=['item', 'key']).sum().sort_index()
+        key_item = per_key.index.get_level_values('item').to_numpy(dtype=np.int64)
+        key_vals = per_key.index.get_level_values('key').to_numpy(dtype=np.int64)
+        key_counts = per_key.to_numpy(dtype=np.int64)
+        codes, starts = np.unique(key_item, return_index=True)
+        for code, lo, hi in zip(codes, starts, np.append(starts[1:], len(key_item))):
+            total = self._totals.setdefault(int(code), DDSketch(self.relative_accuracy))
+            total._merge_counts(key_vals[lo:hi], key_counts[lo:hi])
+
+        self._merge_cells(new_item,
+                          cells.index.get_level_values('day').to_numpy(dtype=np.int64),
+                          new_key, new_count)
+
+    def _merge_cells(self, item, day, key, count) -> None:
+        item = np.concatenate([self._item, item])
+        day = np.concatenate([self._day, day])
+        key = np.concatenate([self._key, key])
+        count = np.concatenate([self._count, count])
+
+        order = np.lexsort((key, day, item))
+        item, day, key, count = item[order], day[order], key[order], count[order]
+
+        # Soma células duplicadas (mesmo item, dia e bucket)
+        boundary = np.ones(len(item), dtype=bool)
+        boundary[1:] = (item[1:] != item[:-1]) | (day[1:] != day[:-1]) | (key[1:] != key[:-1])
+        starts = np.flatnonzero(boundary)
+        self._item, self._day, self._key = item[starts], day[starts], key[starts]
+        self._count = np.add.reduceat(count, starts) if len(starts) else count
+
+        self._offsets = np.searchsorted(self._item, np.arange(len(self._codes) + 1))
+
+    def sketch(self, item_name: str, start_day: Optional[int] = None,
+               end_day: Optional[int] = None) -> Optional[DDSketch]:
+        """Sketch mesclado do item no intervalo [start_day, end_day]."""
+        code = self._codes.get(self.normalize_name(item_name))
+        if code is None:
+            return None
+        if start_day is None and end_day is None:
+            return self._totals.get(code)
+
+        lo, hi = self._offsets[code], self._offsets[code + 1]
+        days = self._day[lo:hi]
+        if start_day is not None:
+            lo += np.searchsorted(days, start_day, side='left')
+        if end_day is not None:
+            hi = self._offsets[code] + np.searchsorted(days, end_day, side='right')
+        return DDSketch.from_counts(self._key[lo:hi], self._count[lo:hi],
+                                    self.relative_accuracy)
+
+    def quantiles(self, item_name: str, qs: Sequence[float],
+                  start_day: Optional[int] = None,
+                  end_day: Optional[int] = None) -> Dict[float, Optional[float]]:
+        """Quantis de preço do item no intervalo (None se sem dados)."""
+        sketch = self.sketch(item_name, start_day, end_day)
+        if sketch is None:
+            return {q: None for q in qs}
+        return dict(zip(qs, sketch.quantiles(qs)))
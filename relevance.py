@@ -0,0 +1,184 @@
+"""
+Relevance
+=========
+
+Score de relevância determinístico por item e por trade (aba Insights).
+
+Quatro componentes em [0, 1], combinados por média ponderada (0-100):
+
+- recência: 0.5 ** (idade / meia-vida), com a idade medida até o trade
+  mais recente do conjunto (o mesmo dado dá sempre o mesmo score);
+- volume: log(1 + trades) / log(1 + trades do item mais negociado);
+- desvio: |log(preço / referência)| / log(2), limitado a 1 (o dobro ou a
+  metade da referência já é desvio máximo). A referência é o preço base do
+  PriceManager; sem ele, a mediana de mercado do próprio item;
+- spread: |log(mediana WTS / mediana WTB)| / log(2), limitado a 1.
+
+Tudo sai de uma passada sobre a tabela agregada por (item, operação)
+(market_summary do wurm_stats_engine, em preço por unidade, a mesma
+unidade dos preços base), sem voltar aos trades. O top-K usa
+``np.argpartition`` (O(n)) e só ordena os K escolhidos.
+
+Exemplo:
+    table = item_relevance(market_summary(engine.cleaned_df, per_unit=True), price_manager.prices)
+    table.iloc[top_k(table['score'].to_numpy(), 20)]
+"""
+
+from typing import Dict, Mapping, Optional
+
+import numpy as np
+import pandas as pd
+
+# Peso de cada componente no score
+RELEVANCE_WEIGHTS = {'recency': 1.0, 'volume': 1.0, 'deviation': 1.5, 'spread': 0.5}
+
+# Meia-vida da recência, em dias
+HALF_LIFE_DAYS = 7.0
+
+RELEVANCE_COLUMNS = ['recency', 'volume', 'deviation', 'spread', 'price', 'reference',
+                     'reference_source', 'count', 'last_seen', 'score']
+
+_LOG2 = np.log(2.0)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Posições dos ``k`` maiores scores, do maior ao menor (NaN fica de fora)."""
+    scores = np.asarray(scores, dtype=float)
+    valid = np.flatnonzero(np.isfinite(scores))
+    k = min(k, len(valid))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    if k < len(valid):
+        valid = valid[np.argpartition(-scores[valid], k - 1)[:k]]
+    return valid[np.argsort(-scores[valid], kind='stable')]
+
+
+def _combine(components: Dict[str, np.ndarray], weights: Mapping[str, float]) -> np.ndarray:
+    total = sum(weights.values())
+    return 100 * sum(weights[name] * values for name, values in components.items()) / total
+
+
+def _deviation(prices: np.ndarray, reference: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid='ignore', divide='ignore'):
+        deviation = np.abs(np.log(prices / reference)) / _LOG2
+    return np.nan_to_num(np.minimum(deviation, 1.0))
+
+
+def item_relevance(summary: pd.DataFrame, reference_prices: Optional[Mapping[str, float]] = None,
+                   now: Optional[pd.Timestamp] = None, weights: Optional[Mapping[str, float]] = None,
+                   half_life_days: float = HALF_LIFE_DAYS) -> pd.DataFrame:
+    """
+    Relevância por item a partir do resumo de mercado.
+
+    Args:
+        summary: market_summary por unidade (per_unit=True; índice (main_item, operation),
+            colunas de MARKET_SUMMARY_COLUMNS)
+        reference_prices: Preço base por item em copper (chaves em minúsculas, como
+            PriceManager.prices)
+        now: Instante de referência da recência (padrão: último trade do resumo)
+        weights: Pesos dos componentes (padrão: RELEVANCE_WEIGHTS)
+        half_life_days: Meia-vida da recência
+
+    Returns:
+        DataFrame indexado por item com RELEVANCE_COLUMNS (score 0-100).
+    """
+    weights = {**RELEVANCE_WEIGHTS, **(weights or {})}
+    if summary is None or summary.empty:
+        return pd.DataFrame(columns=RELEVANCE_COLUMNS, index=pd.Index([], name='main_item'))
+
+    frame = summary.reset_index()
+    codes, items = pd.factorize(frame['main_item'])
+    n = len(items)
+    counts = frame['count'].to_numpy(dtype=float)
+    seen = frame['last_seen'].to_numpy(dtype='datetime64[ns]')
+    operation = frame['operation'].to_numpy(dtype=object)
+
+    # Agregados por item direto das linhas (item, operação)
+    count = np.bincount(codes, weights=counts, minlength=n)
+    seen_ns = np.where(np.isnat(seen), np.iinfo(np.int64).min, seen.astype(np.int64))
+    last_seen = np.full(n, np.iinfo(np.int64).min)
+    np.maximum.at(last_seen, codes, seen_ns)
+    wts = np.full(n, np.nan)
+    wtb = np.full(n, np.nan)
+    is_wts, is_wtb = operation == 'WTS', operation == 'WTB'
+    wts[codes[is_wts]] = frame['median_price'].to_numpy(dtype=float)[is_wts]
+    wtb[codes[is_wtb]] = frame['median_price'].to_numpy(dtype=float)[is_wtb]
+    # Mediana ponderada pelo volume quando não há WTS (ex.: só WTB, ou sem operação)
+    weighted = np.bincount(codes, weights=counts * frame['median_price'].to_numpy(dtype=float), minlength=n) / count
+    price = np.where(np.isfinite(wts), wts, weighted)
+
+    # Recência
+    has_seen = last_seen != np.iinfo(np.int64).min
+    if now is None:
+        now_ns = last_seen[has_seen].max() if has_seen.any() else 0
+    else:
+        now_ns = pd.Timestamp(now).value
+    age_days = (now_ns - last_seen) / 86_400e9
+    recency = np.where(has_seen, 0.5 ** (np.maximum(age_days, 0) / half_life_days), 0.0)
+
+    # Volume, desvio e spread
+    volume = np.log1p(count) / np.log1p(count.max())
+    names = pd.Index(items).astype(str)
+    reference = np.full(n, np.nan)
+    if reference_prices:
+        reference = names.str.lower().str.strip().map(lambda name: reference_prices.get(name, np.nan)) \
+            .to_numpy(dtype=float)
+    has_reference = np.isfinite(reference) & (reference > 0)
+    last_price = np.full(n, np.nan)
+    # Operação mais recente de cada item: primeira ocorrência na ordem decrescente de last_seen
+    newest_first = np.argsort(seen_ns, kind='stable')[::-1]
+    _, pick = np.unique(codes[newest_first], return_index=True)
+    rows = newest_first[pick]
+    last_price[codes[rows]] = frame['last_price'].to_numpy(dtype=float)[rows]
+    deviation = np.where(has_reference, _deviation(price, reference), _deviation(last_price, price))
+    spread = _deviation(wts, wtb)
+
+    components = {'recency': recency, 'volume': volume, 'deviation': deviation, 'spread': spread}
+    return pd.DataFrame({
+        **components,
+        'price': price,
+        'reference': np.where(has_reference, reference, price),
+        'reference_source': np.where(has_reference, 'base', 'mercado'),
+        'count': count.astype(np.int64),
+        'last_seen': pd.to_datetime(np.where(has_seen, last_seen, np.iinfo(np.int64).min)),
+        'score': _combine(components, weights),
+    }, index=pd.Index(items, name='main_item'), columns=RELEVANCE_COLUMNS)
+
+
+def trade_relevance(items: pd.Series, prices: np.ndarray, table: pd.DataFrame,
+                    timestamps: Optional[np.ndarray] = None, weights: Optional[Mapping[str, float]] = None,
+                    half_life_days: float = HALF_LIFE_DAYS) -> np.ndarray:
+    """
+    Relevância de cada trade: volume e spread do item, desvio do preço do
+    trade contra a referência do item e recência do trade (ou do item, sem
+    timestamps). Itens fora da tabela ficam com score NaN.
+
+    Args:
+        items: Item de cada trade
+        prices: Preço por unidade (copper) de cada trade
+        table: Saída de item_relevance
+        timestamps: datetime64 de cada trade (opcional)
+
+    Returns:
+        Score 0-100 por trade.
+    """
+    weights = {**RELEVANCE_WEIGHTS, **(weights or {})}
+    rows = table.index.get_indexer(pd.Series(items, copy=False))
+    known = rows >= 0
+    rows = np.where(known, rows, 0)
+    pick = lambda column: table[column].to_numpy(dtype=float)[rows] if len(table) else np.zeros(len(rows))
+
+    if timestamps is not None and len(table):
+        when = np.asarray(timestamps, dtype='datetime64[ns]')
+        now_ns = table['last_seen'].max().value
+        age_days = (now_ns - when.astype(np.int64)) / 86_400e9
+        recency = np.where(np.isnat(when), 0.0, 0.5 ** (np.maximum(age_days, 0) / half_life_days))
+    else:
+        recency = pick('recency')
+    components = {
+        'recency': recency,
+        'volume': pick('volume'),
+        'deviation': _deviation(np.asarray(prices, dtype=float), pick('reference')),
+        'spread': pick('spread'),
+    }
+    return np.where(known, _combine(components, weights), np.nan)
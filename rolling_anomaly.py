@@ -0,0 +1,284 @@
+"""
+Rolling Anomaly Detector
+========================
+
+Detector robusto de anomalias de preço por item, em streaming.
+
+O z-score global (média/desvio de todo o histórico) é dominado pelos
+próprios outliers e ignora a deriva de preço ao longo do tempo. Aqui cada
+item mantém uma janela com os agregados diários (mediana e MAD do dia) dos
+últimos ``window_days`` dias, e cada trade novo é comparado com ela:
+
+    centro = mediana das medianas diárias
+    escala = hypot(MAD das medianas diárias, mediana dos MADs diários)
+    z robusto = 0.6745 * (preço - centro) / escala
+
+A escala soma a variação entre dias (deriva) com a dispersão dentro do dia
+(um trade isolado varia mais que a mediana do seu dia). |z| > 3.5 é o
+corte usual (Iglewicz & Hoaglin).
+
+As janelas são listas ordenadas mantidas com ``bisect`` (inserção/remoção
+sem reordenar); a mediana sai da posição central e o MAD de uma caminhada
+pelos dois lados da mediana, já que os desvios de cada lado estão em ordem.
+
+Os trades de um lote são agrupados por (item, dia): mediana e MAD de cada
+grupo são calculados em pandas/NumPy, o laço em Python roda uma vez por
+grupo (não por trade) e o score de todos os trades sai de uma operação
+vetorizada. O dia corrente de cada item fica "aberto" (só entra na janela
+quando chega um trade de um dia posterior), então lotes que continuam o
+mesmo dia são tratados corretamente.
+"""
+
+import bisect
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from engine_backends import trade_timestamps
+
+# Constante que torna o MAD comparável ao desvio padrão numa normal
+MAD_SCALE = 0.6745
+
+# Trades mínimos num dia para o MAD do dia entrar na escala (com poucos
+# trades o MAD subestima a dispersão: com 3, é o menor dos dois desvios)
+MIN_DAY_TRADES = 5
+
+FLAG_COLUMNS = ['main_item', 'when', 'price_s', 'median_price', 'mad', 'robust_z']
+
+
+def _median(ordered: list) -> float:
+    n = len(ordered)
+    mid = n // 2
+    return ordered[mid] if n % 2 else (ordered[mid - 1] + ordered[mid]) / 2
+
+
+def _median_mad(ordered: list) -> Tuple[float, float, int]:
+    """Mediana e MAD de uma lista já ordenada, sem ordenar de novo."""
+    n = len(ordered)
+    if n == 0:
+        return np.nan, np.nan, 0
+    mid = n // 2
+    median = _median(ordered)
+
+    # Desvios à esquerda e à direita da mediana já estão em ordem crescente:
+    # intercala os dois lados até a posição central
+    if n % 2:
+        left, right, last, prev = mid - 1, mid + 1, 0.0, 0.0
+        steps = mid
+    else:
+        left, right, last, prev = mid - 1, mid, 0.0, 0.0
+        steps = mid + 1
+    for _ in range(steps):
+        prev = last
+        if right >= n or (left >= 0 and median - ordered[left] <= ordered[right] - median):
+            last = median - ordered[left]
+            left -= 1
+        else:
+            last = ordered[right] - median
+            right += 1
+    mad = last if n % 2 else (prev + last) / 2
+    return float(median), float(mad), n
+
+
+def _day_stats(prices: np.ndarray) -> Tuple[float, float]:
+    """Mediana e MAD de um dia (MAD = NaN com poucos trades)."""
+    median = float(np.median(prices))
+    if len(prices) < MIN_DAY_TRADES:
+        return median, np.nan
+    return median, float(np.median(np.abs(prices - median)))
+
+
+class _ItemWindow:
+    """Agregados diários (mediana e MAD do dia) de um item nos últimos dias."""
+
+    __slots__ = ('days', 'medians', 'spreads', 'ordered_medians', 'ordered_spreads',
+                 'open_day', 'open_prices', 'open_stats', '_baseline')
+
+    def __init__(self) -> None:
+        self.days: Deque[int] = deque()
+        self.medians: Deque[float] = deque()
+        self.spreads: Deque[float] = deque()
+        self.ordered_medians: list = []
+        self.ordered_spreads: list = []
+        self.open_day: Optional[int] = None
+        self.open_prices: Optional[np.ndarray] = None
+        self.open_stats: Tuple[float, float] = (np.nan, np.nan)
+        self._baseline: Optional[Tuple[float, float, int]] = None
+
+    def open(self, day: int, prices: np.ndarray, stats: Tuple[float, float], window_days: int) -> None:
+        """Abre um dia novo, fechando (e pondo na janela) o dia aberto anterior."""
+        if self.open_day is not None:
+            self.push(self.open_day, *self.open_stats, window_days)
+        self.open_day, self.open_prices, self.open_stats = day, prices, stats
+
+    def push(self, day: int, median: float, spread: float, window_days: int) -> None:
+        """Põe um dia fechado na janela e descarta os dias fora dela."""
+        self.days.append(day)
+        self.medians.append(median)
+        self.spreads.append(spread)
+        bisect.insort(self.ordered_medians, median)
+        if spread == spread:  # NaN (dia com poucos trades) não entra
+            bisect.insort(self.ordered_spreads, spread)
+        while self.days[0] <= day - window_days:
+            self.days.popleft()
+            old = self.medians.popleft()
+            del self.ordered_medians[bisect.bisect_left(self.ordered_medians, old)]
+            old = self.spreads.popleft()
+            if old == old:
+                del self.ordered_spreads[bisect.bisect_left(self.ordered_spreads, old)]
+        self._baseline = None
+
+    def baseline(self) -> Tuple[float, float, int]:
+        """(centro, escala, dias na janela); em cache até o próximo push."""
+        if self._baseline is None:
+            center, between, n_days = _median_mad(self.ordered_medians)
+            within = _median(self.ordered_spreads) if self.ordered_spreads else 0.0
+            self._baseline = (center, float(np.hypot(between, within)), n_days)
+        return self._baseline
+
+
+class RollingAnomalyDetector:
+    """
+    Mediana/MAD móveis por item sobre agregados diários, em streaming.
+
+    Args:
+        window_days: Dias de agregados diários na janela de cada item
+        threshold: |z robusto| mínimo para marcar um trade
+        min_days: Dias mínimos na janela antes de marcar trades do item
+        keep_flags: Quantos trades marcados guardar para recent_flags()
+    """
+
+    def __init__(self, window_days: int = 14, threshold: float = 3.5,
+                 min_days: int = 5, keep_flags: int = 1000) -> None:
+        self.window_days = window_days
+        self.threshold = threshold
+        self.min_days = min_days
+        self.keep_flags = keep_flags
+        self.windows: Dict[str, _ItemWindow] = {}
+        self.last_timestamp: Optional[pd.Timestamp] = None
+        self._flags = pd.DataFrame(columns=FLAG_COLUMNS)
+
+    def __len__(self) -> int:
+        return len(self.windows)
+
+    def update(self, items: pd.Series, timestamps: np.ndarray, prices: np.ndarray) -> pd.DataFrame:
+        """
+        Processa um lote de trades: pontua cada um contra a janela do item
+        (dias anteriores) e incorpora os agregados diários.
+
+        Args:
+            items: Nome do item por trade
+            timestamps: datetime64 por trade
+            prices: Preço por trade (<= 0 ou NaN são ignorados)
+
+        Returns:
+            Trades marcados (colunas FLAG_COLUMNS), em ordem de tempo.
+        """
+        items = pd.Series(items, copy=False)
+        timestamps = np.asarray(timestamps, dtype='datetime64[ns]')
+        prices = np.asarray(prices, dtype=float)
+        valid = np.isfinite(prices) & (prices > 0) & ~np.isnat(timestamps) & items.notna().to_numpy()
+        if not valid.any():
+            return pd.DataFrame(columns=FLAG_COLUMNS)
+
+        codes, uniques = pd.factorize(items[valid])
+        when = timestamps[valid]
+        prices = prices[valid]
+        days = when.astype('datetime64[D]').astype(np.int64)
+
+        # Grupos (item, dia) em ordem de tempo dentro de cada item
+        order = np.lexsort((when, days, codes))
+        codes, days, when, prices = codes[order], days[order], when[order], prices[order]
+        starts = np.flatnonzero(np.r_[True, (codes[1:] != codes[:-1]) | (days[1:] != days[:-1])])
+        ends = np.r_[starts[1:], len(codes)]
+        group_of = np.repeat(np.arange(len(starts)), ends - starts)
+
+        # Mediana e MAD de cada (item, dia), vetorizados
+        day_median = pd.Series(prices).groupby(group_of).median().to_numpy()
+        day_mad = pd.Series(np.abs(prices - day_median[group_of])).groupby(group_of).median().to_numpy(copy=True)
+        day_mad[(ends - starts) < MIN_DAY_TRADES] = np.nan
+
+        centers = np.full(len(starts), np.nan)
+        scales = np.full(len(starts), np.nan)
+        names = np.asarray(uniques, dtype=object)
+        windows, window_days, min_days = self.windows, self.window_days, self.min_days
+        for g, (code, day) in enumerate(zip(codes[starts].tolist(), days[starts].tolist())):
+            name = names[code]
+            window = windows.get(name)
+            if window is None:
+                window = windows[name] = _ItemWindow()
+            if window.open_day is None or day > window.open_day:
+                window.open(day, prices[starts[g]:ends[g]], (day_median[g], day_mad[g]), window_days)
+            elif day == window.open_day:
+                # Lote continua o dia aberto: recalcula o agregado do dia inteiro
+                window.open_prices = np.concatenate([window.open_prices, prices[starts[g]:ends[g]]])
+                window.open_stats = _day_stats(window.open_prices)
+            # Dia anterior ao aberto (trade atrasado): só é pontuado
+
+            center, scale, n_days = window.baseline()
+            if n_days >= min_days:
+                centers[g], scales[g] = center, scale
+
+        center_rows, scale_rows = centers[group_of], scales[group_of]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            robust_z = MAD_SCALE * (prices - center_rows) / scale_rows
+        hit = np.flatnonzero(np.isfinite(robust_z) & (np.abs(robust_z) > self.threshold))
+        hit = hit[np.argsort(when[hit], kind='stable')]
+
+        latest = pd.Timestamp(when.max())
+        if self.last_timestamp is None or latest > self.last_timestamp:
+            self.last_timestamp = latest
+
+        flags = pd.DataFrame({
+            'main_item': names[codes[hit]],
+            'when': when[hit],
+            'price_s': prices[hit],
+            'median_price': center_rows[hit],
+            'mad': scale_rows[hit],
+            'robust_z': robust_z[hit],
+        }, columns=FLAG_COLUMNS)
+        if not flags.empty:
+            kept = [self._flags, flags] if not self._flags.empty else [flags]
+            self._flags = pd.concat(kept, ignore_index=True).tail(self.keep_flags)
+        return flags
+
+    def update_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Alimenta o detector com as linhas de ``df`` posteriores ao último trade visto.
+
+        Args:
+            df: DataFrame de trades (main_item, price_s, índice temporal ou 'date')
+
+        Returns:
+            Trades marcados entre as linhas novas.
+        """
+        if df is None or df.empty or not {'main_item', 'price_s'}.issubset(df.columns):
+            return pd.DataFrame(columns=FLAG_COLUMNS)
+        timestamps = trade_timestamps(df)
+        if self.last_timestamp is not None:
+            new = timestamps > np.datetime64(self.last_timestamp)
+            if not new.any():
+                return pd.DataFrame(columns=FLAG_COLUMNS)
+            df, timestamps = df[new], timestamps[new]
+        return self.update(df['main_item'], timestamps, df['price_s'].to_numpy(dtype=float))
+
+    def recent_flags(self, n: Optional[int] = None) -> pd.DataFrame:
+        """Últimos trades marcados (no máximo ``keep_flags``), do mais recente ao mais antigo."""
+        flags = self._flags.iloc[::-1].reset_index(drop=True)
+        return flags.head(n) if n else flags
+
+    def baseline(self, item: str) -> Optional[Dict[str, float]]:
+        """Centro e escala atuais da janela do item (None se o item é desconhecido)."""
+        window = self.windows.get(item)
+        if window is None:
+            return None
+        center, scale, n_days = window.baseline()
+        return {'median': center, 'mad': scale, 'days': n_days}
+
+    def reset(self) -> None:
+        """Esquece todas as janelas e trades marcados."""
+        self.windows.clear()
+        self.last_timestamp = None
+        self._flags = pd.DataFrame(columns=FLAG_COLUMNS)
@@ -0,0 +1,252 @@
+"""
+Sharded Engine
+==============
+
+Vários WurmStatsEngine, um por servidor ou dataset (Freedom, Epic, ...).
+
+Cada shard é registrado com uma forma de carregá-lo (arquivo, DataFrame,
+TradeStore ou função) e pode ser carregado/descarregado sozinho, para
+controlar a memória. As consultas rodam em paralelo, um shard por tarefa,
+num pool de threads (o trabalho pesado é NumPy/pandas/SQLite, que liberam o
+GIL) e os resultados são combinados: comparação de preço entre servidores,
+top itens combinado, busca por item em todos os shards.
+
+Exemplo:
+    shards = ShardedEngine()
+    shards.register('freedom', data_path='data/freedom/trades.txt')
+    shards.register('epic', store=TradeStore('data/epic.db'))
+    shards.load()
+    shards.compare_prices('iron lump', freq='W')
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from wurm_stats_engine import WurmStatsEngine
+
+logger = logging.getLogger(__name__)
+
+# Itens pedidos a cada shard por item do top combinado (reduz itens perdidos
+# por shards que os têm logo abaixo do corte)
+TOP_OVERSAMPLE = 4
+
+
+class ShardedEngine:
+    """
+    Coleção de engines por servidor/dataset com consultas paralelas.
+
+    Args:
+        max_workers: Threads do pool (None = padrão do ThreadPoolExecutor)
+    """
+
+    def __init__(self, max_workers: Optional[int] = None) -> None:
+        self.max_workers = max_workers
+        self._loaders: Dict[str, Callable[[], WurmStatsEngine]] = {}
+        self._engines: Dict[str, WurmStatsEngine] = {}
+
+    # ------------------------------------------------------------------
+    # Shards
+    # ------------------------------------------------------------------
+
+    def register(self, name: str, loader: Optional[Callable[[], WurmStatsEngine]] = None,
+                 **engine_kwargs) -> None:
+        """
+        Registra um shard (sem carregar).
+
+        Args:
+            name: Nome do shard (ex.: 'freedom')
+            loader: Função que devolve o engine do shard; se omitida, os
+                argumentos restantes vão para WurmStatsEngine (data_path,
+                df, store, canonicalizer, backend, ...)
+        """
+        if loader is None:
+            if not engine_kwargs:
+                raise ValueError("Informe 'loader' ou os argumentos do WurmStatsEngine.")
+            loader = lambda: WurmStatsEngine(**engine_kwargs)
+        self._loaders[name] = loader
+        self._engines.pop(name, None)
+
+    def add_engine(self, name: str, engine: WurmStatsEngine) -> None:
+        """Adiciona um engine já carregado (não pode ser recarregado após unload)."""
+        self._loaders.setdefault(name, self._not_reloadable(name))
+        self._engines[name] = engine
+
+    @staticmethod
+    def _not_reloadable(name: str) -> Callable[[], WurmStatsEngine]:
+        def loader():
+            raise RuntimeError(f"Shard '{name}' foi adicionado já carregado e não pode ser recarregado.")
+        return loader
+
+    def remove(self, name: str) -> None:
+        """Esquece o shard (descarrega e remove o registro)."""
+        self._engines.pop(name, None)
+        self._loaders.pop(name, None)
+
+    @property
+    def shards(self) -> List[str]:
+        return list(self._loaders)
+
+    @property
+    def loaded(self) -> List[str]:
+        return [name for name in self._loaders if name in self._engines]
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._engines
+
+    def _check(self, names: Optional[List[str]]) -> List[str]:
+        names = self.shards if names is None else list(names)
+        unknown = [n for n in names if n not in self._loaders]
+        if unknown:
+            raise KeyError(f"Shards desconhecidos: {unknown}")
+        return names
+
+    def load(self, names: Optional[List[str]] = None) -> List[str]:
+        """
+        Carrega shards (em paralelo); os já carregados são mantidos.
+
+        Returns:
+            Shards carregados nesta chamada.
+        """
+        pending = [n for n in self._check(names) if n not in self._engines]
+        if not pending:
+            return []
+        with ThreadPoolExecutor(self.max_workers) as pool:
+            engines = list(pool.map(lambda n: self._loaders[n](), pending))
+        self._engines.update(zip(pending, engines))
+        logger.info(f"Shards carregados: {', '.join(pending)}")
+        return pending
+
+    def unload(self, names: Optional[List[str]] = None) -> None:
+        """Descarrega shards (o registro continua; load() os recarrega)."""
+        for name in self._check(names):
+            self._engines.pop(name, None)
+
+    def engine(self, name: str) -> WurmStatsEngine:
+        """Engine de um shard (carrega sob demanda)."""
+        if name not in self._engines:
+            self.load([name])
+        return self._engines[name]
+
+    def memory_usage(self) -> pd.Series:
+        """Memória do DataFrame de cada shard carregado, em MB."""
+        usage = {}
+        for name in self.loaded:
+            df = self._engines[name].df
+            usage[name] = 0.0 if df is None else df.memory_usage(deep=True).sum() / 1024 / 1024
+        return pd.Series(usage, name='memory_mb', dtype=float)
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+
+    def map(self, func: Callable[[WurmStatsEngine], Any],
+            names: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Executa ``func(engine)`` em cada shard carregado, em paralelo.
+
+        Args:
+            func: Função aplicada ao engine de cada shard
+            names: Shards (None = todos os carregados)
+
+        Returns:
+            Dicionário shard -> resultado, na ordem de registro.
+        """
+        targets = self.loaded if names is None else [n for n in self._check(names) if n in self._engines]
+        if not targets:
+            return {}
+        with ThreadPoolExecutor(self.max_workers) as pool:
+            results = list(pool.map(lambda n: func(self._engines[n]), targets))
+        return dict(zip(targets, results))
+
+    @staticmethod
+    def _concat(results: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+        """Empilha resultados por shard com uma coluna 'shard'."""
+        parts = [df.assign(shard=name) for name, df in results.items() if df is not None and not df.empty]
+        if not parts:
+            return pd.DataFrame()
+        return pd.concat(parts)
+
+    def filter_by_item(self, item_name: str, exact: bool = False,
+                       start: Optional[Any] = None, end: Optional[Any] = None,
+                       names: Optional[List[str]] = None) -> pd.DataFrame:
+        """Trades do item em todos os shards, com a coluna 'shard', em ordem de tempo."""
+        results = self.map(lambda e: e.filter_by_item(item_name, exact=exact, start=start, end=end), names)
+        combined = self._concat(results)
+        if combined.empty or not isinstance(combined.index, pd.DatetimeIndex):
+            return combined
+        return combined.sort_index(kind='stable')
+
+    def compare_prices(self, item_name: str, freq: str = 'D', value: str = 'mean_price',
+                       exact: bool = False, start: Optional[Any] = None, end: Optional[Any] = None,
+                       names: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Série de preço do item lado a lado entre shards.
+
+        Args:
+            item_name: Item (substring ou exato)
+            freq: 'h', 'D', 'W' ou 'M'
+            value: Coluna da série (mean_price, min_price, max_price, trades, volume)
+
+        Returns:
+            DataFrame indexado por período, uma coluna por shard.
+        """
+        results = self.map(lambda e: e.get_resampled_series(item_name, freq, exact, start, end), names)
+        columns = {name: series[value] for name, series in results.items()
+                   if not series.empty and value in series.columns}
+        if not columns:
+            return pd.DataFrame()
+        return pd.DataFrame(columns).sort_index()
+
+    def compare_quantiles(self, item_name: str,
+                          quantiles: Tuple[float, ...] = (0.25, 0.5, 0.75),
+                          start: Optional[Any] = None, end: Optional[Any] = None,
+                          names: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Percentis de preço do item (nome exato) em cada shard, pelos sketches.
+
+        Returns:
+            DataFrame indexado por shard, uma coluna por quantil.
+        """
+        results = self.map(lambda e: e.get_price_quantiles(item_name, quantiles, start, end), names)
+        table = pd.DataFrame.from_dict(results, orient='index', columns=list(quantiles), dtype=float)
+        table.index.name = 'shard'
+        return table
+
+    def get_top_items(self, n: int = 50, by: str = 'count', start: Optional[Any] = None,
+                      end: Optional[Any] = None, names: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Top itens combinado: soma contagens e erros do Space-Saving de cada shard.
+
+        Cada shard contribui com seus ``n * TOP_OVERSAMPLE`` primeiros; um item
+        fora do top de algum shard pode ficar subestimado nesse shard.
+
+        Returns:
+            DataFrame com colunas ['main_item', by, 'error', 'shards'].
+        """
+        k = n * TOP_OVERSAMPLE
+        results = self.map(lambda e: e.get_top_items(k, by, start, end), names)
+        combined = self._concat(results)
+        if combined.empty:
+            return pd.DataFrame(columns=['main_item', by, 'error', 'shards'])
+        merged = combined.groupby('main_item', sort=False).agg(
+            **{by: (by, 'sum'), 'error': ('error', 'sum'), 'shards': ('shard', 'nunique')})
+        return merged.sort_values(by, ascending=False, kind='stable').head(n).reset_index()
+
+    def scan_arbitrage(self, start: Optional[Any] = None, end: Optional[Any] = None,
+                       min_profit_pct: float = 0.0, top_n: Optional[int] = None,
+                       names: Optional[List[str]] = None) -> pd.DataFrame:
+        """Oportunidades de arbitragem de cada shard (WTS e WTB no mesmo servidor), ranqueadas juntas."""
+        results = self.map(lambda e: e.scan_arbitrage(start, end, min_profit_pct=min_profit_pct,
+                                                      top_n=top_n), names)
+        combined = self._concat(results)
+        if combined.empty:
+            return combined
+        combined = combined.sort_values('profit_pct', ascending=False, kind='stable').reset_index(drop=True)
+        return combined.head(top_n) if top_n else combined
+
+    def append_data(self, name: str, df_new: pd.DataFrame) -> int:
+        """Anexa um lote ao shard indicado (carrega o shard se preciso)."""
+        return self.engine(name).append_data(df_new)
@@ -0,0 +1,228 @@
+"""
+SQL Console
+===========
+
+Consultas SQL ad hoc sobre os dados do WurmStatsEngine, sem exportar CSV.
+
+Usa DuckDB quando instalado: o DataFrame do engine e as tabelas agregadas
+são registrados como views sobre a memória do pandas (sem cópia). Sem
+DuckDB, cai para um SQLite em memória; nesse caso as tabelas são copiadas
+uma vez por versão dos dados.
+
+Tabelas disponíveis:
+
+- ``trades``: todos os trades (coluna ``timestamp`` + colunas do engine e
+  ``is_noise``);
+- ``daily`` / ``weekly`` / ``monthly``: agregados (item, período) do mercado;
+- ``players``: agregados por jogador;
+- ``ql_prices``: superfície de preço por faixa de QL e mês;
+- ``top_items``: itens mais negociados (contador Space-Saving).
+
+Os resultados voltam em páginas (``fetchmany``), para a GUI mostrar as
+primeiras linhas sem materializar o resultado inteiro.
+
+Exemplo:
+    console = SQLConsole(engine)
+    for page in console.pages("SELECT main_item, count(*) AS n FROM trades GROUP BY 1"):
+        print(page)
+"""
+
+import logging
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 1000
+
+# Tamanho do lote da cópia para o SQLite (limita o pico de memória)
+_SQLITE_CHUNK = 200_000
+
+
+class SQLConsole:
+    """
+    Console SQL embutido sobre um WurmStatsEngine.
+
+    As tabelas são (re)registradas quando ``engine.data_version`` muda, então
+    consultas depois de um ``append_data`` enxergam o lote novo.
+
+    Args:
+        engine: WurmStatsEngine com os dados carregados
+        backend: 'duckdb', 'sqlite' ou 'auto' (DuckDB se instalado)
+    """
+
+    BACKENDS = ('duckdb', 'sqlite')
+
+    def __init__(self, engine, backend: str = 'auto') -> None:
+        if backend not in self.BACKENDS + ('auto',):
+            raise ValueError(f"Backend inválido: {backend}. Use {list(self.BACKENDS)} ou 'auto'.")
+        self.engine = engine
+        self._lock = threading.Lock()
+        self._version: Optional[int] = None
+        self._tables: List[str] = []
+        self._frames: Dict[str, pd.DataFrame] = {}
+        self.backend = backend
+        if backend in ('auto', 'duckdb'):
+            try:
+                import duckdb
+                self._con = duckdb.connect()
+                self.backend = 'duckdb'
+            except ImportError:
+                if backend == 'duckdb':
+                    raise ImportError("Console SQL com DuckDB requer o pacote duckdb: pip install duckdb")
+                self.backend = 'sqlite'
+        if self.backend == 'sqlite':
+            self._con = sqlite3.connect(':memory:', check_same_thread=False)
+
+    # ------------------------------------------------------------------
+    # Tabelas
+    # ------------------------------------------------------------------
+
+    def _table_sources(self) -> Dict[str, Callable[[], pd.DataFrame]]:
+        """Nome da tabela -> função que monta o DataFrame (avaliada no registro)."""
+        engine = self.engine
+        sources = {'trades': self._trades_frame}
+        if 'main_item' in engine.df.columns:
+            for name, freq in (('daily', 'D'), ('weekly', 'W'), ('monthly', 'M')):
+                sources[name] = lambda freq=freq: engine.get_market_table(freq).reset_index()
+            sources['top_items'] = lambda: engine.get_top_items(engine.heavy_hitters.capacity)
+            sources['ql_prices'] = lambda: engine.ql_surface.table().reset_index()
+        sources['players'] = lambda: engine.player_index.table().reset_index()
+        return sources
+
+    def _trades_frame(self) -> pd.DataFrame:
+        # Colunas de texto (raw_text) voltam do StringPool do engine
+        df = self.engine.with_text(self.engine.df, np.arange(len(self.engine.df)))
+        # Com copy-on-write, reset_index/assign compartilham as colunas existentes
+        frame = df.reset_index() if isinstance(df.index, pd.DatetimeIndex) else df
+        return frame.assign(is_noise=~np.asarray(self.engine.valid_mask, dtype=bool))
+
+    def refresh(self, force: bool = False) -> List[str]:
+        """
+        Registra as tabelas se os dados do engine mudaram.
+
+        Returns:
+            Nomes das tabelas disponíveis.
+        """
+        version = self.engine.data_version
+        with self._lock:
+            if force or version != self._version:
+                self._register_all()
+                self._version = version
+            return list(self._tables)
+
+    def _register_all(self) -> None:
+        tables = []
+        self._frames = {}
+        for name, build in self._table_sources().items():
+            try:
+                frame = build()
+            except Exception as e:
+                logger.warning(f"Tabela SQL '{name}' indisponível: {e}")
+                continue
+            if self.backend == 'duckdb':
+                # Views são por conexão: cada cursor registra os mesmos frames
+                self._frames[name] = frame
+            else:
+                self._copy_to_sqlite(name, frame)
+            tables.append(name)
+        self._tables = tables
+        logger.info(f"Console SQL ({self.backend}): tabelas {', '.join(tables)}")
+
+    def _copy_to_sqlite(self, name: str, frame: pd.DataFrame) -> None:
+        frame = frame.copy(deep=False)
+        for col in frame.columns:
+            dtype = frame[col].dtype
+            if isinstance(dtype, pd.CategoricalDtype) or dtype == object or isinstance(dtype, pd.StringDtype):
+                frame[col] = frame[col].astype(object).where(frame[col].notna(), None)
+            elif dtype.kind == 'M':
+                # ISO 8601: ordena e compara como texto, aceito por date()/strftime()
+                frame[col] = frame[col].dt.strftime('%Y-%m-%d %H:%M:%S').astype(object)
+        self._con.execute(f'DROP TABLE IF EXISTS "{name}"')
+        frame.to_sql(name, self._con, index=False, chunksize=_SQLITE_CHUNK)
+
+    def tables(self) -> List[str]:
+        """Tabelas disponíveis (registra na primeira chamada)."""
+        return self.refresh()
+
+    def describe(self, table: str) -> pd.DataFrame:
+        """Colunas e tipos de uma tabela."""
+        if table not in self.refresh():
+            raise ValueError(f"Tabela desconhecida: {table}")
+        if self.backend == 'duckdb':
+            return self.query(f'DESCRIBE "{table}"')[['column_name', 'column_type']]
+        info = self.query(f'PRAGMA table_info("{table}")')
+        return info[['name', 'type']].rename(columns={'name': 'column_name', 'type': 'column_type'})
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+
+    def pages(self, sql: str, params: Optional[Sequence[Any]] = None,
+              page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[pd.DataFrame]:
+        """
+        Executa uma consulta e devolve o resultado em páginas.
+
+        Cada página é um DataFrame com até ``page_size`` linhas; a próxima só
+        é buscada quando o gerador avança.
+
+        Args:
+            sql: Consulta SQL
+            params: Parâmetros posicionais (``?``), opcional
+            page_size: Linhas por página
+
+        Yields:
+            DataFrames com as colunas do resultado.
+        """
+        self.refresh()
+        with self._lock:
+            cursor = self._con.cursor()
+            for name, frame in self._frames.items():
+                cursor.register(name, frame)
+            cursor.execute(sql, list(params or []))
+        try:
+            if cursor.description is None:
+                return
+            columns = [d[0] for d in cursor.description]
+            while True:
+                with self._lock:
+                    rows = cursor.fetchmany(page_size)
+                if not rows:
+                    break
+                yield pd.DataFrame.from_records(rows, columns=columns)
+                if len(rows) < page_size:
+                    break
+        finally:
+            cursor.close()
+
+    def query(self, sql: str, params: Optional[Sequence[Any]] = None,
+              max_rows: Optional[int] = None) -> pd.DataFrame:
+        """
+        Executa uma consulta e devolve o resultado como um único DataFrame.
+
+        Args:
+            sql: Consulta SQL
+            params: Parâmetros posicionais (``?``), opcional
+            max_rows: Limite de linhas lidas (None = todas)
+        """
+        parts = []
+        read = 0
+        page_size = DEFAULT_PAGE_SIZE if max_rows is None else max(1, min(max_rows, DEFAULT_PAGE_SIZE))
+        for page in self.pages(sql, params, page_size):
+            if max_rows is not None and read + len(page) > max_rows:
+                page = page.iloc[:max_rows - read]
+            parts.append(page)
+            read += len(page)
+            if max_rows is not None and read >= max_rows:
+                break
+        if not parts:
+            return pd.DataFrame()
+        return pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._con.close()
@@ -0,0 +1,183 @@
+"""
+String Pool
+===========
+
+Representação compacta de colunas de texto livre (``raw_text``).
+
+Uma coluna ``object`` guarda um objeto ``str`` do Python por linha (~50 bytes
+de cabeçalho + ponteiro de 8 bytes, mais o texto). Aqui os valores distintos
+ficam concatenados em um único buffer UTF-8, separados por ``\\n``, com um
+array de offsets; cada linha guarda só um código int32.
+
+A busca por substring roda sobre o buffer contíguo, não sobre milhões de
+objetos: o byte mais raro do termo (histograma do buffer) seleciona as
+posições candidatas e os demais bytes são conferidos em NumPy. Sem
+diferenciar maiúsculas, letras ASCII são comparadas com ``| 0x20``, sem
+criar uma cópia minúscula do buffer. As posições
+encontradas viram índices de string por ``searchsorted`` e as linhas por uma
+tabela de consulta.
+
+Lotes anexados (``extend``) entram no fim do buffer; valores repetidos entre
+lotes não são deduplicados, o que não altera o resultado das buscas.
+"""
+
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+_SEP = b'\n'
+
+
+class StringPool:
+    """
+    Coluna de texto deduplicada: buffer UTF-8 + offsets + códigos por linha.
+
+    Args:
+        values: Valores da coluna (None/NaN viram código -1)
+    """
+
+    def __init__(self, values: Optional[Union[pd.Series, Sequence]] = None) -> None:
+        self._buffer = _SEP
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self.codes = np.empty(0, dtype=np.int32)
+        self._histogram: Optional[np.ndarray] = None
+        if values is not None:
+            self.extend(values)
+
+    @classmethod
+    def from_categorical(cls, values: pd.Series) -> "StringPool":
+        """Pool sobre as categorias de uma coluna categórica (reaproveita os códigos)."""
+        pool = cls(values.cat.categories)
+        pool.codes = values.cat.codes.to_numpy().astype(np.int32)
+        return pool
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def n_unique(self) -> int:
+        return len(self._offsets) - 1
+
+    @property
+    def nbytes(self) -> int:
+        """Memória ocupada (buffer + offsets + códigos)."""
+        return len(self._buffer) + self._offsets.nbytes + self.codes.nbytes
+
+    @staticmethod
+    def _encode(uniques: List[str]) -> Tuple[bytes, np.ndarray]:
+        """Valores unidos por '\\n' em UTF-8 e o tamanho em bytes de cada um."""
+        # '\n' é o separador: dentro de um valor vira espaço
+        texts = [str(u).replace('\n', ' ') for u in uniques]
+        joined = '\n'.join(texts)
+        data = joined.encode('utf-8')
+        if len(data) == len(joined):
+            # Só ASCII: bytes == caracteres, sem codificar valor a valor
+            lengths = np.fromiter(map(len, texts), dtype=np.int64, count=len(texts))
+        else:
+            lengths = np.fromiter((len(t.encode('utf-8')) for t in texts), dtype=np.int64,
+                                  count=len(texts))
+        return data, lengths
+
+    def extend(self, values: Union[pd.Series, Sequence]) -> None:
+        """Anexa as linhas de um lote (os distintos do lote vão para o fim do buffer)."""
+        codes, uniques = pd.factorize(pd.Series(values, copy=False))
+        base = self.n_unique
+        if len(uniques):
+            data, lengths = self._encode(list(uniques))
+            self._offsets = np.concatenate([self._offsets, self._offsets[-1] + np.cumsum(lengths + 1)])
+            self._buffer = self._buffer + data + _SEP
+            self._histogram = None
+        codes = codes.astype(np.int32)
+        codes[codes >= 0] += base
+        self.codes = np.concatenate([self.codes, codes])
+
+    def take(self, rows: Union[np.ndarray, slice, Sequence[int]]) -> np.ndarray:
+        """Decodifica as linhas indicadas (array object; None para nulos)."""
+        codes = self.codes[rows]
+        out = np.full(len(codes), None, dtype=object)
+        offsets, buffer = self._offsets, self._buffer
+        for i, code in enumerate(codes.tolist()):
+            if code >= 0:
+                # offsets[k] aponta para o '\n' que precede a string k
+                out[i] = buffer[offsets[code] + 1:offsets[code + 1]].decode('utf-8')
+        return out
+
+    def reorder(self, order: np.ndarray) -> None:
+        """Aplica uma permutação às linhas (quando o DataFrame é reordenado)."""
+        self.codes = self.codes[order]
+
+    def to_series(self, index: Optional[pd.Index] = None, name: Optional[str] = None) -> pd.Series:
+        return pd.Series(self.take(slice(None)), index=index, name=name)
+
+    def find_all(self, needle: bytes, case_sensitive: bool = True) -> np.ndarray:
+        """
+        Posições de todas as ocorrências de ``needle`` no buffer.
+
+        Sem ``case_sensitive``, só letras ASCII são comparadas sem caixa.
+        """
+        array = np.frombuffer(self._buffer, dtype=np.uint8)
+        if self._histogram is None:
+            self._histogram = np.bincount(array, minlength=256)
+        needle = np.frombuffer(needle, dtype=np.uint8)
+        fold = np.zeros(len(needle), dtype=bool)
+        if not case_sensitive:
+            needle = needle | np.where((needle | 0x20) - ord('a') < 26, 0x20, 0).astype(np.uint8)
+            fold = (needle >= ord('a')) & (needle <= ord('z'))
+        size = len(needle)
+
+        # Começa pelo byte mais raro: menos candidatos para conferir
+        counts = self._histogram[needle] + np.where(fold, self._histogram[needle ^ 0x20], 0)
+        pivot = int(np.argmin(counts))
+        hits = array == needle[pivot]
+        if fold[pivot]:
+            hits |= array == (needle[pivot] ^ 0x20)
+        starts = np.flatnonzero(hits) - pivot
+        del hits
+        starts = starts[(starts >= 0) & (starts <= len(array) - size)]
+        for k in range(size):
+            if k != pivot and len(starts):
+                values = array[starts + k]
+                if fold[k]:
+                    values = values | 0x20
+                starts = starts[values == needle[k]]
+        return starts
+
+    def match_strings(self, needle: str, case_sensitive: bool = False) -> np.ndarray:
+        """Máscara por string distinta: True onde ``needle`` aparece."""
+        hit = np.zeros(self.n_unique, dtype=bool)
+        needle_bytes = str(needle).replace('\n', ' ').encode('utf-8')
+        if not needle_bytes:
+            hit[:] = True
+            return hit
+        starts = self.find_all(needle_bytes, case_sensitive)
+        if len(starts):
+            # String k ocupa (offsets[k], offsets[k + 1]); o separador nunca casa
+            hit[np.searchsorted(self._offsets, starts, side='right') - 1] = True
+        return hit
+
+    def contains(self, needle: str, case_sensitive: bool = False) -> np.ndarray:
+        """Máscara por linha: True onde o texto contém ``needle`` (nulos = False)."""
+        return self.rows_from(self.match_strings(needle, case_sensitive))
+
+    def rows_from(self, string_mask: np.ndarray) -> np.ndarray:
+        """Converte uma máscara por string distinta em máscara por linha."""
+        lookup = np.append(string_mask, False)  # código -1 -> última posição (False)
+        return lookup[self.codes]
+
+    def search(self, must: Sequence[str] = (), exclude: Sequence[str] = (),
+               case_sensitive: bool = False) -> np.ndarray:
+        """
+        Máscara por linha: contém todos os termos de ``must`` e nenhum de ``exclude``.
+
+        Os termos são combinados por string distinta antes de expandir para as linhas.
+        """
+        mask = np.ones(self.n_unique, dtype=bool)
+        for term in must:
+            mask &= self.match_strings(term, case_sensitive)
+        for term in exclude:
+            mask &= ~self.match_strings(term, case_sensitive)
+        if not must:
+            # Sem termo obrigatório: nulos também não contêm os excluídos
+            return np.append(mask, True)[self.codes]
+        return self.rows_from(mask)
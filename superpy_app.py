@@ -42,6 +42,8 @@ from ml_predictor import MLPredictor
 from threading_utils import AsyncDataLoader
 from charts_engine import ChartsEngine
 from price_manager import PriceManager
+from item_canonicalizer import ItemCanonicalizer
+from sql_console import SQLConsole
 import customtkinter as ctk
 ctk.set_appearance_mode("dark")
 ctk.set_default_color_theme("blue")
@@ -50,6 +52,7 @@ import matplotlib
 matplotlib.use("TkAgg")
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
+import numpy as np
 import pandas as pd
 
 
@@ -62,8 +65,20 @@ DEFAULT_DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
 PLUGINS_DIR = os.path.join(os.path.dirname(__file__), "plugins")
 EXTERNAL_DIR = os.path.join(os.path.dirname(__file__), "external")
 PRICE_BASE_PATH = os.path.join(EXTERNAL_DIR, "lista preços fixos outubro 2024.csv")
+ITEM_ALIASES_PATH = os.path.join(DEFAULT_DATA_DIR, "item_aliases.json")
+MODEL_STATE_PATH = os.path.join(DEFAULT_DATA_DIR, "ml_state.pkl")
+FEATURE_CACHE_DIR = os.path.join(DEFAULT_DATA_DIR, "features")
 APP_VERSION = "2.2.0"
 
+# Janelas de tempo dos gráficos (dias; None = histórico completo)
+CHART_WINDOWS = {"Tudo": None, "7 dias": 7, "30 dias": 30, "90 dias": 90, "365 dias": 365}
+
+# Períodos de agregação dos gráficos (frequências do engine)
+CHART_PERIODS = {"Horário": "h", "Diário": "D", "Semanal": "W", "Mensal": "M"}
+
+# Linhas por página no console SQL
+SQL_PAGE_SIZE = 500
+
 
 # UI Color Scheme (Lighter for better readability)
 BG = '#F5F5F5'  # Light gray background
@@ -229,11 +244,13 @@ class SuperPyGUI(ctk.CTk):
 
         # data
         self.engine = None
-        self.ml_predictor = MLPredictor()
-        self.charts_engine = ChartsEngine()
         self.price_manager = PriceManager(PRICE_BASE_PATH)
+        self.ml_predictor = MLPredictor(MODEL_STATE_PATH, self.price_manager, FEATURE_CACHE_DIR)
+        self.charts_engine = ChartsEngine()
         self.plugins_meta = {}
         self.plugins_modules = {}
+        self.sql_console = None
+        self.sql_pages = None
 
         # building UI
         self._build_ui()
@@ -264,10 +281,12 @@ class SuperPyGUI(ctk.CTk):
         self.update() # Required for clipboard to work
         self.log_message(f"Copied {len(selection)} rows to clipboard")
 
-    def create_tree_context_menu(self, tree):
-        """Create context menu for treeview"""
+    def create_tree_context_menu(self, tree, actions=None):
+        """Create context menu for treeview (actions: extra (label, callback(tree)) entries)"""
         menu = tk.Menu(self, tearoff=0)
         menu.add_command(label="Copiar", command=lambda: self.copy_selected_rows(tree))
+        for label, callback in actions or []:
+            menu.add_command(label=label, command=lambda cb=callback: cb(tree))
         
         def show_menu(event):
             try:
@@ -297,6 +316,7 @@ class SuperPyGUI(ctk.CTk):
             ('📈', 'Gráficos', self.show_charts),
             ('🔮', 'Insights', self.show_insights),
             ('💰', 'Price Editor', self.show_price_editor),
+            ('🗄️', 'SQL', self.show_sql),
             ('🧩', 'Plugins', self.show_plugins),
             ('⚙️', 'Config', self.show_config),
             ('❓', 'Ajuda', self.show_help),
@@ -309,7 +329,7 @@ class SuperPyGUI(ctk.CTk):
 
         # dynamic content frames
         self.frames = {}
-        for name in ['search', 'advanced', 'stats', 'charts', 'insights', 'price_editor', 'plugins', 'config', 'help']:
+        for name in ['search', 'advanced', 'stats', 'charts', 'insights', 'price_editor', 'sql', 'plugins', 'config', 'help']:
             f = tk.Frame(self.content, bg=BG)
             self.frames[name] = f
 
@@ -319,6 +339,7 @@ class SuperPyGUI(ctk.CTk):
         self._build_charts_frame()
         self._build_insights_frame()
         self._build_price_editor_frame()
+        self._build_sql_frame()
         self._build_plugins_frame()
         self._build_config_frame()
         self._build_help_frame()
@@ -357,7 +378,7 @@ class SuperPyGUI(ctk.CTk):
         top = tk.Frame(f, bg=BG)
         top.pack(fill='x', pady=8)
 
-        tk.Label(top, text='Item:', bg=BG, font=FONT).pack(side='left', padx=6)
+        tk.Label(top, text='Item (ou @jogador):', bg=BG, font=FONT).pack(side='left', padx=6)
         self.search_entry = tk.Entry(top, font=FONT, width=40)
         self.search_entry.pack(side='left', padx=6)
         tk.Button(top, text='Buscar', command=self.on_search, font=FONT).pack(side='left', padx=6)
@@ -449,11 +470,18 @@ class SuperPyGUI(ctk.CTk):
         
         # Treeview for top items
         tree_frame = tk.Frame(paned)
-        self.stats_tree = ttk.Treeview(tree_frame, columns=('Item', 'Count'), show='headings')
+        self.stats_tree = ttk.Treeview(tree_frame, columns=('Item', 'Count', 'Avg', 'Median', 'Last'),
+                                       show='headings')
         self.stats_tree.heading('Item', text='Item')
         self.stats_tree.heading('Count', text='Transações')
+        self.stats_tree.heading('Avg', text='Média WTS')
+        self.stats_tree.heading('Median', text='Mediana WTS')
+        self.stats_tree.heading('Last', text='Último WTS')
         self.stats_tree.column('Item', width=300)
         self.stats_tree.column('Count', width=100)
+        self.stats_tree.column('Avg', width=90)
+        self.stats_tree.column('Median', width=90)
+        self.stats_tree.column('Last', width=90)
         
         vsb = ttk.Scrollbar(tree_frame, orient="vertical", command=self.stats_tree.yview)
         self.stats_tree.configure(yscrollcommand=vsb.set)
@@ -482,14 +510,15 @@ class SuperPyGUI(ctk.CTk):
         def on_success(summary):
             self.stats_text.insert(tk.END, summary)
             
-            # Populate Top Items Treeview (reuse existing logic if needed or from summary)
-            # For now, we'll just reload top items from engine directly as it's fast enough
-            # or we could have run_optimized return a dict with both summary and top items.
-            # Let's keep it simple and just show top items here as before.
-            if 'main_item' in self.engine.df.columns:
-                top_items = self.engine.df['main_item'].value_counts().head(50)
-                for item, count in top_items.items():
-                    self.stats_tree.insert('', 'end', values=(str(item), int(count)))
+            # Populate Top Items Treeview from the engine's heavy-hitter counter
+            # (no full-frame value_counts)
+            top_items = self.engine.get_top_items(50)
+            summary = self.engine.get_market_summary('WTS')
+            prices = summary.reindex(top_items['main_item'])[['mean_price', 'median_price', 'last_price']]
+            fmt = lambda v: f'{v:.2f}' if pd.notna(v) else '-'
+            for item, count, row in zip(top_items['main_item'], top_items['count'],
+                                        prices.itertuples(index=False)):
+                self.stats_tree.insert('', 'end', values=(str(item), int(count), *map(fmt, row)))
             
             self.log_message('Estatísticas geradas com sucesso.')
             self.set_status("Pronto")
@@ -507,7 +536,8 @@ class SuperPyGUI(ctk.CTk):
         try:
             f = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV", "*.csv")])
             if f:
-                self.engine.df.to_csv(f, index=False)
+                # Colunas de texto (raw_text) ficam no StringPool do engine
+                self.engine.with_text(self.engine.df, np.arange(len(self.engine.df))).to_csv(f, index=False)
                 messagebox.showinfo("Exportar", f"Dados exportados para {f}")
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao exportar: {e}")
@@ -524,7 +554,13 @@ class SuperPyGUI(ctk.CTk):
         self.chart_item.pack(side='left', padx=6)
         
         self.chart_type = tk.StringVar(value="Price History")
-        tk.OptionMenu(controls, self.chart_type, "Price History", "Volume/Activity").pack(side='left', padx=6)
+        tk.OptionMenu(controls, self.chart_type, "Price History", "Volume/Activity", "Price by QL").pack(side='left', padx=6)
+
+        self.chart_window = tk.StringVar(value="Tudo")
+        tk.OptionMenu(controls, self.chart_window, *CHART_WINDOWS.keys()).pack(side='left', padx=6)
+
+        self.chart_period = tk.StringVar(value="Diário")
+        tk.OptionMenu(controls, self.chart_period, *CHART_PERIODS.keys()).pack(side='left', padx=6)
         
         tk.Button(controls, text='Gerar Gráfico', command=self.on_generate_chart, font=FONT, bg=ACCENT, fg='white').pack(side='left', padx=6)
         tk.Button(controls, text='Salvar Gráfico', command=self.on_save_chart, font=FONT).pack(side='left', padx=6)
@@ -547,15 +583,17 @@ class SuperPyGUI(ctk.CTk):
         tk.Label(top, text='Tipo:', bg=BG, font=FONT).pack(side='left', padx=(20, 5))
         self.analysis_type = tk.StringVar(value="all")
         analysis_menu = ttk.Combobox(top, textvariable=self.analysis_type, 
-                                     values=["all", "arbitrage", "relevance", "trends"],
+                                     values=["all", "arbitrage", "anomalies", "rolling", "relevance", "trends", "models", "clusters"],
                                      state='readonly', width=12, font=FONT)
         analysis_menu.pack(side='left', padx=5)
         
         tk.Button(top, text='Gerar Insights', command=self.on_generate_insights, 
                  font=FONT, bg=ACCENT, fg='white').pack(side='right', padx=8)
+        tk.Button(top, text='Cancelar', command=self.on_cancel_insights, font=FONT).pack(side='right', padx=4)
+        self.ml_cancel = threading.Event()
 
         # Description
-        desc = tk.Label(f, text='Análise avançada: Arbitragem (WTS vs WTB), Relevância (scoring contextual), Tendências (ALTA/BAIXA/ESTÁVEL).', 
+        desc = tk.Label(f, text='Análise avançada: Arbitragem (WTS vs WTB), Anomalias (Z-Score por item; mediana/MAD móvel), Relevância (scoring contextual), Tendências (ALTA/BAIXA/ESTÁVEL), Modelos AR por item (em paralelo), Clusters por dinâmica de preço (botão direito: itens similares).', 
                         bg=BG, fg='#aaaaaa', font=("Segoe UI", 9))
         desc.pack(fill='x', padx=8, pady=(0, 8))
 
@@ -580,6 +618,7 @@ class SuperPyGUI(ctk.CTk):
         self.insights_tree.configure(yscrollcommand=vsb.set)
         
         self.insights_tree.pack(side='left', fill='both', expand=True)
+        self.create_tree_context_menu(self.insights_tree, [("Itens similares", self.show_similar_items)])
         vsb.pack(side='right', fill='y')
 
     def on_generate_insights(self):
@@ -597,8 +636,16 @@ class SuperPyGUI(ctk.CTk):
             self.insights_tree.delete(i)
             
         # Async execution
+        self.ml_cancel.clear()
+
+        def on_progress(done, total):
+            # Chamado fora da thread do Tk
+            self.after(0, self.set_status, f"Processando ML... {done}/{total} itens")
+
         def run_ml():
-            return self.ml_predictor.run_prediction(self.engine.df, analysis_type=analysis_type)
+            return self.ml_predictor.run_prediction(self.engine.df, analysis_type=analysis_type,
+                                                    progress=on_progress, cancel=self.ml_cancel,
+                                                    data_version=self.engine.data_version)
             
         def on_success(results):
             self.log_message(f'Análise concluída. {len(results)} insights gerados.')
@@ -624,6 +671,28 @@ class SuperPyGUI(ctk.CTk):
         checker = self.async_loader.load_async(run_ml, on_success, on_error)
         self._poll_loader(checker)
 
+    def show_similar_items(self, tree):
+        """Itens com dinâmica de preço parecida com a do item selecionado (clusters do MLPredictor)"""
+        selection = tree.selection()
+        if not selection or not self.engine:
+            return
+        item = str(tree.item(selection[0])['values'][0])
+        similar = self.ml_predictor.similar_items(self.engine.df, item, n=10,
+                                                  data_version=self.engine.data_version)
+        if similar.empty:
+            messagebox.showinfo('Itens similares', f'"{item}" não tem trades suficientes para comparação.')
+            return
+        summary = self.engine.get_market_summary('WTS')
+        prices = dict(zip(summary.index.astype(str), summary['median_price']))
+        lines = [f"{row.main_item}  (mediana WTS: {prices[row.main_item]:.2f}c)" if row.main_item in prices
+                 else row.main_item for row in similar.itertuples()]
+        messagebox.showinfo('Itens similares', f'Dinâmica de preço parecida com "{item}":\n\n' + '\n'.join(lines))
+
+    def on_cancel_insights(self):
+        if hasattr(self, 'ml_cancel') and not self.ml_cancel.is_set():
+            self.ml_cancel.set()
+            self.log_message('Cancelando análise preditiva...')
+
 
     def _build_price_editor_frame(self):
         f = self.frames['price_editor']
@@ -653,20 +722,24 @@ class SuperPyGUI(ctk.CTk):
         tree_frame = tk.Frame(f, bg=BG)
         tree_frame.pack(fill='both', expand=True, padx=8, pady=6)
         
-        cols = ('Item', 'Preço Unitário (c)')
+        cols = ('Item', 'Preço Unitário (c)', 'Mkt Avg', 'Vol')
         self.price_tree = ttk.Treeview(tree_frame, columns=cols, show='headings')
         
         self.price_tree.heading('Item', text='Item')
         self.price_tree.heading('Preço Unitário (c)', text='Preço Unitário (c)')
+        self.price_tree.heading('Mkt Avg', text='Média WTS (c)')
+        self.price_tree.heading('Vol', text='Vol')
         
-        self.price_tree.column('Item', width=400)
+        self.price_tree.column('Item', width=300)
         self.price_tree.column('Preço Unitário (c)', width=150)
+        self.price_tree.column('Mkt Avg', width=110)
+        self.price_tree.column('Vol', width=70)
         
         vsb = ttk.Scrollbar(tree_frame, orient="vertical", command=self.price_tree.yview)
         self.price_tree.configure(yscrollcommand=vsb.set)
         
         self.price_tree.pack(side='left', fill='both', expand=True)
-        self.create_tree_context_menu(self.price_tree)
+        self.create_tree_context_menu(self.price_tree, [("Itens similares", self.show_similar_items)])
         vsb.pack(side='right', fill='y')
         
         # Bind double-click to edit
@@ -678,9 +751,18 @@ class SuperPyGUI(ctk.CTk):
         for i in self.price_tree.get_children():
             self.price_tree.delete(i)
         
+        # Resumo de mercado em cache no engine (recalculado só quando os dados mudam)
+        market = {}
+        if self.engine:
+            summary = self.engine.get_market_summary('WTS')
+            market = dict(zip(summary.index.astype(str).str.lower(),
+                              zip(summary['mean_price'], summary['count'])))
+        
         # Populate
         for item_name, price in sorted(self.price_manager.prices.items()):
-            self.price_tree.insert('', 'end', values=(item_name.capitalize(), f'{price:.2f}'))
+            avg, count = market.get(item_name.lower(), (None, 0))
+            self.price_tree.insert('', 'end', values=(item_name.capitalize(), f'{price:.2f}',
+                                                      f'{avg:.2f}' if avg is not None else '-', int(count)))
         
         self.set_status(f'Loaded {len(self.price_manager.prices)} prices')
     
@@ -742,6 +824,93 @@ class SuperPyGUI(ctk.CTk):
         self.price_value_entry.delete(0, tk.END)
         self.price_value_entry.insert(0, values[1])
 
+    def _build_sql_frame(self):
+        f = self.frames['sql']
+
+        top = tk.Frame(f, bg=BG)
+        top.pack(fill='x', pady=8, padx=8)
+        tk.Label(top, text='Consulta SQL', bg=BG, font=("Segoe UI", 14, "bold")).pack(side='left')
+        tk.Button(top, text='Executar', command=self.on_run_sql, font=FONT, bg=ACCENT, fg='white').pack(side='left', padx=(20, 6))
+        self.sql_more_btn = tk.Button(top, text='Mais linhas', command=self.on_sql_more, font=FONT, state='disabled')
+        self.sql_more_btn.pack(side='left', padx=6)
+        self.sql_tables_label = tk.Label(top, text='Tabelas: trades, daily, weekly, monthly, players, ql_prices, top_items',
+                                         bg=BG, font=FONT)
+        self.sql_tables_label.pack(side='left', padx=12)
+
+        self.sql_text = tk.Text(f, height=6, font=("Consolas", 10))
+        self.sql_text.pack(fill='x', padx=8)
+        self.sql_text.insert('1.0', "SELECT main_item, count(*) AS trades, avg(price_s) AS preco_medio\n"
+                                    "FROM trades WHERE NOT is_noise AND operation = 'WTS'\n"
+                                    "GROUP BY main_item ORDER BY trades DESC")
+
+        # results (Treeview, colunas definidas a cada consulta)
+        tree_frame = tk.Frame(f, bg=BG)
+        tree_frame.pack(fill='both', expand=True, padx=8, pady=6)
+        self.sql_tree = ttk.Treeview(tree_frame, show='headings')
+        vsb = ttk.Scrollbar(tree_frame, orient="vertical", command=self.sql_tree.yview)
+        self.sql_tree.configure(yscrollcommand=vsb.set)
+        self.sql_tree.pack(side='left', fill='both', expand=True)
+        self.create_tree_context_menu(self.sql_tree)
+        vsb.pack(side='right', fill='y')
+
+    def on_run_sql(self):
+        if not self.engine:
+            messagebox.showerror('Erro', 'Dados não carregados')
+            return
+        sql = self.sql_text.get('1.0', tk.END).strip()
+        if not sql:
+            return
+        if self.sql_console is None or self.sql_console.engine is not self.engine:
+            self.sql_console = SQLConsole(self.engine)
+
+        self.set_status('Executando SQL...')
+        self.sql_more_btn.config(state='disabled')
+        t0 = time.time()
+
+        def run_query():
+            pages = self.sql_console.pages(sql, page_size=SQL_PAGE_SIZE)
+            return pages, next(pages, None)
+
+        def on_success(result):
+            self.sql_pages, first = result
+            self.sql_tables_label.config(text=f"Tabelas ({self.sql_console.backend}): "
+                                              f"{', '.join(self.sql_console.tables())}")
+            self.sql_tree.delete(*self.sql_tree.get_children())
+            columns = list(first.columns) if first is not None else []
+            self.sql_tree['columns'] = columns
+            for col in columns:
+                self.sql_tree.heading(col, text=col)
+                self.sql_tree.column(col, width=120)
+            self._append_sql_page(first)
+            self.log_message(f'SQL executado em {time.time() - t0:.2f}s')
+            self.set_status('Pronto')
+
+        def on_error(e):
+            self.sql_pages = None
+            self.log_message(f'Erro SQL: {e}', is_error=True)
+            self.set_status('Erro SQL')
+
+        checker = self.async_loader.load_async(run_query, on_success, on_error)
+        self._poll_loader(checker)
+
+    def on_sql_more(self):
+        if self.sql_pages is None:
+            return
+        self._append_sql_page(next(self.sql_pages, None))
+
+    def _append_sql_page(self, page):
+        if page is None or page.empty:
+            self.sql_pages = None
+            self.sql_more_btn.config(state='disabled')
+            return
+        for row in page.itertuples(index=False):
+            self.sql_tree.insert('', 'end', values=['' if pd.isna(v) else v for v in row])
+        more = len(page) == SQL_PAGE_SIZE
+        if not more:
+            self.sql_pages = None
+        self.sql_more_btn.config(state='normal' if more else 'disabled')
+        self.set_status(f"{len(self.sql_tree.get_children()):,} linhas" + (" (há mais)" if more else ""))
+
     def _build_plugins_frame(self):
         f = self.frames['plugins']
         top = tk.Frame(f, bg=BG)
@@ -819,6 +988,9 @@ Este aplicativo analisa dados de trade do Wurm Online usando Pandas.
 🚀 ANÁLISE AVANÇADA (APIs):
 - engine.calculate_volatility(item, window=7)
 - engine.calculate_mean_average(item, window=7)
+- engine.filter_by_item(item, start='2025-01-01', end='2025-01-31')
+- engine.get_player_trades(jogador) / engine.get_player_stats(jogador)
+- SQLConsole(engine).query("SELECT ... FROM trades") - aba SQL (DuckDB ou SQLite)
 - engine.otimizar_dataframe() - reduz uso de memória
 
 ===================================================
@@ -897,6 +1069,10 @@ Criado por: Jotasiete7 | Versão: 2.0
         self.frames['price_editor'].pack(fill='both', expand=True)
         self.refresh_price_list()
 
+    def show_sql(self):
+        self._hide_all_frames()
+        self.frames['sql'].pack(fill='both', expand=True)
+
     def show_plugins(self):
         self._hide_all_frames()
         self.frames['plugins'].pack(fill='both', expand=True)
@@ -930,12 +1106,17 @@ Criado por: Jotasiete7 | Versão: 2.0
                              data_path = os.path.join(extracted, f)
                              break
             
-            # Initialize engine
-            return WurmStatsEngine(data_path)
+            # Initialize engine (nomes de item canonizados contra a lista de preços)
+            canonicalizer = ItemCanonicalizer.from_price_list(PRICE_BASE_PATH, ITEM_ALIASES_PATH)
+            engine = WurmStatsEngine(data_path, canonicalizer=canonicalizer)
+            # Estado salvo do modelo: só as linhas novas desde a última execução
+            self.ml_predictor.update_model(engine.df, engine.data_version)
+            return engine
 
         # Define success callback
         def on_success(engine):
             self.engine = engine
+            self.price_manager.attach_ql_surface(engine.ql_surface)
             self.log_message(f'Dados carregados com sucesso: {len(self.engine.df):,} registros.')
             self.reload_plugins()
             self.set_status("Pronto")
@@ -969,7 +1150,11 @@ Criado por: Jotasiete7 | Versão: 2.0
         t0 = time.time()
         # Use engine filter
         try:
-            df_res = self.engine.filter_by_item(q, exact=False)
+            if q.startswith('@'):
+                # Busca por jogador usa o índice jogador -> linhas
+                df_res = self.engine.get_player_trades(q[1:].strip())
+            else:
+                df_res = self.engine.filter_by_item(q, exact=False)
             res = df_res.to_dict('records')
         except Exception as e:
             res = []
@@ -1002,15 +1187,10 @@ Criado por: Jotasiete7 | Versão: 2.0
             return
             
         t0 = time.time()
-        df = self.engine.df
-        if must:
-            # Simple contains on raw_text if available, else main_item
-            col = 'raw_text' if 'raw_text' in df.columns else 'main_item'
-            mask = df[col].str.contains(must, case=not self.case_var.get(), na=False)
-            df = df[mask]
-        
-        res = df.head(5000).to_dict('records')
-        res = df.head(5000).to_dict('records')
+        # raw_text fica num StringPool do engine (ou main_item, sem raw_text)
+        df = self.engine.search_text(must, self.adv_not.get(), exact=self.exact_var.get(),
+                                     case_sensitive=self.case_var.get(), limit=5000)
+        res = df.reset_index().to_dict('records')
         dt = time.time() - t0
         
         # Clear tree
@@ -1043,20 +1223,36 @@ Criado por: Jotasiete7 | Versão: 2.0
         for widget in self.chart_frame.winfo_children():
             widget.destroy()
 
+        days = CHART_WINDOWS.get(self.chart_window.get())
+        start, end = self.engine.recent_window(days) if days else (None, None)
+        freq = CHART_PERIODS.get(self.chart_period.get(), 'D')
+
         try:
+            # Séries vêm dos agregados em cache do engine: trocar o período
+            # (diário -> mensal) não reprocessa os trades
             if ctype == "Price History":
                 if not item:
                     messagebox.showinfo('Aviso', 'Digite o nome do item para histórico de preços.')
                     return
                 
-                fig = self.charts_engine.create_price_trend_chart(self.engine.df, item)
+                series = self.engine.get_resampled_series(item, freq=freq, start=start, end=end)
+                fig = self.charts_engine.create_resampled_chart(series, item, kind='price', freq=freq)
 
             elif ctype == "Volume/Activity":
                 if not item:
                     messagebox.showinfo('Aviso', 'Digite o nome do item para volume.')
                     return
                     
-                fig = self.charts_engine.create_volume_chart(self.engine.df, item)
+                series = self.engine.get_resampled_series(item, freq=freq, start=start, end=end)
+                fig = self.charts_engine.create_resampled_chart(series, item, kind='volume', freq=freq)
+
+            elif ctype == "Price by QL":
+                if not item:
+                    messagebox.showinfo('Aviso', 'Digite o nome do item para o preço por QL.')
+                    return
+
+                surface = self.engine.get_ql_surface(item)
+                fig = self.charts_engine.create_ql_surface_chart(surface, item)
 
             # Draw
             self.canvas = FigureCanvasTkAgg(fig, master=self.chart_frame)
@@ -1174,4 +1370,7 @@ def main():
 
 
 if __name__ == '__main__':
+    # Pool de processos do ajuste por item no executável (PyInstaller)
+    import multiprocessing
+    multiprocessing.freeze_support()
     main()
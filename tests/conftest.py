@@ -0,0 +1,60 @@
+# tests/conftest.py
+"""
+Fixtures compartilhadas: fábrica de trades sintéticos
+"""
+
+import pytest
+import pandas as pd
+import numpy as np
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+def _make_trades(n=None, freq='h', start='2025-01-01', items=('iron lump', 'log', 'plank'), seed=0,
+                 cycle=False, price=None, operation=False, timestamps=None, decimals=None):
+    """
+    DataFrame de trades (main_item, price_s[, operation]) indexado por 'timestamp'.
+
+    Args:
+        n: Número de trades (ignorado se ``timestamps`` for dado)
+        freq: Intervalo entre trades
+        start: Primeiro timestamp
+        items: Nomes de item; sorteados por trade, ou em ciclo com ``cycle``
+            (um nome por linha quando len(items) == n)
+        seed: Semente do gerador
+        cycle: Atribui os itens em ordem (0, 1, 2, 0, ...) em vez de sortear
+        price: Preços por trade: array, ou função (rng, códigos do item, t em [0, 1))
+            -> array (padrão: lognormal(2, 0.3))
+        operation: True sorteia WTS/WTB; um array é usado como está
+        timestamps: Timestamps explícitos (substitui n/freq/start)
+        decimals: Arredondamento dos preços (None = sem arredondar)
+    """
+    rng = np.random.default_rng(seed)
+    ts = pd.DatetimeIndex(timestamps) if timestamps is not None else pd.date_range(start, periods=n, freq=freq)
+    n = len(ts)
+    names = np.asarray(items, dtype=object)
+    codes = np.arange(n) % len(names) if cycle else rng.integers(0, len(names), n)
+    t = np.arange(n) / n
+    if price is None:
+        prices = rng.lognormal(2, 0.3, n)
+    elif callable(price):
+        prices = np.asarray(price(rng, codes, t), dtype=float)
+    else:
+        prices = np.asarray(price, dtype=float)
+    if decimals is not None:
+        prices = np.round(prices, decimals)
+    df = pd.DataFrame({'main_item': names[codes].astype(str), 'price_s': prices},
+                      index=pd.DatetimeIndex(ts, name='timestamp'))
+    if operation is True:
+        df['operation'] = np.where(rng.random(n) < 0.5, 'WTS', 'WTB')
+    elif operation is not False:
+        df['operation'] = np.asarray(operation)
+    return df
+
+
+@pytest.fixture
+def make_trades():
+    """Fábrica de trades sintéticos; cada arquivo de teste descreve só o seu cenário."""
+    return _make_trades
@@ -0,0 +1,132 @@
+# tests/test_backtesting.py
+"""
+Testes do backtest walk-forward (sinais sem olhar o futuro, avaliação no horizonte, latência)
+"""
+
+import pytest
+import pandas as pd
+import numpy as np
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from backtesting import WalkForwardBacktest, SIGNAL_KINDS
+from model_state import ModelState
+from ml_predictor import MLPredictor
+
+
+@pytest.fixture
+def trades(make_trades):
+    def build(days=30, per_day=24, drift=0.0, seed=3):
+        return make_trades(days * per_day, freq=pd.Timedelta(days=1) / per_day, start='2025-03-01',
+                           items=('iron lump', 'log'), seed=seed,
+                           price=lambda rng, codes, t: np.where(codes == 0, 10.0, 2.0)
+                           * np.exp(drift * days * t + rng.normal(0, 0.05, len(t))))
+    return build
+
+
+@pytest.fixture
+def spiky(trades):
+    df = trades()
+    # Picos isolados: o preço volta ao normal logo depois
+    spikes = np.arange(200, len(df), 97)
+    df.iloc[spikes, df.columns.get_loc('price_s')] *= np.where(np.arange(len(spikes)) % 2, 1.8, 0.5)
+    return df
+
+
+def test_anomaly_signals_revert(spiky):
+    report = WalkForwardBacktest(kinds=('zscore', 'rolling')).run(spiky)
+    quality = report.quality()
+    assert set(quality.index) == {'zscore', 'rolling'}
+    assert (quality['hit_rate'] > 0.9).all()
+    assert (quality['mean_return'] > 0).all()
+
+    signals = report.signals
+    # Nenhum sinal no aquecimento; abaixo do esperado = COMPRAR
+    assert signals['when'].min() >= pd.Timestamp('2025-03-08')
+    assert (signals['direction'] == np.where(signals['price_s'] < signals['expected_price'], 1, -1)).all()
+
+
+def test_trend_follows_drift(trades):
+    report = WalkForwardBacktest(kinds=('trend',), horizon='5D').run(trades(drift=0.03))
+    quality = report.quality()
+    assert quality.loc['trend', 'signals'] > 0
+    assert quality.loc['trend', 'hit_rate'] > 0.8
+
+
+def test_zscore_uses_only_past(spiky):
+    report = WalkForwardBacktest(kinds=('zscore',), step='1D').run(spiky)
+    signal = report.signals.iloc[0]
+    # Recalcula o z do primeiro sinal só com os trades anteriores ao seu dia
+    day_start = signal['when'].floor('D')
+    past = spiky[(spiky.index < day_start) & (spiky['main_item'] == signal['main_item'])]['price_s']
+    assert signal['expected_price'] == pytest.approx(past.mean())
+    assert signal['score'] == pytest.approx((signal['price_s'] - past.mean()) / past.std())
+
+
+def test_zscore_is_the_shipped_signal(spiky):
+    # Um passo do backtest = score_anomalies (padrões de detect_anomalies) contra o estado anterior
+    report = WalkForwardBacktest(kinds=('zscore',), step='1D').run(spiky)
+    day = report.signals['when'].iloc[0].floor('D')
+    state = ModelState()
+    state.ingest(spiky[spiky.index < day])
+    expected = MLPredictor.score_anomalies(spiky[(spiky.index >= day) & (spiky.index < day + pd.Timedelta('1D'))],
+                                           moments=state.moments.table())
+    got = report.signals[report.signals['when'].dt.floor('D') == day]
+    assert got['when'].tolist() == expected['when'].tolist()
+    np.testing.assert_allclose(got['score'], expected['z_score'])
+
+    # Parâmetros explícitos chegam ao score_anomalies
+    stricter = WalkForwardBacktest(kinds=('zscore',), recent=1, threshold=3.0).run(spiky)
+    assert len(stricter.signals) <= len(report.signals)
+
+
+def test_evaluation_matches_naive(spiky):
+    bt = WalkForwardBacktest(kinds=('zscore', 'rolling'), horizon='2D')
+    signals = bt.run(spiky).signals
+    assert len(signals) > 0
+    for _, signal in signals.sample(min(20, len(signals)), random_state=0).iterrows():
+        window = spiky[(spiky.index > signal['when']) & (spiky.index <= signal['when'] + pd.Timedelta('2D'))
+                       & (spiky['main_item'] == signal['main_item'])]['price_s']
+        assert signal['trades_after'] == len(window)
+        if len(window):
+            assert signal['realized_price'] == pytest.approx(window.mean())
+        else:
+            assert np.isnan(signal['forward_return'])
+
+
+def test_latency_and_progress(spiky):
+    calls = []
+    report = WalkForwardBacktest(step='12h').run(spiky, progress=lambda done, total: calls.append((done, total)))
+    latency = report.latency()
+    assert latency['steps'] == len(report.steps) == calls[-1][1] == len(calls)
+    assert report.steps['rows'].sum() == len(spiky) - 7 * 24  # aquecimento fora dos passos
+    assert 0 < latency['p50'] <= latency['p95'] <= latency['max']
+    assert set(report.quality().index) <= set(SIGNAL_KINDS)
+
+
+def test_ingest_matches_sync(trades):
+    df = trades(days=12)
+    warm = 7 * 24
+    # α/β da previsão são escolhidos no primeiro lote; os seguintes só continuam o estado
+    stepped = ModelState()
+    stepped.ingest(df.iloc[:warm])
+    for lo in range(warm, len(df), 50):
+        stepped.ingest(df.iloc[lo:lo + 50])
+    synced = ModelState()
+    synced.sync(df.iloc[:warm], data_version=1)
+    synced.sync(df, data_version=2)
+    pd.testing.assert_frame_equal(stepped.moments.table(), synced.moments.table())
+    pd.testing.assert_frame_equal(stepped.forecast.summary(), synced.forecast.summary())
+
+
+def test_invalid_input(trades):
+    with pytest.raises(ValueError):
+        WalkForwardBacktest().run(trades().reset_index())
+    with pytest.raises(ValueError):
+        WalkForwardBacktest(kinds=('magic',))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,110 @@
+# tests/test_engine_backends.py
+"""
+Testes de paridade entre os backends do WurmStatsEngine
+"""
+
+import pytest
+import pandas as pd
+import numpy as np
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from wurm_stats_engine import WurmStatsEngine
+from engine_backends import get_backend, trade_timestamps
+from forecasting import HoltForecaster
+from item_clustering import item_features
+from ml_predictor import MLPredictor
+from parallel_fitting import fit_items_parallel
+from rolling_anomaly import RollingAnomalyDetector
+
+
+@pytest.fixture
+def trades_dataframe():
+    """Três itens ao longo de 20 dias, com preços faltando."""
+    n = 600
+    rng = np.random.default_rng(11)
+    ts = pd.date_range('2025-02-01', periods=n, freq='48min')
+    prices = np.round(rng.uniform(5, 80, n), 2)
+    prices[::37] = np.nan
+    df = pd.DataFrame({
+        'timestamp': ts,
+        'date': ts.normalize(),
+        'main_item': pd.Categorical(np.array(['iron lump', 'Iron Lumps', 'stone brick'])[np.arange(n) % 3]),
+        'price_s': prices,
+        'operation': pd.Categorical(np.where(rng.random(n) < 0.4, 'WTB', 'WTS')),
+    })
+    return df.set_index('timestamp')
+
+
+@pytest.fixture(params=['polars', 'duckdb'])
+def backend_name(request):
+    pytest.importorskip(request.param)
+    return request.param
+
+
+def _engines(df, backend_name):
+    return WurmStatsEngine(df=df), WurmStatsEngine(df=df, backend=backend_name)
+
+
+@pytest.mark.parametrize('window', [(None, None), ('2025-02-05', '2025-02-12')])
+def test_backend_parity(trades_dataframe, backend_name, window):
+    """Compara filtros e agregações de cada backend com o pandas."""
+    start, end = window
+    reference, other = _engines(trades_dataframe, backend_name)
+
+    for item, exact in [('iron', False), ('stone brick', True), ('nothing', False)]:
+        expected = reference.filter_by_item(item, exact=exact, start=start, end=end)
+        result = other.filter_by_item(item, exact=exact, start=start, end=end)
+        pd.testing.assert_frame_equal(result, expected)
+
+    for method in ('calculate_volatility', 'calculate_mean_average', 'calculate_profit_margins'):
+        expected = getattr(reference, method)('iron', start=start, end=end)
+        result = getattr(other, method)('iron', start=start, end=end)
+        pd.testing.assert_frame_equal(result, expected, check_dtype=False, check_freq=False)
+
+
+def test_backend_parity_without_time_index(trades_dataframe, backend_name):
+    """Frames sem índice temporal usam a máscara da coluna 'date'."""
+    df = trades_dataframe.reset_index(drop=True)
+    reference, other = _engines(df, backend_name)
+    expected = reference.calculate_profit_margins('iron', start='2025-02-03', end='2025-02-09')
+    result = other.calculate_profit_margins('iron', start='2025-02-03', end='2025-02-09')
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False, check_freq=False)
+
+
+def test_backend_follows_append_and_optimize(trades_dataframe, backend_name):
+    """O cache colunar acompanha lotes anexados e o run_optimized."""
+    engine = WurmStatsEngine(df=trades_dataframe.iloc[:300], backend=backend_name)
+    assert not engine.calculate_mean_average('stone').empty
+    engine.append_data(trades_dataframe.iloc[300:].reset_index())
+    engine.run_optimized()
+    assert len(engine.filter_by_item('stone')) == (trades_dataframe['main_item'] == 'stone brick').sum()
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        get_backend('spark')
+
+
+def test_trade_timestamps_single_rule(trades_dataframe):
+    """Testa a regra única de tempo por trade: índice temporal, senão 'date', senão NaT."""
+    by_index = trade_timestamps(trades_dataframe)
+    assert by_index.dtype == np.dtype('datetime64[ns]')
+    np.testing.assert_array_equal(by_index, trades_dataframe.index.to_numpy())
+    by_date = trade_timestamps(trades_dataframe.reset_index(drop=True))
+    np.testing.assert_array_equal(by_date, trades_dataframe['date'].to_numpy())
+
+    # Sem tempo: nenhum consumidor levanta KeyError, todos devolvem vazio
+    timeless = trades_dataframe.reset_index(drop=True).drop(columns=['date'])
+    assert np.isnat(trade_timestamps(timeless)).all()
+    assert RollingAnomalyDetector().update_frame(timeless).empty
+    assert HoltForecaster().fit_frame(timeless).summary().empty
+    assert item_features(timeless, min_trades=1).empty
+    assert fit_items_parallel(timeless, max_workers=1, min_trades=1) == {}
+    assert MLPredictor.score_anomalies(timeless, threshold=0.0)['when'].isna().all()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,123 @@
+# tests/test_feature_store.py
+"""
+Testes do FeatureStore (LRU por dados/conjunto, cache em disco) e do reuso no MLPredictor
+"""
+
+import pytest
+import pandas as pd
+import numpy as np
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from feature_store import FeatureStore, dataset_fingerprint
+from ml_predictor import MLPredictor
+
+
+@pytest.fixture
+def trades(make_trades):
+    return make_trades(500, start='2025-06-01', seed=6, operation=True, decimals=2).assign(price_iron=0)
+
+
+def _counting_store(**kwargs):
+    calls = []
+    store = FeatureStore(**kwargs)
+    store.register('counts', lambda df: calls.append(len(df)) or df['main_item'].value_counts().to_frame())
+    return store, calls
+
+
+def test_reuse_and_keys(trades):
+    store, calls = _counting_store()
+    first = store.get('counts', trades)
+    assert store.get('counts', trades) is first
+    assert store.get('counts', trades, data_version=3) is not first  # outra chave
+    assert store.get('counts', trades, data_version=3) is store.get('counts', trades, data_version=3)
+    assert calls == [500, 500]
+    assert store.stats['hits'] == 3 and store.stats['misses'] == 2
+
+    # Mesmo data_version, outros dados (engine recarregado): não reaproveita
+    store.get('counts', trades.iloc[:100], data_version=3)
+    assert calls == [500, 500, 100]
+    assert store.invalidate(data_version=3) == 2
+
+    with pytest.raises(KeyError):
+        store.get('unknown', trades)
+
+
+def test_lru_eviction(trades):
+    store, calls = _counting_store(max_entries=2)
+    for version in (1, 2, 1, 3):
+        store.get('counts', trades, data_version=version)
+    assert calls == [500] * 3
+    # A versão 2 foi a menos usada recentemente
+    store.get('counts', trades, data_version=2)
+    assert len(calls) == 4 and len(store) == 2
+
+
+def test_fingerprint_changes(trades):
+    edited = trades.copy()
+    edited.iloc[10, edited.columns.get_loc('price_s')] += 1
+    assert dataset_fingerprint(trades) == dataset_fingerprint(trades.copy())
+    assert dataset_fingerprint(trades) != dataset_fingerprint(edited)
+    assert dataset_fingerprint(trades) != dataset_fingerprint(trades.iloc[:-1])
+
+
+def test_disk_cache(trades, tmp_path):
+    store, calls = _counting_store(cache_dir=str(tmp_path))
+    expected = store.get('counts', trades)
+    store.get('counts', trades.iloc[:50])
+    assert len(list(tmp_path.iterdir())) == 1  # arquivo dos dados antigos substituído
+
+    fresh, fresh_calls = _counting_store(cache_dir=str(tmp_path))
+    fresh.get('counts', trades.iloc[:50])
+    assert fresh_calls == [] and fresh.stats['disk_hits'] == 1
+    fresh.get('counts', trades)
+    assert fresh_calls == [500]
+    pd.testing.assert_frame_equal(fresh.get('counts', trades), expected)
+
+
+def test_disk_cache_sees_item_renames(trades, tmp_path):
+    items = trades.assign(main_item=trades['main_item'].replace({'log': 'logs'}).astype('category'))
+    store, _ = _counting_store(cache_dir=str(tmp_path))
+    store.get('counts', items, data_version=1)
+
+    # Mesmos preços e timestamps, itens fundidos (canonicalize_items): não reaproveita o arquivo
+    merged = items.assign(main_item=items['main_item'].astype(str).replace({'logs': 'log'}).astype('category'))
+    for version in (1, 2):
+        fresh, fresh_calls = _counting_store(cache_dir=str(tmp_path))
+        assert 'logs' not in fresh.get('counts', merged, data_version=version).index
+        assert fresh_calls == [500] and fresh.stats['disk_hits'] == 0
+    assert dataset_fingerprint(items) != dataset_fingerprint(merged)
+
+    again, again_calls = _counting_store(cache_dir=str(tmp_path))
+    again.get('counts', merged, data_version=2)
+    assert again_calls == [] and again.stats['disk_hits'] == 1
+
+
+def test_predictor_reuses_features(trades):
+    predictor = MLPredictor()
+    predictor.update_model(trades, data_version=1)  # como o app ao carregar os dados
+    for analysis_type in ('all', 'relevance', 'anomalies', 'all'):
+        predictor.run_prediction(trades, analysis_type=analysis_type, data_version=1)
+    # 'ml' e 'unit_summary' construídos uma vez cada (as médias por item
+    # vêm do estado do modelo, que cobre o DataFrame)
+    assert predictor.features.stats['misses'] == 2
+    assert predictor.features.stats['hits'] == 3
+
+    # Sem índice temporal (sem estado): as médias por item também entram no store
+    by_date = trades.reset_index().rename(columns={'timestamp': 'date'})
+    predictor.run_prediction(by_date, analysis_type='anomalies')
+    predictor.run_prediction(by_date, analysis_type='anomalies')
+    assert predictor.features.stats['misses'] == 3
+
+
+def test_item_baselines_match_groupby(trades):
+    baselines = MLPredictor.item_baselines(trades)
+    pd.testing.assert_frame_equal(
+        MLPredictor.score_anomalies(trades, recent=5, threshold=1.0, moments=baselines),
+        MLPredictor.score_anomalies(trades, recent=5, threshold=1.0))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
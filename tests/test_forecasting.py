@@ -0,0 +1,128 @@
+# tests/test_forecasting.py
+"""
+Testes do HoltForecaster (Holt amortecido vetorizado por item)
+"""
+
+import pytest
+import pandas as pd
+import numpy as np
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from forecasting import HoltForecaster
+from model_state import ModelState
+from ml_predictor import MLPredictor
+
+
+@pytest.fixture
+def trades(make_trades):
+    def build(seed=0, days=60, per_day=12):
+        # Ferro dobra de preço, log cai pela metade, tábua estável
+        return make_trades(days * per_day, freq=f'{24 * 60 // per_day}min', start='2025-04-01',
+                           seed=seed, cycle=True, decimals=2,
+                           price=lambda rng, codes, t: np.select([codes == 0, codes == 1],
+                                                                 [10 * 2 ** t, 10 * 0.5 ** t], 10.0)
+                           * rng.normal(1, 0.02, len(t)))
+    return build
+
+
+def _holt_reference(y, alpha, beta, phi):
+    """Holt amortecido item a item (laço simples), para conferir a versão vetorizada."""
+    level, trend, sse = np.nan, 0.0, 0.0
+    for value in y:
+        if np.isnan(value):
+            level, trend = level + phi * trend, phi * trend
+            continue
+        if np.isnan(level):
+            level, trend = value, 0.0
+            continue
+        predicted = level + phi * trend
+        sse += (value - predicted) ** 2
+        new_level = predicted + alpha * (value - predicted)
+        trend = beta * (new_level - level) + (1 - beta) * phi * trend
+        level = new_level
+    return level, trend, sse
+
+
+def test_vectorized_matches_reference():
+    rng = np.random.default_rng(3)
+    matrix = np.cumsum(rng.normal(0, 0.05, (20, 40)), axis=1) + 2
+    matrix[rng.random(matrix.shape) < 0.3] = np.nan
+    forecaster = HoltForecaster().fit_matrix(matrix, [f'item {i}' for i in range(20)], first_day=20000)
+
+    for i in range(20):
+        level, trend, sse = _holt_reference(matrix[i], forecaster.alpha_[i], forecaster.beta_[i], forecaster.phi)
+        assert forecaster.level_[i] == pytest.approx(level)
+        assert forecaster.trend_[i] == pytest.approx(trend)
+        assert forecaster.sse_[i] == pytest.approx(sse)
+        # O par escolhido é o de menor erro da grade
+        best = min(_holt_reference(matrix[i], a, b, forecaster.phi)[2]
+                   for a in forecaster.alphas for b in forecaster.betas)
+        assert forecaster.sse_[i] == pytest.approx(best)
+
+
+def test_market_wide_gap_damps_trend():
+    rng = np.random.default_rng(5)
+    matrix = np.cumsum(rng.normal(0.03, 0.01, (2, 30)), axis=1) + 2
+    matrix[:, 20:23] = np.nan  # dias sem nenhum trade
+    gap = HoltForecaster().fit_matrix(matrix, ['iron lump', 'log'], first_day=20000)
+
+    # Mesmos dias, mas com outro item negociado: caminho da lacuna por item
+    with_other = np.vstack([matrix, np.full(30, 2.0)])
+    per_item = HoltForecaster().fit_matrix(with_other, ['iron lump', 'log', 'plank'], first_day=20000)
+    np.testing.assert_allclose(gap.level_, per_item.level_[:2])
+    np.testing.assert_allclose(gap.trend_, per_item.trend_[:2])
+    for i in range(2):
+        level, trend, _ = _holt_reference(matrix[i], gap.alpha_[i], gap.beta_[i], gap.phi)
+        assert gap.trend_[i] == pytest.approx(trend)
+
+
+def test_summary_labels_and_intervals(trades):
+    summary = HoltForecaster().fit_frame(trades()).summary(horizon=14).set_index('main_item')
+    assert summary.loc['iron lump', 'label'] == 'ALTA'
+    assert summary.loc['log', 'label'] == 'BAIXA'
+    assert summary.loc['plank', 'label'] == 'ESTÁVEL'
+    assert (summary['lower'] < summary['forecast']).all() and (summary['forecast'] < summary['upper']).all()
+
+
+def test_forecast_intervals_widen(trades):
+    table = HoltForecaster().fit_frame(trades()).forecast(horizon=5)
+    assert len(table) == 3 * 5
+    width = (table['upper'] - table['lower']).to_numpy().reshape(3, 5)
+    assert (np.diff(width, axis=1) > 0).all()
+    assert table['date'].iloc[0] == pd.Timestamp('2025-05-31')
+
+
+def test_update_matches_single_pass(trades):
+    df = trades(seed=1)
+    whole = HoltForecaster(alphas=[0.3], betas=[0.1])
+    whole.fit_frame(df)
+
+    # Lotes que cortam o mesmo dia no meio
+    split = HoltForecaster(alphas=[0.3], betas=[0.1])
+    split.fit_frame(df.iloc[:100])
+    for lo in range(100, len(df), 41):
+        part = df.iloc[lo:lo + 41]
+        split.update_trades(part['main_item'], part.index.to_numpy(), part['price_s'].to_numpy())
+
+    pd.testing.assert_frame_equal(split.summary(), whole.summary())
+
+
+def test_state_and_predictor_trends(trades, tmp_path):
+    df = trades()
+    state = ModelState()
+    state.sync(df.iloc[:300])
+    state.sync(df)
+    assert state.forecast.last_day is not None and len(state.forecast) == 3
+
+    predictor = MLPredictor(str(tmp_path / 'ml_state.pkl'))
+    insights = predictor.run_prediction(df, analysis_type='trends')
+    assert [i['Tipo'] for i in insights[:2]] == ['ALTA', 'BAIXA']
+    assert insights[0]['Score'].startswith('+')
+    assert 'IC 95%' in insights[0]['Detalhe']
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
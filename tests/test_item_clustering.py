@@ -0,0 +1,82 @@
+# tests/test_item_clustering.py
+"""
+Testes do agrupamento de itens por dinâmica de preço (k-means em mini-lotes)
+"""
+
+import pytest
+import pandas as pd
+import numpy as np
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from item_clustering import ItemClustering, item_features, minibatch_kmeans
+from ml_predictor import MLPredictor
+
+
+@pytest.fixture
+def trades(make_trades):
+    """60 itens em três perfis: preço subindo, caindo e estável mas volátil."""
+    def price(rng, codes, t):
+        profile = codes % 3
+        base = np.exp(codes % 10 / 5) * np.select([profile == 0, profile == 1], [1 + 2 * t, 1 - 0.6 * t], 1.0)
+        return base * rng.lognormal(0, np.where(profile == 2, 0.3, 0.02))
+    return make_trades(60000, freq='4min', items=[f'item {c:02d}' for c in range(60)], seed=4,
+                       price=price, operation=True)
+
+
+def test_minibatch_kmeans_separates_blobs():
+    rng = np.random.default_rng(0)
+    centers = np.array([[0, 0], [10, 0], [0, 10]])
+    x = np.vstack([c + rng.normal(0, 0.5, (500, 2)) for c in centers])
+    found, labels, inertia = minibatch_kmeans(x, 3, batch_size=256)
+    assert len(np.unique(labels)) == 3
+    # Cada bolha inteira num só cluster
+    assert all(len(np.unique(labels[i * 500:(i + 1) * 500])) == 1 for i in range(3))
+    assert np.allclose(np.sort(found[:, 0]), [0, 0, 10], atol=0.3)
+    assert inertia == pytest.approx(((x - found[labels]) ** 2).sum())
+
+
+def test_item_features(trades):
+    features = item_features(trades, curve_weeks=8)
+    assert len(features) == 60
+    assert [c for c in features.columns if c.startswith('curve_')] == [f'curve_{w}' for w in range(8)]
+    np.testing.assert_allclose(features.filter(like='curve_').mean(axis=1), 0, atol=1e-12)
+    profile = features.index.str[-2:].astype(int) % 3
+    assert (features['curve_7'] > features['curve_0'])[profile == 0].all()
+    assert (features['volatility'][profile == 2] > 0.2).all()
+
+
+def test_clusters_follow_profiles_and_cache(trades):
+    clustering = ItemClustering(n_clusters=3)
+    clustering.fit(trades, data_version=1)
+    profile = clustering.labels.index.str[-2:].astype(int) % 3
+    assert pd.crosstab(clustering.labels, profile).gt(0).sum(axis=1).eq(1).all()
+
+    labels = clustering.labels
+    assert clustering.fit(trades.iloc[:100], data_version=1).labels is labels  # em cache
+    assert clustering.fit(trades.iloc[:100], data_version=2).labels.empty
+
+
+def test_similar_items(trades):
+    predictor = MLPredictor()
+    similar = predictor.similar_items(trades, 'ITEM 03', n=5)
+    assert len(similar) == 5 and 'item 03' not in similar['main_item'].tolist()
+    assert similar['same_cluster'].all()
+    assert similar['distance'].is_monotonic_increasing
+    assert all(int(name[-2:]) % 3 == 0 for name in similar['main_item'])
+    assert predictor.similar_items(trades, 'unknown').empty
+
+    insights = predictor.run_prediction(trades, analysis_type='clusters')
+    assert sum(int(i['Score']) for i in insights) == 60
+
+    # Aba de clusters e "Itens similares" compartilham o ajuste do mesmo data_version
+    predictor.similar_items(trades, 'item 03', data_version=7)
+    labels = predictor.clustering.labels
+    predictor.run_prediction(trades, analysis_type='clusters', data_version=7)
+    assert predictor.clustering.labels is labels
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
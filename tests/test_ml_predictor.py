@@ -80,5 +80,66 @@ def test_insufficient_data():
     assert isinstance(results, list)
 
 
+def test_arbitrage_insights():
+    """Testa insights de arbitragem (WTB acima do WTS no mesmo dia)."""
+    predictor = MLPredictor()
+    df = pd.DataFrame({
+        'main_item': ['iron lump', 'iron lump', 'silver lump', 'silver lump'],
+        'operation': ['WTS', 'WTB', 'WTS', 'WTB'],
+        'price_s': [10.0, 15.0, 20.0, 18.0],
+        'date': pd.to_datetime(['2025-01-01'] * 4),
+    })
+
+    results = predictor.run_prediction(df, analysis_type='arbitrage')
+    assert len(results) == 1
+    assert results[0]['Item'] == 'iron lump'
+    assert results[0]['Tipo'] == 'ARBITRAGEM'
+    assert results[0]['Score'] == '50.0%'
+
+
+def test_detect_anomalies_ranked(sample_dataframe):
+    """Testa o Z-Score vetorizado contra o cálculo por item."""
+    predictor = MLPredictor()
+    scores = predictor.score_anomalies(sample_dataframe, recent=10, threshold=1.5)
+
+    assert list(scores['main_item']) == ['silver lump', 'iron lump']
+    silver = sample_dataframe['price_s'][10:]
+    assert scores['z_score'].iloc[0] == pytest.approx((300 - silver.mean()) / silver.std())
+    assert (scores['z_score'].abs().diff().dropna() <= 0).all()
+
+    # Só os 3 trades mais recentes de cada item são avaliados (o outlier do ferro é antigo)
+    insights = predictor.run_prediction(sample_dataframe, analysis_type='anomalies')
+    assert [i['Item'] for i in insights] == ['silver lump']
+    assert insights[0]['Tipo'] == 'ALERTA (CARO)'
+    assert insights[0]['z_score'] > 2
+
+
+def test_preprocess_compact_encodings(sample_dataframe):
+    """Testa as codificações compactas do item (códigos, frequência, alvo suavizado)."""
+    predictor = MLPredictor()
+    df = pd.concat([sample_dataframe, sample_dataframe.iloc[:5]], ignore_index=True)
+    processed = predictor.preprocess_for_ml(df)
+
+    assert not any(col.startswith('item_') and col not in ('item_code', 'item_freq', 'item_target')
+                   for col in processed.columns)
+    assert isinstance(processed['main_item'].dtype, pd.CategoricalDtype)
+    assert processed['item_freq'].iloc[0] == pytest.approx(15 / 25)
+
+    iron = df.loc[df['main_item'] == 'iron lump', 'price_s']
+    m = predictor.TARGET_SMOOTHING
+    expected = (iron.sum() + m * df['price_s'].mean()) / (len(iron) + m)
+    assert processed['item_target'].iloc[0] == pytest.approx(expected, rel=1e-6)
+
+
+def test_item_onehot_sparse(sample_dataframe):
+    """Testa o one-hot esparso contra get_dummies."""
+    pytest.importorskip('scipy')
+    predictor = MLPredictor()
+    matrix, items = predictor.item_onehot(predictor.preprocess_for_ml(sample_dataframe))
+    dense = pd.get_dummies(sample_dataframe['main_item']).to_numpy(dtype=np.uint8)
+    assert list(items) == ['iron lump', 'silver lump']
+    np.testing.assert_array_equal(matrix.toarray(), dense)
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,94 @@
+# tests/test_model_state.py
+"""
+Testes do estado incremental do modelo (momentos, persistência e warm start)
+"""
+
+import pytest
+import pandas as pd
+import numpy as np
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from model_state import ItemMoments, ModelState
+from ml_predictor import MLPredictor
+
+
+@pytest.fixture
+def trades(make_trades):
+    return make_trades(600, freq='2h', start='2025-02-01', seed=11, decimals=2,
+                       price=lambda rng, codes, t: rng.lognormal(2, 0.4, len(t)))
+
+
+def test_moments_merge_matches_groupby(trades):
+    moments = ItemMoments()
+    for lo in range(0, len(trades), 97):
+        part = trades.iloc[lo:lo + 97]
+        moments.update(part['main_item'], part['price_s'].to_numpy())
+
+    table = moments.table().sort_index()
+    expected = trades.groupby('main_item')['price_s'].agg(['count', 'mean', 'std'])
+    np.testing.assert_array_equal(table['count'], expected['count'])
+    np.testing.assert_allclose(table[['mean', 'std']], expected[['mean', 'std']], rtol=1e-10)
+
+
+def test_sync_only_new_rows_and_persist(trades, tmp_path):
+    path = str(tmp_path / 'ml_state.pkl')
+    state = ModelState()
+    assert state.sync(trades.iloc[:400], data_version=1) == 400
+    assert state.sync(trades.iloc[:400], data_version=1) == 0
+    state.save(path)
+
+    loaded = ModelState.load(path)
+    assert loaded.stamp['rows'] == 400 and loaded.stamp['data_version'] == 1
+    assert loaded.sync(trades, data_version=1) == 200
+    assert loaded.moments.get('log')['count'] == (trades['main_item'] == 'log').sum()
+
+    # Outro dataset (começa em outra data): estado reconstruído
+    assert loaded.sync(trades.iloc[50:]) == 550
+    assert loaded.moments.table()['count'].sum() == 550
+
+
+def test_out_of_order_batch_rebuilds(trades):
+    state = ModelState()
+    state.sync(trades.iloc[::2])
+    assert state.sync(trades) == len(trades)
+    assert state.moments.table()['count'].sum() == len(trades)
+
+
+def test_predictor_warm_start(trades, tmp_path):
+    path = str(tmp_path / 'ml_state.pkl')
+    predictor = MLPredictor(path)
+    assert predictor.update_model(trades) == len(trades)
+    expected = predictor.score_anomalies(trades, recent=5, threshold=1.0)
+
+    warm = MLPredictor(path)
+    assert not warm.model.is_empty
+    assert warm.update_model(trades) == 0
+    moments = warm._synced_moments(trades)
+    pd.testing.assert_frame_equal(warm.score_anomalies(trades, recent=5, threshold=1.0, moments=moments),
+                                  expected)
+
+
+def test_queries_leave_state_alone(trades, tmp_path):
+    path = tmp_path / 'ml_state.pkl'
+    predictor = MLPredictor(str(path))
+    predictor.update_model(trades, data_version=4)
+    stamp, saved = dict(predictor.model.stamp), path.stat().st_mtime_ns
+
+    subset = trades.iloc[:300]
+    for analysis_type in ('anomalies', 'rolling', 'trends'):
+        predictor.run_prediction(subset, analysis_type=analysis_type)
+    assert predictor.model.stamp == stamp and path.stat().st_mtime_ns == saved
+    assert predictor._synced_moments(subset) is None
+    assert predictor._synced_moments(trades, data_version=5) is None
+    assert predictor._synced_moments(trades, data_version=4) is not None
+
+    # Sem estado, a consulta sai do próprio DataFrame
+    local = MLPredictor().detect_anomalies(subset, data_version=1)
+    assert predictor.detect_anomalies(subset, data_version=1) == local
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,88 @@
+# tests/test_parallel_fitting.py
+"""
+Testes do ajuste por item em paralelo (pool de processos + memória compartilhada)
+"""
+
+import threading
+import time
+
+import pytest
+import pandas as pd
+import numpy as np
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from parallel_fitting import fit_ar_daily, fit_items_parallel, _shards
+from ml_predictor import MLPredictor
+
+
+@pytest.fixture
+def trades(make_trades):
+    return make_trades(6000, freq='30min', items=[f'item {i}' for i in range(12)], seed=2,
+                       price=lambda rng, codes, t: rng.lognormal(2, 0.2, len(t)))
+
+
+def _item_fit(df, item):
+    rows = df[df['main_item'] == item]
+    return fit_ar_daily(item, rows.index.to_numpy().astype('datetime64[ns]').astype(np.int64),
+                        rows['price_s'].to_numpy())
+
+
+def test_parallel_matches_serial(trades):
+    calls = []
+    results = fit_items_parallel(trades, max_workers=2, progress=lambda done, total: calls.append((done, total)))
+    assert sorted(results) == sorted(trades['main_item'].unique())
+    for item in ['item 0', 'item 7']:
+        np.testing.assert_allclose(results[item]['coef'], _item_fit(trades, item)['coef'])
+    assert calls[0] == (0, 12) and calls[-1] == (12, 12)
+
+
+def test_items_subset_and_kwargs(trades):
+    results = fit_items_parallel(trades, items=['item 1', 'item 2'], max_workers=1, order=1)
+    assert sorted(results) == ['item 1', 'item 2']
+    assert len(results['item 1']['coef']) == 2
+
+
+def test_cancel_before_start(trades):
+    cancel = threading.Event()
+    cancel.set()
+    assert fit_items_parallel(trades, max_workers=2, cancel=cancel) == {}
+
+
+def _slow_marking_fit(item, timestamps, prices, marks=None):
+    """Ajuste lento que deixa um arquivo por item (mostra o que rodou nos workers)."""
+    time.sleep(0.2)
+    Path(marks, item.replace(' ', '_')).write_text(str(len(prices)))
+    return {'n': len(prices)}
+
+
+def test_cancel_waits_for_running_shards(trades, tmp_path):
+    cancel = threading.Event()
+    progress = lambda done, total: cancel.set() if done else None
+    results = fit_items_parallel(trades, fit_func=_slow_marking_fit, max_workers=2, cancel=cancel,
+                                 progress=progress, marks=str(tmp_path))
+    assert 0 < len(results) < 12
+    # Lotes em andamento terminaram antes do unlink: nenhum worker roda depois do retorno
+    finished = len(list(tmp_path.iterdir()))
+    time.sleep(0.6)
+    assert len(list(tmp_path.iterdir())) == finished
+
+
+def test_shards_balance_rows():
+    slices = [(f'i{k}', k * 10, k * 10 + 10) for k in range(10)]
+    shards = _shards(slices, 4)
+    assert [item for shard in shards for item, _, _ in shard] == [f'i{k}' for k in range(10)]
+    assert max(len(s) for s in shards) <= 3
+
+
+def test_predictor_models_insights(trades):
+    insights = MLPredictor().run_prediction(trades, analysis_type='models')
+    assert len(insights) == 12
+    assert insights[0]['Tipo'].startswith('AR (')
+    assert abs(insights[0]['change_pct']) >= abs(insights[-1]['change_pct'])
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,128 @@
+# tests/test_relevance.py
+"""
+Testes do score de relevância (recência, volume, desvio da referência e spread)
+"""
+
+import pytest
+import pandas as pd
+import numpy as np
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from relevance import item_relevance, top_k, trade_relevance
+from wurm_stats_engine import market_summary
+from price_manager import PriceManager
+from ml_predictor import MLPredictor
+
+
+@pytest.fixture
+def trades(make_trades):
+    rows = []
+    # iron: muitos trades recentes, preço no base; log: poucos e antigos;
+    # plank: recente, bem acima do preço base e com spread WTS/WTB largo
+    for day in range(30):
+        rows += [('iron lump', 'WTS', 10.0, f'2025-05-{day + 1:02d}')] * 4
+        rows += [('iron lump', 'WTB', 9.5, f'2025-05-{day + 1:02d}')]
+    rows += [('log', 'WTS', 2.0, '2025-05-01'), ('log', 'WTB', 2.0, '2025-05-02')]
+    rows += [('plank', 'WTS', 8.0, '2025-05-29'), ('plank', 'WTB', 4.0, '2025-05-30'),
+             ('plank', 'WTS', 8.0, '2025-05-30')]
+    items, operations, prices, dates = zip(*rows)
+    df = make_trades(items=items, cycle=True, price=prices, operation=operations, timestamps=dates)
+    return df.assign(date=df.index).sort_index()
+
+
+@pytest.fixture
+def references():
+    manager = PriceManager()
+    manager.prices = {'iron lump': 10.0, 'plank': 4.0}
+    return manager
+
+
+def test_top_k_matches_full_sort():
+    rng = np.random.default_rng(1)
+    scores = rng.random(1000)
+    scores[rng.integers(0, 1000, 20)] = np.nan
+    expected = np.argsort(-np.nan_to_num(scores, nan=-np.inf), kind='stable')[:25]
+    np.testing.assert_array_equal(top_k(scores, 25), expected)
+    assert len(top_k(scores, 5000)) == 980
+    assert len(top_k(scores, 0)) == 0
+
+
+def test_item_components(trades, references):
+    table = item_relevance(market_summary(trades), references.prices)
+    assert table.loc['iron lump', 'volume'] == pytest.approx(1.0)
+    assert table.loc['iron lump', 'recency'] == pytest.approx(1.0)
+    assert table.loc['log', 'recency'] == pytest.approx(0.5 ** (28 / 7))
+    assert table.loc['iron lump', 'deviation'] == pytest.approx(0.0)
+    # plank: WTS 8 contra base 4 -> desvio máximo; WTS/WTB = 2 -> spread máximo
+    assert table.loc['plank', ['deviation', 'spread']].tolist() == [1.0, 1.0]
+    assert table.loc['log', 'reference_source'] == 'mercado'
+    assert table['score'].between(0, 100).all()
+    assert table['score'].idxmax() == 'plank'
+
+    # Determinístico
+    pd.testing.assert_frame_equal(item_relevance(market_summary(trades), references.prices), table)
+
+
+def test_deviation_uses_latest_operation_price():
+    # Sem preço base: desvio do último preço (operação mais recente) contra a mediana WTS
+    summary = pd.DataFrame({
+        'count': [5, 5], 'median_price': [10.0, 10.0], 'last_price': [10.0, 20.0],
+        'last_seen': pd.to_datetime(['2025-05-10', '2025-05-01']),
+    }, index=pd.MultiIndex.from_tuples([('log', 'WTS'), ('log', 'WTB')], names=['main_item', 'operation']))
+    assert item_relevance(summary).loc['log', 'deviation'] == pytest.approx(0.0)
+    assert item_relevance(summary.iloc[::-1]).loc['log', 'deviation'] == pytest.approx(0.0)
+    later = summary.assign(last_seen=pd.to_datetime(['2025-05-01', '2025-05-10']))
+    assert item_relevance(later).loc['log', 'deviation'] == pytest.approx(1.0)
+
+
+def test_trade_relevance(trades, references):
+    table = item_relevance(market_summary(trades), references.prices)
+    scores = trade_relevance(pd.Series(['iron lump', 'iron lump', 'unknown']), np.array([10.0, 20.0, 5.0]), table)
+    assert scores[1] > scores[0]
+    assert np.isnan(scores[2])
+
+    old = trade_relevance(pd.Series(['iron lump']), np.array([10.0]), table,
+                          timestamps=np.array(['2025-05-16'], dtype='datetime64[ns]'))
+    assert old[0] < scores[0]
+
+
+def test_predictor_relevance_insights(trades, references):
+    predictor = MLPredictor(price_manager=references)
+    insights = predictor.run_prediction(trades, analysis_type='relevance')
+    assert [i['Item'] for i in insights] == ['plank', 'iron lump', 'log']
+    assert insights[0]['Tipo'] == 'DESVIO DE PREÇO'
+    assert 'Ref. base' in insights[0]['Detalhe'] and 'Ref. mercado' in insights[2]['Detalhe']
+
+
+def test_bulk_items_compare_unit_prices():
+    # Tijolos vendidos em lotes de 1000 a 175c; o preço base do PriceManager é por unidade
+    ts = pd.date_range('2025-05-01', periods=6, freq='D')
+    df = pd.DataFrame({'main_item': 'stone brick', 'operation': ['WTS', 'WTB'] * 3,
+                       'price_s': 175.0, 'main_qty': 1000.0}, index=pd.DatetimeIndex(ts, name='timestamp'))
+    manager = PriceManager()
+    manager.prices = {'stone brick': 0.175}
+    table = MLPredictor(price_manager=manager).relevance_table(df)
+    assert table.loc['stone brick', 'price'] == pytest.approx(0.175)
+    assert table.loc['stone brick', 'deviation'] == pytest.approx(0.0)
+    assert trade_relevance(pd.Series(['stone brick']), np.array([0.35]), table)[0] > \
+        trade_relevance(pd.Series(['stone brick']), np.array([0.175]), table)[0]
+
+
+def test_opportunities_score_is_deterministic():
+    df = pd.DataFrame({
+        'main_item': ['iron lump'] * 10 + ['silver lump'] * 10,
+        'price_s': [50, 52, 51, 53, 200, 49, 50, 51, 52, 50, 100, 102, 101, 103, 99, 100, 101, 102, 300, 100],
+        'date': pd.date_range('2025-01-01', periods=20),
+    })
+    df['price_iron'] = df['price_s'] * 100
+    first = MLPredictor().run_prediction(df)
+    assert first == MLPredictor().run_prediction(df)
+    assert first[0]['Item'] == 'silver lump'
+    assert float(first[0]['Score de Risco']) > 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
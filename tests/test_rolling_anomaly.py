@@ -0,0 +1,81 @@
+# tests/test_rolling_anomaly.py
+"""
+Testes do RollingAnomalyDetector (mediana/MAD móveis por item)
+"""
+
+import pytest
+import pandas as pd
+import numpy as np
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from rolling_anomaly import RollingAnomalyDetector, _median_mad
+from ml_predictor import MLPredictor
+
+
+@pytest.fixture
+def trades(make_trades):
+    def build(seed=0, days=30, per_day=24):
+        # Preço do ferro sobe aos poucos (deriva); o log é estável
+        return make_trades(days * per_day, freq=f'{24 * 60 // per_day}min', start='2025-03-01',
+                           items=('iron lump', 'log'), seed=seed, cycle=True, decimals=2,
+                           price=lambda rng, codes, t: 10 * np.where(codes == 0, 1 + t, 1.0)
+                           * rng.normal(1, 0.03, len(t)))
+    return build
+
+
+def test_median_mad_sorted_window():
+    rng = np.random.default_rng(5)
+    for n in range(1, 30):
+        values = sorted(rng.integers(0, 20, n).astype(float).tolist())
+        median, mad, count = _median_mad(values)
+        assert median == np.median(values)
+        assert mad == np.median(np.abs(np.array(values) - np.median(values)))
+        assert count == n
+
+
+def test_flags_outlier_and_ignores_drift(trades):
+    df = trades()
+    spike = pd.DataFrame({'main_item': ['log'], 'price_s': [40.0]},
+                         index=pd.DatetimeIndex([pd.Timestamp('2025-03-31 01:00')], name='timestamp'))
+    detector = RollingAnomalyDetector(window_days=7, threshold=6, min_days=3)
+
+    # A deriva do ferro (10 -> 20 em 30 dias) não é marcada
+    assert detector.update_frame(df).empty
+    flags = detector.update_frame(spike)
+    assert flags['main_item'].tolist() == ['log']
+    assert flags['robust_z'].iloc[0] > 3.5
+    assert detector.baseline('log')['days'] == 7
+
+    # Linhas já vistas não são reprocessadas
+    assert detector.update_frame(pd.concat([df, spike])).empty
+    assert len(detector.recent_flags()) == 1
+
+
+def test_batches_match_single_pass(trades):
+    df = trades(seed=1)
+    df.iloc[400, df.columns.get_loc('price_s')] = 1.0
+    whole = RollingAnomalyDetector(window_days=5, min_days=2)
+    expected = whole.update(df['main_item'], df.index.to_numpy(), df['price_s'].to_numpy())
+
+    # Lotes que cortam o mesmo dia no meio
+    split = RollingAnomalyDetector(window_days=5, min_days=2)
+    parts = [split.update_frame(df.iloc[lo:lo + 37]) for lo in range(0, len(df), 37)]
+    pd.testing.assert_frame_equal(pd.concat([p for p in parts if not p.empty], ignore_index=True), expected)
+    assert len(expected) >= 1
+
+
+def test_predictor_rolling_insights(trades):
+    predictor = MLPredictor()
+    df = trades()
+    df.iloc[-2, df.columns.get_loc('price_s')] = 2.0
+    insights = predictor.run_prediction(df, analysis_type='rolling')
+    assert insights[0]['Item'] == 'iron lump'
+    assert insights[0]['Tipo'] == 'OPORTUNIDADE (BARATO)'
+    assert 'mediana móvel' in insights[0]['Detalhe']
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,81 @@
+# tests/test_sharded_engine.py
+"""
+Testes do ShardedEngine (um engine por servidor)
+"""
+
+import pytest
+import pandas as pd
+import numpy as np
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sharded_engine import ShardedEngine
+
+
+def _server_frame(seed, price_scale):
+    n = 150
+    rng = np.random.default_rng(seed)
+    ts = pd.date_range('2025-05-01', periods=n, freq='4h')
+    return pd.DataFrame({
+        'timestamp': ts,
+        'date': ts.normalize(),
+        'main_item': np.array(['iron lump', 'log', 'stone brick'])[np.arange(n) % 3],
+        'price_s': np.round(rng.uniform(1, 10, n) * price_scale, 2),
+        'operation': np.where(np.arange(n) % 2 == 0, 'WTS', 'WTB'),
+    })
+
+
+@pytest.fixture
+def shards():
+    engine = ShardedEngine(max_workers=2)
+    engine.register('freedom', df=_server_frame(1, 1.0))
+    engine.register('epic', df=_server_frame(2, 3.0))
+    return engine
+
+
+def test_load_and_unload(shards):
+    assert shards.loaded == []
+    assert shards.load() == ['freedom', 'epic']
+    assert shards.load() == []
+    shards.unload(['epic'])
+    assert shards.loaded == ['freedom']
+    assert len(shards.memory_usage()) == 1
+    # Consulta só nos shards carregados; engine() recarrega sob demanda
+    assert set(shards.filter_by_item('log')['shard']) == {'freedom'}
+    assert len(shards.engine('epic').df) == 150
+    with pytest.raises(KeyError):
+        shards.load(['chaos'])
+
+
+def test_cross_server_queries(shards):
+    shards.load()
+    prices = shards.compare_prices('iron lump', freq='D', exact=True)
+    assert list(prices.columns) == ['freedom', 'epic']
+    assert (prices['epic'].mean() > prices['freedom'].mean())
+
+    top = shards.get_top_items(3)
+    assert top['count'].tolist() == [100, 100, 100]
+    assert (top['shards'] == 2).all()
+
+    quantiles = shards.compare_quantiles('log')
+    assert quantiles.loc['epic', 0.5] > quantiles.loc['freedom', 0.5]
+
+    trades = shards.filter_by_item('stone', start='2025-05-03', end='2025-05-04')
+    assert trades.index.is_monotonic_increasing
+    assert set(trades['shard']) == {'freedom', 'epic'}
+
+
+def test_append_routes_to_shard(shards):
+    shards.load()
+    shards.append_data('epic', pd.DataFrame({
+        'timestamp': [pd.Timestamp('2025-06-01 10:00')], 'date': [pd.Timestamp('2025-06-01')],
+        'main_item': ['plank'], 'price_s': [1.0], 'operation': ['WTS'],
+    }))
+    result = shards.filter_by_item('plank')
+    assert result['shard'].tolist() == ['epic']
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
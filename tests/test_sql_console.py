@@ -0,0 +1,93 @@
+# tests/test_sql_console.py
+"""
+Testes do console SQL (DuckDB e SQLite)
+"""
+
+import pytest
+import pandas as pd
+import numpy as np
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from wurm_stats_engine import WurmStatsEngine
+from sql_console import SQLConsole
+
+
+@pytest.fixture
+def engine():
+    n = 120
+    ts = pd.date_range('2025-03-01', periods=n, freq='6h')
+    df = pd.DataFrame({
+        'timestamp': ts,
+        'date': ts.normalize(),
+        'main_item': np.array(['iron lump', 'stone brick', 'log'])[np.arange(n) % 3],
+        'main_ql': np.linspace(10, 90, n),
+        'price_s': np.arange(n, dtype=float) + 1,
+        'operation': np.where(np.arange(n) % 2 == 0, 'WTS', 'WTB'),
+        'player': np.array(['Ana', 'Bob'])[np.arange(n) % 2],
+    })
+    return WurmStatsEngine(df=df.set_index('timestamp'))
+
+
+@pytest.fixture(params=['sqlite', 'duckdb'])
+def console(request, engine):
+    if request.param == 'duckdb':
+        pytest.importorskip('duckdb')
+    return SQLConsole(engine, backend=request.param)
+
+
+def test_tables_registered(console):
+    tables = console.tables()
+    for name in ('trades', 'daily', 'weekly', 'monthly', 'players', 'ql_prices', 'top_items'):
+        assert name in tables
+    assert 'price_s' in console.describe('trades')['column_name'].tolist()
+
+
+def test_query_matches_pandas(console, engine):
+    result = console.query(
+        "SELECT main_item, count(*) AS n, sum(price_s) AS total FROM trades "
+        "WHERE operation = ? GROUP BY main_item ORDER BY main_item", ['WTS'])
+    wts = engine.df[engine.df['operation'] == 'WTS']
+    expected = wts.groupby('main_item', observed=True)['price_s'].agg(['count', 'sum'])
+    assert result['main_item'].tolist() == expected.index.tolist()
+    assert result['n'].tolist() == expected['count'].tolist()
+    assert np.allclose(result['total'], expected['sum'])
+
+    daily = console.query("SELECT sum(trades) AS trades FROM daily")
+    assert int(daily['trades'][0]) == len(engine.df)
+
+
+def test_pages_and_limit(console):
+    pages = list(console.pages("SELECT * FROM trades ORDER BY price_s", page_size=50))
+    assert [len(p) for p in pages] == [50, 50, 20]
+    assert pages[1]['price_s'].iloc[0] == 51
+    assert len(console.query("SELECT * FROM trades", max_rows=7)) == 7
+
+
+def test_refresh_after_append(console, engine):
+    assert console.query("SELECT count(*) AS n FROM trades")['n'][0] == 120
+    engine.append_data(pd.DataFrame({
+        'timestamp': [pd.Timestamp('2025-04-01 10:00')], 'date': [pd.Timestamp('2025-04-01')],
+        'main_item': ['log'], 'main_ql': [50.0], 'price_s': [9.0], 'operation': ['WTS'], 'player': ['Cid'],
+    }))
+    assert console.query("SELECT count(*) AS n FROM trades")['n'][0] == 121
+    assert 'cid' in console.query("SELECT player FROM players")['player'].tolist()
+
+
+def test_trades_keep_pooled_text(engine):
+    df = engine.df.reset_index().assign(raw_text=[f'WTS item {i}' for i in range(len(engine.df))])
+    pooled = WurmStatsEngine(df=df.set_index('timestamp'))
+    assert 'raw_text' not in pooled.df.columns  # texto vive no StringPool
+    result = SQLConsole(pooled, backend='sqlite').query("SELECT raw_text FROM trades WHERE price_s = 5")
+    assert result['raw_text'].tolist() == ['WTS item 4']
+
+
+def test_invalid_backend(engine):
+    with pytest.raises(ValueError):
+        SQLConsole(engine, backend='oracle')
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
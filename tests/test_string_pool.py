@@ -0,0 +1,75 @@
+# tests/test_string_pool.py
+"""
+Testes do StringPool e da busca de texto do engine
+"""
+
+import pytest
+import pandas as pd
+import numpy as np
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from string_pool import StringPool
+from wurm_stats_engine import WurmStatsEngine
+
+
+def test_pool_roundtrip_and_dedup():
+    values = ['WTS iron lump', None, 'WTB Log', 'WTS iron lump', 'ação\nnova']
+    pool = StringPool(values)
+    assert pool.n_unique == 3
+    assert list(pool.take(slice(None))) == ['WTS iron lump', None, 'WTB Log', 'WTS iron lump', 'ação nova']
+
+    pool.extend(pd.Series(['wtb plank', np.nan]))
+    assert len(pool) == 7
+    assert pool.take([5, 6]).tolist() == ['wtb plank', None]
+
+
+@pytest.mark.parametrize('needle,case', [('wts', False), ('WTS', True), ('iron lump', False),
+                                         ('ç', True), ('b l', False), ('xyz', False)])
+def test_pool_contains_matches_pandas(needle, case):
+    rng = np.random.default_rng(3)
+    words = np.array(['WTS', 'wtb', 'Iron', 'lump', 'ação', 'Log', 'b', 'l'])
+    values = pd.Series([' '.join(rng.choice(words, 3)) for _ in range(500)] + [None])
+    pool = StringPool(values)
+    expected = values.str.contains(needle, case=case, regex=False).fillna(False).to_numpy(dtype=bool)
+    np.testing.assert_array_equal(pool.contains(needle, case_sensitive=case), expected)
+
+
+def test_pool_search_terms():
+    pool = StringPool(['WTS iron lump ql50', 'WTS iron ore', 'WTB iron lump', None])
+    assert pool.search(['wts', 'iron'], ['ore']).tolist() == [True, False, False, False]
+    assert pool.search([], ['lump']).tolist() == [False, True, False, True]
+
+
+def test_engine_search_text():
+    ts = pd.date_range('2025-01-01', periods=6, freq='h')
+    df = pd.DataFrame({
+        'timestamp': ts[::-1],
+        'main_item': ['iron lump', 'log', 'iron lump', 'log', 'plank', 'iron lump'],
+        'price_s': np.arange(6, dtype=float),
+        'operation': ['WTS', 'WTB'] * 3,
+        'raw_text': [f'<p{i}> {op} item {i}' for i, op in enumerate(['WTS', 'WTB'] * 3)],
+    })
+    engine = WurmStatsEngine(df=df)
+    assert 'raw_text' not in engine.df.columns
+    assert len(engine.text_pools['raw_text']) == len(engine.df)
+
+    result = engine.search_text('wtb', exclude='<p1>')
+    assert result['raw_text'].tolist() == ['<p5> WTB item 5', '<p3> WTB item 3']
+    assert (result['operation'] == 'WTB').all()
+
+    # Lote fora de ordem: os códigos do pool seguem a reordenação do DataFrame
+    engine.append_data(pd.DataFrame({'timestamp': [ts[0] - pd.Timedelta(hours=1)], 'main_item': ['log'],
+                                     'price_s': [9.0], 'operation': ['WTB'], 'raw_text': ['<p9> WTB early']}))
+    result = engine.search_text('wtb')
+    assert result['raw_text'].iloc[0] == '<p9> WTB early'
+    assert result['price_s'].iloc[0] == 9.0
+
+    # Sem raw_text, a busca usa as categorias de main_item
+    assert len(engine.search_text('lump', column='main_item')) == 3
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,102 @@
+# tests/test_trade_store.py
+"""
+Testes do TradeStore (SQLite) e do engine em modo store
+"""
+
+import pytest
+import pandas as pd
+import numpy as np
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from wurm_stats_engine import WurmStatsEngine
+from trade_store import TradeStore
+
+
+@pytest.fixture
+def trades():
+    n = 240
+    rng = np.random.default_rng(5)
+    ts = pd.date_range('2025-01-10', periods=n, freq='3h')
+    items = np.array(['iron lump', 'Iron Ore', 'stone brick', 'log'])[np.arange(n) % 4]
+    ops = np.where(rng.random(n) < 0.5, 'WTS', 'WTB')
+    players = np.array(['Ana', 'bob', 'Cid'])[np.arange(n) % 3]
+    prices = np.round(rng.uniform(1, 50, n), 2)
+    prices[::17] = np.nan
+    return pd.DataFrame({
+        'timestamp': ts,
+        'date': ts.normalize(),
+        'main_item': items,
+        'player': players,
+        'operation': ops,
+        'price_s': prices,
+        'main_ql': rng.uniform(1, 99, n),
+        'raw_text': [f"{o} {i} ql {q:.0f} by {p}" for o, i, q, p in
+                     zip(ops, items, rng.uniform(1, 99, n), players)],
+    })
+
+
+@pytest.fixture
+def engines(trades, tmp_path):
+    memory = WurmStatsEngine(df=trades)
+    store = TradeStore(tmp_path / 'trades.db')
+    assert memory.save_to_store(store) == len(trades)
+    yield memory, WurmStatsEngine(store=store)
+    store.close()
+
+
+def test_store_schema_and_metadata(engines, tmp_path):
+    _, engine = engines
+    names = {r[0] for r in engine.store._con.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {'idx_trades_item_date', 'idx_trades_player', 'idx_trades_operation_date'} <= names
+    assert engine.df is None
+    assert engine.get_stats()['total_records'] == 240
+
+    # Reabrir o arquivo mantém os dados
+    with TradeStore(tmp_path / 'trades.db') as reopened:
+        assert len(reopened) == 240
+
+
+@pytest.mark.parametrize('window', [(None, None), ('2025-01-15', '2025-01-20')])
+def test_store_matches_memory(engines, window):
+    memory, stored = engines
+    start, end = window
+
+    expected = memory.filter_by_item('iron', start=start, end=end)
+    result = stored.filter_by_item('iron', start=start, end=end)
+    assert len(result) == len(expected)
+    assert (result.index == expected.index).all()
+    np.testing.assert_allclose(result['price_s'], expected['price_s'])
+
+    for method in ('calculate_volatility', 'calculate_mean_average', 'calculate_profit_margins'):
+        expected = getattr(memory, method)('iron', start=start, end=end)
+        result = getattr(stored, method)('iron', start=start, end=end)
+        pd.testing.assert_frame_equal(result, expected, check_dtype=False, check_freq=False,
+                                      check_index_type=False)
+
+
+def test_store_player_and_text_search(engines):
+    memory, stored = engines
+    result = stored.get_player_trades('BOB')
+    assert len(result) == len(memory.get_player_trades('bob')) == 80
+
+    hits = stored.store.search_text('WTB AND stone')
+    assert len(hits) > 0
+    assert (hits['main_item'] == 'stone brick').all()
+    assert (hits['operation'] == 'WTB').all()
+
+
+def test_store_append_updates_items(engines):
+    _, stored = engines
+    assert stored.match_items('plank') == []
+    stored.store.append(pd.DataFrame({'timestamp': [pd.Timestamp('2025-03-01 12:00')],
+                                      'main_item': ['plank'], 'price_s': [2.0], 'operation': ['WTS']}))
+    assert stored.match_items('plank') == ['plank']
+    assert len(stored.filter_by_item('plank', exact=True)) == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -5,6 +5,7 @@ Testes unitários para WurmStatsEngine
 
 import pytest
 import pandas as pd
+import numpy as np
 import tempfile
 import json
 import os
@@ -14,7 +15,8 @@ from pathlib import Path
 import sys
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from wurm_stats_engine import WurmStatsEngine
+from wurm_stats_engine import WurmStatsEngine, market_summary, scan_arbitrage
+from item_canonicalizer import ItemCanonicalizer, bounded_edit_distance
 
 
 @pytest.fixture
@@ -81,5 +83,404 @@ def test_empty_filter(sample_data_file):
     assert result.empty
 
 
+@pytest.fixture
+def noisy_dataframe():
+    """DataFrame com categorias de ruído (mensagens de chat)."""
+    items = ['iron lump', 'This is the Trade channel', 'silver lump',
+             'Rare casket', 'iron lump', None]
+    return pd.DataFrame({
+        'main_item': pd.Categorical(items),
+        'price_s': [50, 0, 100, 10, 52, 1],
+        'operation': ['WTS'] * 6,
+    })
+
+
+def test_noise_mask_marks_noise_rows(noisy_dataframe):
+    """Testa a máscara de ruído calculada por categoria."""
+    engine = WurmStatsEngine(df=noisy_dataframe)
+
+    assert engine.valid_mask.tolist() == [True, False, True, False, True, True]
+    assert len(engine.cleaned_df) == 4
+    # Não duplica o DataFrame principal
+    assert len(engine.df) == 6
+
+
+def test_add_noise_terms_at_runtime(noisy_dataframe):
+    """Testa extensão da lista de ruído em tempo de execução."""
+    engine = WurmStatsEngine(df=noisy_dataframe)
+
+    assert engine.add_noise_terms(['SILVER']) == 1
+    assert engine.add_noise_terms(['silver']) == 0
+    assert engine.valid_mask.tolist() == [True, False, False, False, True, True]
+
+
+def test_aho_corasick_find_all():
+    """Testa o autômato com padrões sobrepostos."""
+    from noise_filter import AhoCorasick
+
+    ac = AhoCorasick(['he', 'she', 'his', 'hers'])
+    matches = sorted(ac.find_all('ushers'))
+    assert matches == [(1, 'she'), (2, 'he'), (2, 'hers')]
+    assert not ac.contains_any('xyz')
+
+
+@pytest.fixture
+def market_dataframe():
+    """Dois itens ao longo de 10 dias, já indexados por timestamp."""
+    n = 200
+    rng = np.random.default_rng(7)
+    ts = pd.date_range('2025-01-01', periods=n, freq='72min')
+    df = pd.DataFrame({
+        'timestamp': ts,
+        'date': ts.normalize(),
+        'main_item': pd.Categorical(np.where(np.arange(n) % 2 == 0, 'iron lump', 'silver lump')),
+        'price_s': np.round(rng.uniform(10, 100, n), 2),
+        'operation': pd.Categorical(np.where(np.arange(n) % 3 == 0, 'WTB', 'WTS')),
+    })
+    return df.set_index('timestamp')
+
+
+def test_price_quantiles_bounded_error(market_dataframe):
+    """Testa percentis dos sketches contra o cálculo exato."""
+    engine = WurmStatsEngine(df=market_dataframe)
+    iron = market_dataframe[market_dataframe['main_item'] == 'iron lump']['price_s']
+
+    q = engine.get_price_quantiles('Iron Lump', (0.1, 0.5, 0.9))
+    for level, approx in q.items():
+        exact = np.quantile(iron, level, method='lower')
+        assert abs(approx - exact) / exact <= 0.03
+
+    window = iron['2025-01-03':'2025-01-05']
+    median = engine.get_price_quantiles('iron lump', (0.5,), start='2025-01-03', end='2025-01-05')[0.5]
+    assert abs(median - np.median(window)) / np.median(window) <= 0.05
+    assert engine.get_price_quantiles('unknown', (0.5,))[0.5] is None
+
+
+def test_append_data_merges_sketches(market_dataframe):
+    """Testa que lotes anexados atualizam sketches e versão."""
+    engine = WurmStatsEngine(df=market_dataframe.iloc[:100])
+    version = engine.data_version
+
+    added = engine.append_data(market_dataframe.iloc[100:].reset_index())
+    assert added == 100
+    assert len(engine.df) == 200
+    assert engine.data_version == version + 1
+    assert isinstance(engine.df['main_item'].dtype, pd.CategoricalDtype)
+    assert engine.price_sketches.sketch('silver lump').count == 100
+
+
+def test_top_items_matches_value_counts(market_dataframe):
+    """Testa o top de itens (Space-Saving) contra value_counts."""
+    engine = WurmStatsEngine(df=market_dataframe)
+
+    top = engine.get_top_items(2)
+    expected = market_dataframe['main_item'].value_counts()
+    assert dict(zip(top['main_item'], top['count'])) == expected.astype(float).to_dict()
+
+    window = engine.get_top_items(1, start='2025-01-02', end='2025-01-02')
+    day = market_dataframe.loc['2025-01-02', 'main_item'].value_counts()
+    assert window['count'].iloc[0] == day.max()
+
+
+def test_space_saving_overestimates_only():
+    """Testa a garantia de superestimação do Space-Saving."""
+    from heavy_hitters import SpaceSaving
+
+    keys = ['a'] * 50 + ['b'] * 30 + [f'x{i}' for i in range(40)]
+    summary = SpaceSaving(capacity=5)
+    for chunk in range(0, len(keys), 10):
+        summary.update(keys[chunk:chunk + 10])
+
+    top = dict((k, c) for k, c, _ in summary.top(2))
+    assert set(top) == {'a', 'b'}
+    assert top['a'] >= 50 and top['b'] >= 30
+
+
+def test_time_range_slicing(market_dataframe):
+    """Testa fatias por intervalo de datas nos métodos de análise."""
+    engine = WurmStatsEngine(df=market_dataframe)
+
+    sliced = engine.filter_by_item('iron', start='2025-01-03', end='2025-01-04')
+    assert not sliced.empty
+    assert sliced.index.min() >= pd.Timestamp('2025-01-03')
+    assert sliced.index.max() < pd.Timestamp('2025-01-05')
+    assert len(sliced) == len(market_dataframe.loc['2025-01-03':'2025-01-04'].query("main_item == 'iron lump'"))
+
+    vol = engine.calculate_volatility('iron', window=2, start='2025-01-03', end='2025-01-06')
+    assert vol['date'].min() >= pd.Timestamp('2025-01-03')
+    assert len(vol) == 4
+
+    start, end = engine.recent_window(2)
+    assert start == pd.Timestamp('2025-01-09')
+    assert engine.slice_time(start, end).index.min() >= start
+
+
+def test_resampled_series_rollups(market_dataframe):
+    """Testa séries diárias/mensais contra groupby direto nos trades."""
+    engine = WurmStatsEngine(df=market_dataframe)
+    iron = market_dataframe[market_dataframe['main_item'] == 'iron lump']
+
+    daily = engine.get_resampled_series('iron', freq='D')
+    expected = iron.groupby('date')['price_s'].mean()
+    np.testing.assert_allclose(daily['mean_price'].to_numpy(), expected.to_numpy())
+    assert daily['trades'].sum() == len(iron)
+
+    monthly = engine.get_resampled_series('lump', freq='monthly')
+    assert len(monthly) == 1
+    assert monthly['trades'].iloc[0] == len(market_dataframe)
+    assert monthly['max_price'].iloc[0] == market_dataframe['price_s'].max()
+
+    weekly = engine.get_resampled_series(['iron lump'], freq='W', start='2025-01-06')
+    assert weekly.index.min() == pd.Timestamp('2025-01-06')
+
+
+def test_resampled_series_updates_on_append(market_dataframe):
+    """Testa atualização incremental da tabela base ao anexar lotes."""
+    engine = WurmStatsEngine(df=market_dataframe.iloc[:120])
+    assert engine.get_resampled_series('iron', freq='M')['trades'].sum() == 60
+
+    engine.append_data(market_dataframe.iloc[120:].reset_index())
+    assert engine.get_resampled_series('iron', freq='M')['trades'].sum() == 100
+    hourly = engine.get_resampled_series('iron', freq='h')
+    assert hourly['trades'].sum() == 100
+
+
+def test_scan_arbitrage_matches_groupby(market_dataframe):
+    """Testa o scanner de arbitragem contra um groupby explícito."""
+    df = market_dataframe
+    result = scan_arbitrage(df, only_opportunities=False)
+
+    wts = df[df['operation'] == 'WTS'].groupby(['main_item', 'date'], observed=True)['price_s'].min()
+    wtb = df[df['operation'] == 'WTB'].groupby(['main_item', 'date'], observed=True)['price_s'].max()
+    expected = pd.concat({'min_wts': wts, 'max_wtb': wtb}, axis=1, join='inner')
+    assert len(result) == len(expected)
+
+    merged = result.set_index(['main_item', 'date']).join(expected, rsuffix='_exp')
+    assert np.allclose(merged['min_wts'], merged['min_wts_exp'])
+    assert np.allclose(merged['max_wtb'], merged['max_wtb_exp'])
+    assert result['profit_pct'].is_monotonic_decreasing
+
+    engine = WurmStatsEngine(df=df)
+    ranked = engine.scan_arbitrage(top_n=3)
+    assert len(ranked) <= 3
+    assert (ranked['max_wtb'] > ranked['min_wts']).all()
+
+    banded = scan_arbitrage(df.assign(main_ql=np.tile([20.0, 80.0], 100)), ql_bins=[0, 50, 100])
+    assert set(banded['ql_band'].astype(str)) <= {'0-50', '50-100'}
+
+
+def test_ql_surface_lookup(market_dataframe):
+    """Testa a superfície de preço por QL contra o cálculo direto."""
+    df = market_dataframe.assign(main_ql=np.tile([15.0, 45.0, 85.0, 95.0], 50))
+    engine = WurmStatsEngine(df=df.iloc[:120])
+    engine.append_data(df.iloc[120:].reset_index())
+
+    iron = df[(df['main_item'] == 'iron lump') & (df['main_ql'] > 80) & (df['main_ql'] <= 90)]
+    cell = engine.get_ql_price('Iron Lump', 85)
+    assert cell['ql_band'] == '80-90'
+    assert cell['count'] == len(iron)
+    assert cell['median'] == pytest.approx(iron['price_s'].median())
+    assert cell['spread'] == pytest.approx(iron['price_s'].quantile(0.75) - iron['price_s'].quantile(0.25))
+
+    monthly = engine.get_ql_price('iron lump', 85, when='2025-01-05')
+    assert monthly['count'] == len(iron)
+    assert engine.get_ql_price('iron lump', 55) is None
+
+    surface = engine.get_ql_surface('iron')
+    assert list(surface.index) == ['10-20', '80-90']
+
+    from price_manager import PriceManager
+    pm = PriceManager()
+    pm.attach_ql_surface(engine.ql_surface)
+    result = pm.evaluate_trade('iron lump', cell['median'], ql=85)
+    assert result['reference_source'] == 'ql_surface'
+    assert result['rating'] == 'FAIR'
+
+
+def test_ql_surface_unit_prices_and_rebuild(market_dataframe):
+    """Testa a superfície em preço por unidade e a referência do PriceManager após reconstrução."""
+    from price_manager import PriceManager
+    df = market_dataframe.assign(main_ql=85.0, main_qty=np.tile([1.0, 10.0, np.nan, 0.0], 50))
+    engine = WurmStatsEngine(df=df)
+    pm = PriceManager()
+    pm.attach_ql_surface(engine.ql_surface)
+
+    iron = df[df['main_item'] == 'iron lump']
+    qty = iron['main_qty'].where(iron['main_qty'] > 0, 1.0).fillna(1.0)
+    expected = (iron['price_s'] / qty).median()
+    assert engine.get_ql_price('iron lump', 85)['median'] == pytest.approx(expected)
+
+    # add_noise_terms reconstrói os índices: o PriceManager enxerga a superfície nova
+    engine.add_noise_terms(['silver'])
+    assert engine.get_ql_price('silver lump', 85) is None
+    assert pm.get_ql_reference('silver lump', 85) is None
+    assert pm.get_ql_reference('iron lump', 85)['median'] == pytest.approx(expected)
+
+    # Trade de 10 unidades ao preço de referência por unidade: justo
+    assert pm.evaluate_trade('iron lump', expected * 10, quantity=10, ql=85)['rating'] == 'FAIR'
+
+
+def test_player_index(market_dataframe):
+    """Testa o índice de jogadores e os agregados após append."""
+    df = market_dataframe.assign(player=np.tile(['Alice', 'Bob', 'carol', 'ALICE'], 50))
+    engine = WurmStatsEngine(df=df.iloc[:150])
+    engine.append_data(df.iloc[150:].reset_index())
+
+    alice = df[df['player'].str.lower() == 'alice']
+    trades = engine.get_player_trades('alice')
+    assert len(trades) == len(alice)
+    assert trades.index.is_monotonic_increasing
+
+    stats = engine.get_player_stats('Alice')
+    assert stats['trades'] == len(alice)
+    assert stats['wts'] + stats['wtb'] == len(alice)
+    assert stats['items'] == alice['main_item'].nunique()
+    assert sum(stats['hours']) == len(alice)
+    assert stats['last_seen'] == alice.index.max()
+    assert 0.2 < stats['price_ratio'] < 5
+
+    assert engine.get_player_stats('nobody') is None
+    assert engine.get_top_players(1).index[0] == 'alice'
+    assert len(engine.get_player_trades('bob', start='2025-01-05')) < len(df) // 4
+
+
+def test_item_canonicalization(market_dataframe, tmp_path):
+    """Testa a fusão de variantes de nome e a persistência dos aliases."""
+    variants = np.array(['iron lump', 'Iron Lumps', 'lump, iron', 'iron lupms'])
+    df = market_dataframe.assign(main_item=pd.Categorical(np.tile(variants, 50)))
+    aliases = tmp_path / 'item_aliases.json'
+
+    canonicalizer = ItemCanonicalizer(['Iron Lumps', 'Stone Bricks'], str(aliases))
+    engine = WurmStatsEngine(df=df, canonicalizer=canonicalizer)
+    assert list(engine.df['main_item'].cat.categories) == ['iron lump']
+    assert engine.get_top_items(1)['count'].iloc[0] == len(df)
+
+    engine.append_data(df.iloc[:4].reset_index().assign(main_item=['Stone bricks'] * 4))
+    assert 'stone brick' in engine.df['main_item'].cat.categories
+
+    saved = json.loads(aliases.read_text(encoding='utf-8'))['aliases']
+    assert saved['iron lupms'] == 'iron lump'
+    assert ItemCanonicalizer(aliases_path=str(aliases)).canonicalize('lump, iron') == 'iron lump'
+
+    assert bounded_edit_distance('kitten', 'sitting', 3) == 3
+    assert bounded_edit_distance('kitten', 'sitting', 2) == 3
+
+
+def test_canonicalizer_keeps_noise_detectable(market_dataframe, tmp_path):
+    """Testa que o ruído de chat continua marcado com canonicalizador (carga, lote e re-canonização)."""
+    names = np.array(['You can disable receiving these messages', 'Iron Lumps',
+                      'WTS or WTT. Only messages starting with WTB, WTS', 'iron lump'])
+    df = market_dataframe.assign(main_item=pd.Categorical(np.tile(names, 50)))
+    expected = np.tile([False, True, False, True], 50)
+
+    canonicalizer = ItemCanonicalizer(['Iron Lumps'], str(tmp_path / 'item_aliases.json'))
+    engine = WurmStatsEngine(df=df, canonicalizer=canonicalizer)
+    np.testing.assert_array_equal(engine.valid_mask, expected)
+    assert set(engine.cleaned_df['main_item']) == {'iron lump'}
+
+    engine.append_data(df.iloc[:4].reset_index())
+    np.testing.assert_array_equal(engine.valid_mask[-4:], expected[:4])
+
+    plain = WurmStatsEngine(df=df)
+    plain.canonicalize_items(canonicalizer)
+    np.testing.assert_array_equal(plain.valid_mask, expected)
+
+
+def test_market_summary_cached_and_incremental(market_dataframe):
+    """Testa o resumo de mercado: agregação única, cache e atualização por lote."""
+    engine = WurmStatsEngine(df=market_dataframe.iloc[:150])
+    summary = engine.get_market_summary()
+    assert engine.get_market_summary() is summary
+
+    iron = market_dataframe.iloc[:150]
+    iron = iron[(iron['main_item'] == 'iron lump') & (iron['operation'] == 'WTS')]['price_s']
+    row = summary.loc[('iron lump', 'WTS')]
+    assert row['count'] == len(iron)
+    assert row['median_price'] == pytest.approx(iron.median())
+    assert row['last_price'] == iron.iloc[-1]
+    assert row['last_seen'] == iron.index[-1]
+
+    engine.append_data(market_dataframe.iloc[150:].reset_index())
+    pd.testing.assert_frame_equal(engine.get_market_summary(), market_summary(engine.cleaned_df))
+    wts = engine.get_market_summary('WTS')
+    assert list(wts.index) == ['iron lump', 'silver lump']
+    assert engine.get_market_summary('WTB')['count'].sum() == (market_dataframe['operation'] == 'WTB').sum()
+
+
+def test_item_resolution_shared_by_series_and_filter(market_dataframe):
+    """Testa que série reamostrada e filtro por item resolvem o mesmo nome igual (texto literal)."""
+    df = market_dataframe.assign(main_item=market_dataframe['main_item'].astype(str))
+    df.iloc[::5, df.columns.get_loc('main_item')] = 'rope (thick)'
+    engine = WurmStatsEngine(df=df)
+    for name in ('rope (thick)', 'rope (', 'SILVER', 'LUMP'):
+        series = engine.get_resampled_series(name, freq='D')
+        assert series['trades'].sum() == len(engine.filter_by_item(name)) > 0
+    assert engine.match_items('rope (thick)') == ['rope (thick)']
+    assert engine.match_items('Rope (Thick)', exact=True) == ['rope (thick)']
+    assert engine.match_items('rope (') == ['rope (thick)']
+    assert sorted(engine.match_items('lump')) == ['iron lump', 'silver lump']
+    # Metacaracteres não são interpretados
+    assert engine.match_items('iron|silver') == []
+    assert engine.match_items('rope', exact=True) == []
+
+
+def test_injected_timestamp_column_becomes_index(market_dataframe):
+    """Testa que a coluna 'timestamp' do DataFrame injetado vira o índice ordenado."""
+    raw = market_dataframe.reset_index().iloc[::-1]
+    engine = WurmStatsEngine(df=raw)
+    assert engine.df.index.name == 'timestamp' and engine.df.index.is_monotonic_increasing
+    assert 'timestamp' not in engine.df.columns
+    assert 'timestamp' in raw.columns and not raw['timestamp'].is_monotonic_increasing  # sem mutar o chamador
+    assert engine.df.reset_index()['timestamp'].tolist() == market_dataframe.index.tolist()
+
+
+def test_append_keeps_normalized_prices(market_dataframe):
+    """Testa que lotes já normalizados não são reconvertidos (0.29 não vira 0.28)."""
+    engine = WurmStatsEngine(df=market_dataframe.iloc[:100])
+    batch = market_dataframe.iloc[100:103].reset_index().assign(price_s=[0.29, 0.57, 1.15])
+    engine.append_data(batch)
+    assert engine.df['price_s'].iloc[-3:].tolist() == [0.29, 0.57, 1.15]
+    assert engine.df['price_iron'].iloc[-3:].tolist() == [29, 57, 115]
+
+    # price_iron informado é mantido
+    engine.append_data(batch.assign(price_iron=[1, 2, 3], timestamp=batch['timestamp'] + pd.Timedelta('1D')))
+    assert engine.df['price_iron'].iloc[-3:].tolist() == [1, 2, 3]
+
+
+def _with_noise(market_dataframe):
+    df = market_dataframe.copy()
+    names = df['main_item'].astype(str).to_numpy(dtype=object)
+    names[5::17] = 'This is the Trade channel'
+    df['main_item'] = pd.Categorical(names)
+    return df
+
+
+def test_market_summary_append_touches_only_batch_items(market_dataframe):
+    """Testa o resumo incremental com ruído e um lote de um item só."""
+    df = _with_noise(market_dataframe)
+    engine = WurmStatsEngine(df=df.iloc[:150])
+    engine.get_market_summary()
+    selected = []
+    original = engine._item_rows
+    engine._item_rows = lambda items: selected.append(original(items)) or selected[-1]
+
+    batch = df.iloc[150:]
+    engine.append_data(batch[batch['main_item'] == 'iron lump'].reset_index())
+    pd.testing.assert_frame_equal(engine.get_market_summary(), market_summary(engine.cleaned_df))
+    assert set(selected[-1]['main_item']) == {'iron lump'}
+
+
+def test_ql_surface_append_matches_rebuild(market_dataframe):
+    """Testa a superfície de QL incremental com ruído contra a construção de uma vez."""
+    df = _with_noise(market_dataframe).assign(main_ql=np.tile([15.0, 45.0, 85.0, 95.0], 50))
+    engine = WurmStatsEngine(df=df.iloc[:150])
+    batch = df.iloc[150:]
+    engine.append_data(batch[batch['main_item'] == 'silver lump'].reset_index())
+    engine.append_data(batch[batch['main_item'] != 'silver lump'].reset_index())
+
+    rebuilt = WurmStatsEngine(df=df)
+    pd.testing.assert_frame_equal(engine.ql_surface.table().sort_index(), rebuilt.ql_surface.table().sort_index())
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,337 @@
+"""
+Trade Store
+===========
+
+Armazenamento em disco (SQLite) dos trades já processados.
+
+O cache pickle/parquet precisa ser carregado inteiro na memória. O store
+guarda os mesmos trades num arquivo SQLite com índices para as consultas do
+engine, então dá para navegar históricos de vários anos com pouca memória:
+
+- ``(main_item, date)``: trades e agregados diários de um item;
+- ``(player)``: trades de um jogador (case-insensitive);
+- ``(operation, date)``: lado WTS/WTB de um período;
+- ``trades_fts``: índice FTS5 sobre ``raw_text`` (busca por palavras).
+
+Nomes de item são resolvidos primeiro na lista de itens distintos (como o
+engine faz nas categorias) e só então consultados por ``IN (...)`` no índice.
+
+Exemplo:
+    store = TradeStore('data/trades.db')
+    store.append(engine.df, is_noise=~engine.valid_mask)
+    engine = WurmStatsEngine(store=store)
+"""
+
+import logging
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from engine_backends import match_item_names
+
+logger = logging.getLogger(__name__)
+
+# Colunas persistidas (as demais colunas do DataFrame são ignoradas)
+STORE_COLUMNS = {
+    'timestamp': 'TEXT',
+    'date': 'TEXT',
+    'main_item': 'TEXT',
+    'player': 'TEXT COLLATE NOCASE',
+    'operation': 'TEXT',
+    'price_s': 'REAL',
+    'price_iron': 'INTEGER',
+    'main_qty': 'REAL',
+    'main_ql': 'REAL',
+    'main_dmg': 'REAL',
+    'main_wt': 'REAL',
+    'is_noise': 'INTEGER NOT NULL DEFAULT 0',
+    'raw_text': 'TEXT',
+}
+
+INDEXES = {
+    'idx_trades_item_date': '(main_item, date)',
+    'idx_trades_player': '(player)',
+    'idx_trades_operation_date': '(operation, date)',
+}
+
+_TS_FORMAT = '%Y-%m-%d %H:%M:%S'
+_DATE_FORMAT = '%Y-%m-%d'
+
+# Linhas por executemany na importação
+_INSERT_CHUNK = 50_000
+
+# Limite de parâmetros por consulta (SQLITE_MAX_VARIABLE_NUMBER antigo é 999)
+_MAX_PARAMS = 900
+
+
+class TradeStore:
+    """
+    Trades em um arquivo SQLite indexado.
+
+    Args:
+        path: Arquivo do banco (criado se não existir); ':memory:' para testes
+        cache_mb: Cache de páginas do SQLite, em MB (limita a memória residente)
+    """
+
+    def __init__(self, path: Union[str, Path], cache_mb: int = 32) -> None:
+        self.path = str(path)
+        if self.path != ':memory:':
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._con = sqlite3.connect(self.path, check_same_thread=False)
+        self._con.execute('PRAGMA journal_mode=WAL')
+        self._con.execute('PRAGMA synchronous=NORMAL')
+        self._con.execute(f'PRAGMA cache_size={-1024 * int(cache_mb)}')
+        self.version = 0
+        self._items: Optional[List[str]] = None
+        self.has_fts = False
+        self._create_schema()
+
+    def _create_schema(self) -> None:
+        columns = ', '.join(f'{name} {kind}' for name, kind in STORE_COLUMNS.items())
+        with self._con:
+            self._con.execute(f'CREATE TABLE IF NOT EXISTS trades (id INTEGER PRIMARY KEY, {columns})')
+            self._create_indexes()
+        try:
+            with self._con:
+                self._con.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS trades_fts USING fts5("
+                    "raw_text, content='trades', content_rowid='id')")
+            self.has_fts = True
+        except sqlite3.OperationalError as e:
+            logger.warning(f"SQLite sem FTS5, busca de texto usará LIKE: {e}")
+
+    def _create_indexes(self) -> None:
+        for name, cols in INDEXES.items():
+            self._con.execute(f'CREATE INDEX IF NOT EXISTS {name} ON trades {cols}')
+
+    def close(self) -> None:
+        self._con.close()
+
+    def __enter__(self) -> "TradeStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self._con.execute('SELECT count(*) FROM trades').fetchone()[0]
+
+    # ------------------------------------------------------------------
+    # Escrita
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _to_records(df: pd.DataFrame, is_noise: Optional[np.ndarray]) -> Tuple[List[str], Iterator[tuple]]:
+        """Converte o DataFrame para colunas do store (datas como texto ISO)."""
+        if isinstance(df.index, pd.DatetimeIndex):
+            df = df.reset_index()
+        present = [c for c in STORE_COLUMNS if c in df.columns and c != 'is_noise']
+        data = {}
+        for col in present:
+            values = df[col]
+            if col in ('timestamp', 'date'):
+                fmt = _TS_FORMAT if col == 'timestamp' else _DATE_FORMAT
+                values = pd.to_datetime(values, errors='coerce').dt.strftime(fmt)
+            elif not pd.api.types.is_numeric_dtype(values.dtype) or isinstance(values.dtype, pd.CategoricalDtype):
+                values = values.astype(object)
+            data[col] = values.astype(object).where(values.notna(), None).tolist()
+        if 'date' not in data and 'timestamp' in data:
+            present.append('date')
+            data['date'] = [ts[:10] if ts else None for ts in data['timestamp']]
+        present.append('is_noise')
+        noise = np.zeros(len(df), dtype=bool) if is_noise is None else np.asarray(is_noise, dtype=bool)
+        data['is_noise'] = noise.astype(int).tolist()
+        return present, zip(*(data[c] for c in present))
+
+    def append(self, df: pd.DataFrame, is_noise: Optional[np.ndarray] = None) -> int:
+        """
+        Grava um lote de trades (e indexa o raw_text no FTS).
+
+        Args:
+            df: Trades no formato do engine (índice 'timestamp' ou coluna)
+            is_noise: Máscara de ruído por linha, opcional
+
+        Returns:
+            Número de linhas gravadas.
+        """
+        if df is None or df.empty:
+            return 0
+        columns, records = self._to_records(df, is_noise)
+        sql = (f"INSERT INTO trades ({', '.join(columns)}) "
+               f"VALUES ({', '.join('?' * len(columns))})")
+        with self._con:
+            first_id = self._con.execute('SELECT coalesce(max(id), 0) FROM trades').fetchone()[0]
+            # Lote grande (carga inicial): recriar os índices depois sai bem mais
+            # barato que mantê-los linha a linha
+            rebuild = len(df) > max(first_id, _INSERT_CHUNK)
+            if rebuild:
+                for name in INDEXES:
+                    self._con.execute(f'DROP INDEX IF EXISTS {name}')
+            while True:
+                chunk = [r for _, r in zip(range(_INSERT_CHUNK), records)]
+                if not chunk:
+                    break
+                self._con.executemany(sql, chunk)
+            if rebuild:
+                self._create_indexes()
+            if self.has_fts and 'raw_text' in columns:
+                self._con.execute(
+                    "INSERT INTO trades_fts(rowid, raw_text) "
+                    "SELECT id, raw_text FROM trades WHERE id > ? AND raw_text IS NOT NULL", (first_id,))
+        self.version += 1
+        self._items = None
+        logger.info(f"{len(df):,} trades gravados em {self.path}")
+        return len(df)
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+
+    def items(self) -> List[str]:
+        """Nomes de item distintos (em cache até o próximo append)."""
+        if self._items is None:
+            rows = self._con.execute(
+                'SELECT DISTINCT main_item FROM trades WHERE main_item IS NOT NULL ORDER BY main_item')
+            self._items = [r[0] for r in rows]
+        return self._items
+
+    def match_items(self, item_name: Union[str, List[str]], exact: bool = False) -> List[str]:
+        """Resolve um nome (texto em qualquer parte ou exato, case-insensitive) nos itens distintos."""
+        if isinstance(item_name, list):
+            return item_name
+        names = self.items()
+        return [name for name, hit in zip(names, match_item_names(names, item_name, exact)) if hit]
+
+    @staticmethod
+    def _range_clause(start: Optional[Any], end: Optional[Any]) -> Tuple[str, List[Any]]:
+        """
+        Predicado de [start, end] (end sem hora inclui o dia inteiro).
+
+        Filtra por 'date' (coberto pelos índices) e, quando há hora, também
+        por 'timestamp'.
+        """
+        clauses, params = [], []
+        if start is not None:
+            start_ts = pd.Timestamp(start)
+            clauses.append('date >= ?')
+            params.append(start_ts.strftime(_DATE_FORMAT))
+            if start_ts != start_ts.normalize():
+                clauses.append('timestamp >= ?')
+                params.append(start_ts.strftime(_TS_FORMAT))
+        if end is not None:
+            end_ts = pd.Timestamp(end)
+            clauses.append('date <= ?')
+            params.append(end_ts.strftime(_DATE_FORMAT))
+            if end_ts != end_ts.normalize():
+                clauses.append('timestamp <= ?')
+                params.append(end_ts.strftime(_TS_FORMAT))
+        return ''.join(f' AND {c}' for c in clauses), params
+
+    def _read(self, sql: str, params: Sequence[Any]) -> pd.DataFrame:
+        df = pd.read_sql_query(sql, self._con, params=list(params))
+        for col, fmt in (('timestamp', _TS_FORMAT), ('date', _DATE_FORMAT)):
+            if col in df.columns:
+                df[col] = pd.to_datetime(df[col], format=fmt, errors='coerce')
+        if 'is_noise' in df.columns:
+            df['is_noise'] = df['is_noise'].astype(bool)
+        return df
+
+    @staticmethod
+    def _frame(df: pd.DataFrame) -> pd.DataFrame:
+        """Trades no formato do engine: índice 'timestamp', sem id."""
+        df = df.drop(columns='id')
+        for col in ('main_item', 'operation'):
+            df[col] = df[col].astype('category')
+        return df.set_index('timestamp')
+
+    def _item_query(self, names: List[str], select: str, where: str = '',
+                    start: Optional[Any] = None, end: Optional[Any] = None,
+                    tail: str = '') -> pd.DataFrame:
+        """Executa ``select`` para os itens, em blocos de até _MAX_PARAMS nomes."""
+        range_sql, range_params = self._range_clause(start, end)
+        parts = []
+        for i in range(0, len(names), _MAX_PARAMS):
+            block = names[i:i + _MAX_PARAMS]
+            sql = (f"{select} FROM trades WHERE main_item IN ({', '.join('?' * len(block))})"
+                   f"{where}{range_sql} {tail}")
+            parts.append(self._read(sql, block + range_params))
+        return pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+
+    def item_trades(self, item_name: Union[str, List[str]], exact: bool = False,
+                    start: Optional[Any] = None, end: Optional[Any] = None) -> pd.DataFrame:
+        """
+        Trades de um item (inclui ruído, como filter_by_item), em ordem de tempo.
+
+        Returns:
+            DataFrame indexado por 'timestamp'.
+        """
+        names = self.match_items(item_name, exact)
+        if not names:
+            return pd.DataFrame()
+        df = self._item_query(names, 'SELECT *', start=start, end=end)
+        return self._frame(df.sort_values(['timestamp', 'id'], kind='stable'))
+
+    def player_trades(self, player: str, start: Optional[Any] = None,
+                      end: Optional[Any] = None) -> pd.DataFrame:
+        """Trades de um jogador (case-insensitive), em ordem de tempo."""
+        range_sql, params = self._range_clause(start, end)
+        df = self._read(f"SELECT * FROM trades WHERE player = ?{range_sql} ORDER BY timestamp, id",
+                        [str(player).strip()] + params)
+        return self._frame(df)
+
+    def daily_mean_price(self, item_name: Union[str, List[str]], exact: bool = False,
+                         start: Optional[Any] = None, end: Optional[Any] = None) -> pd.Series:
+        """Preço médio por 'date' dos trades do item."""
+        names = self.match_items(item_name, exact)
+        if not names:
+            return pd.Series(dtype=float)
+        df = self._item_query(names, 'SELECT date, sum(price_s) AS total, count(price_s) AS n',
+                              ' AND price_s IS NOT NULL', start, end, 'GROUP BY date')
+        df = df.groupby('date').sum()
+        return (df['total'] / df['n']).rename('price_s')
+
+    def daily_spread(self, item_name: Union[str, List[str]], exact: bool = False,
+                     start: Optional[Any] = None, end: Optional[Any] = None) -> pd.DataFrame:
+        """Menor WTS e maior WTB por 'date' (apenas dias com os dois lados)."""
+        names = self.match_items(item_name, exact)
+        if not names:
+            return pd.DataFrame(columns=['min_wts', 'max_wtb'])
+        df = self._item_query(
+            names,
+            "SELECT date, min(CASE WHEN operation = 'WTS' THEN price_s END) AS min_wts, "
+            "max(CASE WHEN operation = 'WTB' THEN price_s END) AS max_wtb",
+            '', start, end, 'GROUP BY date')
+        df = df.groupby('date').agg({'min_wts': 'min', 'max_wtb': 'max'})
+        return df.dropna().astype(float)
+
+    def search_text(self, query: str, limit: Optional[int] = 1000) -> pd.DataFrame:
+        """
+        Busca por palavras em raw_text (FTS5; sintaxe MATCH do SQLite).
+
+        Sem FTS5, cai para LIKE com a consulta inteira.
+
+        Returns:
+            Trades encontrados, indexados por 'timestamp'.
+        """
+        limit_sql = '' if limit is None else f' LIMIT {int(limit)}'
+        if self.has_fts:
+            sql = ("SELECT trades.* FROM trades_fts JOIN trades ON trades.id = trades_fts.rowid "
+                   f"WHERE trades_fts MATCH ? ORDER BY trades.timestamp, trades.id{limit_sql}")
+            params = [query]
+        else:
+            sql = f"SELECT * FROM trades WHERE raw_text LIKE ? ORDER BY timestamp, id{limit_sql}"
+            params = [f'%{query}%']
+        return self._frame(self._read(sql, params))
+
+    def metadata(self) -> Dict[str, Any]:
+        """Contagem de linhas e intervalo de datas."""
+        lo, hi = self._con.execute('SELECT min(timestamp), max(timestamp) FROM trades').fetchone()
+        return {
+            'total_records': len(self),
+            'columns': [c for c in STORE_COLUMNS if c != 'timestamp'],
+            'date_range': (lo and pd.Timestamp(lo).isoformat(), hi and pd.Timestamp(hi).isoformat()),
+            'store_path': self.path,
+        }
@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 import os
 import glob
@@ -16,15 +17,16 @@ def parse_wurm_price(price_val):
         return 0
         
     # Se já for numérico (float/int), assume que é Copper (padrão antigo) e converte para Iron
+    # round, não int: 0.29 * 100 = 28.999... viraria 28
     if isinstance(price_val, (int, float)):
-        return int(price_val * 100) # 1 Copper = 100 Iron
+        return int(round(price_val * 100)) # 1 Copper = 100 Iron
         
     price_str = str(price_val).lower().strip()
     
     # Tenta converter string numérica direta ("1500.0") -> Assume Copper
     try:
         val = float(price_str)
-        return int(val * 100)
+        return int(round(val * 100))
     except ValueError:
         pass
         
@@ -108,6 +110,52 @@ def _get_latest_data_timestamp(data_dir: str) -> float:
                 continue
     return latest_time
 
+def normalize_trade_frame(df_master: pd.DataFrame) -> pd.DataFrame:
+    """
+    Limpa e normaliza um DataFrame de trades (datas, numéricos, preços e categorias).
+
+    Usado tanto na reconstrução do cache quanto para lotes anexados ao engine.
+    """
+    logger.info("Processando DataFrame...")
+    
+    # Remove linhas vazias
+    df_master.dropna(how='all', inplace=True)
+    
+    # Converte datas
+    for col in ['timestamp', 'date']:
+        if col in df_master.columns:
+            df_master[col] = pd.to_datetime(df_master[col], errors='coerce')
+            
+    # Converte numéricos
+    numeric_cols = ['main_qty', 'main_ql', 'main_dmg', 'main_wt']
+    for col in numeric_cols:
+        if col in df_master.columns:
+            df_master[col] = pd.to_numeric(df_master[col], errors='coerce')
+            
+    # Normalização de Preço Especial (lotes já normalizados passam direto:
+    # reconverter o price_s numérico arredondaria os preços de novo)
+    if 'price_s' in df_master.columns and 'price_iron' not in df_master.columns \
+            and pd.api.types.is_numeric_dtype(df_master['price_s']):
+        df_master['price_s'] = df_master['price_s'].fillna(0).astype(float)
+        df_master['price_iron'] = np.round(df_master['price_s'].to_numpy() * 100).astype(np.int64)
+    elif 'price_s' in df_master.columns and 'price_iron' not in df_master.columns:
+        logger.info("Normalizando preços (Iron Coins)...")
+        # Cria coluna price_iron usando o novo parser
+        df_master['price_iron'] = df_master['price_s'].apply(parse_wurm_price)
+        
+        # Mantém compatibilidade: price_s como float (Copper)
+        # Iron / 100 = Copper
+        df_master['price_s'] = df_master['price_iron'] / 100.0
+
+    # Otimização de tipos (Categorias)
+    if 'main_item' in df_master.columns:
+        df_master['main_item'] = df_master['main_item'].astype('category')
+        
+    if 'operation' in df_master.columns:
+        df_master['operation'] = df_master['operation'].astype('category')
+
+    return df_master
+
 def load_data_and_build_cache(data_dir: str, force_rebuild: bool = False, sample_size: int = None) -> pd.DataFrame:
     """
     Carrega dados de trade, utilizando cache se disponível e atualizado.
@@ -183,38 +231,7 @@ def load_data_and_build_cache(data_dir: str, force_rebuild: bool = False, sample
     df_master = pd.DataFrame(data_list)
     
     # 3. Limpeza e Processamento Final
-    logger.info("Processando DataFrame...")
-    
-    # Remove linhas vazias
-    df_master.dropna(how='all', inplace=True)
-    
-    # Converte datas
-    for col in ['timestamp', 'date']:
-        if col in df_master.columns:
-            df_master[col] = pd.to_datetime(df_master[col], errors='coerce')
-            
-    # Converte numéricos
-    numeric_cols = ['main_qty', 'main_ql', 'main_dmg', 'main_wt']
-    for col in numeric_cols:
-        if col in df_master.columns:
-            df_master[col] = pd.to_numeric(df_master[col], errors='coerce')
-            
-    # Normalização de Preço Especial
-    if 'price_s' in df_master.columns:
-        logger.info("Normalizando preços (Iron Coins)...")
-        # Cria coluna price_iron usando o novo parser
-        df_master['price_iron'] = df_master['price_s'].apply(parse_wurm_price)
-        
-        # Mantém compatibilidade: price_s como float (Copper)
-        # Iron / 100 = Copper
-        df_master['price_s'] = df_master['price_iron'] / 100.0
-
-    # Otimização de tipos (Categorias)
-    if 'main_item' in df_master.columns:
-        df_master['main_item'] = df_master['main_item'].astype('category')
-        
-    if 'operation' in df_master.columns:
-        df_master['operation'] = df_master['operation'].astype('category')
+    df_master = normalize_trade_frame(df_master)
 
     # 4. Salva o cache
     try:
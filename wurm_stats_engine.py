@@ -10,17 +10,87 @@ Data: 2025-11-26
 """
 
 import pandas as pd
+import numpy as np
 import json
 from pathlib import Path
-from typing import Optional, Union, List, Dict, Any
+from typing import Optional, Union, List, Dict, Any, Tuple
 from datetime import datetime
 import logging
 
+from noise_filter import NoiseFilter
+from quantile_sketch import ItemQuantileIndex
+from heavy_hitters import HeavyHitterTracker
+from market_series import MarketSeriesCache
+from ql_surface import QLPriceSurface
+from player_index import PlayerIndex
+from item_canonicalizer import ItemCanonicalizer
+from trade_store import TradeStore
+from string_pool import StringPool
+from engine_backends import EngineBackend, Rows, get_backend, item_codes, match_item_names, \
+    trade_timestamps
+
 # Configuração de logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 
+def slice_time_range(df: pd.DataFrame, start: Optional[Any] = None,
+                     end: Optional[Any] = None) -> pd.DataFrame:
+    """
+    Fatia o DataFrame pelo intervalo de datas [start, end].
+
+    Com um DatetimeIndex ordenado usa ``searchsorted`` (O(log n)) e devolve
+    uma fatia posicional, sem varrer as linhas. Sem índice temporal, cai para
+    um filtro sobre a coluna 'date'. Um ``end`` sem hora inclui o dia inteiro.
+
+    Args:
+        df: DataFrame de trades
+        start: Data/hora inicial (inclusiva), opcional
+        end: Data/hora final (inclusiva), opcional
+
+    Returns:
+        DataFrame restrito ao intervalo.
+    """
+    rows = time_range_rows(df, start, end)
+    if rows is None:
+        return df
+    return df.iloc[rows] if isinstance(rows, slice) else df[rows]
+
+
+def time_range_rows(df: pd.DataFrame, start: Optional[Any] = None,
+                    end: Optional[Any] = None) -> Rows:
+    """
+    Linhas do intervalo [start, end], sem materializar o DataFrame.
+
+    Returns:
+        None (todas as linhas), uma fatia posicional (índice temporal
+        ordenado) ou uma máscara booleana (filtro pela coluna 'date').
+    """
+    if df is None or (start is None and end is None):
+        return None
+
+    start_ts = pd.Timestamp(start) if start is not None else None
+    end_ts = pd.Timestamp(end) if end is not None else None
+    end_side = 'right'
+    if end_ts is not None and end_ts == end_ts.normalize():
+        end_ts, end_side = end_ts + pd.Timedelta(days=1), 'left'
+
+    if isinstance(df.index, pd.DatetimeIndex) and df.index.is_monotonic_increasing:
+        lo = df.index.searchsorted(start_ts, side='left') if start_ts is not None else 0
+        hi = df.index.searchsorted(end_ts, side=end_side) if end_ts is not None else len(df)
+        return slice(int(lo), int(hi))
+
+    if 'date' not in df.columns:
+        return None
+    dates = pd.to_datetime(df['date'], errors='coerce')
+    mask = pd.Series(True, index=df.index)
+    if start_ts is not None:
+        mask &= dates >= start_ts
+    if end_ts is not None:
+        mask &= (dates < end_ts) if end_side == 'left' else (dates <= end_ts)
+    return mask.to_numpy()
+
+
 class WurmStatsEngine:
     """
     Motor de estatísticas para análise de dados de trade do Wurm Online.
@@ -32,11 +102,44 @@ class WurmStatsEngine:
         data_path (Path): Caminho para o arquivo de dados
         df (pd.DataFrame): DataFrame principal com os dados de trade
         metadata (dict): Metadados sobre o dataset carregado
+        valid_mask (np.ndarray): Máscara booleana das linhas que não são ruído
+        data_version (int): Incrementado a cada carga ou lote anexado
+        price_sketches (ItemQuantileIndex): Sketches de quantis por item e item-dia
+        heavy_hitters (HeavyHitterTracker): Top itens por contagem e quantidade
+        market_series (MarketSeriesCache): Agregados (item, período) para reamostragem
+        store (TradeStore): Store SQLite opcional (consultas sem carregar o histórico)
+        market_summary (pd.DataFrame): Resumo por (item, operação), em cache por data_version
     """
+
+    # Lista de Termos de Ruído (Stop Words). Pode ser estendida em tempo de
+    # execução via add_noise_terms().
+    NOISE_TERMS = [
+        "You can disable receiving these messages",
+        "View the full Trade Chat Etiquette",
+        "Please PM the person if you",
+        "This is the Trade channel",
+        "Only messages starting with WTB, WTS",
+        "You can also use @<name> to",
+        "common",
+        "rare",
+        "null",
+        "fragment",
+        "casket",
+        "clay",
+    ]
+
+    # Colunas (categóricas) onde o ruído é verificado
+    NOISE_COLUMNS = ['main_item']
+
+    # Colunas de texto livre guardadas fora do DataFrame, em StringPool
+    TEXT_COLUMNS = ['raw_text']
     
     def __init__(self, data_path: Optional[Union[str, Path]] = None, 
                  sample_size: Optional[int] = None,
-                 df: Optional[pd.DataFrame] = None) -> None:
+                 df: Optional[pd.DataFrame] = None,
+                 canonicalizer: Optional[ItemCanonicalizer] = None,
+                 backend: Union[str, EngineBackend] = 'pandas',
+                 store: Optional[TradeStore] = None) -> None:
         """
         Inicializa o WurmStatsEngine.
         
@@ -47,20 +150,46 @@ class WurmStatsEngine:
             data_path: Caminho para o arquivo de dados JSON Lines (opcional se df for fornecido)
             sample_size: Número de linhas para carregar (None = todas).
             df: DataFrame injetado (opcional). Se fornecido, ignora data_path.
+                Como na carga de arquivo, uma coluna 'timestamp' vira o índice
+                (ordenado) de self.df e deixa de ser coluna; o DataFrame do
+                chamador não é alterado.
+            canonicalizer: Mapeia 'main_item' para nomes canônicos na carga e
+                nos lotes anexados (opcional).
+            backend: Backend das consultas por item ('pandas', 'polars',
+                'duckdb' ou 'auto'); veja engine_backends.
+            store: TradeStore em disco (opcional). Sem data_path/df, as
+                consultas por item e por jogador vão direto ao SQLite e o
+                histórico não é carregado na memória.
             
         Raises:
             FileNotFoundError: Se o arquivo não existir
-            ValueError: Se nem data_path nem df forem fornecidos
+            ValueError: Se nem data_path, df ou store forem fornecidos
         """
         self.data_path = Path(data_path) if data_path else None
         self.df: Optional[pd.DataFrame] = None
         self.metadata: Dict[str, Any] = {}
         self.sample_size = sample_size
+        self.noise_filter = NoiseFilter(self.NOISE_TERMS)
+        self.valid_mask: Optional[np.ndarray] = None
+        self.data_version = 0
+        self.price_sketches = ItemQuantileIndex()
+        self.heavy_hitters = HeavyHitterTracker()
+        self.market_series = MarketSeriesCache()
+        self.ql_surface = QLPriceSurface()
+        self.player_index = PlayerIndex()
+        self.canonicalizer = canonicalizer
+        self.backend = get_backend(backend)
+        self.store = store
+        self.text_pools: Dict[str, StringPool] = {}
+        self._market_summary: Optional[pd.DataFrame] = None
+        self._market_summary_version = -1
         
         if df is not None:
             # Injeção de dependência: usa o DataFrame fornecido
             logger.info("Inicializando com DataFrame injetado.")
-            self.df = df
+            self.df = self._index_frame(df)
+            self._preprocess_data()
+            self._build_indexes()
             self._generate_metadata()
             logger.info(f"✔ Dados injetados: {len(self.df):,} registros")
         elif self.data_path:
@@ -73,10 +202,16 @@ class WurmStatsEngine:
             
             logger.info(f"Iniciando carregamento de {self.data_path.name}...")
             self._load_data()
+            self._preprocess_data()
+            self._build_indexes()
             self._generate_metadata()
             logger.info(f"✔ Dados carregados: {len(self.df):,} registros, {len(self.df.columns)} colunas")
+        elif store is not None:
+            # Modo store: nada em memória, consultas indexadas no SQLite
+            self.metadata = store.metadata()
+            logger.info(f"✔ Store aberto: {self.metadata['total_records']:,} registros em {store.path}")
         else:
-            raise ValueError("É necessário fornecer 'data_path' ou 'df' para inicializar o engine.")
+            raise ValueError("É necessário fornecer 'data_path', 'df' ou 'store' para inicializar o engine.")
     
     def _load_data(self) -> None:
         """
@@ -108,12 +243,289 @@ class WurmStatsEngine:
     def _setup_index(self) -> None:
         """Configura o índice do DataFrame para otimização."""
         if self.df is None: return
-        
+        self.df = self._index_frame(self.df)
+
+    @staticmethod
+    def _index_frame(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Retorna o DataFrame indexado e ordenado por 'timestamp', se houver.
+
+        A coluna 'timestamp' sai das colunas (só o índice a carrega: manter as
+        duas deixaria reset_index ambíguo). Não altera o DataFrame recebido.
+        """
         # Garante que temos um índice temporal se possível
-        if 'timestamp' in self.df.columns and not isinstance(self.df.index, pd.DatetimeIndex):
-            self.df['timestamp'] = pd.to_datetime(self.df['timestamp'])
-            self.df.set_index('timestamp', inplace=True)
-            self.df.sort_index(inplace=True)
+        if 'timestamp' in df.columns and not isinstance(df.index, pd.DatetimeIndex):
+            index = pd.DatetimeIndex(pd.to_datetime(df['timestamp']), name='timestamp')
+            df = df.drop(columns='timestamp').set_index(index)
+        # Índice ordenado: permite fatias por searchsorted (slice_time_range)
+        if isinstance(df.index, pd.DatetimeIndex) and not df.index.is_monotonic_increasing:
+            df = df.sort_index(kind='stable')
+        return df
+
+    @staticmethod
+    def _row_days(df: pd.DataFrame) -> np.ndarray:
+        """Dia de cada linha em epoch-days (int64; NaT vira o mínimo de int64)."""
+        return trade_timestamps(df).astype('datetime64[D]').astype(np.int64)
+
+    @staticmethod
+    def _to_day(value: Any) -> Optional[int]:
+        """Converte data (str, datetime, Timestamp) em epoch-days."""
+        if value is None:
+            return None
+        return int(np.datetime64(pd.Timestamp(value).date(), 'D').astype(np.int64))
+
+    def _preprocess_data(self) -> None:
+        """
+        Calcula a máscara de ruído (entradas de chat e termos de NOISE_TERMS).
+
+        O autômato roda uma vez por categoria distinta, não por linha, e o
+        resultado é uma máscara booleana: o DataFrame não é duplicado.
+        """
+        if self.df is None:
+            return
+
+        self.df = self._compact_text(self.df)
+        if self.canonicalizer is not None:
+            self.df = self._canonicalize_frame(self.df)
+
+        noise = self._noise_mask(self.df)
+        self.valid_mask = ~noise
+        removed = int(noise.sum())
+        if removed > 0:
+            logger.info(f"Pré-processamento: {removed} linhas de ruído marcadas.")
+
+    def _compact_text(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Move as colunas de TEXT_COLUMNS para os StringPools (linhas anexadas ao fim)."""
+        columns = [c for c in self.TEXT_COLUMNS if c in df.columns]
+        for col in columns:
+            self.text_pools.setdefault(col, StringPool()).extend(df[col])
+        return df.drop(columns=columns) if columns else df
+
+    def _canonicalize_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Troca as categorias de 'main_item' pelos nomes canônicos (sem tocar nas strings por linha).
+
+        Categorias de ruído ficam intactas: canonizadas (minúsculas, sem
+        pontuação, no singular) deixariam de casar com NOISE_TERMS.
+        """
+        if 'main_item' not in df.columns:
+            return df
+        df = df.copy(deep=False)
+        df['main_item'] = self.canonicalizer.remap(df['main_item'], keep=self.noise_filter.is_noise)
+        self.canonicalizer.save()
+        return df
+
+    def canonicalize_items(self, canonicalizer: ItemCanonicalizer) -> int:
+        """
+        Aplica um canonicalizador ao DataFrame carregado e reconstrói os índices.
+
+        Lotes anexados depois disso também são canonizados.
+
+        Returns:
+            Quantidade de categorias de item eliminadas pela fusão.
+        """
+        self.canonicalizer = canonicalizer
+        if self.df is None or 'main_item' not in self.df.columns:
+            return 0
+        before = self.df['main_item'].astype('category').cat.categories.size
+        self._preprocess_data()
+        self._build_indexes()
+        self._generate_metadata()
+        merged = before - self.df['main_item'].cat.categories.size
+        logger.info(f"Itens canonizados: {before} -> {before - merged} categorias")
+        return merged
+
+    def _build_indexes(self) -> None:
+        """Reconstrói as estruturas derivadas (sketches) a partir do DataFrame completo."""
+        self.price_sketches = ItemQuantileIndex()
+        self.heavy_hitters = HeavyHitterTracker()
+        # Construído sob demanda na primeira consulta (get_resampled_series)
+        self.market_series.clear()
+        # No lugar: o PriceManager guarda referência à superfície
+        self.ql_surface.clear()
+        self.player_index = PlayerIndex()
+        # Resumo de mercado: calculado na primeira consulta (get_market_summary)
+        self._market_summary = None
+        if self.df is not None and not self.df.empty:
+            self._update_indexes(self.df, self.valid_mask)
+            self._index_players(0)
+        self.data_version += 1
+
+    def _update_indexes(self, batch: pd.DataFrame, batch_valid: np.ndarray) -> None:
+        """Incorpora um lote (já indexado) às estruturas derivadas."""
+        if 'main_item' not in batch.columns:
+            return
+        rows = batch[batch_valid] if not batch_valid.all() else batch
+        days = self._row_days(rows)
+        if 'price_s' in rows.columns:
+            self.price_sketches.update(rows['main_item'], days,
+                                       rows['price_s'].to_numpy(dtype=float))
+        quantities = rows['main_qty'].to_numpy(dtype=float) if 'main_qty' in rows.columns else None
+        self.heavy_hitters.update(rows['main_item'], days, quantities)
+        if self.market_series.is_built:
+            self.market_series.update(*self._series_inputs(rows))
+        if 'main_ql' in rows.columns and 'price_s' in rows.columns:
+            self._update_ql_surface(rows)
+
+    def _update_ql_surface(self, rows: pd.DataFrame) -> None:
+        """Recalcula a superfície de QL dos itens presentes em `rows`."""
+        full = rows
+        n_valid = len(self.df) if self.valid_mask is None else int(np.count_nonzero(self.valid_mask))
+        if len(rows) != n_valid:
+            # Medianas não são mescláveis: usa todos os trades dos itens tocados
+            full = self._item_rows(rows['main_item'])
+        timestamps = self._series_inputs(full)[1]
+        self.ql_surface.update(full['main_item'], full['main_ql'].to_numpy(dtype=float),
+                               timestamps, unit_prices(full))
+
+    def _item_rows(self, items: pd.Series) -> pd.DataFrame:
+        """
+        Linhas válidas (não ruído) de self.df dos itens em `items`.
+
+        Seleciona pelas posições (códigos da categoria + valid_mask), sem
+        materializar o cleaned_df inteiro a cada lote anexado.
+        """
+        codes, names = item_codes(self.df)
+        found = names.get_indexer(pd.Index(items.dropna().unique()))
+        # Posição extra no fim: código -1 (item nulo) nunca é selecionado
+        wanted = np.zeros(len(names) + 1, dtype=bool)
+        wanted[found[found >= 0]] = True
+        keep = wanted[codes]
+        if self.valid_mask is not None:
+            keep &= self.valid_mask
+        return self.df.iloc[np.flatnonzero(keep)]
+
+    def _index_players(self, offset: int) -> None:
+        """Indexa as linhas a partir de `offset` e recalcula os jogadores tocados."""
+        if 'player' not in self.df.columns:
+            return
+        touched = self.player_index.add_rows(self.df['player'].iloc[offset:], offset)
+        if not touched:
+            return
+        positions = self.player_index.positions_of(touched) if offset else np.arange(len(self.df))
+        rows = self.df.iloc[positions[self.valid_mask[positions]]]
+
+        # Preço relativo à mediana de mercado do item (sketches, sem ordenar)
+        ratios = np.full(len(rows), np.nan)
+        if 'price_s' in rows.columns:
+            codes, uniques = pd.factorize(rows['main_item'])
+            medians = np.array([self.price_sketches.quantiles(u, (0.5,))[0.5] or np.nan
+                                for u in uniques], dtype=float)
+            if len(medians):
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    ratios = np.where(codes >= 0, rows['price_s'].to_numpy(dtype=float)
+                                      / medians[codes], np.nan)
+        operations = rows['operation'] if 'operation' in rows.columns else pd.Series(index=rows.index)
+        self.player_index.update_stats(rows['player'], rows['main_item'], operations,
+                                       ratios, self._series_inputs(rows)[1])
+
+    def _series_inputs(self, rows: pd.DataFrame) -> Tuple:
+        """Colunas (item, timestamp, preço, quantidade) para o MarketSeriesCache."""
+        timestamps = trade_timestamps(rows)
+        prices = rows['price_s'].to_numpy(dtype=float) if 'price_s' in rows.columns \
+            else np.full(len(rows), np.nan)
+        quantities = rows['main_qty'].to_numpy(dtype=float) if 'main_qty' in rows.columns else None
+        return rows['main_item'], timestamps, prices, quantities
+
+    def append_data(self, df_new: pd.DataFrame) -> int:
+        """
+        Anexa um lote de trades e atualiza incrementalmente as estruturas derivadas.
+
+        O lote passa pela mesma normalização do wurm_parser. Apenas as linhas
+        novas são processadas pelo filtro de ruído e pelos sketches.
+
+        Args:
+            df_new: Lote de trades (bruto ou já normalizado)
+
+        Returns:
+            Número de linhas anexadas.
+        """
+        if df_new is None or df_new.empty:
+            return 0
+
+        import wurm_parser
+        batch = self._index_frame(wurm_parser.normalize_trade_frame(df_new.copy()))
+        batch = self._compact_text(batch)
+        if self.canonicalizer is not None:
+            batch = self._canonicalize_frame(batch)
+
+        batch_valid = ~self._noise_mask(batch)
+
+        in_order = True
+        if self.df is None or self.df.empty:
+            self.df = batch
+            self.valid_mask = batch_valid
+        else:
+            in_order = (not isinstance(self.df.index, pd.DatetimeIndex) or batch.empty
+                        or batch.index.min() >= self.df.index.max())
+            self.df = self._concat_frames(self.df, batch)
+            self.valid_mask = np.concatenate([self.valid_mask, batch_valid])
+            if not in_order:
+                order = np.argsort(self.df.index.to_numpy(), kind='stable')
+                self.df = self.df.iloc[order]
+                self.valid_mask = self.valid_mask[order]
+                for pool in self.text_pools.values():
+                    pool.reorder(order)
+
+        self._update_indexes(batch, batch_valid)
+        if in_order:
+            self._index_players(len(self.df) - len(batch))
+        else:
+            # As posições mudaram com a reordenação: reconstrói o índice
+            self.player_index = PlayerIndex()
+            self._index_players(0)
+        summary_current = self._market_summary_version == self.data_version
+        self.data_version += 1
+        if summary_current:
+            self._update_market_summary(batch[batch_valid])
+        self._generate_metadata()
+        logger.info(f"Lote anexado: {len(batch):,} registros (versão {self.data_version})")
+        return len(batch)
+
+    @staticmethod
+    def _concat_frames(base: pd.DataFrame, batch: pd.DataFrame) -> pd.DataFrame:
+        """Concatena preservando colunas categóricas (união das categorias)."""
+        base = base.copy(deep=False)
+        batch = batch.copy(deep=False)
+        for col in base.columns:
+            if col not in batch.columns or not isinstance(base[col].dtype, pd.CategoricalDtype):
+                continue
+            incoming = batch[col].astype('category').cat.categories
+            extra = incoming.difference(base[col].cat.categories)
+            if len(extra):
+                base[col] = base[col].cat.add_categories(extra)
+            batch[col] = pd.Categorical(batch[col], categories=base[col].cat.categories)
+        return pd.concat([base, batch])
+
+    def _noise_mask(self, df: pd.DataFrame) -> np.ndarray:
+        """Máscara de ruído (True = ruído) sobre as colunas de NOISE_COLUMNS."""
+        noise = np.zeros(len(df), dtype=bool)
+        for col in self.NOISE_COLUMNS:
+            if col in df.columns:
+                noise |= self.noise_filter.mask(df[col])
+        return noise
+
+    @property
+    def cleaned_df(self) -> pd.DataFrame:
+        """DataFrame sem as linhas de ruído (materializado sob demanda)."""
+        if self.df is None:
+            return pd.DataFrame()
+        if self.valid_mask is None or self.valid_mask.all():
+            return self.df
+        return self.df[self.valid_mask]
+
+    def add_noise_terms(self, terms: List[str]) -> int:
+        """
+        Adiciona termos de ruído em tempo de execução e atualiza a máscara.
+
+        Returns:
+            Quantidade de termos novos adicionados.
+        """
+        added = self.noise_filter.add_terms(terms)
+        if added:
+            self._preprocess_data()
+            self._build_indexes()
+        return added
 
     def _generate_metadata(self) -> None:
         """Gera metadados básicos sobre o dataset."""
@@ -129,65 +541,402 @@ class WurmStatsEngine:
             )
         }
 
+    @property
+    def _store_only(self) -> bool:
+        """True quando os dados estão só no TradeStore (nada carregado em memória)."""
+        return self.df is None and self.store is not None
+
+    def save_to_store(self, store: TradeStore) -> int:
+        """Grava o DataFrame (com a marcação de ruído) num TradeStore."""
+        if self.df is None: return 0
+        noise = None if self.valid_mask is None else ~self.valid_mask
+        return store.append(self.with_text(self.df, np.arange(len(self.df))), is_noise=noise)
+
     def get_stats(self) -> Dict[str, Any]:
         """Retorna estatísticas gerais do dataset."""
         return self.metadata
 
-    def filter_by_item(self, item_name: str, exact: bool = False) -> pd.DataFrame:
-        """Retorna DataFrame filtrado por nome do item."""
+    def get_price_quantiles(self, item_name: str,
+                            quantiles: Tuple[float, ...] = (0.1, 0.5, 0.9),
+                            start: Optional[Any] = None,
+                            end: Optional[Any] = None) -> Dict[float, Optional[float]]:
+        """
+        Retorna percentis de preço de um item a partir dos sketches.
+
+        Não ordena as linhas: o erro relativo é limitado pela precisão do
+        sketch (1% por padrão). Linhas de ruído e preços <= 0 são ignorados.
+
+        Args:
+            item_name: Nome exato do item (case-insensitive)
+            quantiles: Quantis desejados entre 0 e 1
+            start: Data inicial (inclusiva), opcional
+            end: Data final (inclusiva), opcional
+
+        Returns:
+            Dicionário {quantil: preço}; None quando não há dados.
+        """
+        return self.price_sketches.quantiles(item_name, quantiles,
+                                             self._to_day(start), self._to_day(end))
+
+    def get_price_iqr(self, item_name: str, start: Optional[Any] = None,
+                      end: Optional[Any] = None) -> Optional[float]:
+        """Intervalo interquartil (p75 - p25) do preço de um item."""
+        q = self.get_price_quantiles(item_name, (0.25, 0.75), start, end)
+        if q[0.25] is None:
+            return None
+        return q[0.75] - q[0.25]
+
+    def get_top_items(self, n: int = 50, by: str = 'count',
+                      start: Optional[Any] = None,
+                      end: Optional[Any] = None) -> pd.DataFrame:
+        """
+        Retorna os itens mais negociados a partir do contador Space-Saving.
+
+        Não varre o DataFrame, então funciona mesmo sem o histórico completo
+        em memória. Linhas de ruído não são contadas.
+
+        Args:
+            n: Quantidade de itens
+            by: 'count' (número de trades) ou 'quantity' (quantidade total)
+            start: Data inicial (inclusiva), opcional
+            end: Data final (inclusiva), opcional
+
+        Returns:
+            DataFrame com colunas ['main_item', by, 'error'], em ordem decrescente.
+        """
+        top = self.heavy_hitters.top(n, by, self._to_day(start), self._to_day(end))
+        return pd.DataFrame(top, columns=['main_item', by, 'error'])
+
+    def get_ql_price(self, item_name: str, ql: float,
+                     when: Optional[Any] = None) -> Optional[Dict[str, Any]]:
+        """
+        Preço típico por unidade de um item numa faixa de QL (consulta O(1) na superfície).
+
+        Args:
+            item_name: Nome exato do item (case-insensitive)
+            ql: Qualidade desejada
+            when: Data de referência (usa o mês dela); None = todas as datas
+
+        Returns:
+            Dicionário com count, median, spread e ql_band, ou None sem dados.
+        """
+        return self.ql_surface.lookup(item_name, ql, when)
+
+    def get_ql_surface(self, item_name: str, value: str = 'median') -> pd.DataFrame:
+        """
+        Matriz faixa de QL x mês de um item.
+
+        O nome é resolvido como em match_items: primeiro o nome exato, depois
+        a primeira categoria que contém a substring.
+        """
+        names = self.match_items(item_name, exact=True) or self.match_items(item_name)
+        if not names:
+            return pd.DataFrame()
+        return self.ql_surface.surface(names[0], value)
+
+    def get_player_trades(self, player: str, start: Optional[Any] = None,
+                          end: Optional[Any] = None) -> pd.DataFrame:
+        """
+        Todas as linhas postadas por um jogador (case-insensitive), via índice.
+
+        Inclui linhas de ruído, como filter_by_item. As posições já estão em
+        ordem de tempo, então o intervalo [start, end] é um fatiamento O(log n).
+        """
+        if self._store_only:
+            return self.store.player_trades(player, start, end)
+        if self.df is None: return pd.DataFrame()
+        rows = self.df.iloc[self.player_index.positions(player)]
+        return slice_time_range(rows, start, end)
+
+    def get_player_stats(self, player: str) -> Optional[Dict[str, Any]]:
+        """
+        Agregados de um jogador.
+
+        Returns:
+            Dicionário com trades, wts, wtb, items (itens distintos),
+            price_ratio (mediana do preço / mediana de mercado), first_seen,
+            last_seen, peak_hour, active_hours e hours (trades por hora do
+            dia); None se o jogador não existir.
+        """
+        stats = self.player_index.stats(player)
+        if stats is not None:
+            stats['hours'] = self.player_index.hours(player).tolist()
+        return stats
+
+    def get_top_players(self, n: int = 20, by: str = 'trades') -> pd.DataFrame:
+        """Jogadores com maior valor em `by` (trades, items, active_hours, ...)."""
+        table = self.player_index.table()
+        if by not in table.columns:
+            raise ValueError(f"Coluna inválida: {by}. Use {list(table.columns)}")
+        return table.nlargest(n, by)
+
+    def with_text(self, rows: pd.DataFrame, positions: np.ndarray) -> pd.DataFrame:
+        """Recoloca as colunas de texto (decodificadas) em linhas tiradas de self.df."""
+        if not self.text_pools:
+            return rows
+        rows = rows.copy(deep=False)
+        for col, pool in self.text_pools.items():
+            rows[col] = pool.take(positions)
+        return rows
+
+    def search_text(self, must: str = '', exclude: str = '', exact: bool = False,
+                    case_sensitive: bool = False, column: str = 'raw_text',
+                    limit: Optional[int] = None) -> pd.DataFrame:
+        """
+        Busca por substring no texto livre (raw_text, ou 'main_item' sem ele).
+
+        Em colunas de TEXT_COLUMNS a busca roda sobre o buffer do StringPool;
+        em colunas categóricas, sobre as categorias distintas.
+
+        Args:
+            must: Termos obrigatórios (separados por espaço)
+            exclude: Termos proibidos (separados por espaço)
+            exact: Se True, ``must`` é uma frase única
+            case_sensitive: Diferencia maiúsculas (apenas ASCII no StringPool)
+            column: Coluna pesquisada
+            limit: Máximo de linhas devolvidas (as primeiras no tempo)
+
+        Returns:
+            Linhas encontradas, com a coluna de texto decodificada.
+        """
+        must_terms = [must] if exact and must else must.split()
+        exclude_terms = exclude.split()
+        if self._store_only:
+            if not must_terms:
+                return pd.DataFrame()
+            quoted = lambda t: '"' + t.replace('"', '""') + '"'
+            query = ' AND '.join(quoted(t) for t in must_terms)
+            query += ''.join(f' NOT {quoted(t)}' for t in exclude_terms)
+            return self.store.search_text(query, limit)
+        if self.df is None: return pd.DataFrame()
+        if column not in self.text_pools and column not in self.df.columns:
+            column = 'main_item'
+
+        if column in self.text_pools:
+            mask = self.text_pools[column].search(must_terms, exclude_terms, case_sensitive)
+        elif isinstance(self.df[column].dtype, pd.CategoricalDtype):
+            pool = StringPool.from_categorical(self.df[column])
+            mask = pool.search(must_terms, exclude_terms, case_sensitive)
+        else:
+            values = self.df[column].astype(str)
+            mask = np.ones(len(self.df), dtype=bool)
+            for term in must_terms:
+                mask &= values.str.contains(term, case=case_sensitive, regex=False).to_numpy()
+            for term in exclude_terms:
+                mask &= ~values.str.contains(term, case=case_sensitive, regex=False).to_numpy()
+
+        positions = np.flatnonzero(mask)
+        if limit is not None:
+            positions = positions[:limit]
+        return self.with_text(self.df.iloc[positions], positions)
+
+    def slice_time(self, start: Optional[Any] = None, end: Optional[Any] = None) -> pd.DataFrame:
+        """Retorna a fatia do DataFrame no intervalo [start, end] (O(log n))."""
         if self.df is None: return pd.DataFrame()
-        if exact:
-            return self.df[self.df['main_item'].str.fullmatch(item_name, case=False, na=False)]
-        return self.df[self.df['main_item'].str.contains(item_name, case=False, na=False)]
+        return slice_time_range(self.df, start, end)
+
+    def recent_window(self, days: int) -> Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]]:
+        """Retorna (start, end) cobrindo os últimos `days` dias do dataset."""
+        if self.df is None or self.df.empty or not isinstance(self.df.index, pd.DatetimeIndex):
+            return None, None
+        end = self.df.index[-1]
+        return end.normalize() - pd.Timedelta(days=days - 1), end
+
+    def match_items(self, item_name: Union[str, List[str]], exact: bool = False) -> List[str]:
+        """
+        Resolve um nome (texto em qualquer parte, como filter_by_item, ou exato; case-insensitive) nas categorias de item.
+
+        Trabalha sobre os valores distintos de 'main_item', não sobre as linhas.
+        Uma lista de nomes é devolvida como está.
+        """
+        if self._store_only:
+            return self.store.match_items(item_name, exact)
+        if not isinstance(item_name, str):
+            return [str(i) for i in item_name]
+        if self.df is None or 'main_item' not in self.df.columns:
+            return []
+        _, names = item_codes(self.df)
+        return pd.Index(names).astype(str)[match_item_names(names, item_name, exact)].tolist()
+
+    def get_resampled_series(self, item_name: Union[str, List[str]], freq: str = 'D',
+                             exact: bool = False, start: Optional[Any] = None,
+                             end: Optional[Any] = None) -> pd.DataFrame:
+        """
+        Série de preço e volume de um item (ou conjunto de itens) em qualquer frequência.
+
+        Os trades são agregados uma vez por (item, hora); dia, semana e mês são
+        derivados dessa tabela e ficam em cache até a próxima mudança de dados.
+
+        Args:
+            item_name: Substring do item, ou lista de nomes exatos
+            freq: 'h' (hora), 'D' (dia), 'W' (semana) ou 'M' (mês)
+            exact: Se True, item_name deve casar com o nome inteiro
+            start: Início do intervalo (inclusivo), opcional
+            end: Fim do intervalo (inclusivo), opcional
+
+        Returns:
+            DataFrame indexado por 'period' com mean_price, min_price,
+            max_price, trades e volume.
+        """
+        if self.df is None or 'main_item' not in self.df.columns:
+            return pd.DataFrame()
+        self._ensure_market_series()
+        return self.market_series.series(self.match_items(item_name, exact), freq, start, end)
+
+    def _ensure_market_series(self) -> None:
+        if not self.market_series.is_built:
+            rows = self.cleaned_df
+            self.market_series.build(*self._series_inputs(rows))
+
+    def get_market_table(self, freq: str = 'D') -> pd.DataFrame:
+        """
+        Agregados (item, período) de todo o mercado na frequência pedida.
+
+        Returns:
+            DataFrame indexado por (item, period) com trades, price_count,
+            price_sum, price_min, price_max e quantity.
+        """
+        if self.df is None or 'main_item' not in self.df.columns:
+            return pd.DataFrame()
+        self._ensure_market_series()
+        return self.market_series.table(freq)
+
+    def get_market_summary(self, operation: Optional[str] = None) -> pd.DataFrame:
+        """
+        Resumo de mercado de todos os itens (contagem, média, mediana, mínimo,
+        máximo, último preço e último trade).
+
+        Calculado numa única agregação agrupada e guardado em cache até a
+        próxima mudança de data_version; lotes anexados recalculam só os
+        itens tocados. Linhas de ruído e preços <= 0 ficam de fora.
+
+        Args:
+            operation: 'WTS' ou 'WTB' para só essa operação, indexada por item
+                (None = todas, indexada por (main_item, operation))
 
-    def calculate_volatility(self, item_name: str, window: int = 7) -> pd.DataFrame:
+        Returns:
+            DataFrame com as colunas de MARKET_SUMMARY_COLUMNS.
+        """
+        if self._market_summary is None or self._market_summary_version != self.data_version:
+            self._market_summary = market_summary(self.cleaned_df)
+            self._market_summary_version = self.data_version
+        summary = self._market_summary
+        if operation is None:
+            return summary
+        if operation not in summary.index.get_level_values('operation'):
+            return summary.iloc[:0].droplevel('operation')
+        return summary.xs(operation, level='operation')
+
+    def _update_market_summary(self, rows: pd.DataFrame) -> None:
+        """Recalcula no resumo de mercado os itens presentes em `rows`."""
+        if 'main_item' not in rows.columns or rows.empty:
+            self._market_summary_version = self.data_version
+            return
+        touched = rows['main_item'].dropna().unique()
+        # A mediana não é mesclável: usa todos os trades dos itens tocados
+        fresh = market_summary(self._item_rows(rows['main_item']))
+        kept = self._market_summary[~self._market_summary.index.get_level_values('main_item').isin(touched)]
+        self._market_summary = pd.concat([kept, fresh]).sort_index() if not kept.empty else fresh
+        self._market_summary_version = self.data_version
+
+    def set_backend(self, backend: Union[str, EngineBackend]) -> None:
+        """Troca o backend das consultas por item (ImportError se indisponível)."""
+        self.backend = get_backend(backend)
+        logger.info(f"Backend de consultas: {self.backend.name}")
+
+    def _item_codes_for(self, item_name: str, exact: bool = False) -> np.ndarray:
+        """Códigos das categorias que casam com item_name (texto literal, case-insensitive)."""
+        _, names = item_codes(self.df)
+        return np.flatnonzero(match_item_names(names, item_name, exact))
+
+    def _store_names(self, item_name: str, exact: bool = False) -> List[str]:
+        """Nomes do store que casam com item_name (mesma regra de _item_codes_for)."""
+        return self.store.match_items(item_name, exact)
+
+    def filter_by_item(self, item_name: str, exact: bool = False,
+                       start: Optional[Any] = None, end: Optional[Any] = None) -> pd.DataFrame:
+        """Retorna DataFrame filtrado por nome do item (e opcionalmente por intervalo de datas)."""
+        if self._store_only:
+            return self.store.item_trades(self._store_names(item_name, exact), start=start, end=end)
+        if self.df is None: return pd.DataFrame()
+        codes = self._item_codes_for(item_name, exact)
+        rows = time_range_rows(self.df, start, end)
+        return self.df.iloc[self.backend.filter_positions(self.df, codes, rows)]
+
+    def _daily_mean_price(self, item_name: str, start: Optional[Any] = None,
+                          end: Optional[Any] = None) -> pd.Series:
+        """Preço médio diário do item, calculado pelo backend (ou pelo store)."""
+        if self._store_only:
+            names = self._store_names(item_name)
+            return self.store.daily_mean_price(names, start=start, end=end) if names else pd.Series(dtype=float)
+        if self.df is None or 'price_s' not in self.df.columns or 'date' not in self.df.columns:
+            return pd.Series(dtype=float)
+        codes = self._item_codes_for(item_name)
+        return self.backend.daily_mean_price(self.df, codes, time_range_rows(self.df, start, end))
+
+    def calculate_volatility(self, item_name: str, window: int = 7,
+                             start: Optional[Any] = None, end: Optional[Any] = None) -> pd.DataFrame:
         """Calcula a volatilidade (desvio padrão) do preço."""
-        df_item = self.filter_by_item(item_name)
-        if df_item.empty or 'price_s' not in df_item.columns:
+        daily_price = self._daily_mean_price(item_name, start, end)
+        if daily_price.empty:
             return pd.DataFrame()
         
-        # Group by date and take mean price
-        daily_price = df_item.groupby('date')['price_s'].mean()
         volatility = daily_price.rolling(window=window).std()
         return volatility.reset_index(name='volatility')
 
-    def calculate_mean_average(self, item_name: str, window: int = 7) -> pd.DataFrame:
+    def calculate_mean_average(self, item_name: str, window: int = 7,
+                               start: Optional[Any] = None, end: Optional[Any] = None) -> pd.DataFrame:
         """Calcula a média móvel do preço."""
-        df_item = self.filter_by_item(item_name)
-        if df_item.empty or 'price_s' not in df_item.columns:
+        daily_price = self._daily_mean_price(item_name, start, end)
+        if daily_price.empty:
             return pd.DataFrame()
             
-        daily_price = df_item.groupby('date')['price_s'].mean()
         ma = daily_price.rolling(window=window).mean()
         return ma.reset_index(name='moving_average')
 
-    def calculate_profit_margins(self, item_name: str) -> pd.DataFrame:
+    def calculate_profit_margins(self, item_name: str,
+                                 start: Optional[Any] = None, end: Optional[Any] = None) -> pd.DataFrame:
         """
         Calcula margens de lucro (WTS - WTB) para um item.
         """
-        df_item = self.filter_by_item(item_name, exact=False)
-        
-        if 'operation' not in df_item.columns or 'price_s' not in df_item.columns or 'date' not in df_item.columns:
+        if self._store_only:
+            names = self._store_names(item_name)
+            if not names:
+                return pd.DataFrame()
+            margins = self.store.daily_spread(names, start=start, end=end)
+        elif self.df is None or not {'operation', 'price_s', 'date'}.issubset(self.df.columns):
             return pd.DataFrame()
-            
-        # Separate WTS and WTB
-        wts = df_item[df_item['operation'] == 'WTS'].groupby('date')['price_s'].min()
-        wtb = df_item[df_item['operation'] == 'WTB'].groupby('date')['price_s'].max()
-        
-        # Merge and calculate spread
-        margins = pd.DataFrame({'min_wts': wts, 'max_wtb': wtb})
+        else:
+            # Menor WTS e maior WTB por dia (backend)
+            codes = self._item_codes_for(item_name)
+            margins = self.backend.daily_spread(self.df, codes, time_range_rows(self.df, start, end))
         margins['spread'] = margins['min_wts'] - margins['max_wtb']
         margins['margin_pct'] = (margins['spread'] / margins['max_wtb']) * 100
         
         return margins.dropna().sort_index()
 
-    def calculate_risk_trends(self, item_name: str, window: int = 7) -> pd.DataFrame:
+    def scan_arbitrage(self, start: Optional[Any] = None, end: Optional[Any] = None,
+                       ql_bins: Optional[List[float]] = None, min_profit_pct: float = 0.0,
+                       top_n: Optional[int] = None) -> pd.DataFrame:
+        """
+        Ranking de oportunidades de arbitragem (menor WTS < maior WTB) no mercado inteiro.
+
+        Veja scan_arbitrage() (função do módulo) para as colunas retornadas.
+        Linhas de ruído são ignoradas.
+        """
+        if self.df is None: return pd.DataFrame()
+        rows = self.df if self.valid_mask is None else self.df[self.valid_mask]
+        return scan_arbitrage(slice_time_range(rows, start, end), ql_bins=ql_bins,
+                              min_profit_pct=min_profit_pct, top_n=top_n)
+
+    def calculate_risk_trends(self, item_name: str, window: int = 7,
+                              start: Optional[Any] = None, end: Optional[Any] = None) -> pd.DataFrame:
         """
         Calcula tendências de risco (Volatilidade + Média Móvel).
         """
         # Reuse existing methods but ensure they return compatible DataFrames
-        vol = self.calculate_volatility(item_name, window)
-        ma = self.calculate_mean_average(item_name, window)
+        vol = self.calculate_volatility(item_name, window, start=start, end=end)
+        ma = self.calculate_mean_average(item_name, window, start=start, end=end)
         
         if vol.empty or ma.empty:
             return pd.DataFrame()
@@ -219,9 +968,169 @@ class WurmStatsEngine:
                 
         end_mem = self.df.memory_usage(deep=True).sum()
         saved = (start_mem - end_mem) / 1024 / 1024
+
+        # Backends colunares convertem/registram o frame otimizado agora, não na 1ª consulta
+        self.backend.prepare(self.df)
         
         return f"Otimização concluída. Economia de {saved:.2f} MB."
 
+def scan_arbitrage(df: pd.DataFrame, ql_bins: Optional[List[float]] = None,
+                   min_profit_pct: float = 0.0, top_n: Optional[int] = None,
+                   only_opportunities: bool = True) -> pd.DataFrame:
+    """
+    Varre o mercado inteiro em busca de arbitragem WTS x WTB (vetorizado).
+
+    Para cada item e dia (e faixa de QL, se pedida) calcula o menor WTS e o
+    maior WTB numa única passada: as chaves (item, dia, faixa) são combinadas
+    num inteiro e reduzidas direto em arrays NumPy (ou por groupby, quando o
+    espaço de chaves é esparso demais).
+
+    Args:
+        df: DataFrame de trades (main_item, operation, price_s, date/índice)
+        ql_bins: Limites das faixas de QL (ex.: [0, 30, 50, 70, 90, 100]), opcional
+        min_profit_pct: Lucro percentual mínimo para entrar no ranking
+        top_n: Limita o resultado às N melhores oportunidades
+        only_opportunities: Se False, retorna todos os pares WTS/WTB
+
+    Returns:
+        DataFrame ordenado por profit_pct com main_item, date, [ql_band],
+        min_wts, max_wtb, spread, margin_pct (mesma convenção de
+        calculate_profit_margins), profit (max_wtb - min_wts) e profit_pct.
+    """
+    columns = ['main_item', 'date'] + (['ql_band'] if ql_bins else []) + \
+        ['min_wts', 'max_wtb', 'spread', 'margin_pct', 'profit', 'profit_pct']
+    required = {'main_item', 'operation', 'price_s'}
+    if df is None or df.empty or not required.issubset(df.columns):
+        return pd.DataFrame(columns=columns)
+
+    prices = df['price_s'].to_numpy(dtype=float)
+    is_wts = (df['operation'] == 'WTS').to_numpy()
+    is_wtb = (df['operation'] == 'WTB').to_numpy()
+    items = df['main_item'] if isinstance(df['main_item'].dtype, pd.CategoricalDtype) \
+        else df['main_item'].astype('category')
+    item_codes = items.cat.codes.to_numpy().astype(np.int64)
+    days = WurmStatsEngine._row_days(df)
+
+    valid = (is_wts | is_wtb) & (prices > 0) & (item_codes >= 0) & (days != np.iinfo(np.int64).min)
+    if ql_bins:
+        ql = df['main_ql'].to_numpy(dtype=float) if 'main_ql' in df.columns else np.full(len(df), np.nan)
+        bands = np.digitize(ql, ql_bins[1:-1]).astype(np.int64)
+        valid &= np.isfinite(ql)
+    else:
+        bands = np.zeros(len(df), dtype=np.int64)
+    if not valid.any():
+        return pd.DataFrame(columns=columns)
+
+    day0 = days[valid].min()
+    n_days = int(days[valid].max() - day0 + 1)
+    n_bands = len(ql_bins) - 1 if ql_bins else 1
+    keys = (item_codes * n_days + (days - day0)) * n_bands + bands
+
+    wts_sel = valid & is_wts
+    wtb_sel = valid & is_wtb
+    n_keys = (int(item_codes.max()) + 1) * n_days * n_bands
+    if n_keys <= 4 * len(df):
+        # Espaço de chaves denso: min/max direto em arrays, sem hash
+        min_wts = np.full(n_keys, np.inf)
+        max_wtb = np.full(n_keys, -np.inf)
+        np.minimum.at(min_wts, keys[wts_sel], prices[wts_sel])
+        np.maximum.at(max_wtb, keys[wtb_sel], prices[wtb_sel])
+        both = np.flatnonzero(np.isfinite(min_wts) & np.isfinite(max_wtb))
+        pairs = pd.DataFrame({'min_wts': min_wts[both], 'max_wtb': max_wtb[both]}, index=both)
+    else:
+        min_wts = pd.Series(prices[wts_sel]).groupby(keys[wts_sel]).min()
+        max_wtb = pd.Series(prices[wtb_sel]).groupby(keys[wtb_sel]).max()
+        pairs = pd.concat({'min_wts': min_wts, 'max_wtb': max_wtb}, axis=1, join='inner')
+    if pairs.empty:
+        return pd.DataFrame(columns=columns)
+
+    pairs['spread'] = pairs['min_wts'] - pairs['max_wtb']
+    pairs['margin_pct'] = (pairs['spread'] / pairs['max_wtb']) * 100
+    pairs['profit'] = -pairs['spread']
+    pairs['profit_pct'] = (pairs['profit'] / pairs['min_wts']) * 100
+    if only_opportunities:
+        pairs = pairs[(pairs['profit'] > 0) & (pairs['profit_pct'] >= min_profit_pct)]
+    pairs = pairs.nlargest(top_n, 'profit_pct') if top_n else \
+        pairs.sort_values('profit_pct', ascending=False, kind='stable')
+
+    # Decodifica as chaves apenas das linhas que sobraram
+    key = pairs.index.to_numpy()
+    result = pd.DataFrame({
+        'main_item': pd.Categorical.from_codes(key // n_bands // n_days, items.cat.categories),
+        'date': (key // n_bands % n_days + day0).astype('datetime64[D]').astype('datetime64[ns]'),
+    })
+    if ql_bins:
+        labels = [f"{ql_bins[i]:g}-{ql_bins[i + 1]:g}" for i in range(n_bands)]
+        result['ql_band'] = pd.Categorical.from_codes(key % n_bands, labels)
+    for col in ['min_wts', 'max_wtb', 'spread', 'margin_pct', 'profit', 'profit_pct']:
+        result[col] = pairs[col].to_numpy()
+    return result
+
+
+def unit_prices(df: pd.DataFrame) -> np.ndarray:
+    """
+    Preço por unidade de cada trade (price_s / main_qty), em copper.
+
+    Linhas sem quantidade válida (ausente, NaN ou <= 0) ficam com o price_s
+    do trade, como um lote de uma unidade.
+    """
+    prices = df['price_s'].to_numpy(dtype=float)
+    if 'main_qty' not in df.columns:
+        return prices
+    qty = df['main_qty'].to_numpy(dtype=float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(np.isfinite(qty) & (qty > 0), prices / qty, prices)
+
+
+MARKET_SUMMARY_COLUMNS = ['count', 'mean_price', 'median_price', 'min_price', 'max_price',
+                          'last_price', 'last_seen']
+
+
+def market_summary(df: pd.DataFrame, per_unit: bool = False) -> pd.DataFrame:
+    """
+    Resumo de mercado por (item, operação) numa única agregação agrupada.
+
+    Considera apenas preços > 0 (doações e erros de parse distorcem as
+    médias). Com o DataFrame em ordem de tempo, 'last_price' é o preço do
+    trade mais recente do grupo.
+
+    Args:
+        df: DataFrame de trades (main_item, operation, price_s, índice temporal ou 'date')
+        per_unit: Se True, usa o preço por unidade (unit_prices: price_s / main_qty),
+            na mesma unidade dos preços base do PriceManager
+
+    Returns:
+        DataFrame indexado por (main_item, operation) com as colunas de
+        MARKET_SUMMARY_COLUMNS.
+    """
+    empty = pd.DataFrame(columns=MARKET_SUMMARY_COLUMNS,
+                         index=pd.MultiIndex.from_arrays([[], []], names=['main_item', 'operation']))
+    if df is None or df.empty or not {'main_item', 'price_s'}.issubset(df.columns):
+        return empty
+
+    prices = unit_prices(df) if per_unit else df['price_s'].to_numpy(dtype=float)
+    keep = prices > 0
+    if not keep.any():
+        return empty
+    timestamps = trade_timestamps(df)
+    operations = df['operation'].to_numpy(dtype=object) if 'operation' in df.columns \
+        else np.full(len(df), None, dtype=object)
+    items = df['main_item'].to_numpy(dtype=object)
+
+    frame = pd.DataFrame({'main_item': items[keep], 'operation': operations[keep],
+                          'price_s': prices[keep], 'timestamp': timestamps[keep]})
+    summary = frame.groupby(['main_item', 'operation'], sort=True, dropna=False).agg(
+        count=('price_s', 'count'),
+        mean_price=('price_s', 'mean'),
+        median_price=('price_s', 'median'),
+        min_price=('price_s', 'min'),
+        max_price=('price_s', 'max'),
+        last_price=('price_s', 'last'),
+        last_seen=('timestamp', 'max'),
+    )
+    return summary
+
+
 if __name__ == "__main__":
     # Teste rápido
     try: